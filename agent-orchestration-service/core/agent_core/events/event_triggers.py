@@ -7,11 +7,13 @@ from typing import Dict
 logger = logging.getLogger(__name__)
 
 # --- Start of modification: Rename and simplify old function ---
-async def trigger_view_model_update(context: Dict, view_name: str):
+async def trigger_view_model_update(context: Dict, view_name: str, force_snapshot: bool = False):
     """
     Generates a view model and pushes it to the client via WebSocket.
     This function is robust and can accept either a full run_context 
     or a sub-context (like principal_context) that contains a 'run_context_ref'.
+    Only the delta since the client's last revision is sent unless force_snapshot is set
+    (used on subscribe and resync).
     """
     if not context:
         logger.warning("view_model_update_no_context")
@@ -48,13 +50,9 @@ async def trigger_view_model_update(context: Dict, view_name: str):
         # 2. Always pass the real run_context to the generator
         model = await generate_view_model(actual_run_context, view_name)
         
-        await events.send_json(
-            run_id=run_id,
-            message={
-                "type": "view_model_update",
-                "data": {"view_name": view_name, "model": model}
-            }
-        )
+        sent = await events.emit_view_model_update(run_id, view_name, model, force_snapshot=force_snapshot)
+        if not sent:
+            return
         if model and (model.get("nodes") or model.get("edges")): # Ensure to check if model is None
             logger.info("view_model_update_success", extra={
                 "view_name": view_name,
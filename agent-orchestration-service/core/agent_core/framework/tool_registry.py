@@ -5,6 +5,8 @@ This includes internal Python-based tools, tools from MCP servers, and
 handles dynamic availability based on Agent Profiles.
 """
 
+import os
+import json
 import inspect
 import logging
 import importlib
@@ -19,9 +21,33 @@ from mcp.client.session_group import ClientSessionGroup
 
 MCP_PROMPT_OVERRIDE_FILE = Path("mcp_prompt_override.yaml")
 MCP_TOOLS_CACHE_FILE = Path(".current_mcp_tools.yaml")
+CUSTOM_TOOLS_MANIFEST_FILE = Path(".custom_tools_manifest.json")
+CUSTOM_TOOLS_MANIFEST_FORMAT = 1
+# When enabled, custom node modules are only imported on first use if the manifest is up to date.
+LAZY_CUSTOM_TOOL_IMPORTS = os.getenv("TOOL_REGISTRY_LAZY_IMPORTS", "true").lower() in ("1", "true", "yes")
 
 _TOOL_REGISTRY = {}
 
+# Bumped on every registry change; all compiled tool caches below are keyed by / cleared with it.
+_REGISTRY_VERSION = 0
+_PROFILE_TOOLS_CACHE: Dict[tuple, List[Dict]] = {}
+_PROFILE_PROMPT_CACHE: Dict[tuple, str] = {}
+_API_TOOL_CACHE: Dict[str, Dict] = {}
+
+
+def _bump_registry_version():
+    """Invalidates every compiled tool list, API schema and prompt fragment."""
+    global _REGISTRY_VERSION
+    _REGISTRY_VERSION += 1
+    _PROFILE_TOOLS_CACHE.clear()
+    _PROFILE_PROMPT_CACHE.clear()
+    _API_TOOL_CACHE.clear()
+
+
+def get_registry_version() -> int:
+    """Returns the current registry version, which changes whenever tools are (re)registered."""
+    return _REGISTRY_VERSION
+
 
 def _sanitize_schema_for_api(schema: Any) -> Any:
     """
@@ -89,12 +115,24 @@ def tool_registry(
             "context_segment_contributions": context_segment_contributions or [],
             "default_knowledge_item_type": default_knowledge_item_type,
             "source_uri_field_in_output": source_uri_field_in_output,
-            "title_field_in_output": title_field_in_output
+            "title_field_in_output": title_field_in_output,
+            "module_name": cls.__module__,
+            "class_name": cls.__name__
         }
         
-        if name in _TOOL_REGISTRY:
+        existing = _TOOL_REGISTRY.get(name)
+        if _is_lazy_placeholder(existing) and existing.get("module_name") == cls.__module__:
+            # The tool was registered from the manifest; keep that entry (it may already carry
+            # merged handover parameters) and just attach the now-imported class.
+            existing["node_class"] = cls
+            cls._tool_info = existing
+            logger.debug("lazy_tool_class_attached", extra={"description": "Attached imported class to lazily registered tool", "tool_name": name})
+            return cls
+
+        if existing is not None:
             logger.warning("tool_registration_overwrite", extra={"description": "Tool name already exists and will be overwritten", "tool_name": name})
         _TOOL_REGISTRY[name] = tool_info
+        _bump_registry_version()
         
         cls._tool_info = tool_info
         
@@ -111,10 +149,41 @@ def get_tool_by_name(name):
     """Gets a registered tool by its name."""
     return _TOOL_REGISTRY.get(name)
 
+def _is_lazy_placeholder(tool_info: Optional[Dict]) -> bool:
+    return bool(
+        tool_info
+        and tool_info.get("implementation_type") == "internal"
+        and tool_info.get("node_class") is None
+        and tool_info.get("module_name")
+    )
+
+def _resolve_node_class(tool_info: Dict):
+    """Returns the tool's class, importing its module on first use if it was registered lazily."""
+    if not _is_lazy_placeholder(tool_info):
+        return tool_info.get("node_class")
+
+    module_name = tool_info["module_name"]
+    try:
+        module = importlib.import_module(module_name)
+    except Exception as e:
+        logger.error("lazy_tool_module_import_error", extra={"description": "Error importing module of lazily registered tool", "tool_name": tool_info.get("name"), "module_name": module_name, "error": str(e)}, exc_info=True)
+        return None
+
+    # Importing usually attaches the class through the decorator; modules imported before the
+    # registry was (re)initialized need to be attached here.
+    cls = tool_info.get("node_class") or getattr(module, tool_info.get("class_name", ""), None)
+    if cls is None:
+        logger.error("lazy_tool_class_not_found", extra={"description": "Class of lazily registered tool not found in its module", "tool_name": tool_info.get("name"), "module_name": module_name, "class_name": tool_info.get("class_name")})
+        return None
+    tool_info["node_class"] = cls
+    cls._tool_info = tool_info
+    logger.debug("lazy_tool_module_imported", extra={"description": "Imported module of lazily registered tool", "tool_name": tool_info.get("name"), "module_name": module_name})
+    return cls
+
 def get_tool_node_class(name):
     """Gets the Node or Flow class corresponding to a tool name."""
     tool = get_tool_by_name(name)
-    return tool["node_class"] if tool else None
+    return _resolve_node_class(tool) if tool else None
 
 def get_tools_by_toolset_names(toolset_names: List[str]) -> List[Dict]:
     """
@@ -161,11 +230,37 @@ def get_all_toolsets_with_tools() -> Dict[str, List[Dict]]:
         })
     return toolsets_data
 
+def _format_tool_for_llm_api(tool_info: Dict) -> Dict:
+    description = tool_info.get("description", "")
+    
+    toolset_name = tool_info.get("toolset_name", tool_info["name"])
+    description_with_toolset = f"{description} (Belongs to toolset: '{toolset_name}')"
+        
+    parameters = tool_info.get("parameters", {})
+    if not isinstance(parameters, dict):
+         logger.warning("tool_invalid_parameters", extra={"description": "Tool has non-dict parameters; using empty object", "tool_name": tool_info.get('name', 'unknown'), "parameters": str(parameters)})
+         parameters = {"type": "object", "properties": {}}
+    
+    # Sanitize the schema to remove all custom fields starting with 'x-' before sending to the API
+    sanitized_parameters = _sanitize_schema_for_api(parameters)
+    
+    return {
+        "type": "function",
+        "function": {
+            "name": tool_info.get("name", ""),
+            "description": description_with_toolset,
+            "parameters": sanitized_parameters
+        }
+    }
+
 def format_tools_for_llm_api(tools_list: List[Dict]) -> List[Dict]:
     """
     Formats a list of tools into the format required by the LLM API,
     appending toolset information to the description and sanitizing the schema.
     
+    Compiled entries for registered tools are cached until the registry changes,
+    so the returned dicts are shared and must be treated as read-only.
+    
     Args:
         tools_list: A list of tool information dictionaries.
     
@@ -174,27 +269,16 @@ def format_tools_for_llm_api(tools_list: List[Dict]) -> List[Dict]:
     """
     api_tools = []
     for tool_info in tools_list:
-        description = tool_info.get("description", "")
-        
-        toolset_name = tool_info.get("toolset_name", tool_info["name"])
-        description_with_toolset = f"{description} (Belongs to toolset: '{toolset_name}')"
-            
-        parameters = tool_info.get("parameters", {})
-        if not isinstance(parameters, dict):
-             logger.warning("tool_invalid_parameters", extra={"description": "Tool has non-dict parameters; using empty object", "tool_name": tool_info.get('name', 'unknown'), "parameters": str(parameters)})
-             parameters = {"type": "object", "properties": {}}
-        
-        # Sanitize the schema to remove all custom fields starting with 'x-' before sending to the API
-        sanitized_parameters = _sanitize_schema_for_api(parameters)
-        
-        api_tool = {
-            "type": "function",
-            "function": {
-                "name": tool_info.get("name", ""),
-                "description": description_with_toolset,
-                "parameters": sanitized_parameters
-            }
-        }
+        name = tool_info.get("name", "")
+        if _TOOL_REGISTRY.get(name) is not tool_info:
+            # Ad-hoc tool definitions are not cached since they can change behind our back.
+            api_tools.append(_format_tool_for_llm_api(tool_info))
+            continue
+
+        api_tool = _API_TOOL_CACHE.get(name)
+        if api_tool is None:
+            api_tool = _format_tool_for_llm_api(tool_info)
+            _API_TOOL_CACHE[name] = api_tool
         api_tools.append(api_tool)
     return api_tools
 
@@ -320,6 +404,7 @@ def register_native_mcp_tool(
         "source_uri_field_in_output": source_uri_field_in_output,
         "title_field_in_output": title_field_in_output
     }
+    _bump_registry_version()
     logger.debug("mcp_tool_registered", extra={"description": "Registered native MCP tool", "unique_tool_name": unique_tool_name, "original_name": name, "server_name": server_name})
 
 def _apply_mcp_prompt_overrides():
@@ -382,6 +467,51 @@ import copy
 from .handover_service import HandoverService
 
 
+def _scan_custom_node_modules(tools_dir: Path) -> Dict[str, List[int]]:
+    """Returns {module_name: [mtime_ns, size]} for every custom node module in the directory."""
+    signatures = {}
+    for py_file in sorted(tools_dir.glob("*.py")):
+        if py_file.name.startswith("_"):
+            continue
+        stat = py_file.stat()
+        # Use the full module path: agent_core.nodes.custom_nodes.module_name
+        signatures[f"agent_core.nodes.custom_nodes.{py_file.stem}"] = [stat.st_mtime_ns, stat.st_size]
+    return signatures
+
+
+def _load_custom_tools_manifest(module_signatures: Dict[str, List[int]]) -> Optional[List[Dict]]:
+    """Returns the tool definitions from the manifest, or None if it is missing or stale."""
+    if not CUSTOM_TOOLS_MANIFEST_FILE.exists():
+        return None
+    try:
+        with open(CUSTOM_TOOLS_MANIFEST_FILE, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except Exception as e:
+        logger.warning("custom_tools_manifest_unreadable", extra={"description": "Could not read custom tools manifest, importing all modules", "manifest_file": str(CUSTOM_TOOLS_MANIFEST_FILE), "error": str(e)})
+        return None
+
+    if manifest.get("format") != CUSTOM_TOOLS_MANIFEST_FORMAT or manifest.get("modules") != module_signatures:
+        logger.debug("custom_tools_manifest_stale", extra={"description": "Custom node modules changed since the manifest was written", "manifest_file": str(CUSTOM_TOOLS_MANIFEST_FILE)})
+        return None
+    return manifest.get("tools", [])
+
+
+def _write_custom_tools_manifest(module_signatures: Dict[str, List[int]]):
+    """Records the freshly imported custom tools so that the next start can register them lazily."""
+    tools = [
+        {key: value for key, value in tool_info.items() if key != "node_class"}
+        for tool_info in _TOOL_REGISTRY.values()
+        if tool_info.get("implementation_type") == "internal" and tool_info.get("module_name") in module_signatures
+    ]
+    try:
+        payload = json.dumps({"format": CUSTOM_TOOLS_MANIFEST_FORMAT, "modules": module_signatures, "tools": tools}, ensure_ascii=False, indent=2)
+        with open(CUSTOM_TOOLS_MANIFEST_FILE, 'w', encoding='utf-8') as f:
+            f.write(payload)
+        logger.debug("custom_tools_manifest_written", extra={"description": "Wrote custom tools manifest", "tool_count": len(tools), "manifest_file": str(CUSTOM_TOOLS_MANIFEST_FILE)})
+    except Exception as e:
+        logger.warning("custom_tools_manifest_write_failed", extra={"description": "Failed to write custom tools manifest; tools will be imported eagerly next time", "manifest_file": str(CUSTOM_TOOLS_MANIFEST_FILE), "error": str(e)})
+
+
 async def initialize_registry(discovery_session_group: Optional[ClientSessionGroup], custom_nodes_path_str="agent_core/nodes/custom_nodes"):
     """
     Initializes the tool registry by discovering internal and native MCP tools.
@@ -393,6 +523,7 @@ async def initialize_registry(discovery_session_group: Optional[ClientSessionGro
     global _TOOL_REGISTRY
     logger.info("tool_registry_init_begin", extra={"description": "Initializing tool registry"})
     _TOOL_REGISTRY.clear()
+    _bump_registry_version()
 
     HandoverService.load_protocols()
 
@@ -401,24 +532,36 @@ async def initialize_registry(discovery_session_group: Optional[ClientSessionGro
     tools_dir = Path(custom_nodes_path_str)
     if tools_dir.exists() and tools_dir.is_dir():
         try:
-            for py_file in tools_dir.glob("*.py"):
-                if py_file.name.startswith("_"):
-                    continue
+            module_signatures = _scan_custom_node_modules(tools_dir)
+            manifest_tools = _load_custom_tools_manifest(module_signatures) if LAZY_CUSTOM_TOOL_IMPORTS else None
+
+            if manifest_tools is not None:
+                # Modules are unchanged since the manifest was written: register the tools from it
+                # and defer importing each module until its tool is actually connected.
+                for tool_info in manifest_tools:
+                    _TOOL_REGISTRY[tool_info["name"]] = {**tool_info, "node_class": None}
+                logger.info("custom_tools_registered_lazily", extra={"description": "Registered custom tools from manifest without importing their modules", "tool_count": len(manifest_tools), "manifest_file": str(CUSTOM_TOOLS_MANIFEST_FILE)})
+            else:
+                all_imported = True
+                for module_name in module_signatures:
+                    try:
+                        # Force reload by removing from sys.modules if already imported
+                        if module_name in sys.modules:
+                            logger.debug("module_force_reload", extra={"description": "Removing module from sys.modules to force reload", "module_name": module_name})
+                            del sys.modules[module_name]
+                        
+                        importlib.import_module(module_name)
+                        logger.debug("custom_tool_module_imported", extra={"description": "Successfully imported custom tool module", "module_name": module_name})
+                    except ImportError as e:
+                        all_imported = False
+                        logger.error("custom_tool_module_import_error", extra={"description": "Error importing module. Check paths and dependencies", "module_name": module_name, "error": str(e)})
+                    except Exception as e:
+                        all_imported = False
+                        logger.error("custom_tool_module_unknown_error", extra={"description": "Unknown error processing module", "module_name": module_name, "error": str(e)}, exc_info=True)
 
-                # Use the full module path: agent_core.nodes.custom_nodes.module_name
-                module_name = f"agent_core.nodes.custom_nodes.{py_file.stem}"
-                try:
-                    # Force reload by removing from sys.modules if already imported
-                    if module_name in sys.modules:
-                        logger.debug("module_force_reload", extra={"description": "Removing module from sys.modules to force reload", "module_name": module_name})
-                        del sys.modules[module_name]
-                    
-                    importlib.import_module(module_name)
-                    logger.debug("custom_tool_module_imported", extra={"description": "Successfully imported custom tool module", "module_name": module_name})
-                except ImportError as e:
-                    logger.error("custom_tool_module_import_error", extra={"description": "Error importing module. Check paths and dependencies", "module_name": module_name, "error": str(e)})
-                except Exception as e:
-                    logger.error("custom_tool_module_unknown_error", extra={"description": "Unknown error processing module", "module_name": module_name, "error": str(e)}, exc_info=True)
+                # Only a complete scan is worth reusing; otherwise retry the imports next time.
+                if LAZY_CUSTOM_TOOL_IMPORTS and all_imported:
+                    _write_custom_tools_manifest(module_signatures)
         except Exception as e:
             logger.error("custom_tools_scan_error", extra={"description": "Error scanning custom nodes directory", "directory": custom_nodes_path_str, "error": str(e)}, exc_info=True)
     else:
@@ -489,6 +632,9 @@ async def initialize_registry(discovery_session_group: Optional[ClientSessionGro
 
     _cache_mcp_tools_to_yaml()
 
+    # Handover merges and prompt overrides edit entries in place, so drop everything compiled so far.
+    _bump_registry_version()
+
     tools_count = len(_TOOL_REGISTRY)
     actual_custom_python_tool_count = sum(1 for t in _TOOL_REGISTRY.values() if t.get("implementation_type") == "internal")
     actual_native_tool_count = sum(1 for t in _TOOL_REGISTRY.values() if t.get("implementation_type") == "native_mcp")
@@ -499,12 +645,53 @@ async def initialize_registry(discovery_session_group: Optional[ClientSessionGro
 
     return _TOOL_REGISTRY
 
+def _profile_tools_cache_key(loaded_profile: Dict, context: Dict, agent_id: str) -> tuple:
+    """
+    Everything that affects tool resolution: the profile version, its tool policy and,
+    for Associates, the Principal's toolset override.
+    """
+    tool_access_policy = loaded_profile.get("tool_access_policy", {})
+    is_associate_agent = "Associate" in agent_id
+    override_toolsets = context["state"].get("allowed_toolsets") if is_associate_agent else None
+    return (
+        _REGISTRY_VERSION,
+        loaded_profile.get("profile_id"),
+        loaded_profile.get("rev"),
+        is_associate_agent,
+        tuple(tool_access_policy.get("allowed_toolsets", [])),
+        tuple(tool_access_policy.get("allowed_individual_tools", [])),
+        tuple(override_toolsets) if override_toolsets is not None else None,
+    )
+
 def get_tools_for_profile(loaded_profile: Dict, context: Dict, agent_id: str) -> List[Dict]:
     """
     Gets the list of tools available to an agent based on its loaded profile
     and the current context. Tool access is governed by the profile's
     `tool_access_policy` and any overrides from the Principal.
+
+    Results are cached per (registry version, profile version, toolset selection).
     """
+    cache_key = _profile_tools_cache_key(loaded_profile, context, agent_id)
+    cached = _PROFILE_TOOLS_CACHE.get(cache_key)
+    if cached is None:
+        cached = _resolve_tools_for_profile(loaded_profile, context, agent_id)
+        _PROFILE_TOOLS_CACHE[cache_key] = cached
+    return list(cached)
+
+def format_tools_description_for_profile(loaded_profile: Dict, context: Dict, agent_id: str) -> str:
+    """Renders the 'tool_description' prompt segment for an agent, cached like get_tools_for_profile."""
+    cache_key = _profile_tools_cache_key(loaded_profile, context, agent_id)
+    rendered = _PROFILE_PROMPT_CACHE.get(cache_key)
+    if rendered is None:
+        tools_by_toolset = {}
+        for tool_info in get_tools_for_profile(loaded_profile, context, agent_id):
+            toolset = tool_info.get("toolset_name", tool_info.get("name", "unknown_toolset"))
+            tools_by_toolset.setdefault(toolset, []).append(tool_info)
+        rendered = format_tools_for_prompt_by_toolset(tools_by_toolset)
+        _PROFILE_PROMPT_CACHE[cache_key] = rendered
+    return rendered
+
+def _resolve_tools_for_profile(loaded_profile: Dict, context: Dict, agent_id: str) -> List[Dict]:
     sub_context_state = context["state"]
     profile_id = loaded_profile.get("profile_id", "UnknownProfile")
     
@@ -621,7 +808,8 @@ def connect_tools_to_node(node, context: Optional[Dict] = None):
             # For "internal_profile_agent", node_class is always AgentNode.
             # For "native_mcp", node_class is MCPProxyNode.
             
-            node_class_from_registry = tool_info.get("node_class") # This is set for "internal" type by decorator
+            # Set for "internal" type by the decorator, or imported here on first use if registered lazily
+            node_class_from_registry = _resolve_node_class(tool_info) if impl_type == "internal" else tool_info.get("node_class")
             ends_flow_tool = tool_info.get("ends_flow", False)
             action_name = name # PocketFlow action is the tool name
             
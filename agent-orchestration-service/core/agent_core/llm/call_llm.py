@@ -1,7 +1,9 @@
 import os
 import json
 import uuid
-from typing import List, Dict, Any, Optional
+import hashlib
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
 import logging
 import asyncio # Add asyncio module
 # Import LiteLLM library
@@ -19,6 +21,7 @@ from litellm.exceptions import (
 )
 import json_repair
 from .utils import extract_tool_calls_from_content
+from .stream_emitter import IncrementalTagMatcher, LLMChunkCoalescer
 
 
 # Learn more about calling the LLM: https://the-pocket.github.io/PocketFlow/utility_function/llm.html
@@ -93,6 +96,72 @@ class FunctionCallErrorException(Exception):
     pass
 
 
+# --- Token estimation cache ---
+# Per-message token counts keyed by (tokenizer model, message content hash). In agent loops the
+# system prompt and history prefix are identical between turns, so only new messages hit the tokenizer.
+TOKEN_COUNT_CACHE_MAX_ENTRIES = 16384
+_message_token_cache: "OrderedDict[Tuple[str, str], int]" = OrderedDict()
+# litellm adds per-request tokens (e.g. reply priming) on top of the per-message counts;
+# measured once per tokenizer model so that summed per-message counts match a full count.
+_request_overhead_tokens: Dict[str, int] = {}
+
+
+def _message_content_hash(message: Dict) -> str:
+    serialized = json.dumps(message, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(serialized.encode("utf-8")).hexdigest()
+
+
+def _get_request_overhead_tokens(model_for_counting: str) -> int:
+    overhead = _request_overhead_tokens.get(model_for_counting)
+    if overhead is None:
+        probe = {"role": "user", "content": "probe"}
+        single = litellm.token_counter(model=model_for_counting, messages=[probe])
+        double = litellm.token_counter(model=model_for_counting, messages=[probe, probe])
+        overhead = max(0, 2 * single - double)
+        _request_overhead_tokens[model_for_counting] = overhead
+    return overhead
+
+
+def _resolve_token_counter_model(model: str, llm_config_for_tokenizer: Optional[Dict[str, Any]]) -> Optional[str]:
+    # Prioritize using the model name specified for the tokenizer
+    if llm_config_for_tokenizer and llm_config_for_tokenizer.get("litellm_token_counter_model"):
+        model_for_counting = llm_config_for_tokenizer["litellm_token_counter_model"]
+        logger.debug("token_counting_model_override", extra={"model_for_counting": model_for_counting, "override_source": "litellm_token_counter_model"})
+        return model_for_counting
+    return model or None
+
+
+def estimate_message_tokens(
+    model: str,
+    messages: List[Dict],
+    llm_config_for_tokenizer: Optional[Dict[str, Any]] = None
+) -> List[int]:
+    """
+    Returns the token count of each message, excluding the per-request overhead.
+    Counts are memoized by message content and tokenizer model, so this is the building block
+    for prompt budgeting and context-window trimming: dropping message i saves counts[i] tokens.
+    Raises if the tokenizer fails.
+    """
+    model_for_counting = _resolve_token_counter_model(model, llm_config_for_tokenizer)
+    if not model_for_counting:
+        return [0] * len(messages)
+
+    overhead = _get_request_overhead_tokens(model_for_counting)
+    counts: List[int] = []
+    for message in messages:
+        cache_key = (model_for_counting, _message_content_hash(message))
+        count = _message_token_cache.get(cache_key)
+        if count is None:
+            count = max(0, litellm.token_counter(model=model_for_counting, messages=[message]) - overhead)
+            _message_token_cache[cache_key] = count
+            if len(_message_token_cache) > TOKEN_COUNT_CACHE_MAX_ENTRIES:
+                _message_token_cache.popitem(last=False)
+        else:
+            _message_token_cache.move_to_end(cache_key)
+        counts.append(count)
+    return counts
+
+
 def estimate_prompt_tokens(
     model: str,
     text: Optional[str] = None,
@@ -103,13 +172,10 @@ def estimate_prompt_tokens(
 ) -> int:
     """
     Estimates the number of tokens for a given input. Can accept a single text string or a list of messages.
+    Per-message counts are memoized (see estimate_message_tokens), so repeated calls only tokenize new messages.
     """
-    # Prioritize using the model name specified for the tokenizer
-    model_for_counting = model
-    if llm_config_for_tokenizer and llm_config_for_tokenizer.get("litellm_token_counter_model"):
-        model_for_counting = llm_config_for_tokenizer["litellm_token_counter_model"]
-        logger.debug("token_counting_model_override", extra={"model_for_counting": model_for_counting, "override_source": "litellm_token_counter_model"})
-    elif not model:
+    model_for_counting = _resolve_token_counter_model(model, llm_config_for_tokenizer)
+    if not model_for_counting:
         logger.warning("token_estimation_no_model", extra={"model_provided": bool(model), "override_found": False, "return_value": 0})
         return 0
 
@@ -130,15 +196,19 @@ def estimate_prompt_tokens(
         return 0
 
     try:
-        return litellm.token_counter(model=model_for_counting, messages=messages_for_calc)
+        message_counts = estimate_message_tokens(model_for_counting, messages_for_calc)
+        return sum(message_counts) + _get_request_overhead_tokens(model_for_counting)
     except Exception as e:
         logger.warning("token_estimation_failed", extra={"model_for_counting": model_for_counting, "error_message": str(e), "return_value": 0})
         return 0
 
+FORBIDDEN_CONTENT_TAGS = ("<tool_call>", "<tool_code>")
+
 class LLMResponseAggregator:
     """
     Helper class to aggregate streaming LLM responses.
     This can be expanded or moved to a separate utility file if it grows complex.
+    Chunk events are coalesced by LLMChunkCoalescer; call flush_events() once the stream ends.
     """
     def __init__(self, agent_id: str, parent_agent_id: Optional[str], events: Optional[Any], run_id: Optional[str], stream_id: str, llm_model_id: Optional[str], associated_task_nums_for_event: Optional[List[int]] = None, module_id_for_event: Optional[str] = None, dispatch_id_for_event: Optional[str] = None):
         self.agent_id = agent_id
@@ -158,6 +228,10 @@ class LLMResponseAggregator:
         self.model_id_used: Optional[str] = None # To store the model ID from the response
         self.actual_usage: Optional[Dict[str, int]] = None # <--- Added
 
+        self._tag_matcher = IncrementalTagMatcher(FORBIDDEN_CONTENT_TAGS)
+        self._contextual_data_for_event = self._get_contextual_data_for_event()
+        self._chunk_coalescer = LLMChunkCoalescer(self._emit_coalesced_chunk) if events else None
+
     def _get_contextual_data_for_event(self) -> Optional[Dict]:
         """Builds the contextual data dictionary for events."""
         contextual_data = {}
@@ -169,6 +243,23 @@ class LLMResponseAggregator:
             contextual_data["dispatch_id"] = self.dispatch_id_for_event
         return contextual_data if contextual_data else None
 
+    async def _emit_coalesced_chunk(self, chunk_type: str, content: str):
+        await self.events.emit_llm_chunk(
+            run_id=self.run_id, agent_id=self.agent_id, parent_agent_id=self.parent_agent_id, chunk_type=chunk_type,
+            content=content, stream_id=self.stream_id, llm_id=self.llm_model_id,
+            contextual_data=self._contextual_data_for_event
+        )
+
+    async def flush_events(self):
+        """Sends any chunk events still buffered by the coalescer."""
+        if self._chunk_coalescer:
+            await self._chunk_coalescer.aclose()
+
+    def discard_events(self):
+        """Drops buffered chunk events, used when the stream is aborted or retried."""
+        if self._chunk_coalescer:
+            self._chunk_coalescer.discard()
+
     async def process_chunk(self, chunk: Any):
         self.raw_chunks.append(chunk)
         if os.environ.get("DEBUG_LLM", "0") == "1":
@@ -201,25 +292,19 @@ class LLMResponseAggregator:
         if hasattr(delta, "reasoning_content") and delta.reasoning_content is not None:
             # print(delta.reasoning_content, end="", flush=True) # Direct print removed
             self.full_reasoning_content += delta.reasoning_content
-            if self.events:
-                await self.events.emit_llm_chunk(
-                    run_id=self.run_id, agent_id=self.agent_id, parent_agent_id=self.parent_agent_id, chunk_type="reasoning_content",
-                    content=delta.reasoning_content, stream_id=self.stream_id, llm_id=self.llm_model_id,
-                    contextual_data=self._get_contextual_data_for_event()
-                )
+            if self._chunk_coalescer:
+                await self._chunk_coalescer.add("reasoning_content", delta.reasoning_content)
 
         if hasattr(delta, "content") and delta.content is not None:
             self.full_content += delta.content
             # ==================== START OF FIX ====================
-            if "<tool_call>" in self.full_content or "<tool_code>" in self.full_content:
+            # Only the new delta plus a short carry-over is scanned, not the whole full_content
+            if self._tag_matcher.feed(delta.content):
+                self.discard_events()
                 raise FunctionCallErrorException("Detected '<tool_call>' or '<tool_code>' in stream, forcing retry.")
             # ===================== END OF FIX =====================
-            if self.events:
-                await self.events.emit_llm_chunk(
-                    run_id=self.run_id, agent_id=self.agent_id, parent_agent_id=self.parent_agent_id, chunk_type="content",
-                    content=delta.content, stream_id=self.stream_id, llm_id=self.llm_model_id,
-                    contextual_data=self._get_contextual_data_for_event()
-                )
+            if self._chunk_coalescer:
+                await self._chunk_coalescer.add("content", delta.content)
 
         if hasattr(delta, "tool_calls") and delta.tool_calls:
             for tc_chunk in delta.tool_calls:
@@ -233,21 +318,12 @@ class LLMResponseAggregator:
                 if hasattr(tc_chunk, "function"):
                     if hasattr(tc_chunk.function, "name") and tc_chunk.function.name:
                         self.current_tool_call_chunks[index]["function"]["name"] += tc_chunk.function.name
-                        if self.events:
-                            await self.events.emit_llm_chunk(
-                                run_id=self.run_id, agent_id=self.agent_id, parent_agent_id=self.parent_agent_id, chunk_type="tool_name",
-                                content=tc_chunk.function.name, stream_id=self.stream_id, llm_id=self.llm_model_id,
-                                contextual_data=self._get_contextual_data_for_event()
-                            )
+                        if self._chunk_coalescer:
+                            await self._chunk_coalescer.add("tool_name", tc_chunk.function.name)
                     if hasattr(tc_chunk.function, "arguments") and tc_chunk.function.arguments:
                         self.current_tool_call_chunks[index]["function"]["arguments"] += tc_chunk.function.arguments
-                        if self.events:
-                            await self.events.emit_llm_chunk(
-                                run_id=self.run_id, agent_id=self.agent_id, parent_agent_id=self.parent_agent_id, chunk_type="tool_args",
-                                content=tc_chunk.function.arguments, # Keep existing decode
-                                stream_id=self.stream_id, llm_id=self.llm_model_id,
-                                contextual_data=self._get_contextual_data_for_event()
-                            )
+                        if self._chunk_coalescer:
+                            await self._chunk_coalescer.add("tool_args", tc_chunk.function.arguments)
     
     def get_aggregated_response(self, messages_for_llm: List[Dict]) -> Dict:
         # Reconstruct full messages if needed by litellm or for logging
@@ -317,6 +393,7 @@ async def call_litellm_acompletion(
     for attempt in range(app_level_max_retries + 1):
         # Move stream_id generation inside the loop to ensure a new ID for each retry
         current_stream_id = stream_id or str(uuid.uuid4())
+        response_aggregator = None
         
         try:
             model_name = llm_config.get("model")
@@ -375,6 +452,7 @@ async def call_litellm_acompletion(
             
             async for chunk in llm_response_stream:
                 await response_aggregator.process_chunk(chunk)
+            await response_aggregator.flush_events()
 
             aggregated_response = response_aggregator.get_aggregated_response(messages_for_llm=final_messages)
 
@@ -483,6 +561,8 @@ async def call_litellm_acompletion(
         except asyncio.CancelledError:
             # ... (CancelledError handling logic remains unchanged) ...
             logger.warning("llm_call_cancelled", extra={"stream_id": current_stream_id})
+            if response_aggregator:
+                response_aggregator.discard_events()
             if events and agent_id_for_event and run_id_for_event:
                  await events.emit_llm_stream_failed(
                     run_id=run_id_for_event, 
@@ -497,6 +577,8 @@ async def call_litellm_acompletion(
         except Exception as e_outer:
             # ... (Other exception handling logic remains unchanged) ...
             # Note: The return here will break out of our retry loop, which is correct because these are unrecoverable errors
+            if response_aggregator:
+                response_aggregator.discard_events()
             if isinstance(e_outer, (RateLimitError, Timeout, APIConnectionError, ServiceUnavailableError, InternalServerError)):
                 if run_context:
                     stats = run_context['runtime']['token_usage_stats']
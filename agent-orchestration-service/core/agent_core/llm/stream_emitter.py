@@ -0,0 +1,138 @@
+import os
+import asyncio
+import logging
+from typing import Awaitable, Callable, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Coalescing budget for llm_chunk frames. A flush interval of 0 disables coalescing
+# and restores the previous one-frame-per-delta behaviour.
+DEFAULT_FLUSH_INTERVAL_MS = float(os.getenv("LLM_CHUNK_FLUSH_INTERVAL_MS", "30"))
+DEFAULT_MAX_FLUSH_INTERVAL_MS = float(os.getenv("LLM_CHUNK_MAX_FLUSH_INTERVAL_MS", "250"))
+DEFAULT_MAX_BUFFER_BYTES = int(os.getenv("LLM_CHUNK_MAX_BUFFER_BYTES", "1024"))
+
+
+class IncrementalTagMatcher:
+    """
+    Detects forbidden tags in a stream of text deltas without rescanning the accumulated text.
+    Only the last (longest_tag - 1) characters are carried over between deltas, so each
+    call is O(len(delta)) and a tag split across two deltas is still found.
+    """
+    def __init__(self, tags: Iterable[str]):
+        self.tags = tuple(tags)
+        self._carry = max((len(t) for t in self.tags), default=1) - 1
+        self._tail = ""
+
+    def feed(self, text: str) -> Optional[str]:
+        """Returns the first tag found in the stream so far, or None."""
+        window = self._tail + text
+        for tag in self.tags:
+            if tag in window:
+                return tag
+        self._tail = window[-self._carry:] if self._carry else ""
+        return None
+
+
+class LLMChunkCoalescer:
+    """
+    Batches streamed LLM deltas into fewer llm_chunk frames.
+
+    Deltas are buffered in arrival order; consecutive deltas of the same chunk_type are
+    merged into a single frame. The buffer is flushed when it exceeds max_buffer_bytes,
+    when the flush interval has elapsed, or by a deferred flush so that a stalled stream
+    never holds content back for longer than one interval. The interval adapts to socket
+    backpressure: slow sends widen it (up to max_flush_interval_ms), fast sends shrink it
+    back towards the base interval.
+    """
+    def __init__(
+        self,
+        emit: Callable[[str, str], Awaitable[None]],
+        flush_interval_ms: Optional[float] = None,
+        max_flush_interval_ms: Optional[float] = None,
+        max_buffer_bytes: Optional[int] = None,
+    ):
+        self._emit = emit
+        self.base_interval = (DEFAULT_FLUSH_INTERVAL_MS if flush_interval_ms is None else flush_interval_ms) / 1000.0
+        self.max_interval = max(
+            self.base_interval,
+            (DEFAULT_MAX_FLUSH_INTERVAL_MS if max_flush_interval_ms is None else max_flush_interval_ms) / 1000.0,
+        )
+        self.max_buffer_bytes = DEFAULT_MAX_BUFFER_BYTES if max_buffer_bytes is None else max_buffer_bytes
+        self.interval = self.base_interval
+
+        self._segments: List[List] = []  # [chunk_type, [parts]] in arrival order
+        self._buffered_bytes = 0
+        self._last_flush_at = float("-inf")  # The first delta is sent immediately
+        self._lock = asyncio.Lock()
+        self._deferred_flush: Optional[asyncio.Task] = None
+
+        self.deltas_received = 0
+        self.frames_sent = 0
+
+    async def add(self, chunk_type: str, content: str):
+        if not content:
+            return
+        self.deltas_received += 1
+        if self._segments and self._segments[-1][0] == chunk_type:
+            self._segments[-1][1].append(content)
+        else:
+            self._segments.append([chunk_type, [content]])
+        self._buffered_bytes += len(content.encode("utf-8"))
+
+        loop = asyncio.get_running_loop()
+        if (
+            self.base_interval <= 0
+            or self._buffered_bytes >= self.max_buffer_bytes
+            or loop.time() - self._last_flush_at >= self.interval
+        ):
+            await self.flush()
+        elif self._deferred_flush is None or self._deferred_flush.done():
+            self._deferred_flush = asyncio.create_task(self._flush_after_interval())
+
+    async def _flush_after_interval(self):
+        await asyncio.sleep(self.interval)
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error("llm_chunk_deferred_flush_failed", extra={"error_message": str(e)}, exc_info=True)
+
+    async def flush(self):
+        async with self._lock:
+            if not self._segments:
+                return
+            segments, self._segments = self._segments, []
+            self._buffered_bytes = 0
+
+            loop = asyncio.get_running_loop()
+            started_at = loop.time()
+            for chunk_type, parts in segments:
+                await self._emit(chunk_type, "".join(parts))
+            self.frames_sent += len(segments)
+            self._last_flush_at = loop.time()
+            self._adapt_interval(self._last_flush_at - started_at)
+
+    def _adapt_interval(self, send_seconds: float):
+        if self.base_interval <= 0:
+            return
+        if send_seconds > self.interval / 2:
+            self.interval = min(self.interval * 2, self.max_interval)
+        else:
+            self.interval = max(self.base_interval, self.interval * 0.75)
+
+    async def aclose(self):
+        """Flushes everything that is still buffered. Call once the stream has finished."""
+        await self.flush()
+        self._cancel_deferred_flush()
+        if self.deltas_received:
+            logger.debug("llm_chunks_coalesced", extra={"deltas_received": self.deltas_received, "frames_sent": self.frames_sent, "final_interval_ms": round(self.interval * 1000, 1)})
+
+    def discard(self):
+        """Drops buffered deltas without sending them, e.g. when the stream is being retried."""
+        self._segments = []
+        self._buffered_bytes = 0
+        self._cancel_deferred_flush()
+
+    def _cancel_deferred_flush(self):
+        if self._deferred_flush and not self._deferred_flush.done():
+            self._deferred_flush.cancel()
+        self._deferred_flush = None
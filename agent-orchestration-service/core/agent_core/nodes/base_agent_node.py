@@ -8,7 +8,7 @@ import json
 from datetime import datetime, timezone
 from pocketflow import AsyncNode
 from ..llm.call_llm import estimate_prompt_tokens, call_litellm_acompletion
-from ..framework.tool_registry import get_tool_by_name, get_tools_for_profile, format_tools_for_prompt_by_toolset
+from ..framework.tool_registry import get_tool_by_name, format_tools_description_for_profile
 import json_repair
 import os
 from typing import Dict, Any, Optional, List
@@ -322,14 +322,7 @@ class AgentNode(AsyncNode):
                                 rendered_content = ""
 
                     elif segment_type == "tool_description":
-                        applicable_tools = get_tools_for_profile(self.loaded_profile, context, self.agent_id)
-                        tools_by_toolset = {}
-                        for tool_info in applicable_tools:
-                            toolset = tool_info.get("toolset_name", tool_info.get("name", "unknown_toolset"))
-                            if toolset not in tools_by_toolset:
-                                tools_by_toolset[toolset] = []
-                            tools_by_toolset[toolset].append(tool_info)
-                        rendered_content = format_tools_for_prompt_by_toolset(tools_by_toolset)
+                        rendered_content = format_tools_description_for_profile(self.loaded_profile, context, self.agent_id)
 
                     if isinstance(rendered_content, str):
                         rendered_content = _apply_simple_template_interpolation(rendered_content, context)
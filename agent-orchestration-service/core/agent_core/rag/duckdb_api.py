@@ -164,6 +164,32 @@ class DuckDBRAGStore:
             logger.info("text_chunk_added_or_exists", extra={"chunk_id": new_id})
             return new_id
 
+    async def delete_text_chunks_by_hash(self, project_id: str, chunk_hashes: List[str]) -> int:
+        """Asynchronously deletes the text chunks (and their embeddings) with the given content hashes from a project."""
+        if not chunk_hashes:
+            return 0
+        if not self.config.get('database_writable', False):
+            raise PermissionError(f"Data source '{self.config.get('source_name')}' is read-only, 'delete_text_chunks_by_hash' operation is not allowed.")
+
+        async with self.db_lock:
+            def _sync_delete():
+                with self._get_connection() as con:
+                    meta_cfg = self.config['meta_table']
+                    emb_cfg = self.config['embedding_table']
+                    ids = [row[0] for row in con.execute(
+                        f"SELECT {meta_cfg['id_column']} FROM {meta_cfg['name']} WHERE project_id = ? AND list_contains(?, hash)",
+                        (project_id, chunk_hashes)
+                    ).fetchall()]
+                    if not ids:
+                        return 0
+                    con.execute(f"DELETE FROM {emb_cfg['name']} WHERE list_contains(?, {emb_cfg['id_column']})", (ids,))
+                    con.execute(f"DELETE FROM {meta_cfg['name']} WHERE list_contains(?, {meta_cfg['id_column']})", (ids,))
+                    return len(ids)
+
+            deleted_count = await self._execute_in_thread(_sync_delete)
+            logger.info("text_chunks_deleted", extra={"project_id": project_id, "deleted_count": deleted_count})
+            return deleted_count
+
     async def process_pending_embeddings(self, batch_size: int = 50):
         """Asynchronously generates and stores embeddings for pending text chunks."""
         if not self.config.get('database_writable', False):
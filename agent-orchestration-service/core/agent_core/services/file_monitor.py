@@ -1,23 +1,23 @@
 import os
 import asyncio
-from pathlib import Path
 import subprocess
 import tempfile
 import logging
-from markitdown import MarkItDown
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler, FileModifiedEvent, FileCreatedEvent, FileDeletedEvent
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Set
 
 # Import the websocket manager
 from .websocket_manager import manager
 
 # To integrate RAG, we'll import the RAGAddNode
 from ..nodes.custom_nodes.rag_add_node import RAGAddNode
-from ..rag.federation import RAGFederationService
+from .rag_indexer import RAGIndexingPipeline
 
 # This will be set at app startup
 PROJECTS_ROOT_DIR = ""
+# Debounced, incremental indexing pipeline; created by start_file_monitoring
+INDEXING_PIPELINE: Optional[RAGIndexingPipeline] = None
 # Define which file types should trigger RAG indexing (fallback if yek is not available)
 SUPPORTED_DOC_EXTENSIONS = ['.txt', '.md', '.py', '.rst', '.yaml', '.yml']
 
@@ -193,89 +193,30 @@ async def get_files_with_yek(project_path: str) -> List[str]:
 
 async def process_files_for_rag(file_paths: List[str], project_id: str):
     """
-    Pass the file list to the RAG system for indexing
+    Pass the file list to the RAG system for indexing.
+    Files are handed to the incremental indexing pipeline, which skips unchanged files
+    and only embeds chunks that are new since the last pass.
     """
     if not file_paths:
         return
-    writable_engine = RAGFederationService.get_writable_engine()
-    if not writable_engine:
-        logger.error("RAG Indexing failed: No writable RAG engine configured.")
+    if not INDEXING_PIPELINE:
+        logger.error("rag_indexing_pipeline_not_started", extra={"project_id": project_id})
         return
 
-    # --- Core modification: Do not instantiate RAGAddNode anymore, call the engine's method directly ---
-    try:
-        # Assume we will create a helper method in RAGEngine to handle indexing
-        # Or call the db_store's method directly
-        
-        # 1. Read all file contents
-        all_docs_content = []
-        for file_path in file_paths:
-            if os.path.exists(file_path) and os.path.isfile(file_path):
-                 md = MarkItDown(enable_plugins=True)
-                 content = md.convert(Path(file_path)).text_content
-                 all_docs_content.append(content)
-
-        if not all_docs_content:
-            logger.warning("No valid content to index.")
-            return
-
-        # 2. Call the db_store's method, passing in the project_id
-        for content in all_docs_content:
-             await writable_engine.db_store.add_text_chunk(
-                 chunk_text=content,
-                 project_id=project_id,
-                 # Other metadata can be added as needed
-             )
-        
-        # 3. Trigger embedding processing
-        await writable_engine.db_store.process_pending_embeddings()
-        
-        logger.info("rag_indexing_success", extra={"files_processed": len(all_docs_content), "project_id": project_id})
-
-    except Exception as e:
-        logger.error("rag_indexing_error", extra={"project_id": project_id, "error_message": str(e)}, exc_info=True)
+    # Bulk discovery runs behind files the user actually touched (touched_at=0 sorts last)
+    INDEXING_PIPELINE.enqueue_files(project_id, file_paths, touched_at=0.0)
+    logger.info("rag_indexing_files_queued", extra={"files_queued": len(file_paths), "project_id": project_id})
 
 async def trigger_rag_indexing_fallback(project_id: str, file_path: str):
     """
     Fallback RAG indexing when yek is not available - processes a single file.
-    (MODIFIED: Now uses RAGFederationService directly)
+    (MODIFIED: Now goes through the incremental indexing pipeline)
     """
     logger.info("rag_indexing_fallback_start", extra={"file_path": file_path, "project_id": project_id})
-    
-    # 1. Get a writable RAG engine
-    writable_engine = RAGFederationService.get_writable_engine()
-    if not writable_engine:
-        logger.error("rag_indexing_fallback_no_engine", extra={"file_path": file_path})
+    if not INDEXING_PIPELINE:
+        logger.error("rag_indexing_pipeline_not_started", extra={"project_id": project_id})
         return
-
-    try:
-        # 2. Check if the file exists
-        if os.path.exists(file_path) and os.path.isfile(file_path):
-            # 3. Read and convert file content
-            md = MarkItDown(enable_plugins=True)
-            content = md.convert(Path(file_path)).text_content
-            
-            if not content:
-                logger.warning("rag_indexing_fallback_no_content", extra={"file_path": file_path})
-                return
-
-            # 4. Call the db_store's method, passing in the project_id
-            await writable_engine.db_store.add_text_chunk(
-                chunk_text=content,
-                project_id=project_id,
-                doc_id=os.path.basename(file_path), # Use filename as doc_id
-                url=file_path # Use file path as url
-            )
-            
-            # 5. Trigger embedding processing
-            await writable_engine.db_store.process_pending_embeddings()
-
-            logger.info("rag_indexing_fallback_success", extra={"file_path": file_path})
-        else:
-            logger.warning("rag_indexing_fallback_file_not_found", extra={"file_path": file_path})
-
-    except Exception as e:
-        logger.error("rag_indexing_fallback_error", extra={"file_path": file_path, "error_message": str(e)}, exc_info=True)
+    INDEXING_PIPELINE.notify(project_id, file_path, "upsert")
 
 class ProjectChangeHandler(FileSystemEventHandler):
     """Handles file system events and triggers updates."""
@@ -284,7 +225,7 @@ class ProjectChangeHandler(FileSystemEventHandler):
         super().__init__()
         self.loop = loop
         self.debounce_timers: Dict[str, asyncio.TimerHandle] = {}
-        self.rag_debounce_timers: Dict[str, asyncio.TimerHandle] = {}
+        self.projects_seen: Set[str] = set()
 
     def on_any_event(self, event):
         """
@@ -298,21 +239,20 @@ class ProjectChangeHandler(FileSystemEventHandler):
         if not project_id:
             return
 
-        # --- RAG Indexing Logic (with debouncing for project-level updates) ---
+        # --- RAG Indexing Logic (debounced and coalesced per project by the indexing pipeline) ---
         file_ext = os.path.splitext(event.src_path)[1].lower()
-        if file_ext in SUPPORTED_DOC_EXTENSIONS:
+        if file_ext in SUPPORTED_DOC_EXTENSIONS and INDEXING_PIPELINE:
             if isinstance(event, (FileCreatedEvent, FileModifiedEvent)):
-                # Cancel previous RAG timer for this project if exists
-                if project_id in self.rag_debounce_timers:
-                    self.rag_debounce_timers[project_id].cancel()
-                
-                # Set a debounced RAG indexing timer (2 seconds delay)
-                self.rag_debounce_timers[project_id] = self.loop.call_later(
-                    2.0, self._do_rag_indexing, project_id, event.src_path
-                )
+                if project_id not in self.projects_seen and not INDEXING_PIPELINE.has_manifest(project_id):
+                    # First change in a project that was never indexed: index the whole project once
+                    asyncio.run_coroutine_threadsafe(
+                        trigger_rag_indexing_with_yek(project_id, event.src_path),
+                        self.loop
+                    )
+                self.projects_seen.add(project_id)
+                INDEXING_PIPELINE.notify_threadsafe(project_id, event.src_path, "upsert")
             elif isinstance(event, FileDeletedEvent):
-                # TODO: Implement logic to remove a document from the index
-                logger.warning("file_deleted_rag_removal_not_implemented", extra={"path": event.src_path})
+                INDEXING_PIPELINE.notify_threadsafe(project_id, event.src_path, "delete")
 
         # --- File Tree Broadcast Logic (with debouncing) ---
         if project_id in self.debounce_timers:
@@ -322,15 +262,6 @@ class ProjectChangeHandler(FileSystemEventHandler):
             0.5, self._do_broadcast, project_id
         )
 
-    def _do_rag_indexing(self, project_id: str, file_path: str):
-        """Execute RAG indexing in the event loop."""
-        asyncio.run_coroutine_threadsafe(
-            trigger_rag_indexing_with_yek(project_id, file_path),
-            self.loop
-        )
-        if project_id in self.rag_debounce_timers:
-            del self.rag_debounce_timers[project_id]
-
     def _do_broadcast(self, project_id: str):
         """Generates and broadcasts the file tree."""
         logger.info("broadcasting_file_tree_update", extra={"project_id": project_id})
@@ -357,8 +288,9 @@ def start_file_monitoring(path: str, loop: asyncio.AbstractEventLoop):
     if not os.environ.get("RAG_ENABLED"):
         logger.info("rag_disabled_skipping_file_monitoring")
         return
-    global PROJECTS_ROOT_DIR
+    global PROJECTS_ROOT_DIR, INDEXING_PIPELINE
     PROJECTS_ROOT_DIR = os.path.abspath(path)
+    INDEXING_PIPELINE = RAGIndexingPipeline(PROJECTS_ROOT_DIR, loop)
     
     event_handler = ProjectChangeHandler(loop)
     observer = Observer()
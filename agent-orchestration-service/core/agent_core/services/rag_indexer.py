@@ -0,0 +1,369 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import heapq
+import logging
+from pathlib import Path
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from ..rag.federation import RAGFederationService
+
+logger = logging.getLogger(__name__)
+
+RAG_INDEX_DEBOUNCE_SECONDS = float(os.getenv("RAG_INDEX_DEBOUNCE_SECONDS", "2.0"))
+# Upper bound on how long a continuously changing project can postpone indexing
+RAG_INDEX_MAX_DELAY_SECONDS = float(os.getenv("RAG_INDEX_MAX_DELAY_SECONDS", "10.0"))
+RAG_INDEX_WORKERS = int(os.getenv("RAG_INDEX_WORKERS", "2"))
+
+CHUNK_MIN_CHARS = 800
+CHUNK_MAX_CHARS = 2000
+# A paragraph closes a chunk when its hash hits this modulus (content-defined boundaries),
+# so inserting text early in a file only changes the chunks around the edit.
+CHUNK_BOUNDARY_MODULUS = 4
+
+MANIFEST_DIR_NAME = ".rag_index"  # Top-level dot directory, ignored by the file monitor
+
+
+def chunk_text_content(text: str) -> List[str]:
+    """
+    Splits converted document text into chunks along paragraph boundaries.
+    Boundaries are chosen from paragraph content rather than running offsets, which keeps
+    unchanged regions of an edited file mapped to the same chunks (and the same hashes).
+    """
+    paragraphs = [p.strip() for p in text.split("\n\n") if p.strip()]
+    chunks: List[str] = []
+    current: List[str] = []
+    current_len = 0
+
+    for paragraph in paragraphs:
+        while len(paragraph) > CHUNK_MAX_CHARS:
+            if current:
+                chunks.append("\n\n".join(current))
+                current, current_len = [], 0
+            chunks.append(paragraph[:CHUNK_MAX_CHARS])
+            paragraph = paragraph[CHUNK_MAX_CHARS:]
+
+        if current and current_len + len(paragraph) > CHUNK_MAX_CHARS:
+            chunks.append("\n\n".join(current))
+            current, current_len = [], 0
+
+        current.append(paragraph)
+        current_len += len(paragraph) + 2
+        paragraph_hash = int(hashlib.md5(paragraph.encode("utf-8")).hexdigest()[:8], 16)
+        if current_len >= CHUNK_MIN_CHARS and paragraph_hash % CHUNK_BOUNDARY_MODULUS == 0:
+            chunks.append("\n\n".join(current))
+            current, current_len = [], 0
+
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def _hash_text(text: str) -> str:
+    # Must match the hash DuckDBRAGStore uses for deduplication
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class RAGIndexingPipeline:
+    """
+    Debounced, incremental RAG indexing for project files.
+
+    File system events are coalesced per project and flushed after a quiet period. Flushed files
+    go into a priority queue (most recently touched first) that a bounded pool of workers drains.
+    A per-project manifest records the content hash and chunk hashes of every indexed file, so
+    unchanged files are skipped, only new chunks are inserted and embedded, and chunks that
+    disappeared from a file are removed. Embedding runs once per drained batch, not per file.
+    """
+    def __init__(
+        self,
+        projects_root: str,
+        loop: asyncio.AbstractEventLoop,
+        debounce_seconds: float = RAG_INDEX_DEBOUNCE_SECONDS,
+        max_delay_seconds: float = RAG_INDEX_MAX_DELAY_SECONDS,
+        max_workers: int = RAG_INDEX_WORKERS,
+    ):
+        self.projects_root = projects_root
+        self.loop = loop
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max(max_delay_seconds, debounce_seconds)
+        self.max_workers = max(1, max_workers)
+
+        # project_id -> file_path -> (kind, touched_at); waiting for the debounce to fire
+        self._pending: Dict[str, Dict[str, Tuple[str, float]]] = {}
+        self._pending_since: Dict[str, float] = {}
+        self._debounce_handles: Dict[str, asyncio.TimerHandle] = {}
+
+        # Heap of (-touched_at, seq, project_id, file_path); the latest job per file wins
+        self._heap: List[Tuple[float, int, str, str]] = []
+        self._jobs: Dict[Tuple[str, str], Tuple[str, float, int]] = {}
+        self._jobs_per_project: Counter = Counter()
+        self._in_flight: Dict[Tuple[str, str], float] = {}
+        self._job_available = asyncio.Event()
+        self._seq = 0
+        self._workers: List[asyncio.Task] = []
+
+        self._manifests: Dict[str, Dict[str, Any]] = {}
+        self._projects_needing_embedding: Set[str] = set()
+        self._embedding_lock = asyncio.Lock()
+        # Serializes chunk inserts/removals and manifest updates within a project, so a file's cleanup
+        # never sees the manifest before another file's (deduplicated) inserts of a shared chunk are recorded
+        self._project_locks: Dict[str, asyncio.Lock] = {}
+        self._markitdown = None
+
+        self._stats = Counter()
+        self._last_index_lag_seconds: Optional[float] = None
+
+    # --- Event intake (thread-safe) ---
+
+    def notify_threadsafe(self, project_id: str, file_path: str, kind: str):
+        """Entry point for watchdog threads. kind is 'upsert' or 'delete'."""
+        self.loop.call_soon_threadsafe(self.notify, project_id, file_path, kind)
+
+    def notify(self, project_id: str, file_path: str, kind: str):
+        now = time.time()
+        self._pending.setdefault(project_id, {})[file_path] = (kind, now)
+        self._pending_since.setdefault(project_id, now)
+        self._stats["events_received"] += 1
+
+        handle = self._debounce_handles.pop(project_id, None)
+        if handle:
+            handle.cancel()
+        waited = now - self._pending_since[project_id]
+        delay = max(0.0, min(self.debounce_seconds, self.max_delay_seconds - waited))
+        self._debounce_handles[project_id] = self.loop.call_later(delay, self._flush_project, project_id)
+
+    def enqueue_files(self, project_id: str, file_paths: List[str], touched_at: float = 0.0):
+        """Queues files without debouncing, e.g. for an initial full-project pass. Older touched_at runs later."""
+        for file_path in file_paths:
+            self._enqueue(project_id, file_path, "upsert", touched_at)
+        self._ensure_workers()
+
+    def has_manifest(self, project_id: str) -> bool:
+        return os.path.exists(self._manifest_path(project_id))
+
+    def _flush_project(self, project_id: str):
+        self._debounce_handles.pop(project_id, None)
+        self._pending_since.pop(project_id, None)
+        files = self._pending.pop(project_id, {})
+        for file_path, (kind, touched_at) in files.items():
+            self._enqueue(project_id, file_path, kind, touched_at)
+        logger.info("rag_index_batch_flushed", extra={"project_id": project_id, "file_count": len(files)})
+        self._ensure_workers()
+
+    def _enqueue(self, project_id: str, file_path: str, kind: str, touched_at: float):
+        key = (project_id, file_path)
+        self._seq += 1
+        if key not in self._jobs:
+            self._jobs_per_project[project_id] += 1
+        self._jobs[key] = (kind, touched_at, self._seq)
+        heapq.heappush(self._heap, (-touched_at, self._seq, project_id, file_path))
+        self._job_available.set()
+
+    def _ensure_workers(self):
+        self._workers = [w for w in self._workers if not w.done()]
+        while len(self._workers) < self.max_workers:
+            self._workers.append(self.loop.create_task(self._worker()))
+
+    # --- Workers ---
+
+    def _pop_job(self) -> Optional[Tuple[str, str, str, float]]:
+        deferred = []
+        try:
+            while self._heap:
+                entry = heapq.heappop(self._heap)
+                _, seq, project_id, file_path = entry
+                key = (project_id, file_path)
+                job = self._jobs.get(key)
+                if not job or job[2] != seq:
+                    continue  # Superseded by a newer event for the same file
+                if key in self._in_flight:
+                    # Another worker is indexing this file; the newer job runs once it finishes
+                    deferred.append(entry)
+                    continue
+                del self._jobs[key]
+                return project_id, file_path, job[0], job[1]
+            self._job_available.clear()
+            return None
+        finally:
+            for entry in deferred:
+                heapq.heappush(self._heap, entry)
+
+    async def _worker(self):
+        while True:
+            job = self._pop_job()
+            if job is None:
+                await self._job_available.wait()
+                continue
+
+            project_id, file_path, kind, touched_at = job
+            key = (project_id, file_path)
+            self._in_flight[key] = touched_at
+            try:
+                await self._index_file(project_id, file_path, kind)
+            except Exception as e:
+                self._stats["files_failed"] += 1
+                logger.error("rag_index_file_failed", extra={"project_id": project_id, "file_path": file_path, "error_message": str(e)}, exc_info=True)
+            finally:
+                self._in_flight.pop(key, None)
+                if key in self._jobs:
+                    self._job_available.set()  # Release a job deferred while this file was in flight
+                if touched_at:
+                    self._last_index_lag_seconds = time.time() - touched_at
+                self._jobs_per_project[project_id] -= 1
+                if self._jobs_per_project[project_id] <= 0:
+                    del self._jobs_per_project[project_id]
+                    await self._finish_project_batch(project_id)
+
+    async def _finish_project_batch(self, project_id: str):
+        if any(pid == project_id for pid, _ in self._in_flight):
+            return  # Another worker still holds a file of this project; it will finish the batch
+        self._save_manifest(project_id)
+        if project_id not in self._projects_needing_embedding:
+            return
+        engine = RAGFederationService.get_writable_engine()
+        if not engine:
+            return
+        async with self._embedding_lock:
+            if project_id not in self._projects_needing_embedding:
+                return
+            self._projects_needing_embedding.discard(project_id)
+            await engine.db_store.process_pending_embeddings()
+            self._stats["embedding_batches"] += 1
+            logger.info("rag_index_batch_embedded", extra={"project_id": project_id})
+
+    # --- Indexing ---
+
+    def _convert_file(self, file_path: str) -> str:
+        if self._markitdown is None:
+            from markitdown import MarkItDown
+            self._markitdown = MarkItDown(enable_plugins=True)
+        return self._markitdown.convert(Path(file_path)).text_content or ""
+
+    @staticmethod
+    def _hash_file(file_path: str) -> str:
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    async def _index_file(self, project_id: str, file_path: str, kind: str):
+        engine = RAGFederationService.get_writable_engine()
+        if not engine:
+            logger.error("rag_index_no_writable_engine", extra={"project_id": project_id})
+            return
+
+        manifest = self._get_manifest(project_id)
+        files = manifest["files"]
+        previous = files.get(file_path)
+
+        if kind == "delete" or not os.path.isfile(file_path):
+            if previous:
+                async with self._project_lock(project_id):
+                    del files[file_path]
+                    await self._remove_unreferenced_chunks(engine, project_id, manifest, set(previous["chunks"]))
+                self._stats["files_removed"] += 1
+            return
+
+        content_hash = await asyncio.to_thread(self._hash_file, file_path)
+        if previous and previous["content_hash"] == content_hash:
+            self._stats["files_unchanged"] += 1
+            return
+
+        text = await asyncio.to_thread(self._convert_file, file_path)
+        chunks = chunk_text_content(text)
+        chunk_hashes = [_hash_text(chunk) for chunk in chunks]
+        previous_hashes = set(previous["chunks"]) if previous else set()
+
+        relative_path = os.path.relpath(file_path, os.path.join(self.projects_root, project_id))
+        added = 0
+        async with self._project_lock(project_id):
+            for chunk, chunk_hash in zip(chunks, chunk_hashes):
+                if chunk_hash in previous_hashes:
+                    continue
+                await engine.db_store.add_text_chunk(
+                    chunk_text=chunk,
+                    project_id=project_id,
+                    doc_id=relative_path,
+                    url=file_path
+                )
+                added += 1
+
+            files[file_path] = {"content_hash": content_hash, "chunks": chunk_hashes}
+            await self._remove_unreferenced_chunks(engine, project_id, manifest, previous_hashes - set(chunk_hashes))
+
+        if added:
+            self._projects_needing_embedding.add(project_id)
+        self._stats["files_indexed"] += 1
+        self._stats["chunks_added"] += added
+        self._stats["chunks_reused"] += len(chunks) - added
+        logger.debug("rag_index_file_done", extra={"project_id": project_id, "file_path": relative_path, "chunks_total": len(chunks), "chunks_added": added})
+
+    def _project_lock(self, project_id: str) -> asyncio.Lock:
+        lock = self._project_locks.get(project_id)
+        if lock is None:
+            lock = self._project_locks[project_id] = asyncio.Lock()
+        return lock
+
+    async def _remove_unreferenced_chunks(self, engine: Any, project_id: str, manifest: Dict[str, Any], candidate_hashes: Set[str]):
+        if not candidate_hashes:
+            return
+        # The same chunk can appear in several files; only drop it once no file references it
+        still_referenced = {h for entry in manifest["files"].values() for h in entry["chunks"]}
+        removable = list(candidate_hashes - still_referenced)
+        if removable:
+            removed = await engine.db_store.delete_text_chunks_by_hash(project_id, removable)
+            self._stats["chunks_removed"] += removed or 0
+
+    # --- Manifest ---
+
+    def _manifest_path(self, project_id: str) -> str:
+        return os.path.join(self.projects_root, MANIFEST_DIR_NAME, f"{project_id}.json")
+
+    def _get_manifest(self, project_id: str) -> Dict[str, Any]:
+        manifest = self._manifests.get(project_id)
+        if manifest is None:
+            manifest = {"files": {}}
+            path = self._manifest_path(project_id)
+            if os.path.exists(path):
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        manifest = json.load(f)
+                except (OSError, json.JSONDecodeError) as e:
+                    logger.warning("rag_index_manifest_load_failed", extra={"project_id": project_id, "error_message": str(e)})
+            self._manifests[project_id] = manifest
+        return manifest
+
+    def _save_manifest(self, project_id: str):
+        manifest = self._manifests.get(project_id)
+        if manifest is None:
+            return
+        path = self._manifest_path(project_id)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(manifest, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error("rag_index_manifest_save_failed", extra={"project_id": project_id, "error_message": str(e)})
+
+    # --- Metrics ---
+
+    def get_metrics(self) -> Dict[str, Any]:
+        now = time.time()
+        waiting_since = [t for files in self._pending.values() for _, t in files.values()]
+        waiting_since += [touched_at for _, touched_at, _ in self._jobs.values() if touched_at]
+        waiting_since += [touched_at for touched_at in self._in_flight.values() if touched_at]
+        return {
+            "pending_files": sum(len(files) for files in self._pending.values()),
+            "queued_files": len(self._jobs),
+            "in_flight_files": len(self._in_flight),
+            "workers": self.max_workers,
+            "index_lag_seconds": round(now - min(waiting_since), 3) if waiting_since else 0.0,
+            "last_index_lag_seconds": round(self._last_index_lag_seconds, 3) if self._last_index_lag_seconds is not None else None,
+            **dict(self._stats),
+        }
@@ -4,8 +4,12 @@ import uuid
 import logging # Add logging module
 import re
 from datetime import datetime
-from typing import Dict, List, Optional, Any, TypedDict, Set
+from typing import Dict, List, Optional, Any, TypedDict, Set, Tuple
 import copy
+from collections import OrderedDict
+
+# Maximum number of hydrated tool result payloads kept per KnowledgeBase (least recently used are evicted)
+HYDRATED_PAYLOAD_CACHE_SIZE = 256
 
 # Define TypedDicts to enhance type hinting and readability
 
@@ -45,6 +49,8 @@ class KnowledgeBase:
         # KB20 Token management features
         self._next_sequence: int = 1  # Global sequence counter
         self.items_by_token: Dict[str, str] = {}  # token -> item_id mapping
+        # tool_call_id -> (fingerprint, hydrated result_payload); only finished interactions are cached, LRU-bounded
+        self._hydrated_payload_cache: "OrderedDict[str, Tuple[Tuple, Any]]" = OrderedDict()
         # 使用 f-string 和 run_id 的前8个字符来创建一个更具体的日志记录器名称
         self.logger = logging.getLogger(__name__) 
         self.logger.info("knowledge_base_created", extra={"description": "KnowledgeBase instance created", "run_id": run_id})
@@ -115,21 +121,46 @@ class KnowledgeBase:
         # Create a new seen_tokens set for each top-level call
         return await self._hydrate_content_recursively(content, set(), max_depth)
 
+    async def _get_hydrated_payload(self, interaction: Dict) -> Any:
+        """
+        Returns the hydrated result_payload of a tool interaction.
+        Results of finished interactions no longer change and KB items are immutable,
+        so they are hydrated once and served from the cache afterwards. The cache is keyed
+        by the tool call and its completion (status, end_time), never by object identity.
+        """
+        payload = interaction.get("result_payload")
+        tool_call_id = interaction.get("tool_call_id")
+        if not tool_call_id or interaction.get("status") == "running":
+            return await self.hydrate_content(payload)
+
+        fingerprint = (interaction.get("status"), interaction.get("end_time"))
+        cached = self._hydrated_payload_cache.get(tool_call_id)
+        if cached and cached[0] == fingerprint:
+            self._hydrated_payload_cache.move_to_end(tool_call_id)
+            return cached[1]
+
+        hydrated_payload = copy.deepcopy(await self.hydrate_content(payload))
+        self._hydrated_payload_cache[tool_call_id] = (fingerprint, hydrated_payload)
+        self._hydrated_payload_cache.move_to_end(tool_call_id)
+        while len(self._hydrated_payload_cache) > HYDRATED_PAYLOAD_CACHE_SIZE:
+            self._hydrated_payload_cache.popitem(last=False)
+        return hydrated_payload
+
     async def hydrate_turn_list_tool_results(self, turns: List[Dict]) -> List[Dict]:
         """
         Iterates through a list of Turns and hydrates the result_payload in all tool_interactions.
         Returns a new, hydrated list of Turns.
         """
-        hydrated_turns = copy.deepcopy(turns)
-    
-        for turn in hydrated_turns:
+        # Hydrated payloads are substituted through the deepcopy memo, so large tool results
+        # are neither re-hydrated nor re-copied on every call.
+        copy_memo: Dict[int, Any] = {}
+        for turn in turns:
             for interaction in turn.get("tool_interactions", []):
-                payload_to_hydrate = interaction.get("result_payload")
-                if payload_to_hydrate:
-                    hydrated_payload = await self.hydrate_content(payload_to_hydrate)
-                    interaction["result_payload"] = hydrated_payload
-        
-        return hydrated_turns
+                payload = interaction.get("result_payload")
+                if payload:
+                    copy_memo[id(payload)] = await self._get_hydrated_payload(interaction)
+
+        return copy.deepcopy(turns, copy_memo)
 
     # --- End KB Hydration Logic ---
 
@@ -0,0 +1,127 @@
+import json
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def _escape_pointer_token(token: Any) -> str:
+    """Escapes a single JSON Pointer (RFC 6901) reference token."""
+    return str(token).replace("~", "~0").replace("/", "~1")
+
+
+def compute_json_patch(old: Any, new: Any, path: str = "") -> List[Dict[str, Any]]:
+    """
+    Computes a JSON-patch style (RFC 6902) list of add/remove/replace operations that turns `old` into `new`.
+    Both values must be plain JSON data (dict/list/str/int/float/bool/None).
+    Lists are compared position by position, which keeps the common "append a turn" case to a single 'add'.
+    """
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops: List[Dict[str, Any]] = []
+        for key in old:
+            if key not in new:
+                ops.append({"op": "remove", "path": f"{path}/{_escape_pointer_token(key)}"})
+        for key, value in new.items():
+            child_path = f"{path}/{_escape_pointer_token(key)}"
+            if key in old:
+                ops.extend(compute_json_patch(old[key], value, child_path))
+            else:
+                ops.append({"op": "add", "path": child_path, "value": value})
+        return ops
+
+    if isinstance(old, list) and isinstance(new, list):
+        ops = []
+        common_length = min(len(old), len(new))
+        for index in range(common_length):
+            ops.extend(compute_json_patch(old[index], new[index], f"{path}/{index}"))
+        for index in range(common_length, len(new)):
+            ops.append({"op": "add", "path": f"{path}/{index}", "value": new[index]})
+        # Remove from the end so that the remaining indices stay valid while the patch is applied
+        for index in range(len(old) - 1, common_length - 1, -1):
+            ops.append({"op": "remove", "path": f"{path}/{index}"})
+        return ops
+
+    # type() check keeps True/1 and 1/1.0 from being treated as unchanged
+    if type(old) is type(new) and old == new:
+        return []
+    return [{"op": "replace", "path": path, "value": new}]
+
+
+class RevisionedStateChannel:
+    """
+    Tracks one synchronized state stream (the turns list or a single view model) for one client connection.
+
+    Every change bumps a monotonically increasing revision and records the patch that produced it.
+    Deltas are built from the client's last acknowledged revision (or, until the client acks, from the
+    last revision sent, since the websocket delivers in order). When the required history is no longer
+    available, or after a reset, a full snapshot is produced instead.
+    """
+    def __init__(self, history_limit: int = 64):
+        self.revision: int = 0
+        self.acked_revision: Optional[int] = None
+        self.sent_revision: Optional[int] = None
+        self._state: Any = None
+        self._has_state = False
+        self._history: Deque[Tuple[int, List[Dict[str, Any]]]] = deque(maxlen=history_limit)
+
+    @staticmethod
+    def _normalize(state: Any) -> Any:
+        # Produces an independent, JSON-clean copy so later in-place mutations of the live state
+        # cannot leak into the stored baseline. default=str matches SessionEventManager._send.
+        return json.loads(json.dumps(state, ensure_ascii=False, default=str))
+
+    def reset(self):
+        """Forgets the client's baseline so that the next update is sent as a snapshot."""
+        self._has_state = False
+        self._state = None
+        self._history.clear()
+        self.acked_revision = None
+        self.sent_revision = None
+
+    def acknowledge(self, revision: int):
+        if self.sent_revision is None or revision > self.sent_revision:
+            logger.debug("state_sync_ack_ignored", extra={"acked_revision": revision, "sent_revision": self.sent_revision})
+            return
+        if self.acked_revision is None or revision > self.acked_revision:
+            self.acked_revision = revision
+
+    def _snapshot_payload(self) -> Dict[str, Any]:
+        self.sent_revision = self.revision
+        self.acked_revision = None
+        return {"sync_mode": "snapshot", "revision": self.revision, "state": self._state}
+
+    def update(self, state: Any, force_snapshot: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Records a new version of the state and returns the payload to send,
+        or None when nothing changed since the last revision.
+        """
+        normalized = self._normalize(state)
+
+        if not self._has_state or force_snapshot:
+            self.revision += 1
+            self._history.clear()
+            self._state = normalized
+            self._has_state = True
+            return self._snapshot_payload()
+
+        ops = compute_json_patch(self._state, normalized)
+        if not ops:
+            return None
+
+        self.revision += 1
+        self._history.append((self.revision, ops))
+        self._state = normalized
+
+        base_revision = self.acked_revision if self.acked_revision is not None else self.sent_revision
+        if base_revision is None or not self._history or self._history[0][0] > base_revision + 1:
+            return self._snapshot_payload()
+
+        patches = [{"revision": rev, "ops": rev_ops} for rev, rev_ops in self._history if rev > base_revision]
+        self.sent_revision = self.revision
+        return {
+            "sync_mode": "delta",
+            "revision": self.revision,
+            "base_revision": base_revision,
+            "patches": patches,
+        }
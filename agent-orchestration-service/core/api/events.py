@@ -9,6 +9,7 @@ import copy
 from datetime import datetime, timezone
 
 from .session import active_runs_store # Import global run store
+from agent_core.utils.state_sync import RevisionedStateChannel
 logger = logging.getLogger(__name__)
 
 class SessionEventManager:
@@ -31,6 +32,8 @@ class SessionEventManager:
         self.is_connected = False
         self.websocket: Optional[WebSocket] = None
         self.on_send: Optional[callable] = None
+        # (run_id, stream_name) -> revision tracking for turns_sync / view_model_update deltas
+        self._state_channels: Dict[tuple, RevisionedStateChannel] = {}
         # session_id is now the connection credential ID for the WebSocket, mainly used for logging
         logger.debug("event_manager_created", extra={"session_id": session_id})
         
@@ -412,9 +415,31 @@ class SessionEventManager:
         
         return await kb.hydrate_turn_list_tool_results(turns)
 
-    async def emit_turns_sync(self, context: Dict[str, Any]):
+    def _get_state_channel(self, run_id: str, stream_name: str) -> RevisionedStateChannel:
+        key = (run_id, stream_name)
+        channel = self._state_channels.get(key)
+        if channel is None:
+            channel = RevisionedStateChannel()
+            self._state_channels[key] = channel
+        return channel
+
+    def acknowledge_state_revision(self, run_id: str, stream_name: str, revision: int):
+        """Records the latest revision the client has applied for a synchronized stream."""
+        channel = self._state_channels.get((run_id, stream_name))
+        if channel:
+            channel.acknowledge(revision)
+
+    def reset_state_sync(self, run_id: str, stream_name: Optional[str] = None):
+        """Drops the client baseline so that the next update of the stream(s) is sent as a full snapshot."""
+        for (channel_run_id, channel_stream), channel in self._state_channels.items():
+            if channel_run_id == run_id and (stream_name is None or channel_stream == stream_name):
+                channel.reset()
+
+    async def emit_turns_sync(self, context: Dict[str, Any], force_snapshot: bool = False):
         """ 
-        (Modified) Sends the complete list of turns to synchronize the frontend state, and hydrates before sending.
+        (Modified) Synchronizes the turns list with the frontend, hydrating before sending.
+        The first sync (or force_snapshot) sends the complete list; later syncs send revisioned
+        JSON-patch deltas, and nothing at all when the turns did not change.
         """
         if not context:
             logger.warning("emit_turns_sync called with empty context. Aborting.")
@@ -452,15 +477,39 @@ class SessionEventManager:
         # --- End of hydration step ---
 
         try:
-            # Use the hydrated turns_to_send
+            sync_payload = self._get_state_channel(run_id, "turns").update(turns_to_send, force_snapshot=force_snapshot)
+            if sync_payload is None:
+                logger.debug("turns_sync_skipped_unchanged", extra={"run_id": run_id})
+                return
+
+            data = {k: v for k, v in sync_payload.items() if k != "state"}
+            if sync_payload["sync_mode"] == "snapshot":
+                data["turns"] = sync_payload["state"]
             await self.send_json(
                 run_id=run_id,
-                message={"type": "turns_sync", "data": {"turns": turns_to_send}}
+                message={"type": "turns_sync", "data": data}
             )
-            logger.debug("turns_sync_event_sent", extra={"run_id": run_id, "turns_count": len(turns_to_send)})
+            logger.debug("turns_sync_event_sent", extra={"run_id": run_id, "turns_count": len(turns_to_send), "sync_mode": sync_payload["sync_mode"], "revision": sync_payload["revision"]})
         except Exception as e:
             logger.error("turns_sync_event_send_failed", extra={"run_id": run_id, "error": str(e)}, exc_info=True)
 
+    async def emit_view_model_update(self, run_id: str, view_name: str, model: Any, force_snapshot: bool = False) -> bool:
+        """Sends a view model as a revisioned snapshot or delta. Returns False if it was unchanged and nothing was sent."""
+        sync_payload = self._get_state_channel(run_id, view_name).update(model, force_snapshot=force_snapshot)
+        if sync_payload is None:
+            logger.debug("view_model_update_skipped_unchanged", extra={"run_id": run_id, "view_name": view_name})
+            return False
+
+        data = {"view_name": view_name}
+        data.update({k: v for k, v in sync_payload.items() if k != "state"})
+        if sync_payload["sync_mode"] == "snapshot":
+            data["model"] = sync_payload["state"]
+        await self.send_json(
+            run_id=run_id,
+            message={"type": "view_model_update", "data": data}
+        )
+        return True
+
     async def emit_work_module_updated(self, run_id: str, module_data: Dict, contextual_data: Optional[Dict] = None):
         """Sends a work module update event
 
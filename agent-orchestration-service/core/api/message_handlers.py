@@ -327,7 +327,7 @@ async def handle_start_run_message(ws_state: Dict, data: Dict):
             await event_manager.emit_run_ready(server_run_id, request_id)
             
             # Send turns_sync to provide the authoritative data for rendering the conversation.
-            await event_manager.emit_turns_sync(run_context)
+            await event_manager.emit_turns_sync(run_context, force_snapshot=True)
             
             logger.info("resume_completed", extra={"run_id": server_run_id})
             
@@ -767,8 +767,8 @@ async def handle_subscribe_to_view(ws_state: Dict, data: Dict):
         subscriptions[run_id] = set()
     subscriptions[run_id].add(view_name)
     
-    # Immediately push the latest view model once
-    await trigger_view_model_update(run_context, view_name)
+    # Immediately push the latest view model once, as a full snapshot that later deltas build on
+    await trigger_view_model_update(run_context, view_name, force_snapshot=True)
 
 
 async def handle_unsubscribe_from_view(ws_state: Dict, data: Dict):
@@ -790,6 +790,43 @@ async def handle_unsubscribe_from_view(ws_state: Dict, data: Dict):
                 del subscriptions[run_id]
 
 
+async def handle_ack_state_revision(ws_state: Dict, data: Dict):
+    """Handles client acknowledgements of applied turns_sync / view_model_update revisions"""
+    event_manager = ws_state.event_manager
+
+    run_id = data.get("run_id")
+    stream_name = data.get("stream")
+    revision = data.get("revision")
+
+    if not run_id or not stream_name or not isinstance(revision, int):
+        logger.warning("ack_state_revision_missing_params", extra={"session_id": event_manager.session_id, "run_id": run_id, "stream": stream_name})
+        return
+
+    event_manager.acknowledge_state_revision(run_id, stream_name, revision)
+
+
+async def handle_request_state_resync(ws_state: Dict, data: Dict):
+    """Handles client requests for a full snapshot after a gap in turns_sync / view_model_update revisions"""
+    event_manager = ws_state.event_manager
+    session_id_for_log = event_manager.session_id
+
+    run_id = data.get("run_id")
+    stream_name = data.get("stream")
+
+    logger.info("request_state_resync_received", extra={"session_id": session_id_for_log, "run_id": run_id, "stream": stream_name})
+
+    run_context = active_runs_store.get(run_id) if run_id else None
+    if not run_context or not stream_name:
+        logger.warning("request_state_resync_invalid", extra={"session_id": session_id_for_log, "run_id": run_id, "stream": stream_name})
+        await event_manager.emit_error(run_id=run_id, agent_id="System", error_message="request_state_resync requires a valid run_id and stream.")
+        return
+
+    if stream_name == "turns":
+        await event_manager.emit_turns_sync(run_context, force_snapshot=True)
+    else:
+        await trigger_view_model_update(run_context, stream_name, force_snapshot=True)
+
+
 async def handle_manage_work_modules_request(ws_state: Dict, data: Dict):
     """Handles direct work module management requests from the client"""
     event_manager = ws_state.event_manager
@@ -961,6 +998,8 @@ MESSAGE_HANDLERS: Dict[str, callable] = {
     "request_knowledge_base": handle_request_knowledge_base_message, # New handler
     "subscribe_to_view": handle_subscribe_to_view, # New view subscription handler
     "unsubscribe_from_view": handle_unsubscribe_from_view, # New view unsubscription handler
+    "ack_state_revision": handle_ack_state_revision, # Client ack for revisioned state sync
+    "request_state_resync": handle_request_state_resync, # Client request for a full state snapshot
     "manage_work_modules_request": handle_manage_work_modules_request, # New module management handler
 }
 
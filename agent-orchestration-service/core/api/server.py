@@ -19,6 +19,7 @@ from api.events import SessionEventManager
 from agent_core.iic.core.iic_handlers import list_projects, get_project, create_project, delete_project, update_project, update_run_meta, delete_run, update_run_name, move_iic
 # Import server_manager startup/shutdown functions
 from agent_core.services.server_manager import lifespan_manager
+from agent_core.services import file_monitor
 # Import the new message handler registry
 from .message_handlers import MESSAGE_HANDLERS
 # Import metadata related modules
@@ -410,6 +411,14 @@ async def get_metadata(url: str = Query(..., description="The URL for which to f
         raise HTTPException(status_code=500, detail="Failed to fetch metadata")
 
 
+@app.get("/rag/indexing/metrics")
+async def rag_indexing_metrics():
+    """Returns queue depth and index lag of the incremental RAG indexing pipeline"""
+    if not file_monitor.INDEXING_PIPELINE:
+        return {"enabled": False}
+    return {"enabled": True, **file_monitor.INDEXING_PIPELINE.get_metrics()}
+
+
 @app.get("/health")
 async def health_check():
     """健康检查端点"""
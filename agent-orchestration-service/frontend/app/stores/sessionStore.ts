@@ -5,6 +5,7 @@ import { selectionStore } from './selectionStore'; // Import selectionStore
 import { config } from '@/app/config';
 import { ProjectService } from '@/lib/api';
 import type { Turn as OriginalTurn, ToolInteraction } from '@/app/chat/types/conversation'; // <-- New import
+import { applyRevisionPatches, type StateSyncFields } from '@/app/utils/stateSync';
 
 // Define the shape of `llm_interaction` as we expect it, including `actual_usage`.
 interface EnrichedLLMInteraction {
@@ -390,9 +391,11 @@ export interface WorkModuleUpdated {
 
 export interface ViewModelUpdate {
   type: 'view_model_update';
-  data: {
+  run_id?: string;
+  data: StateSyncFields & {
     view_name: 'flow_view' | 'kanban_view' | 'timeline_view';
-    model: FlowViewModel | KanbanViewModel | TimelineViewModel;
+    // Only present on snapshots; deltas carry `patches` instead
+    model?: FlowViewModel | KanbanViewModel | TimelineViewModel;
   };
 }
 
@@ -406,8 +409,10 @@ export interface ViewModelUpdateFailed {
 
 export interface TurnsSync {
   type: 'turns_sync';
-  data: {
-    turns: Turn[];
+  run_id?: string;
+  data: StateSyncFields & {
+    // Only present on snapshots; deltas carry `patches` instead
+    turns?: Turn[];
   };
 }
 
@@ -507,6 +512,9 @@ class SessionStore {
 
   private runCreationPromises = new Map<string, { resolve: (runId: string) => void, reject: (reason?: unknown) => void }>();
 
+  // Last server state per `${run_id}:${stream}` for revisioned turns_sync / view_model_update deltas
+  private syncedStates = new Map<string, { revision: number; state: unknown }>();
+
   // New store properties for API updates
   availableToolsets: AvailableToolsetsResponse['data']['toolsets'] | null = null;
   lastLLMRequestParams: LLMRequestParams['data'] | null = null;
@@ -699,6 +707,7 @@ class SessionStore {
 
       ws.onclose = () => {
         this.ws = null;
+        this.syncedStates.clear();
       };
     });
   }
@@ -707,8 +716,11 @@ class SessionStore {
     // console.log('Received message:', data.type, data);
     switch (data.type) {
       case 'turns_sync': {
+        const turnsSync = data as TurnsSync;
+        const turns = this.resolveSyncedState<Turn[]>(turnsSync.run_id, 'turns', turnsSync.data, turnsSync.data.turns);
+        if (!turns) break;
         runInAction(() => {
-            this.turns = data.data.turns;
+            this.turns = turns;
             this.isResuming = false; // End of resumption
         });
         break;
@@ -744,7 +756,12 @@ class SessionStore {
       }
       case 'view_model_update': {
         console.log('View Model Update Received:', data);
-        const { view_name, model } = (data as ViewModelUpdate).data;
+        const viewModelUpdate = data as ViewModelUpdate;
+        const { view_name } = viewModelUpdate.data;
+        const model = this.resolveSyncedState<NonNullable<ViewModelUpdate['data']['model']>>(
+          viewModelUpdate.run_id, view_name, viewModelUpdate.data, viewModelUpdate.data.model
+        );
+        if (!model) break;
         this.viewErrors.set(view_name, null);
         
         // Reset waiting state (first ViewModel has arrived)
@@ -757,7 +774,8 @@ class SessionStore {
         
         if (view_name === 'flow_view') {
           // Do not update turns from here anymore
-          const newFlow = model as FlowViewModel;
+          // Work on a copy so the merge below does not alter the synced server state
+          const newFlow = structuredClone(model) as FlowViewModel;
           
           // Create a map of stream IDs from the current (old) flow structure
           // to preserve content of completed streams.
@@ -1108,6 +1126,64 @@ class SessionStore {
     }
   }
 
+  // region: Revisioned state sync
+  /**
+   * Returns the full state for a turns_sync / view_model_update message, applying delta patches
+   * on top of the last synced state. Acknowledges the applied revision, or requests a resync and
+   * returns null when the delta does not line up with what this client has.
+   */
+  private resolveSyncedState<T>(runId: string | undefined, stream: string, sync: StateSyncFields, snapshot: T | undefined): T | null {
+    const key = `${runId}:${stream}`;
+
+    // Servers without revisioned sync always send snapshots without a revision
+    if (sync.sync_mode !== 'delta') {
+      if (snapshot === undefined) return null;
+      if (sync.revision !== undefined) {
+        this.syncedStates.set(key, { revision: sync.revision, state: snapshot });
+        this.acknowledgeStateRevision(runId, stream, sync.revision);
+      }
+      return snapshot;
+    }
+
+    const current = this.syncedStates.get(key);
+    let applied: { state: T; revision: number } | null = null;
+    if (current) {
+      try {
+        applied = applyRevisionPatches(current.state as T, current.revision, sync.patches || []);
+      } catch (error) {
+        console.warn(`Failed to apply ${stream} patch, requesting resync:`, error);
+      }
+    }
+    if (!applied) {
+      this.syncedStates.delete(key);
+      this.requestStateResync(runId, stream);
+      return null;
+    }
+
+    this.syncedStates.set(key, applied);
+    this.acknowledgeStateRevision(runId, stream, applied.revision);
+    return applied.state;
+  }
+
+  private acknowledgeStateRevision(runId: string | undefined, stream: string, revision: number) {
+    if (runId && this.ws?.readyState === WebSocket.OPEN) {
+      this.ws.send(JSON.stringify({
+        type: 'ack_state_revision',
+        data: { run_id: runId, stream, revision }
+      }));
+    }
+  }
+
+  private requestStateResync(runId: string | undefined, stream: string) {
+    if (runId && this.ws?.readyState === WebSocket.OPEN) {
+      this.ws.send(JSON.stringify({
+        type: 'request_state_resync',
+        data: { run_id: runId, stream }
+      }));
+    }
+  }
+  // endregion
+
   // region: ViewModel Subscription and Management
   subscribeToView(runId: string, viewName: 'flow_view' | 'kanban_view' | 'timeline_view') {
     if (this.ws?.readyState === WebSocket.OPEN) {
@@ -0,0 +1,90 @@
+/**
+ * Client side of the revisioned state sync used by `turns_sync` and `view_model_update`.
+ * The server sends either a full snapshot or JSON-patch (RFC 6902 add/remove/replace) deltas
+ * grouped by revision.
+ */
+
+export interface JsonPatchOperation {
+  op: 'add' | 'remove' | 'replace';
+  path: string;
+  value?: unknown;
+}
+
+export interface RevisionPatch {
+  revision: number;
+  ops: JsonPatchOperation[];
+}
+
+export interface StateSyncFields {
+  sync_mode?: 'snapshot' | 'delta';
+  revision?: number;
+  base_revision?: number;
+  patches?: RevisionPatch[];
+}
+
+type JsonContainer = Record<string, unknown> | unknown[];
+
+const parsePointer = (path: string): string[] =>
+  path === '' ? [] : path.split('/').slice(1).map(token => token.replace(/~1/g, '/').replace(/~0/g, '~'));
+
+/**
+ * Applies JSON-patch operations to a copy of `document` and returns the copy.
+ * Throws if a path does not exist, so the caller can fall back to a resync.
+ */
+export function applyJsonPatch<T>(document: T, ops: JsonPatchOperation[]): T {
+  let result: unknown = structuredClone(document);
+
+  for (const operation of ops) {
+    const tokens = parsePointer(operation.path);
+    if (tokens.length === 0) {
+      result = operation.value;
+      continue;
+    }
+
+    let parent = result as JsonContainer;
+    for (const token of tokens.slice(0, -1)) {
+      const next = Array.isArray(parent) ? parent[Number(token)] : parent[token];
+      if (next === null || typeof next !== 'object') {
+        throw new Error(`Invalid patch path: ${operation.path}`);
+      }
+      parent = next as JsonContainer;
+    }
+
+    const last = tokens[tokens.length - 1];
+    if (Array.isArray(parent)) {
+      const index = last === '-' ? parent.length : Number(last);
+      if (operation.op === 'add') {
+        parent.splice(index, 0, operation.value);
+      } else if (operation.op === 'remove') {
+        parent.splice(index, 1);
+      } else {
+        parent[index] = operation.value;
+      }
+    } else if (operation.op === 'remove') {
+      delete parent[last];
+    } else {
+      parent[last] = operation.value;
+    }
+  }
+
+  return result as T;
+}
+
+/**
+ * Applies the patches of a delta message on top of `current`, which is at `currentRevision`.
+ * Patches the client already has are skipped. Returns null when there is a revision gap,
+ * in which case the client should request a resync.
+ */
+export function applyRevisionPatches<T>(current: T, currentRevision: number, patches: RevisionPatch[]): { state: T; revision: number } | null {
+  let state = current;
+  let revision = currentRevision;
+
+  for (const patch of patches) {
+    if (patch.revision <= revision) continue;
+    if (patch.revision !== revision + 1) return null;
+    state = applyJsonPatch(state, patch.ops);
+    revision = patch.revision;
+  }
+
+  return { state, revision };
+}
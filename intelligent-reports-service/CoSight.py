@@ -26,11 +26,13 @@ from app.cosight.agent.planner.instance.planner_agent_instance import create_pla
 from app.cosight.agent.planner.task_plannr_agent import TaskPlannerAgent
 from app.cosight.task.task_manager import TaskManager
 from app.cosight.task.todolist import Plan
+from app.cosight.task.step_scheduler import StepScheduler
 from app.cosight.task.time_record_util import time_record
 from app.common.logger_util import logger
 
 class CoSight:
-    def __init__(self, plan_llm, act_llm, tool_llm, vision_llm, work_space_path: str = None):
+    def __init__(self, plan_llm, act_llm, tool_llm, vision_llm, work_space_path: str = None,
+                 max_concurrent_steps: int = None):
         self.work_space_path = work_space_path or os.getenv("WORKSPACE_PATH") or os.getcwd()
         self.plan_id = f"plan_{int(time.time())}"
         self.plan = Plan(work_space_path=self.work_space_path)
@@ -40,6 +42,8 @@ class CoSight:
         self.act_llm = act_llm  # Store llm for later use
         self.tool_llm = tool_llm
         self.vision_llm = vision_llm
+        # 单个计划同时执行的最大步骤数，步骤在所有计划共享的线程池中执行
+        self.max_concurrent_steps = max_concurrent_steps
 
     @time_record
     def execute(self, question, output_format=""):
@@ -49,66 +53,37 @@ class CoSight:
             create_result = self.task_planner_agent.create_plan(create_task, output_format)
             create_task += f"\nThe plan creation result is: {create_result}\nCreation failed, please carefully review the plan creation rules and select the create_plan tool to create the plan"
             retry_count += 1
-        while True:
-            ready_steps = self.plan.get_ready_steps()
-            if not ready_steps:
-                logger.info("No more ready steps to execute")
-                break
-            logger.info(f"Found {ready_steps} ready steps to execute")
-
-            results = self.execute_steps(question, ready_steps)
-            logger.info(f"All steps completed with results: {results}")
-            # 可配置是否只在堵塞的时候再重规划，提高效率
-            # todo 这里没有实时上报
-            plan_report_event_manager.publish("plan_process", self.plan)
-            # re_plan_result = self.task_planner_agent.re_plan(question, output_format)
-            # logger.info(f"re-plan_result is {re_plan_result}")
+        results = self.execute_steps(question)
+        logger.info(f"All steps completed with results: {results}")
+        # re_plan_result = self.task_planner_agent.re_plan(question, output_format)
+        # logger.info(f"re-plan_result is {re_plan_result}")
         return self.task_planner_agent.finalize_plan(question, output_format)
 
-    def execute_steps(self, question, ready_steps):
-        from threading import Thread, Semaphore
-        from queue import Queue
-
-        results = {}
-        result_queue = Queue()
-        semaphore = Semaphore(min(5, len(ready_steps)))
-
-        def execute_step(step_index):
-            semaphore.acquire()
-            try:
-                logger.info(f"Starting execution of step {step_index}")
-                # 每个线程创建独立的TaskActorAgent实例
-                task_actor_agent = TaskActorAgent(
-                    create_actor_instance(f"actor_for_step_{step_index}", self.work_space_path),
-                    self.act_llm,
-                    self.vision_llm,
-                    self.tool_llm,
-                    self.plan_id,
-                    work_space_path=self.work_space_path
-                )
-                result = task_actor_agent.act(question=question, step_index=step_index)
-                logger.info(f"Completed execution of step {step_index} with result: {result}")
-                result_queue.put((step_index, result))
-            finally:
-                semaphore.release()
-
-        # 为每个ready_step创建并执行线程
-        threads = []
-        for step_index in ready_steps:
-            thread = Thread(target=execute_step, args=(step_index,))
-            thread.start()
-            threads.append(thread)
-
-        # 等待所有线程完成
-        for thread in threads:
-            thread.join()
-
-        # 收集结果
-        while not result_queue.empty():
-            step_index, result = result_queue.get()
-            results[step_index] = result
-
-        return results
+    def execute_steps(self, question):
+        """执行计划中的步骤：某个步骤的前置步骤全部结束后立即启动，不等待同一批的其他步骤"""
+        scheduler = StepScheduler(
+            self.plan,
+            lambda step_index: self.execute_step(question, step_index),
+            max_concurrent_steps=self.max_concurrent_steps,
+            # 每个步骤结束后实时上报计划进度
+            on_step_done=lambda step_index, result: plan_report_event_manager.publish("plan_process", self.plan)
+        )
+        return scheduler.run()
+
+    def execute_step(self, question, step_index):
+        logger.info(f"Starting execution of step {step_index}")
+        # 每个步骤创建独立的TaskActorAgent实例
+        task_actor_agent = TaskActorAgent(
+            create_actor_instance(f"actor_for_step_{step_index}", self.work_space_path),
+            self.act_llm,
+            self.vision_llm,
+            self.tool_llm,
+            self.plan_id,
+            work_space_path=self.work_space_path
+        )
+        result = task_actor_agent.act(question=question, step_index=step_index)
+        logger.info(f"Completed execution of step {step_index} with result: {result}")
+        return result
 
 
 if __name__ == '__main__':
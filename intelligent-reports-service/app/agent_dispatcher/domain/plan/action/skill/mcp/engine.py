@@ -13,9 +13,13 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import atexit
+import os
+
 from mcp import Tool as MCPTool
 
 from app.agent_dispatcher.domain.plan.action.skill.mcp.server import MCPServerStdio, MCPServerSse
+from app.agent_dispatcher.domain.plan.action.skill.mcp.session_pool import MCPSessionPool
 from app.agent_dispatcher.infrastructure.entity.exception.ZaeFrameworkException import \
     NaeFrameworkException
 from app.agent_dispatcher.infrastructure.entity.exception.error_code_consts import MCP_ERROR
@@ -26,6 +30,9 @@ from app.agent_dispatcher.infrastructure.entity.Skill import Skill
 
 mcp_servers = []
 
+# 是否复用MCP会话，关闭后每次调用都重新建立连接
+MCP_SESSION_POOL_ENABLED = os.getenv("MCP_SESSION_POOL_ENABLED", "true").lower() == "true"
+
 
 class MCPEngine:
 
@@ -41,34 +48,28 @@ class MCPEngine:
     @staticmethod
     async def get_mcp_tools(name, config) -> list[MCPTool]:
         """Get all function tools from a single MCP server."""
-        server = None
         try:
-            server = MCPEngine.get_server(name, config)
-            await server.connect()
-            tools = await server.list_tools()
-            return tools
+            if MCP_SESSION_POOL_ENABLED:
+                return await mcp_session_pool.list_tools(name, config)
+            async with MCPEngine.get_server(name, config) as server:
+                return await server.list_tools()
         except Exception as e:
             logger.error(f"Error invoking MCP tool {name}: {e}")
             return []
-        finally:
-            if server:
-                await server.cleanup()
 
     @staticmethod
     async def invoke_mcp_tool(name, config, tool_name, input_json: dict = {}):
         """Invoke an MCP tool and return the result as a string."""
         logger.info(f"Invoke MCP tool {tool_name}, {input_json}")
-        server = None
         try:
-            server = MCPEngine.get_server(name, config)
-            await server.connect()
-            result = await server.call_tool(tool_name, input_json)
+            if MCP_SESSION_POOL_ENABLED:
+                result = await mcp_session_pool.call_tool(name, config, tool_name, input_json)
+            else:
+                async with MCPEngine.get_server(name, config) as server:
+                    result = await server.call_tool(tool_name, input_json)
         except Exception as e:
-            print(f"Error invoking MCP tool {tool_name}: {e}")
+            logger.error(f"Error invoking MCP tool {tool_name}: {e}")
             raise NaeFrameworkException(MCP_ERROR, f"Error invoking MCP tool {tool_name}")
-        finally:
-            if server:
-                await server.cleanup()
         logger.info(f"MCP tool {tool_name} returned {result}")
 
         # The MCP tool result is a list of content items, whereas OpenAI tool outputs are a single
@@ -88,3 +89,6 @@ class MCPEngine:
 
         return tool_output
 
+
+mcp_session_pool = MCPSessionPool(MCPEngine.get_server)
+atexit.register(mcp_session_pool.close)
@@ -0,0 +1,250 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import asyncio
+import json
+import os
+import time
+from typing import Any, Callable, Dict, Optional
+
+import anyio
+from mcp import Tool as MCPTool
+from mcp.shared.exceptions import McpError
+from mcp.types import CallToolResult
+
+from app.agent_dispatcher.domain.plan.action.skill.mcp.server import MCPServer
+from app.common.domain.util.background_loop import background_loop
+from app.common.logger_util import logger
+
+# 每个MCP server同时执行的最大工具调用数
+MCP_SESSION_MAX_CONCURRENCY = int(os.getenv("MCP_SESSION_MAX_CONCURRENCY", "4"))
+# 会话空闲超过该时间（秒）后关闭
+MCP_SESSION_IDLE_TIMEOUT = float(os.getenv("MCP_SESSION_IDLE_TIMEOUT", "300"))
+# 会话空闲超过该时间（秒）后，复用前先ping检查是否可用
+MCP_SESSION_HEALTH_CHECK_INTERVAL = float(os.getenv("MCP_SESSION_HEALTH_CHECK_INTERVAL", "30"))
+# 建立连接和健康检查的超时时间（秒）
+MCP_SESSION_CONNECT_TIMEOUT = float(os.getenv("MCP_SESSION_CONNECT_TIMEOUT", "30"))
+# 向已关闭的传输流写入请求时抛出，此时请求没有发出，任何调用都可以重试
+_REQUEST_NOT_SENT_ERRORS = (anyio.ClosedResourceError, anyio.BrokenResourceError)
+
+
+class _PooledSession:
+    """一个保持连接的MCP server
+
+    连接和清理必须在同一个任务中完成（stdio/sse客户端基于anyio的任务组），
+    因此每个会话由一个常驻任务持有：建立连接后等待关闭信号，再在同一任务中清理。
+    """
+
+    def __init__(self, server: MCPServer):
+        self.server = server
+        self.last_used = time.monotonic()
+        self.in_use = 0
+        # 已移出连接池，不再分配给新的调用，最后一个调用结束后关闭
+        self.retired = False
+        self._ready: Optional[asyncio.Future] = None
+        self._closing = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self._ready = asyncio.get_running_loop().create_future()
+        self._task = asyncio.create_task(self._hold())
+        try:
+            await asyncio.wait_for(asyncio.shield(self._ready), MCP_SESSION_CONNECT_TIMEOUT)
+        except BaseException:
+            self._task.cancel()
+            raise
+
+    async def _hold(self):
+        try:
+            await self.server.connect()
+        except asyncio.CancelledError:
+            self._ready.cancel()
+            raise
+        except Exception as e:
+            self._ready.set_exception(e)
+            return
+        self._ready.set_result(None)
+        try:
+            await self._closing.wait()
+        finally:
+            await self.server.cleanup()
+
+    @property
+    def alive(self) -> bool:
+        return self._task is not None and not self._task.done() and self.server.session is not None
+
+    async def ping(self) -> bool:
+        try:
+            await asyncio.wait_for(self.server.session.send_ping(), MCP_SESSION_CONNECT_TIMEOUT)
+            return True
+        except Exception as e:
+            logger.warning(f"Health check of MCP server {self.server.name} failed: {e}")
+            return False
+
+    async def close(self):
+        self._closing.set()
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._task, MCP_SESSION_CONNECT_TIMEOUT)
+        except Exception as e:
+            logger.error(f"Error closing MCP server {self.server.name}: {e}")
+
+
+class MCPSessionPool:
+    """按server配置复用MCP会话的连接池
+
+    会话保存在共享的后台事件循环（background_loop）中，调用方可以在任意线程、任意事件循环中使用。
+    - 同一配置的server只保持一个会话，工具调用在该会话上并发执行，并发数受 max_concurrency 限制
+    - 会话空闲超过 health_check_interval 后，复用前先ping，失败则重新连接
+    - 会话空闲超过 idle_timeout 后被关闭
+    - 调用因连接问题失败时，该会话移出连接池，其上仍在执行的其他调用结束后再关闭
+    - 请求未发出（连接已断开）或获取工具列表失败时，重新连接并重试一次；
+      其他情况下工具调用可能已在server端执行，不重试（server返回的协议错误都不重试）
+    """
+
+    def __init__(self, server_factory: Callable[[str, dict], MCPServer],
+                 max_concurrency: int = MCP_SESSION_MAX_CONCURRENCY,
+                 idle_timeout: float = MCP_SESSION_IDLE_TIMEOUT,
+                 health_check_interval: float = MCP_SESSION_HEALTH_CHECK_INTERVAL):
+        self.server_factory = server_factory
+        self.max_concurrency = max_concurrency
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+
+        self._sessions: Dict[str, _PooledSession] = {}
+        self._connect_locks: Dict[str, asyncio.Lock] = {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._reaper: Optional[asyncio.Task] = None
+
+    # ===== 后台事件循环 =====
+
+    async def _run_in_pool(self, coro):
+        loop = background_loop.get_loop()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            return await self._in_loop(coro)
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._in_loop(coro), loop))
+
+    async def _in_loop(self, coro):
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap_idle_sessions())
+        return await coro
+
+    async def _reap_idle_sessions(self):
+        interval = max(1.0, min(self.idle_timeout, self.health_check_interval) / 2)
+        while True:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            for key, session in list(self._sessions.items()):
+                if session.in_use == 0 and now - session.last_used > self.idle_timeout:
+                    logger.info(f"Close idle MCP server {session.server.name}")
+                    await self._discard(key, session)
+
+    # ===== 会话管理 =====
+
+    @staticmethod
+    def _key(name: str, config: dict) -> str:
+        return f"{name}:{json.dumps(config, sort_keys=True, ensure_ascii=False, default=str)}"
+
+    async def _discard(self, key: str, session: _PooledSession):
+        if self._sessions.get(key) is session:
+            del self._sessions[key]
+        await session.close()
+
+    async def _retire(self, key: str, session: _PooledSession):
+        """把会话移出连接池，新的调用会重新连接；不中断该会话上其他调用方正在执行的调用"""
+        if self._sessions.get(key) is session:
+            del self._sessions[key]
+        session.retired = True
+        if session.in_use == 0:
+            await session.close()
+
+    async def _acquire(self, key: str, name: str, config: dict) -> _PooledSession:
+        lock = self._connect_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            session = self._sessions.get(key)
+            if session is not None:
+                if not session.alive:
+                    await self._retire(key, session)
+                    session = None
+                elif time.monotonic() - session.last_used > self.health_check_interval and not await session.ping():
+                    await self._retire(key, session)
+                    session = None
+            if session is None:
+                session = _PooledSession(self.server_factory(name, config))
+                await session.start()
+                self._sessions[key] = session
+                logger.info(f"MCP server {name} connected and pooled")
+            session.in_use += 1
+            return session
+
+    async def _release(self, session: _PooledSession):
+        session.in_use -= 1
+        session.last_used = time.monotonic()
+        if session.retired and session.in_use == 0:
+            await session.close()
+
+    async def _with_session(self, name: str, config: dict, operation: Callable[[MCPServer], Any],
+                            idempotent: bool = False):
+        key = self._key(name, config)
+        semaphore = self._semaphores.setdefault(key, asyncio.Semaphore(self.max_concurrency))
+        async with semaphore:
+            for attempt in range(2):
+                session = await self._acquire(key, name, config)
+                try:
+                    return await operation(session.server)
+                except McpError:
+                    raise
+                except Exception as e:
+                    await self._retire(key, session)
+                    # 请求可能已送达server时，非幂等的调用不重试
+                    if attempt or not (idempotent or isinstance(e, _REQUEST_NOT_SENT_ERRORS)):
+                        raise
+                    logger.warning(f"MCP server {name} call failed, reconnecting: {e!r}")
+                finally:
+                    await self._release(session)
+
+    # ===== 对外接口 =====
+
+    async def call_tool(self, name: str, config: dict, tool_name: str,
+                        arguments: dict[str, Any] | None) -> CallToolResult:
+        """在复用的会话上调用工具（只在请求未发出时重试，避免工具被执行两次）"""
+        return await self._run_in_pool(
+            self._with_session(name, config, lambda server: server.call_tool(tool_name, arguments)))
+
+    async def list_tools(self, name: str, config: dict) -> list[MCPTool]:
+        """在复用的会话上获取工具列表"""
+        return await self._run_in_pool(
+            self._with_session(name, config, lambda server: server.list_tools(), idempotent=True))
+
+    async def _close_all(self):
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        for key, session in list(self._sessions.items()):
+            await self._discard(key, session)
+
+    def close(self, timeout: float = 10):
+        """关闭所有会话"""
+        if not self._sessions and self._reaper is None:
+            return
+        try:
+            background_loop.run(self._close_all(), timeout)
+        except Exception as e:
+            logger.error(f"Error closing MCP session pool: {e}")
@@ -0,0 +1,112 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import asyncio
+import atexit
+import concurrent.futures
+import threading
+from typing import Any, Awaitable, Optional
+
+from app.common.logger_util import logger
+
+
+class BackgroundEventLoop:
+    """在后台线程中常驻运行的事件循环
+
+    同步代码通过 run() 把协程提交到该循环执行，协程中创建的异步客户端、MCP会话等可以跨调用复用，
+    不会随每次调用新建的事件循环一起被关闭。
+    """
+
+    def __init__(self, name: str = "background-loop"):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def get_loop(self) -> asyncio.AbstractEventLoop:
+        """获取事件循环，第一次调用时启动后台线程"""
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                started = threading.Event()
+
+                def run():
+                    asyncio.set_event_loop(loop)
+                    loop.call_soon(started.set)
+                    loop.run_forever()
+
+                self._thread = threading.Thread(target=run, name=self.name, daemon=True)
+                self._thread.start()
+                started.wait()
+                self._loop = loop
+            return self._loop
+
+    def in_loop_thread(self) -> bool:
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def submit(self, coro: Awaitable) -> concurrent.futures.Future:
+        """提交协程，返回 concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.get_loop())
+
+    def run(self, coro: Awaitable, timeout: Optional[float] = None) -> Any:
+        """在后台事件循环中执行协程并等待结果
+
+        Args:
+            coro: 要执行的协程
+            timeout: 超时时间（秒），超时后取消协程并抛出 TimeoutError
+
+        Raises:
+            RuntimeError: 在后台事件循环线程中调用（会导致死锁）
+        """
+        if self.in_loop_thread():
+            coro.close()
+            raise RuntimeError(f"{self.name}.run() cannot be called from its own event loop thread")
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise TimeoutError(f"Coroutine did not finish within {timeout} seconds and was cancelled")
+        except BaseException:
+            # 调用方被中断时一并取消协程
+            future.cancel()
+            raise
+
+    def close(self, timeout: float = 10):
+        """取消未完成的任务并停止事件循环"""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None or loop.is_closed():
+            return
+
+        async def _cancel_pending():
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        try:
+            asyncio.run_coroutine_threadsafe(_cancel_pending(), loop).result(timeout)
+        except Exception as e:
+            logger.error(f"Error cancelling pending tasks of {self.name}: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join(timeout)
+        if not self._thread.is_alive():
+            loop.close()
+
+
+# 进程内共享的后台事件循环，供智能体执行异步工具和MCP调用
+background_loop = BackgroundEventLoop("cosight-async")
+atexit.register(background_loop.close)
@@ -135,7 +135,7 @@ class TaskActorAgent(BaseAgent):
             {"role": "user", "content": task_prompt})
         try:
             result = self.execute(self.history, step_index=step_index)
-            if self.plan.step_statuses.get(self.plan.steps[step_index], "") == "in_progress":
+            if self.plan.get_step_status(step_index) == "in_progress":
                 self.plan.mark_step(step_index, step_status="completed", step_notes=str(result))
             return result
         except Exception as e:
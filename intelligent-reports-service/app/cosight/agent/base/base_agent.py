@@ -15,18 +15,21 @@
 
 import inspect
 import json
-import sys
+import os
 from typing import List, Dict, Any
 
-import asyncio
 from concurrent.futures import ThreadPoolExecutor
 from app.agent_dispatcher.domain.plan.action.skill.mcp.engine import MCPEngine
 from app.agent_dispatcher.infrastructure.entity.AgentInstance import AgentInstance
+from app.common.domain.util.background_loop import background_loop
 from app.cosight.agent.base.skill_to_tool import convert_skill_to_tool,get_mcp_tools,convert_mcp_tools
 from app.cosight.llm.chat_llm import ChatLLM
 from app.cosight.task.time_record_util import time_record
 from app.common.logger_util import logger
 
+# 异步工具和MCP工具单次调用的超时时间（秒），超时后取消调用
+TOOL_CALL_TIMEOUT = float(os.getenv("COSIGHT_TOOL_CALL_TIMEOUT", "600"))
+
 
 class BaseAgent:
     def __init__(self, agent_instance: AgentInstance, llm: ChatLLM, functions: {}):
@@ -40,6 +43,7 @@ class BaseAgent:
         self.tools.extend(convert_mcp_tools(self.mcp_tools))
         self.functions = functions
         self.history = []
+        self.tool_call_timeout = TOOL_CALL_TIMEOUT
 
     def find_mcp_tool(self, tool_name):
         for tool in self.mcp_tools:
@@ -146,13 +150,8 @@ class BaseAgent:
 
             # 检查是否是异步函数
             if inspect.iscoroutinefunction(function_to_call):
-                # 创建新的事件循环来运行异步函数
-                loop = asyncio.new_event_loop()
-                try:
-                    asyncio.set_event_loop(loop)
-                    result = loop.run_until_complete(function_to_call(**args_dict))
-                finally:
-                    loop.close()
+                # 异步函数提交到共享的后台事件循环执行，异步客户端可跨调用复用
+                result = background_loop.run(function_to_call(**args_dict), timeout=self.tool_call_timeout)
             else:
                 # 同步函数直接调用
                 result = function_to_call(**args_dict)
@@ -174,29 +173,21 @@ class BaseAgent:
 
     @time_record
     def _execute_mcp_tool_call(self, function_name="", function_args="", tool_call_id=""):
-        loop = None
         try:
             mcp_tool, tool_name = self.find_mcp_tool(function_name)
             if mcp_tool and tool_name:
                 cleaned_args = function_args.replace('\\\'', '\'')
                 args_dict = json.loads(cleaned_args or "{}")
-                # Windows系统需要特殊处理
-                if sys.platform == "win32":
-                    from asyncio import ProactorEventLoop
-                    loop = ProactorEventLoop()
-                else:
-                    loop = asyncio.new_event_loop()
-
-                asyncio.set_event_loop(loop)
 
-                # 执行异步调用
-                result = loop.run_until_complete(
+                # 在共享的后台事件循环中执行，复用连接池中的MCP会话
+                result = background_loop.run(
                     MCPEngine.invoke_mcp_tool(
                         mcp_tool['mcp_name'],
                         mcp_tool['mcp_config'],
                         tool_name,
                         args_dict
-                    )
+                    ),
+                    timeout=self.tool_call_timeout
                 )
                 return {
                     "role": "tool",
@@ -219,8 +210,3 @@ class BaseAgent:
                 "tool_call_id": tool_call_id,
                 "content": f"Execution error: {str(e)}"
             }
-        finally:
-            # 清理事件循环
-            if loop:
-                loop.close()
-                asyncio.set_event_loop(None)
@@ -0,0 +1,109 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional
+
+from app.cosight.task.todolist import Plan
+from app.common.logger_util import logger
+
+# 所有计划共享的步骤执行线程池大小
+STEP_WORKERS = int(os.getenv("COSIGHT_STEP_WORKERS", "16"))
+# 单个计划默认的最大并发步骤数
+MAX_CONCURRENT_STEPS = int(os.getenv("COSIGHT_MAX_CONCURRENT_STEPS", "5"))
+
+_step_executor: Optional[ThreadPoolExecutor] = None
+_step_executor_lock = Lock()
+
+
+def get_step_executor() -> ThreadPoolExecutor:
+    """获取所有计划共享的步骤执行线程池"""
+    global _step_executor
+    with _step_executor_lock:
+        if _step_executor is None:
+            _step_executor = ThreadPoolExecutor(max_workers=STEP_WORKERS, thread_name_prefix="cosight-step")
+        return _step_executor
+
+
+class StepScheduler:
+    """事件驱动的步骤调度器
+
+    某个步骤的最后一个前置步骤执行结束时立即启动该步骤，而不是等待同一批的所有步骤结束。
+    前置步骤"执行结束"的判定与 Plan.get_ready_steps 一致（状态不再是 not_started），
+    另外要求前置步骤的执行函数已经返回，避免其处于 in_progress 时就启动后续步骤。
+    """
+
+    def __init__(self, plan: Plan, run_step: Callable[[int], Any], max_concurrent_steps: int = None,
+                 executor: ThreadPoolExecutor = None, on_step_done: Callable[[int, Any], None] = None):
+        """
+        Args:
+            plan: 要执行的计划
+            run_step: 执行单个步骤的函数，参数为步骤索引
+            max_concurrent_steps: 该计划同时执行的最大步骤数
+            executor: 执行步骤的线程池，默认使用共享线程池
+            on_step_done: 每个步骤结束后的回调，参数为 (步骤索引, 结果)
+        """
+        self.plan = plan
+        self.run_step = run_step
+        self.max_concurrent_steps = max(1, max_concurrent_steps or MAX_CONCURRENT_STEPS)
+        self.executor = executor or get_step_executor()
+        self.on_step_done = on_step_done
+
+    def _schedulable_steps(self, submitted: set, running: set) -> List[int]:
+        return [
+            step_index for step_index in self.plan.get_ready_steps()
+            if step_index not in submitted
+            and not any(int(dep) in running for dep in self.plan.dependencies.get(step_index, []))
+        ]
+
+    def run(self) -> Dict[int, Any]:
+        """执行计划中所有可执行的步骤，直到没有正在执行且可以启动的步骤
+
+        Returns:
+            Dict[int, Any]: 步骤索引到执行结果的映射
+        """
+        results: Dict[int, Any] = {}
+        submitted = set()
+        running: Dict[Future, int] = {}
+
+        while True:
+            free_slots = self.max_concurrent_steps - len(running)
+            if free_slots > 0:
+                ready_steps = self._schedulable_steps(submitted, set(running.values()))[:free_slots]
+                if ready_steps:
+                    logger.info(f"Found {ready_steps} ready steps to execute")
+                for step_index in ready_steps:
+                    submitted.add(step_index)
+                    running[self.executor.submit(self.run_step, step_index)] = step_index
+
+            if not running:
+                logger.info("No more ready steps to execute")
+                break
+
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                step_index = running.pop(future)
+                try:
+                    results[step_index] = future.result()
+                except Exception as e:
+                    logger.error(f"Step {step_index} execution failed: {str(e)}", exc_info=True)
+                    results[step_index] = str(e)
+                logger.info(f"Step {step_index} finished")
+                if self.on_step_done:
+                    self.on_step_done(step_index, results[step_index])
+
+        return results
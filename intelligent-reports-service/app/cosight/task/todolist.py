@@ -13,7 +13,9 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from collections import Counter, defaultdict, deque
 import re
+from threading import RLock
 from typing import List, Optional, Dict, Tuple
 import os
 import platform
@@ -27,24 +29,75 @@ folder_files_map: Dict[str, List[str]] = {}
 subfolder_files_map: Dict[str, List[str]] = {}
 
 class Plan:
-    """Represents a single plan with steps, statuses, and execution details as a DAG."""
+    """Represents a single plan with steps, statuses, and execution details as a DAG.
+
+    步骤的状态、备注等按步骤索引存储；同时维护每个步骤尚未开始的前置步骤数（入度）和可执行步骤集合，
+    mark_step 时增量更新，get_ready_steps 不再遍历整个计划。
+    """
 
     def __init__(self, title: str = "", steps: List[str] = None, dependencies: Dict[int, List[int]] = None, work_space_path: str = ""):
         self.title = title
-        self.steps = steps if steps else []
-        # 使用步骤内容（中文）作为key存储状态、备注和详细信息
-        self.step_statuses = {step: "not_started" for step in self.steps}
-        self.step_notes = {step: "" for step in self.steps}
-        self.step_details = {step: "" for step in self.steps}
-        self.step_files = {step: "" for step in self.steps}
+        self.steps = list(steps) if steps else []
+        # 按步骤索引存储状态、备注和详细信息，相同内容的步骤互不影响
+        self._statuses = ["not_started"] * len(self.steps)
+        self._notes = [""] * len(self.steps)
+        self._details = [""] * len(self.steps)
+        self._files = [""] * len(self.steps)
+        self._lock = RLock()
         # 使用邻接表表示依赖关系
         if dependencies:
-            self.dependencies = dependencies
+            self.dependencies = {int(k): [int(dep) for dep in v] for k, v in dependencies.items()}
         else:
-            self.dependencies = {i: [i - 1] for i in range(1, len(self.steps))} if len(self.steps) > 1 else {}
+            self.dependencies = self._sequential_dependencies(len(self.steps))
+        self._rebuild_index()
         self.result = ""
         self.work_space_path = work_space_path if work_space_path else os.environ.get("WORKSPACE_PATH") or os.getcwd()
 
+    @staticmethod
+    def _sequential_dependencies(step_count: int) -> Dict[int, List[int]]:
+        return {i: [i - 1] for i in range(1, step_count)} if step_count > 1 else {}
+
+    def _rebuild_index(self) -> None:
+        """根据依赖关系和当前状态重建入度、后继步骤和可执行集合"""
+        step_count = len(self.steps)
+        self._dependents: Dict[int, List[int]] = defaultdict(list)
+        self._pending_deps = [0] * step_count
+        for step_index, deps in self.dependencies.items():
+            if not 0 <= step_index < step_count:
+                continue
+            for dep in deps:
+                if not 0 <= dep < step_count:
+                    logger.warning(f"Ignore invalid dependency {dep} of step {step_index}")
+                    continue
+                self._dependents[dep].append(step_index)
+                if self._statuses[dep] == "not_started":
+                    self._pending_deps[step_index] += 1
+        self._ready = {
+            i for i in range(step_count)
+            if self._statuses[i] == "not_started" and self._pending_deps[i] == 0
+        }
+        self._status_counts = Counter(self._statuses)
+
+    # 以步骤内容为key的只读视图，供计划上报和前端展示使用
+    @property
+    def step_statuses(self) -> Dict[str, str]:
+        return dict(zip(self.steps, self._statuses))
+
+    @property
+    def step_notes(self) -> Dict[str, str]:
+        return dict(zip(self.steps, self._notes))
+
+    @property
+    def step_details(self) -> Dict[str, str]:
+        return dict(zip(self.steps, self._details))
+
+    @property
+    def step_files(self) -> Dict[str, str]:
+        return dict(zip(self.steps, self._files))
+
+    def get_step_status(self, step_index: int) -> str:
+        return self._statuses[step_index]
+
     def set_plan_result(self, plan_result):
         self.result = plan_result
 
@@ -57,19 +110,8 @@ class Plan:
         返回:
             List[int]: 可立即执行的步骤索引列表（返回所有符合条件的步骤）
         """
-        logger.info(f"get_ready_steps dependencies: {self.dependencies}")
-        ready_steps = []
-        for step_index in range(len(self.steps)):
-            # 获取该步骤的所有依赖
-            dependencies = self.dependencies.get(step_index, [])
-
-            # 检查所有依赖是否都已完成
-            if all(self.step_statuses.get(self.steps[int(dep)]) != "not_started" for dep in dependencies):
-                # 检查步骤本身是否未开始
-                if self.step_statuses.get(self.steps[step_index]) == "not_started":
-                    ready_steps.append(step_index)
-
-        return ready_steps
+        with self._lock:
+            return sorted(self._ready)
 
     def update(self, title: Optional[str] = None, steps: Optional[List[str]] = None,
                dependencies: Optional[Dict[int, List[int]]] = None) -> None:
@@ -79,46 +121,58 @@ class Plan:
         if type(steps) == str:
             tmep_str = str(steps)
             steps = tmep_str.split("\n")
-        if steps:
-            # Preserve all existing steps and their statuses
-            new_steps = []
-            new_statuses = {}
-            new_notes = {}
-            new_details = {}
-
-            # First, process all steps in the input order
-            for step in steps:
-                # If step exists in current steps and is started, preserve it
-                if step in self.steps and self.step_statuses.get(step) != "not_started":
-                    new_steps.append(step)
-                    new_statuses[step] = self.step_statuses.get(step)
-                    new_notes[step] = self.step_notes.get(step)
-                    new_details[step] = self.step_details.get(step)
-                # If step exists in current steps and is not started, preserve as not_started
-                elif step in self.steps:
-                    new_steps.append(step)
-                    new_statuses[step] = "not_started"
-                    new_notes[step] = self.step_notes.get(step)
-                    new_details[step] = self.step_details.get(step)
-                # If step is new, add as not_started
-                else:
-                    new_steps.append(step)
-                    new_statuses[step] = "not_started"
-                    new_notes[step] = ""
-                    new_details[step] = ""
-
-            self.steps = new_steps
-            self.step_statuses = new_statuses
-            self.step_notes = new_notes
-            self.step_details = new_details
-        logger.info(f"before update dependencies: {self.dependencies}")
-        if dependencies:
-            self.dependencies.clear()
-            dependencies = {int(k): v for k, v in dependencies.items()}
-            self.dependencies.update(dependencies)
-        else:
-            self.dependencies = {i: [i - 1] for i in range(1, len(steps))} if len(steps) > 1 else {}
-        logger.info(f"after update dependencies: {self.dependencies}")
+        with self._lock:
+            if steps:
+                # 按内容匹配原有步骤（内容相同的步骤按出现顺序依次匹配），保留其状态、备注和详细信息
+                old_indices: Dict[str, deque] = defaultdict(deque)
+                for old_index, step in enumerate(self.steps):
+                    old_indices[step].append(old_index)
+
+                statuses, notes, details, files = [], [], [], []
+                for step in steps:
+                    if old_indices.get(step):
+                        old_index = old_indices[step].popleft()
+                        statuses.append(self._statuses[old_index])
+                        notes.append(self._notes[old_index])
+                        details.append(self._details[old_index])
+                        files.append(self._files[old_index])
+                    else:
+                        statuses.append("not_started")
+                        notes.append("")
+                        details.append("")
+                        files.append("")
+
+                self.steps = list(steps)
+                self._statuses, self._notes, self._details, self._files = statuses, notes, details, files
+            logger.info(f"before update dependencies: {self.dependencies}")
+            if dependencies:
+                self.dependencies = {int(k): [int(dep) for dep in v] for k, v in dependencies.items()}
+            else:
+                self.dependencies = self._sequential_dependencies(len(self.steps))
+            logger.info(f"after update dependencies: {self.dependencies}")
+            self._rebuild_index()
+
+    def _set_status(self, step_index: int, step_status: str) -> None:
+        old_status = self._statuses[step_index]
+        if old_status == step_status:
+            return
+        self._statuses[step_index] = step_status
+        self._status_counts[old_status] -= 1
+        self._status_counts[step_status] += 1
+
+        # 依赖的判定与原实现一致：前置步骤不再是 not_started 即视为已满足
+        if old_status == "not_started":
+            self._ready.discard(step_index)
+            for dependent in self._dependents.get(step_index, ()):
+                self._pending_deps[dependent] -= 1
+                if self._pending_deps[dependent] == 0 and self._statuses[dependent] == "not_started":
+                    self._ready.add(dependent)
+        elif step_status == "not_started":
+            for dependent in self._dependents.get(step_index, ()):
+                self._pending_deps[dependent] += 1
+                self._ready.discard(dependent)
+            if self._pending_deps[step_index] == 0:
+                self._ready.add(step_index)
 
     def mark_step(self, step_index: int, step_status: Optional[str] = None, step_notes: Optional[str] = None) -> None:
         """Mark a single step with specific statuses, notes, and details.
@@ -132,33 +186,34 @@ class Plan:
         if step_index < 0 or step_index >= len(self.steps):
             raise ValueError(f"Invalid step_index: {step_index}. Valid indices range from 0 to {len(self.steps) - 1}.")
         logger.info(f"step_index: {step_index}, step_status is {step_status},step_notes is {step_notes}")
-        step = self.steps[step_index]
-
-        # Update step status
-        if step_status is not None:
-            self.step_statuses[step] = step_status
 
         # Update step notes
         if step_notes is not None:
             step_notes, file_path_info = process_text_with_workspace(step_notes, self.work_space_path)
-            self.step_notes[step] = step_notes
-            self.step_files[step] = file_path_info
 
-        # Validate status if marking as completed
-        if step_status == "completed":
-            # Check if all dependencies are completed
-            if not all(self.step_statuses[self.steps[int(dep)]] == "completed" for dep in
-                       self.dependencies.get(step_index, [])):
-                raise ValueError(f"Cannot complete step {step_index} before its dependencies are completed")
+        with self._lock:
+            # Update step status
+            if step_status is not None:
+                self._set_status(step_index, step_status)
+
+            if step_notes is not None:
+                self._notes[step_index] = step_notes
+                self._files[step_index] = file_path_info
+
+            # Validate status if marking as completed
+            if step_status == "completed":
+                # Check if all dependencies are completed
+                if not all(self._statuses[int(dep)] == "completed" for dep in self.dependencies.get(step_index, [])):
+                    raise ValueError(f"Cannot complete step {step_index} before its dependencies are completed")
 
     def get_progress(self) -> Dict[str, int]:
         """Get progress statistics of the plan."""
         return {
             "total": len(self.steps),
-            "completed": sum(1 for status in self.step_statuses.values() if status == "completed"),
-            "in_progress": sum(1 for status in self.step_statuses.values() if status == "in_progress"),
-            "blocked": sum(1 for status in self.step_statuses.values() if status == "blocked"),
-            "not_started": sum(1 for status in self.step_statuses.values() if status == "not_started")
+            "completed": self._status_counts["completed"],
+            "in_progress": self._status_counts["in_progress"],
+            "blocked": self._status_counts["blocked"],
+            "not_started": self._status_counts["not_started"]
         }
 
     def format(self, with_detail: bool = False) -> str:
@@ -184,14 +239,14 @@ class Plan:
                 "in_progress": "[→]",
                 "completed": "[✓]",
                 "blocked": "[!]",
-            }.get(self.step_statuses.get(step), "[ ]")
+            }.get(self._statuses[i], "[ ]")
 
             # 显示依赖关系
             deps = self.dependencies.get(i, [])
             dep_str = f" (depends on: {', '.join(map(str, deps))})" if deps else ""
             output += f"Step{i} :{status_symbol} {step}{dep_str}\n"
-            if self.step_notes.get(step):
-                output += f"   Notes: {self.step_notes.get(step)}\nDetails: {self.step_details.get(step)}\n" if with_detail else f"   Notes: {self.step_notes.get(step)}\n"
+            if self._notes[i]:
+                output += f"   Notes: {self._notes[i]}\nDetails: {self._details[i]}\n" if with_detail else f"   Notes: {self._notes[i]}\n"
 
         return output
 
@@ -201,7 +256,7 @@ class Plan:
         Returns:
             bool: True if any step is blocked, False otherwise
         """
-        return any(status == "blocked" for status in self.step_statuses.values())
+        return self._status_counts["blocked"] > 0
 
 
 def get_last_folder_name(workspace_path: str) -> str:
@@ -60,6 +60,10 @@ class AudioTool:
         return ext
 
     async def audio_recognition(self, audio_path, task_prompt):
+        # 同步客户端的流式请求放到线程中执行，不阻塞调用方的事件循环（如共享的后台事件循环）
+        return await asyncio.to_thread(self._recognize, audio_path, task_prompt)
+
+    def _recognize(self, audio_path, task_prompt):
         audio_url = ''
         audio_format = ''
         if audio_path.startswith('http://') or audio_path.startswith('https://'):
@@ -118,4 +122,4 @@ class AudioTool:
 
     def speech_to_text(self, audio_path: str, task_prompt: str, ):
         logger.info(f"Using Tool: {self.name}, audio_path: {audio_path}, task_prompt: {task_prompt}")
-        return asyncio.run(self.audio_recognition(audio_path, task_prompt))
+        return self._recognize(audio_path, task_prompt)
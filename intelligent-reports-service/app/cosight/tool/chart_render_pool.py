@@ -0,0 +1,205 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import atexit
+import base64
+import concurrent.futures
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from app.common.logger_util import logger
+
+# 渲染进程数
+CHART_RENDER_WORKERS = int(os.environ.get("CHART_RENDER_WORKERS", str(min(4, os.cpu_count() or 1))))
+# 排队（含正在渲染）的图表数上限，超过后提交方阻塞等待
+CHART_RENDER_MAX_PENDING = int(os.environ.get("CHART_RENDER_MAX_PENDING", str(CHART_RENDER_WORKERS * 4)))
+# 缓存的渲染结果数，相同的图表规格直接返回缓存结果
+CHART_RENDER_CACHE_SIZE = int(os.environ.get("CHART_RENDER_CACHE_SIZE", "128"))
+# 关闭后在调用线程中渲染（串行，kaleido的全局渲染进程不是线程安全的）
+CHART_RENDER_POOL_ENABLED = os.environ.get("CHART_RENDER_POOL_ENABLED", "true").lower() == "true"
+# 等待单个图表渲染（含排队）的超时时间（秒）
+CHART_RENDER_TIMEOUT = float(os.environ.get("CHART_RENDER_TIMEOUT", "120"))
+
+_IMAGE_MIME = {"png": "image/png", "svg": "image/svg+xml"}
+
+
+def chart_spec(fig, image_format: str = "png", width: int = 800, height: int = 500, scale: float = 2,
+               include_html: bool = True) -> Dict[str, Any]:
+    """把plotly图表转换为可在进程间传递、可哈希去重的渲染规格"""
+    if image_format not in _IMAGE_MIME:
+        raise ValueError(f"Unsupported image format: {image_format}")
+    return {
+        "figure": fig.to_json(),
+        "format": image_format,
+        "width": width,
+        "height": height,
+        "scale": scale,
+        "include_html": include_html,
+    }
+
+
+def render_chart(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """渲染图表规格，返回 image_base64、image_mime 以及（可选的）可嵌入的交互式 chart_html"""
+    import plotly.io as pio
+
+    fig = pio.from_json(spec["figure"])
+    result = {"image_mime": _IMAGE_MIME[spec["format"]]}
+    if spec.get("include_html", True):
+        html_io = io.StringIO()
+        fig.write_html(html_io, include_plotlyjs='cdn', full_html=False)
+        result["chart_html"] = html_io.getvalue()
+    image = fig.to_image(format=spec["format"], width=spec["width"], height=spec["height"], scale=spec["scale"])
+    result["image_base64"] = base64.b64encode(image).decode('utf-8')
+    return result
+
+
+def _warm_up():
+    """渲染进程启动后先渲染一个空图，提前启动kaleido，避免第一张图表承担启动开销"""
+    import plotly.graph_objects as go
+
+    try:
+        render_chart(chart_spec(go.Figure(), width=10, height=10, scale=1))
+    except Exception as e:
+        logger.warning(f"Chart renderer warm-up failed: {e}")
+
+
+class ChartRenderPool:
+    """预热的图表渲染进程池
+
+    - 图表在独立进程中渲染，不受请求线程中plotly/kaleido全局状态的影响，也不占用请求线程的GIL
+    - 排队的图表数受 max_pending 限制，超过后 submit 阻塞，避免大报告一次性堆积所有图表
+    - 相同规格的图表只渲染一次：正在渲染的复用同一个Future，已完成的从LRU缓存返回
+    """
+
+    def __init__(self, max_workers: int = CHART_RENDER_WORKERS, max_pending: int = CHART_RENDER_MAX_PENDING,
+                 cache_size: int = CHART_RENDER_CACHE_SIZE, enabled: bool = CHART_RENDER_POOL_ENABLED):
+        self.max_workers = max(1, max_workers)
+        self.cache_size = cache_size
+        self.enabled = enabled
+
+        self._executor: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        self._lock = threading.RLock()
+        self._inline_lock = threading.Lock()
+        self._pending = threading.BoundedSemaphore(max(1, max_pending))
+        self._in_flight: Dict[str, concurrent.futures.Future] = {}
+        self._results: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def _get_executor(self) -> concurrent.futures.ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # 服务进程中有后台线程，直接fork的子进程可能继承被持有的锁；
+                # forkserver只在干净的服务进程中导入一次主模块，渲染进程都从它fork
+                start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                self._executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=multiprocessing.get_context(start_method),
+                    initializer=_warm_up)
+                logger.info(f"Chart render pool started with {self.max_workers} workers")
+            return self._executor
+
+    def start(self):
+        """启动并预热所有渲染进程"""
+        if not self.enabled:
+            return
+        executor = self._get_executor()
+        for future in [executor.submit(_warm_up) for _ in range(self.max_workers)]:
+            future.result(CHART_RENDER_TIMEOUT)
+
+    @staticmethod
+    def spec_key(spec: Dict[str, Any]) -> str:
+        return hashlib.sha256(json.dumps(spec, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def submit(self, spec: Dict[str, Any], timeout: Optional[float] = None) -> concurrent.futures.Future:
+        """提交图表规格，返回渲染结果的Future；排队已满时最多等待 timeout 秒，超时抛出 concurrent.futures.TimeoutError"""
+        key = self.spec_key(spec)
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                future = concurrent.futures.Future()
+                future.set_result(self._results[key])
+                return future
+            if key in self._in_flight:
+                return self._in_flight[key]
+
+        if not self.enabled:
+            future = concurrent.futures.Future()
+            try:
+                with self._inline_lock:
+                    future.set_result(render_chart(spec))
+            except Exception as e:
+                future.set_exception(e)
+            self._done(key, future)
+            return future
+
+        if not self._pending.acquire(timeout=timeout):
+            raise concurrent.futures.TimeoutError(f"Timed out waiting for a chart render slot after {timeout}s")
+        with self._lock:
+            # 等待排队期间，相同规格可能已被其他线程提交
+            if key in self._in_flight:
+                self._pending.release()
+                return self._in_flight[key]
+            try:
+                future = self._get_executor().submit(render_chart, spec)
+            except Exception:
+                self._pending.release()
+                raise
+            self._in_flight[key] = future
+        future.add_done_callback(lambda f: self._done(key, f, release=True))
+        return future
+
+    def render(self, spec: Dict[str, Any], timeout: Optional[float] = CHART_RENDER_TIMEOUT) -> Dict[str, Any]:
+        """渲染图表规格并等待结果，超时（含排队等待）抛出 concurrent.futures.TimeoutError（渲染进程中的任务继续执行，结果仍会缓存）"""
+        if timeout is None:
+            return self.submit(spec).result()
+        deadline = time.monotonic() + timeout
+        future = self.submit(spec, timeout)
+        return future.result(max(0.0, deadline - time.monotonic()))
+
+    def _done(self, key: str, future: concurrent.futures.Future, release: bool = False):
+        if release:
+            self._pending.release()
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+            if future.cancelled():
+                return
+            if future.exception() is not None:
+                if isinstance(future.exception(), concurrent.futures.process.BrokenProcessPool):
+                    # 渲染进程异常退出后，下次提交时重建进程池
+                    logger.error("Chart render pool is broken, it will be restarted")
+                    self._executor = None
+                return
+            if self.cache_size > 0:
+                self._results[key] = future.result()
+                while len(self._results) > self.cache_size:
+                    self._results.popitem(last=False)
+
+    def close(self):
+        """关闭渲染进程"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+# 进程内共享的图表渲染池，服务启动时预热（未预热时第一次提交图表时启动）
+chart_render_pool = ChartRenderPool()
+atexit.register(chart_render_pool.close)
@@ -14,11 +14,14 @@
 #    under the License.
 
 import json
+import os
 import time
 import re
 import asyncio
+import hashlib
 from datetime import datetime
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
 from lagent.schema import ModelStatusCode
 from lagent.actions import ActionExecutor
 
@@ -28,9 +31,19 @@ from app.cosight.tool.deep_search.common.entity import SearchResult, SearchSourc
 from app.cosight.tool.deep_search.common.prompts import select_example1_cn, select_example2_cn
 from app.cosight.tool.deep_search.actions.web_search import ManusWebSearch
 from app.cosight.tool.deep_search.model.model_service import ModelService
+from app.cosight.tool.search_cache import QueryCache, search_cache
 from app.common.logger_util import logger
 
 DEFAULT_SYSTEM_PROMPT = "你是一个专业的知识助手。"
+# 单个搜索源的截止时间（秒），超时的搜索源不再等待
+SEARCH_SOURCE_TIMEOUT = float(os.environ.get("SEARCH_SOURCE_TIMEOUT", "60"))
+# 合并后的搜索内容的token上限，超出部分不再放入总结上下文
+SEARCH_CONTEXT_MAX_TOKENS = int(os.environ.get("SEARCH_CONTEXT_MAX_TOKENS", "24000"))
+# 剩余预算不足时不再截断放入网页，避免只剩标题的引文
+SEARCH_CONTEXT_MIN_PAGE_TOKENS = 200
+
+_CJK_PATTERN = re.compile(r'[\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]')
+_WHITESPACE_PATTERN = re.compile(r'\s+')
 
 
 class SearchContext:
@@ -95,61 +108,51 @@ class SearchContext:
             logger.info(f"将在 {len(self.search_sources)} 个搜索源中并发搜索")
             yield i18n.t('concurrent_search_start', len(self.search_sources))
 
-            # 创建并发任务
-            search_tasks = []
-            for source in self.search_sources:
-                search_tasks.append(self.perform_search_with_source_task(query, source, keywords))
+            # 每个搜索源一个任务，超过截止时间的搜索源不再等待
+            search_tasks = {}
+            for i, source in enumerate(self.search_sources):
+                task = asyncio.ensure_future(self._search_source_with_deadline(query, source, keywords))
+                search_tasks[task] = i
 
             # 先通知用户所有搜索已启动
             for i, source in enumerate(self.search_sources):
                 source_name = f"{source['name']}:{source['sub_name']}"
                 yield i18n.t('source_search_start', source_name)
 
-            # 并发执行所有搜索任务
+            # 按完成顺序逐个处理搜索源的结果，最慢的搜索源不再决定首个结果的返回时间
             start_time = time.time()
-            
-            results = await asyncio.gather(*search_tasks)
-            # 解包结果
-            search_results_list, self.images = results[-1]
+            source_results = [None] * len(self.search_sources)
+            pending = set(search_tasks)
+            try:
+                while pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in sorted(done, key=search_tasks.get):
+                        index = search_tasks[task]
+                        source = self.search_sources[index]
+                        source_name = f"{source['name']}:{source['sub_name']}"
+                        search_result = task.result()
+
+                        if search_result is None:
+                            yield i18n.t('search_source_timeout', source_name, SEARCH_SOURCE_TIMEOUT)
+                            continue
+                        # 如果搜索结果为空或出错，继续下一个搜索源
+                        if isinstance(search_result, dict) or not search_result[0]:
+                            yield i18n.t('no_results_found_source', source_name)
+                            continue
+
+                        source_results[index] = prepare_source_results(*search_result)
+                        yield i18n.t('results_found', source_name, len(source_results[index][0]))
+            finally:
+                # 调用方提前结束时取消仍在执行的搜索
+                for task in pending:
+                    task.cancel()
 
             total_search_time = time.time() - start_time
             yield i18n.t('all_searches_complete', total_search_time)
 
-            # 处理所有搜索结果
-            all_search_results = {}
-            all_formatted_results = []
-            all_results = []
-
-            for i, search_result in enumerate(search_results_list):
-                source = self.search_sources[i]
-                source_name = f"{source['name']}:{source['sub_name']}"
-
-                # 如果搜索结果为空或出错，继续下一个搜索源
-                if not search_result or isinstance(search_result, dict) and search_result.get(
-                        "type") == "unknown_result":
-                    yield i18n.t('no_results_found_source', source_name)
-                    continue
-
-                # 处理搜索结果
-                result_count = len(search_result.keys()) if isinstance(search_result, dict) else 0
-                yield i18n.t('results_found', source_name, result_count)
-
-                # 合并搜索结果
-                offset = len(all_search_results)
-                for key, item in search_result.items():
-                    new_key = str(int(key) + offset)
-                    all_search_results[new_key] = item
-
-                    # 添加到格式化结果和结果列表
-                    idx = len(all_formatted_results)
-                    all_formatted_results.append(
-                        f"[webpage {idx + 1} begin]\n**标题：{item['title']}**\n链接：{item['url']}\n正文：{item['content']}\n[webpage {idx + 1} end]")
-                    all_results.append({
-                        "title": item['title'],
-                        "url": item['url'],
-                        "source_name": source_name,
-                        "source_type": source.get('type')
-                    })
+            # 按搜索源顺序合并（而不是完成顺序），保证引文编号稳定
+            all_results, all_formatted_results, self.images = merge_source_results(
+                source_results, self.search_sources)
 
             # 如果没有找到任何结果
             if not all_results:
@@ -193,6 +196,17 @@ class SearchContext:
                 reference_list.append(i18n.t('reference_item', i, source_name, item['title'], item['url']))
         return reference_list
 
+    async def _search_source_with_deadline(self, query, selected_search_source, keywords):
+        """在截止时间内执行搜索源的搜索任务，超时返回None"""
+        try:
+            return await asyncio.wait_for(
+                self.perform_search_with_source_task(query, selected_search_source, keywords),
+                timeout=SEARCH_SOURCE_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(f"搜索源 [{selected_search_source.get('name')}:{selected_search_source.get('sub_name')}] "
+                           f"超过 {SEARCH_SOURCE_TIMEOUT}s 未返回结果，不再等待")
+            return None
+
     async def perform_search_with_source_task(self, query, selected_search_source, keywords):
         """执行特定知识源的搜索任务（不产生中间状态更新）
 
@@ -297,6 +311,119 @@ class SearchContext:
         self.context += "\n" + text
 
 
+def estimate_tokens(text: str) -> int:
+    """粗略估算文本的token数：中日韩字符每字约1个token，其他字符每4个约1个token"""
+    if not text:
+        return 0
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """把文本截断到不超过 max_tokens 个token"""
+    tokens = estimate_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    end = len(text) * max_tokens // tokens
+    while end > 0 and estimate_tokens(text[:end]) > max_tokens:
+        end = end * 9 // 10
+    return text[:end]
+
+
+def normalize_url(url: str) -> str:
+    """归一化URL用于去重：忽略协议、域名大小写、锚点和末尾的斜杠"""
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url.strip()
+    if not parts.netloc:
+        return url.strip()
+    return urlunsplit(('', parts.netloc.lower(), parts.path.rstrip('/'), parts.query, ''))
+
+
+def format_webpage(index: int, item: Dict[str, Any], content: str) -> str:
+    return f"[webpage {index} begin]\n**标题：{item['title']}**\n链接：{item['url']}\n正文：{content}\n[webpage {index} end]"
+
+
+def prepare_source_results(search_result: Dict[str, Any], images: Any) -> Tuple[List[Dict[str, Any]], Any]:
+    """搜索源返回后立即整理结果：按原编号排序，计算去重键和token数"""
+    items = []
+    for key in sorted(search_result, key=lambda k: int(k) if str(k).isdigit() else float('inf')):
+        item = search_result[key]
+        content = item.get('content') or ''
+        normalized = _WHITESPACE_PATTERN.sub(' ', content).strip()
+        items.append({
+            "title": item.get('title', ''),
+            "url": item.get('url', ''),
+            "content": content,
+            "url_key": normalize_url(item.get('url') or ''),
+            "content_key": hashlib.sha1(normalized.encode('utf-8')).hexdigest() if normalized else '',
+            "tokens": estimate_tokens(content),
+        })
+    return items, images
+
+
+def merge_source_results(source_results: List[Optional[Tuple[List[Dict[str, Any]], Any]]],
+                         search_sources: List[Dict[str, Any]],
+                         max_tokens: int = SEARCH_CONTEXT_MAX_TOKENS) -> Tuple[List[Dict[str, Any]], List[str], Dict]:
+    """合并各搜索源的结果
+
+    按搜索源顺序和源内顺序编号，与搜索源的完成顺序无关，保证引文编号稳定；
+    URL或正文相同的网页只保留第一次出现的；网页按编号依次放入，总token数不超过 max_tokens。
+
+    Returns:
+        (引文列表, 格式化后的网页列表, 按查询合并的图片)
+    """
+    all_results, all_formatted_results, images = [], [], {}
+    seen_urls, seen_contents = set(), set()
+    remaining = max_tokens
+    skipped_duplicates = skipped_budget = 0
+
+    for source, prepared in zip(search_sources, source_results):
+        if prepared is None:
+            continue
+        items, source_images = prepared
+        source_name = f"{source['name']}:{source['sub_name']}"
+        if isinstance(source_images, dict):
+            for image_query, image_list in source_images.items():
+                merged = images.setdefault(image_query, [])
+                merged.extend(image for image in image_list if image not in merged)
+        elif source_images:
+            images.setdefault(source_name, []).extend(source_images)
+
+        for item in items:
+            if item["url_key"] in seen_urls or item["content_key"] in seen_contents:
+                skipped_duplicates += 1
+                continue
+
+            index = len(all_formatted_results) + 1
+            overhead = estimate_tokens(format_webpage(index, item, ''))
+            content = item["content"]
+            if overhead + item["tokens"] > remaining:
+                if remaining - overhead < SEARCH_CONTEXT_MIN_PAGE_TOKENS:
+                    skipped_budget += 1
+                    continue
+                content = truncate_to_tokens(content, remaining - overhead)
+            remaining -= overhead + estimate_tokens(content)
+
+            if item["url_key"]:
+                seen_urls.add(item["url_key"])
+            if item["content_key"]:
+                seen_contents.add(item["content_key"])
+            all_formatted_results.append(format_webpage(index, item, content))
+            all_results.append({
+                "title": item['title'],
+                "url": item['url'],
+                "source_name": source_name,
+                "source_type": source.get('type')
+            })
+
+    if skipped_duplicates or skipped_budget:
+        logger.info(f"合并搜索结果：保留 {len(all_results)} 条，去除重复 {skipped_duplicates} 条，"
+                    f"超出 {max_tokens} token预算 {skipped_budget} 条")
+    return all_results, all_formatted_results, images
+
+
 async def rewrite_question(query: str, llm, chat_history) -> list:
     """使用大模型重组和优化问题。"""
     prompt = f"""
@@ -367,12 +494,19 @@ async def rewrite_question(query: str, llm, chat_history) -> list:
         {"role": "user", "content": prompt}
     ]
     logger.info(f"rewrite_question ======>messages: {messages}")
-    try:
+
+    async def load():
         response = await llm.chat(messages)
         logger.info(f"rewrite_question ======>response: {response}")
 
         # 清理响应文本,去除引号和多余空格
         return clear_model_response(response)
+
+    # 改写结果与历史对话、语言和当天日期有关
+    key = QueryCache.make_key(query, model=getattr(llm, 'model_name', None), history=chat_history,
+                              locale=i18n.get_locale(), date=datetime.now().strftime('%Y-%m-%d'))
+    try:
+        return await search_cache.get_or_load("llm:rewrite_question", key, load)
     except Exception as e:
         logger.error(f"提取关键词失败: {e}", exc_info=True)
         return query
@@ -444,15 +578,20 @@ async def extract_search_keywords(query: str, llm) -> list:
         {"role": "user", "content": prompt}
     ]
     logger.info(f"extract_search_keywords ======>messages: {messages}")
-    try:
+
+    async def load():
         response = await llm.chat(messages)
 
         # 清理响应文本,去除引号和多余空格
         cleaned_response = clear_model_response(response)
         logger.info(f"extract_search_keywords ======>response: {cleaned_response}")
+        return [kw.strip() for kw in cleaned_response.split(',')]
 
-        # 提取返回的关键词列表,并将原始query作为第一个关键词
-        keywords = [kw.strip() for kw in cleaned_response.split(',')]
+    try:
+        # 相同（归一化后）的问题复用提取的关键词，并发的相同问题只调用一次大模型
+        keywords = await search_cache.get_or_load(
+            "llm:search_keywords", QueryCache.make_key(query, model=getattr(llm, 'model_name', None)), load)
+        # 将原始query作为第一个关键词
         return [query, *keywords]
     except Exception as e:
         logger.error(f"提取关键词失败: {e}", exc_info=True)
@@ -19,7 +19,6 @@ import traceback
 from typing import Dict, List, Optional, Union, Any, Tuple
 import re
 import uuid
-import base64
 import requests
 from urllib.parse import urlparse
 from bs4 import BeautifulSoup
@@ -41,9 +40,27 @@ import plotly.graph_objects as go
 import plotly.io as pio
 import concurrent.futures 
 import threading 
-import io  
+import hashlib
+import time
 
 from app.common.logger_util import logger
+from app.cosight.tool.chart_render_pool import chart_render_pool, chart_spec
+
+# 报告生成过程中同时进行的LLM请求数上限（进程内所有报告共享）
+HTML_REPORT_LLM_CONCURRENCY = int(os.environ.get("HTML_REPORT_LLM_CONCURRENCY", "8"))
+# 是否按提示词内容哈希缓存LLM结果，工作区内容未变化的子章节重新生成报告时不再请求LLM
+HTML_REPORT_CACHE_ENABLED = os.environ.get("HTML_REPORT_CACHE_ENABLED", "true").lower() == "true"
+# 缓存目录，位于工作区下（read_text_files_from_workspace 只读取工作区根目录的文件）
+HTML_REPORT_CACHE_DIR = ".html_report_cache"
+# 缓存条目超过该时长（秒）未被使用即视为过期
+HTML_REPORT_CACHE_TTL = int(os.environ.get("HTML_REPORT_CACHE_TTL", str(7 * 24 * 3600)))
+# 每个工作区最多保留的缓存条目数，超出后按最近使用时间淘汰最旧的条目
+HTML_REPORT_CACHE_MAX_ENTRIES = int(os.environ.get("HTML_REPORT_CACHE_MAX_ENTRIES", "512"))
+
+# 图表静态图像格式：png 或 svg
+CHART_IMAGE_FORMAT = os.environ.get("CHART_IMAGE_FORMAT", "png")
+
+_llm_semaphore = threading.BoundedSemaphore(HTML_REPORT_LLM_CONCURRENCY)
 
 # 字体配置函数
 def configure_matplotlib_fonts():
@@ -158,19 +175,92 @@ class HtmlVisualizationToolkit:
         logger.info(f"共找到 {len(text_files)} 个文本文件")
         return text_files
     
-    def ask_llm(self, prompt):
-        """通过LLM获取回答"""
+    def ask_llm(self, prompt, use_cache=False, cache_key=None):
+        """通过LLM获取回答
+        
+        Args:
+            prompt: 提示词
+            use_cache: 是否使用工作区内按提示词哈希缓存的结果
+            cache_key: 缓存键，默认使用提示词本身
+        """
+        cache_path = self._llm_cache_path(cache_key or prompt) if use_cache and HTML_REPORT_CACHE_ENABLED else None
+        if cache_path:
+            cached = self._read_llm_cache(cache_path)
+            if cached is not None:
+                logger.info(f"命中LLM缓存: {os.path.basename(cache_path)}")
+                return cached
         try:
-            logger.info("正在向LLM发送请求...")
-            messages = [{"role": "user", "content": prompt}]
-            logger.info(f"调用LLM请求: {messages}")
-            result = llm_for_tool.chat_to_llm(messages)
+            with _llm_semaphore:
+                logger.info("正在向LLM发送请求...")
+                messages = [{"role": "user", "content": prompt}]
+                logger.info(f"调用LLM请求: {messages}")
+                result = llm_for_tool.chat_to_llm(messages)
             logger.info(f"调用LLM返回响应: {result}")
-            return result
         except Exception as e:
             logger.error(f" 错误")
             logger.error(f"调用LLM时出错: {str(e)}")
             return None
+        if cache_path and result:
+            self._write_llm_cache(cache_path, result)
+        return result
+    
+    def _llm_cache_path(self, cache_key):
+        """缓存文件路径，由模型和缓存键的哈希确定"""
+        digest = hashlib.sha256(f"{self.llm_model}\n{cache_key}".encode('utf-8')).hexdigest()
+        return os.path.join(self.get_workspace_path(), HTML_REPORT_CACHE_DIR, f"{digest}.json")
+    
+    def _read_llm_cache(self, cache_path):
+        """读取缓存，过期的条目删除并视为未命中；命中时更新修改时间，作为最近使用时间"""
+        try:
+            if time.time() - os.path.getmtime(cache_path) > HTML_REPORT_CACHE_TTL:
+                os.remove(cache_path)
+                return None
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                response = json.load(f).get('response')
+            os.utime(cache_path)
+            return response
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"读取LLM缓存 {cache_path} 时出错: {str(e)}")
+            return None
+    
+    def _write_llm_cache(self, cache_path, response):
+        """先写临时文件再替换，并发写同一缓存时不会读到不完整的内容"""
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=os.path.dirname(cache_path),
+                                             suffix='.tmp', delete=False) as f:
+                json.dump({'response': response}, f, ensure_ascii=False)
+            os.replace(f.name, cache_path)
+        except Exception as e:
+            logger.warning(f"写入LLM缓存 {cache_path} 时出错: {str(e)}")
+            return
+        self._prune_llm_cache(os.path.dirname(cache_path))
+    
+    def _prune_llm_cache(self, cache_dir):
+        """删除过期的缓存条目，条目数仍超过上限时按最近使用时间淘汰最旧的条目"""
+        entries = []
+        now = time.time()
+        for entry in os.scandir(cache_dir):
+            if not entry.name.endswith('.json'):
+                continue
+            try:
+                mtime = entry.stat().st_mtime
+                if now - mtime > HTML_REPORT_CACHE_TTL:
+                    os.remove(entry.path)
+                else:
+                    entries.append((mtime, entry.path))
+            except FileNotFoundError:
+                continue
+        if len(entries) <= HTML_REPORT_CACHE_MAX_ENTRIES:
+            return
+        entries.sort()
+        for _, path in entries[:len(entries) - HTML_REPORT_CACHE_MAX_ENTRIES]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
     
     def save_html_report(self, html_content, report_name="report"):
         """保存HTML报告到工作区"""
@@ -239,141 +329,31 @@ class HtmlVisualizationToolkit:
             else:
                 logger.info(f"使用生成的标题: {outline['title']}")
             
-            # 步骤3: 根据大纲重新组织内容
-            logger.info("\n[步骤3/6] 根据大纲重新组织内容")
-            sections = self.reorganize_content(text_files, outline, user_query)
-            if not sections:
-                return {
-                    "status": "error",
-                    "message": "重新组织内容时出错"
-                }
-            
-            # 步骤4: 分析每个子章节，判断是否适合生成图表
-            logger.info("\n[步骤4/6] 分析内容并生成可视化")
-            visualizations = {}
-            chart_templates = {}
-            
+            # 步骤3-4: 根据大纲重新组织内容、分析内容并生成可视化、提取关键指标
+            # 各子章节互不依赖，重组完内容后立即分析可视化；所有子章节重组完成后开始提取关键指标
             if include_charts:
                 # 如果指定了"all"，包含所有图表类型
                 if 'all' in chart_types:
                     chart_types = ['line', 'bar', 'pie', 'scatter', 'radar', 'heatmap', 'bubble', 'treemap', 'sankey']
-                    
                 logger.info(f"包含图表类型: {', '.join(chart_types)}")
-                
-                # 创建线程安全的字典用于存储可视化结果
-                viz_lock = threading.Lock()
-                template_lock = threading.Lock()
-                
-                # 创建一个计数器，用于显示进度
-                total_subsections = sum(len(section['subsections']) for section in sections)
-                processed_count = 0
-                progress_lock = threading.Lock()
-                
-                logger.info(f"总共需要处理 {total_subsections} 个子章节")
-                
-                # 处理可视化的内部函数
-                def process_visualization(i, section, j, subsection):
-                    nonlocal processed_count
-                    
-                    try:
-                        viz_id = f"{i+1}-{j+1}"
-                        
-                        with progress_lock:
-                            processed_count += 1
-                            logger.info(f"\n处理小节 ({processed_count}/{total_subsections}): {subsection['title']}")
-                        
-                        # 分析内容是否适合生成图表
-                        viz_info = self.analyze_content_for_visualization(subsection['content'], user_query)
-                        
-                        if not viz_info.get('suitable_for_visualization', False):
-                            return None
-                        
-                        # 使用图表类型过滤
-                        chart_type = viz_info.get('chart_type', '').lower()
-                        chart_match = False
-                        
-                        if 'all' in chart_types:
-                            chart_match = True
-                        elif chart_type in ['折线图', '线图', 'line chart', 'line graph', 'line plot'] and 'line' in chart_types:
-                            chart_match = True
-                        elif chart_type in ['柱状图', '条形图', 'bar chart', 'bar graph', 'histogram'] and 'bar' in chart_types:
-                            chart_match = True
-                        elif chart_type in ['饼图', '圆饼图', 'pie chart'] and 'pie' in chart_types:
-                            chart_match = True
-                        elif chart_type in ['散点图', 'scatter plot', 'scatter graph'] and 'scatter' in chart_types:
-                            chart_match = True
-                        elif chart_type in ['雷达图', 'radar chart', 'radar plot', 'spider chart'] and 'radar' in chart_types:
-                            chart_match = True
-                        elif chart_type in ['热力图', 'heatmap', 'heat map'] and 'heatmap' in chart_types:
-                            chart_match = True
-                        elif chart_type in ['气泡图', 'bubble chart', 'bubble plot'] and 'bubble' in chart_types:
-                            chart_match = True
-                        elif chart_type in ['树状图', 'treemap', 'tree map'] and 'treemap' in chart_types:
-                            chart_match = True
-                        elif chart_type in ['桑基图', 'sankey diagram', 'sankey chart'] and 'sankey' in chart_types:
-                            chart_match = True
-                        
-                        if not chart_match:
-                            return None
-                        
-                        # 创建可视化
-                        viz = self.create_visualization(viz_info, chart_types)
-                        if not viz:
-                            return None
-                        
-                        # 生成图表代码模板
-                        template = {
-                            'title': subsection['title'],
-                            'chart_type': viz_info.get('chart_type', ''),
-                            'template': self.generate_chart_code_template(viz_info)
-                        }
-                        
-                        with progress_lock:
-                            logger.info(f"已为小节 '{subsection['title']}' 生成图表")
-                        
-                        # 安全地将结果添加到共享字典中
-                        with viz_lock:
-                            visualizations[viz_id] = viz
-                        
-                        with template_lock:
-                            chart_templates[viz_id] = template
-                        
-                        return viz_id
-                        
-                    except Exception as e:
-                        logger.error(f'raise error: {str(e)}', exc_info=True)
-                        return None
-                
-                # 准备所有可视化任务
-                tasks = []
-                for i, section in enumerate(sections):
-                    for j, subsection in enumerate(section['subsections']):
-                        tasks.append((i, section, j, subsection))
-                
-                # 确定线程池大小，避免创建过多线程
-                max_workers = min(10, max(1, min(os.cpu_count() or 4, total_subsections)))
-                logger.info(f"将使用 {max_workers} 个线程并行处理可视化")
-                
-                # 使用线程池并行处理所有可视化任务
-                with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-                    futures = [executor.submit(process_visualization, *task) for task in tasks]
-                    
-                    # 等待所有任务完成
-                    for future in concurrent.futures.as_completed(futures):
-                        try:
-                            result = future.result()
-                        except Exception as e:
-                            logger.info(f"获取可视化结果时出错: {str(e)}")
-                
-                logger.info(f"所有 {total_subsections} 个子章节的可视化处理完成")
-                logger.info(f"共生成了 {len(visualizations)} 个图表")
-                
             else:
                 logger.info("生成内容不包含可视化数据，跳过图表生成")
             
+            logger.info("\n[步骤3-4/6] 重新组织内容、分析内容并生成可视化")
+            sections, visualizations, chart_templates, metrics = self.run_section_pipeline(
+                text_files, outline, user_query, chart_types if include_charts else None)
+            if not sections:
+                return {
+                    "status": "error",
+                    "message": "重新组织内容时出错"
+                }
+            if include_charts:
+                logger.info(f"共生成了 {len(visualizations)} 个图表")
+            
             # 步骤5: 使用商务风格主题生成HTML报告
             logger.info(f"\n[步骤5/6] 生成HTML报告")
-            html_content = self.generate_html_report_with_apple_theme(outline, sections, visualizations, user_query)
+            html_content = self.generate_html_report_with_apple_theme(outline, sections, visualizations, user_query,
+                                                                      metrics=metrics)
             
             # 步骤6: 保存HTML报告
             logger.info(f"\n[步骤6/6] 保存HTML报告")
@@ -430,9 +410,11 @@ class HtmlVisualizationToolkit:
     def generate_outline(self, text_files, user_query=""):
         """根据工作区中的文本文件生成报告大纲"""
         logger.info("正在生成报告大纲...")
+        # 大纲只读取每个文件的前500个字符，按文件名排序，文件读取顺序不影响提示词和缓存
+        previews = sorted((file['filename'], file['content'][:500]) for file in text_files)
         all_content = ""
-        for file in text_files:
-            all_content += f"文件名: {file['filename']}\n内容预览: {file['content'][:500]}...\n\n"
+        for filename, preview in previews:
+            all_content += f"文件名: {filename}\n内容预览: {preview}...\n\n"
         
         # 判断用户查询的语言
         is_chinese = bool(re.search(r'[\u4e00-\u9fff]', user_query)) if user_query else True
@@ -502,7 +484,9 @@ Please return the outline in JSON format as follows:
 Note: content_from should indicate which files the content for that subsection should be extracted from. Please ensure that all JSON field values are strings or arrays, not nested objects or complex structures.
 """
         
-        response = self.ask_llm(prompt)
+        # 缓存键只包含大纲实际读取的内容：查询语言、用户查询和各文件的文件名与内容预览
+        cache_key = json.dumps(['outline', is_chinese, user_query, previews], ensure_ascii=False)
+        response = self.ask_llm(prompt, use_cache=True, cache_key=cache_key)
         if response:
             try:
                 # 提取JSON部分
@@ -609,74 +593,15 @@ Note: content_from should indicate which files the content for that subsection s
         
         logger.info(f"总共需要处理 {total_subsections} 个子章节")
         
-        # 判断用户查询的语言
-        is_chinese = bool(re.search(r'[\u4e00-\u9fff]', user_query)) if user_query else True
-        
         def process_subsection(section_idx, section, subsection_idx, subsection):
             """处理单个子章节的函数，将在独立线程中运行"""
             nonlocal processed_count
             
             try:
-                content_files = subsection.get('content_from', [])
-                
-                # 如果没有指定文件，尝试查找相关内容
-                if not content_files:
-                    relevant_content = ""
-                    for filename, content in filename_to_content.items():
-                        if subsection['title'].lower() in content.lower():
-                            relevant_content += content + "\n\n"
-                else:
-                    relevant_content = ""
-                    for filename in content_files:
-                        if filename in filename_to_content:
-                            relevant_content += filename_to_content[filename] + "\n\n"
-                
-                # 根据用户查询语言选择合适的提示语
-                if is_chinese:
-                    prompt = f"""请根据以下原始内容撰写一个关于"{subsection['title']}"的子章节内容。内容应该是连贯的，格式良好的段落，尽量提取和组织所有相关的信息，尽量保留数据相关的原始内容，请确保数据和内容完全与原始内容一致，不要篡改。
-
-重要说明：请不要在内容中再次包含标题（如 "### {subsection['title']}"），因为标题会在最终报告中单独添加。
-
-请使用Markdown格式，可以使用以下Markdown语法增强可读性：
-- 使用 #### 及更小级别的标题标记小节（注意：不要使用 # 或 ## 或 ###，因为这些级别会与文档结构冲突）
-- 使用 **文本** 标记重要内容
-- 使用 1. 2. 3. 或 * - + 创建有序或无序列表
-- 必要时可以使用表格、引用块等其他Markdown元素
-
-注意：请直接输出Markdown内容，不要将Markdown内容包装在代码块中（例如不要使用```markdown之类的标记）。
-同时请确保不要在内容开头重复子章节的标题，这会导致标题重复显示。
-
-原始内容:
-{relevant_content}
-
-返回内容应该是结构良好的Markdown文本，每个段落都应该是完整的句子，且长度适当。
-注意：直接从正文内容开始撰写，必须使用中文撰写内容。
-"""
-                else:
-                    prompt = f"""Based on the following original content, please write subsection content about "{subsection['title']}". The content should be coherent, well-formatted paragraphs that extract and organize all relevant information, preserving data-related original content. Ensure the data and content are completely consistent with the original content, without alteration.
-
-Important note: Do not include the title (such as "### {subsection['title']}") in the content, as the title will be added separately in the final report.
-
-Please use Markdown format, with the following Markdown syntax to enhance readability:
-- Use #### and smaller heading levels to mark subsections (note: do not use #, ##, or ###, as these levels conflict with the document structure)
-- Use **text** to mark important content
-- Use 1. 2. 3. or * - + to create ordered or unordered lists
-- Use tables, quote blocks, and other Markdown elements when necessary
-
-Note: Output Markdown content directly, without wrapping it in code blocks (e.g., do not use ```markdown tags).
-Also make sure not to repeat the subsection title at the beginning of the content, as this will cause the title to be displayed twice.
-
-Original content:
-{relevant_content}
-
-The returned content should be well-structured Markdown text, with complete sentences in each paragraph and appropriate length.
-Note: Start writing directly from the body content, and you must write the content in English.
-"""
-                
                 with progress_lock:
                     logger.info(f"处理子章节 [{section_idx+1}.{subsection_idx+1}]: {subsection['title']} ({processed_count+1}/{total_subsections})")
                 
-                subsection_content = self.ask_llm(prompt)
+                subsection_content = self.reorganize_subsection(subsection, filename_to_content, user_query)
                 result = {
                     'title': subsection['title'],
                     'content': subsection_content,
@@ -753,6 +678,207 @@ Note: Start writing directly from the body content, and you must write the conte
         logger.info(f"所有 {total_subsections} 个子章节处理完成")
         return reorganized_sections
     
+    def reorganize_subsection(self, subsection, filename_to_content, user_query=""):
+        """根据子章节引用的文件内容撰写子章节正文，返回Markdown文本（失败时为None）"""
+        # 判断用户查询的语言
+        is_chinese = bool(re.search(r'[\u4e00-\u9fff]', user_query)) if user_query else True
+        
+        content_files = subsection.get('content_from', [])
+        
+        # 如果没有指定文件，尝试查找相关内容
+        if not content_files:
+            relevant_content = ""
+            for filename, content in filename_to_content.items():
+                if subsection['title'].lower() in content.lower():
+                    relevant_content += content + "\n\n"
+        else:
+            relevant_content = ""
+            for filename in content_files:
+                if filename in filename_to_content:
+                    relevant_content += filename_to_content[filename] + "\n\n"
+        
+        # 根据用户查询语言选择合适的提示语
+        if is_chinese:
+            prompt = f"""请根据以下原始内容撰写一个关于"{subsection['title']}"的子章节内容。内容应该是连贯的，格式良好的段落，尽量提取和组织所有相关的信息，尽量保留数据相关的原始内容，请确保数据和内容完全与原始内容一致，不要篡改。
+
+重要说明：请不要在内容中再次包含标题（如 "### {subsection['title']}"），因为标题会在最终报告中单独添加。
+
+请使用Markdown格式，可以使用以下Markdown语法增强可读性：
+- 使用 #### 及更小级别的标题标记小节（注意：不要使用 # 或 ## 或 ###，因为这些级别会与文档结构冲突）
+- 使用 **文本** 标记重要内容
+- 使用 1. 2. 3. 或 * - + 创建有序或无序列表
+- 必要时可以使用表格、引用块等其他Markdown元素
+
+注意：请直接输出Markdown内容，不要将Markdown内容包装在代码块中（例如不要使用```markdown之类的标记）。
+同时请确保不要在内容开头重复子章节的标题，这会导致标题重复显示。
+
+原始内容:
+{relevant_content}
+
+返回内容应该是结构良好的Markdown文本，每个段落都应该是完整的句子，且长度适当。
+注意：直接从正文内容开始撰写，必须使用中文撰写内容。
+"""
+        else:
+            prompt = f"""Based on the following original content, please write subsection content about "{subsection['title']}". The content should be coherent, well-formatted paragraphs that extract and organize all relevant information, preserving data-related original content. Ensure the data and content are completely consistent with the original content, without alteration.
+
+Important note: Do not include the title (such as "### {subsection['title']}") in the content, as the title will be added separately in the final report.
+
+Please use Markdown format, with the following Markdown syntax to enhance readability:
+- Use #### and smaller heading levels to mark subsections (note: do not use #, ##, or ###, as these levels conflict with the document structure)
+- Use **text** to mark important content
+- Use 1. 2. 3. or * - + to create ordered or unordered lists
+- Use tables, quote blocks, and other Markdown elements when necessary
+
+Note: Output Markdown content directly, without wrapping it in code blocks (e.g., do not use ```markdown tags).
+Also make sure not to repeat the subsection title at the beginning of the content, as this will cause the title to be displayed twice.
+
+Original content:
+{relevant_content}
+
+The returned content should be well-structured Markdown text, with complete sentences in each paragraph and appropriate length.
+Note: Start writing directly from the body content, and you must write the content in English.
+"""
+        
+        return self.ask_llm(prompt, use_cache=True)
+    
+    def visualize_subsection(self, subsection, chart_types, user_query=""):
+        """分析子章节内容并生成图表
+        
+        Returns:
+            (图表, 图表代码模板)，内容不适合可视化或图表类型不在 chart_types 中时返回None
+        """
+        # 分析内容是否适合生成图表
+        viz_info = self.analyze_content_for_visualization(subsection['content'], user_query)
+        
+        if not viz_info.get('suitable_for_visualization', False):
+            return None
+        
+        # 使用图表类型过滤
+        chart_type = viz_info.get('chart_type', '').lower()
+        chart_match = False
+        
+        if 'all' in chart_types:
+            chart_match = True
+        elif chart_type in ['折线图', '线图', 'line chart', 'line graph', 'line plot'] and 'line' in chart_types:
+            chart_match = True
+        elif chart_type in ['柱状图', '条形图', 'bar chart', 'bar graph', 'histogram'] and 'bar' in chart_types:
+            chart_match = True
+        elif chart_type in ['饼图', '圆饼图', 'pie chart'] and 'pie' in chart_types:
+            chart_match = True
+        elif chart_type in ['散点图', 'scatter plot', 'scatter graph'] and 'scatter' in chart_types:
+            chart_match = True
+        elif chart_type in ['雷达图', 'radar chart', 'radar plot', 'spider chart'] and 'radar' in chart_types:
+            chart_match = True
+        elif chart_type in ['热力图', 'heatmap', 'heat map'] and 'heatmap' in chart_types:
+            chart_match = True
+        elif chart_type in ['气泡图', 'bubble chart', 'bubble plot'] and 'bubble' in chart_types:
+            chart_match = True
+        elif chart_type in ['树状图', 'treemap', 'tree map'] and 'treemap' in chart_types:
+            chart_match = True
+        elif chart_type in ['桑基图', 'sankey diagram', 'sankey chart'] and 'sankey' in chart_types:
+            chart_match = True
+        
+        if not chart_match:
+            return None
+        
+        # 创建可视化
+        viz = self.create_visualization(viz_info, chart_types)
+        if not viz:
+            return None
+        
+        # 生成图表代码模板
+        template = {
+            'title': subsection['title'],
+            'chart_type': viz_info.get('chart_type', ''),
+            'template': self.generate_chart_code_template(viz_info)
+        }
+        return viz, template
+    
+    def run_section_pipeline(self, text_files, outline, user_query="", chart_types=None):
+        """按依赖关系并行处理所有子章节
+        
+        每个子章节重组完内容后立即分析可视化，不等待其他子章节；所有子章节重组完成后立即提取关键指标，
+        与其余可视化任务并行。LLM请求数受全局并发上限约束，结果按内容哈希缓存。
+        
+        Args:
+            text_files: 工作区文本文件
+            outline: 报告大纲
+            user_query: 用户查询
+            chart_types: 图表类型列表，为空时不生成图表
+            
+        Returns:
+            (sections, visualizations, chart_templates, metrics)
+        """
+        filename_to_content = {file['filename']: file['content'] for file in text_files}
+        sections = [{'title': section['title'], 'subsections': [None] * len(section.get('subsections', []))}
+                    for section in outline.get('sections', [])]
+        tasks = [(i, j, subsection)
+                 for i, section in enumerate(outline.get('sections', []))
+                 for j, subsection in enumerate(section.get('subsections', []))]
+        visualizations = {}
+        chart_templates = {}
+        result_lock = threading.Lock()
+        remaining = len(tasks)
+        metrics_future = None
+        
+        logger.info(f"总共需要处理 {len(tasks)} 个子章节")
+        
+        def process_subsection(executor, i, j, subsection):
+            nonlocal remaining, metrics_future
+            try:
+                content = self.reorganize_subsection(subsection, filename_to_content, user_query)
+                failed = not content
+            except Exception as e:
+                logger.error(f"处理子章节 {subsection['title']} 时出错: {str(e)}")
+                content, failed = f"<p>内容生成失败: {str(e)}</p>", True
+            
+            with result_lock:
+                sections[i]['subsections'][j] = {'title': subsection['title'], 'content': content}
+                remaining -= 1
+                logger.info(f"完成子章节 [{i+1}.{j+1}]: {subsection['title']} ({len(tasks) - remaining}/{len(tasks)})")
+                if remaining == 0:
+                    metrics_future = executor.submit(self.extract_key_metrics,
+                                                     self._join_section_content(sections), user_query)
+            
+            if not chart_types or failed:
+                return
+            try:
+                result = self.visualize_subsection(sections[i]['subsections'][j], chart_types, user_query)
+            except Exception as e:
+                logger.error(f'raise error: {str(e)}', exc_info=True)
+                return
+            if result:
+                viz_id = f"{i+1}-{j+1}"
+                with result_lock:
+                    visualizations[viz_id], chart_templates[viz_id] = result
+                logger.info(f"已为小节 '{subsection['title']}' 生成图表")
+        
+        # 线程大多在等待LLM响应，实际并发由 HTML_REPORT_LLM_CONCURRENCY 控制
+        max_workers = max(1, min(32, len(tasks) + 1))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(process_subsection, executor, *task) for task in tasks]
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error(f"处理子章节时出错: {str(e)}")
+            if metrics_future is not None:
+                metrics = metrics_future.result()
+            else:
+                metrics = self.extract_key_metrics(self._join_section_content(sections), user_query)
+        
+        logger.info(f"所有 {len(tasks)} 个子章节处理完成")
+        return sections, visualizations, chart_templates, metrics
+    
+    @staticmethod
+    def _join_section_content(sections):
+        """拼接所有子章节内容，用于提取关键指标"""
+        all_content = ""
+        for section in sections:
+            for subsection in section.get('subsections', []):
+                all_content += str((subsection or {}).get('content') or '') + "\n\n"
+        return all_content
+    
     def analyze_content_for_visualization(self, section_content, user_query=""):
         """分析内容是否适合生成图表，返回可视化信息"""
         try:
@@ -862,7 +988,7 @@ If the content is not suitable for visualization, then return:
 }}
 """
 
-            response = self.ask_llm(prompt)
+            response = self.ask_llm(prompt, use_cache=True)
             
             # 处理JSON响应
             try:
@@ -1456,22 +1582,17 @@ If the content is not suitable for visualization, then return:
                 )
             )
             
-            # 保存交互式HTML
-            html_io = io.StringIO()
-            fig.write_html(html_io, include_plotlyjs='cdn', full_html=False)
-            chart_html = html_io.getvalue()
-            
-            # 保存为静态图像
-            img_bytes = fig.to_image(format="png", width=800, height=500, scale=2)
-            img_base64 = base64.b64encode(img_bytes).decode('utf-8')
+            # 在渲染进程池中生成交互式HTML和静态图像，相同的图表只渲染一次
+            rendered = chart_render_pool.render(chart_spec(fig, image_format=CHART_IMAGE_FORMAT))
             
             # 准备返回数据
             result = {
                 'title': title,
                 'description': description,
                 'chart_type': chart_type,
-                'image_base64': img_base64,
-                'chart_html': chart_html,
+                'image_base64': rendered['image_base64'],
+                'image_mime': rendered['image_mime'],
+                'chart_html': rendered['chart_html'],
                 'is_interactive': True
             }
             
@@ -1859,7 +1980,7 @@ If there are no suitable quantitative metrics in the content, please return:
 }}
 """
             
-            response = self.ask_llm(prompt)
+            response = self.ask_llm(prompt, use_cache=True)
             
             try:
                 # 提取JSON部分
@@ -1959,8 +2080,12 @@ If there are no suitable quantitative metrics in the content, please return:
         
         return metrics_html
     
-    def generate_html_report_with_apple_theme(self, outline, sections, visualizations, user_query=""):
-        """使用类Apple设计风格生成HTML报告"""
+    def generate_html_report_with_apple_theme(self, outline, sections, visualizations, user_query="", metrics=None):
+        """使用类Apple设计风格生成HTML报告
+        
+        Args:
+            metrics: 已提取的关键指标，为None时根据章节内容提取
+        """
         logger.info("生成HTML报告...")
         
         # 获取主题样式
@@ -1970,14 +2095,9 @@ If there are no suitable quantitative metrics in the content, please return:
         title = outline.get('title', '自动生成的报告')
         subtitle = outline.get('subtitle', '')
         
-        # 提取所有内容，用于生成关键指标
-        all_content = ""
-        for section in sections:
-            for subsection in section.get('subsections', []):
-                all_content += str(subsection.get('content') or '') + "\n\n"
-        
         # 提取关键指标
-        metrics = self.extract_key_metrics(all_content, user_query)
+        if metrics is None:
+            metrics = self.extract_key_metrics(self._join_section_content(sections), user_query)
         metrics_html = self.create_metric_cards_html(metrics)
         
         # 构建导航目录
@@ -2029,7 +2149,7 @@ If there are no suitable quantitative metrics in the content, please return:
                                 <button class="toggle-button toggle-interactive" onclick="toggleChart('{viz_id}', 'interactive')" style="display:none;">交互图表</button>
                             </div>
                             <div class="static-chart" style="display:none;">
-                                <img src="data:image/png;base64,{viz['image_base64']}" alt="{viz['title']}" class="chart-image">
+                                <img src="data:{viz.get('image_mime', 'image/png')};base64,{viz['image_base64']}" alt="{viz['title']}" class="chart-image">
                             </div>
                         </div>
                         '''
@@ -2038,7 +2158,7 @@ If there are no suitable quantitative metrics in the content, please return:
                         section_html += f'''
                         <div class="chart-container">
                             <h4 class="chart-title">{viz['title']}</h4>
-                            <img src="data:image/png;base64,{viz['image_base64']}" alt="{viz['title']}" class="chart-image">
+                            <img src="data:{viz.get('image_mime', 'image/png')};base64,{viz['image_base64']}" alt="{viz['title']}" class="chart-image">
                             <p class="chart-description">{viz['description']}</p>
                         </div>
                         '''
@@ -51,6 +51,10 @@ class VisionTool():
             return base64.b64encode(image_file.read()).decode("utf-8")
 
     async def _run(self, image_path_url, task_prompt):
+        # 同步客户端的流式请求放到线程中执行，不阻塞调用方的事件循环（如共享的后台事件循环）
+        return await asyncio.to_thread(self._analyze, image_path_url, task_prompt)
+
+    def _analyze(self, image_path_url, task_prompt):
         img_url = ''
         if image_path_url.startswith('http://') or image_path_url.startswith('https://'):
             img_url = image_path_url
@@ -101,4 +105,4 @@ class VisionTool():
 
     def ask_question_about_image(self, image_path_url, task_prompt):
         logger.info(f"Using Tool: {self.name}, image_path_url: {image_path_url}, task_prompt： {task_prompt}")
-        return asyncio.run(self._run(image_path_url, task_prompt))
+        return self._analyze(image_path_url, task_prompt)
@@ -0,0 +1,174 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import asyncio
+import concurrent.futures
+import copy
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from app.common.logger_util import logger
+
+# 查询结果的缓存时间（秒），搜索结果和关键词时效性较强，只做短时间缓存
+SEARCH_CACHE_TTL = float(os.environ.get("SEARCH_CACHE_TTL", "300"))
+# 缓存的查询数
+SEARCH_CACHE_SIZE = int(os.environ.get("SEARCH_CACHE_SIZE", "512"))
+# 关闭后每次调用都直接请求搜索服务/大模型（相同查询仍会合并为一次请求）
+SEARCH_CACHE_ENABLED = os.environ.get("SEARCH_CACHE_ENABLED", "true").lower() == "true"
+
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+_TRAILING_PUNCTUATION = '?？!！.。,，;；:：、~～ '
+
+
+def normalize_query(query: str) -> str:
+    """归一化查询：全角转半角、忽略大小写、合并空白、去掉首尾的标点，
+    使“相同的问题换个写法”命中同一个缓存项"""
+    text = unicodedata.normalize('NFKC', str(query or '')).lower()
+    text = _WHITESPACE_PATTERN.sub(' ', text)
+    return text.strip(_TRAILING_PUNCTUATION + '"\'')
+
+
+def is_error_result(result: Any) -> bool:
+    """搜索服务返回的错误结果不缓存"""
+    if isinstance(result, dict):
+        return "error" in result
+    if isinstance(result, list):
+        return any(isinstance(item, dict) and "error" in item for item in result)
+    return result is None
+
+
+class QueryCache:
+    """带过期时间的查询缓存，按 (provider, 查询) 单飞
+
+    - 缓存未过期时直接返回缓存结果的副本
+    - 相同的查询正在请求时，后来的调用等待同一个请求的结果，不再重复请求；
+      请求结果用 concurrent.futures.Future 传递，不同线程、不同事件循环中的调用都可以合并
+    - 请求失败或结果不可缓存时不写入缓存，下一次调用重新请求
+    """
+
+    def __init__(self, ttl: float = SEARCH_CACHE_TTL, max_size: int = SEARCH_CACHE_SIZE,
+                 enabled: bool = SEARCH_CACHE_ENABLED):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, Hashable], Tuple[float, Any]]" = OrderedDict()
+        self._in_flight: Dict[Tuple[str, Hashable], concurrent.futures.Future] = {}
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0}
+
+    @staticmethod
+    def make_key(query: str, **params) -> str:
+        """由归一化的查询和其他影响结果的参数生成缓存键"""
+        params = {k: v for k, v in params.items() if v is not None}
+        if not params:
+            return normalize_query(query)
+        return normalize_query(query) + "\x00" + json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+
+    def get(self, provider: str, key: Hashable) -> Tuple[bool, Any]:
+        """返回 (是否命中, 缓存结果的副本)"""
+        if not self.enabled:
+            return False, None
+        with self._lock:
+            entry = self._entries.get((provider, key))
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[(provider, key)]
+                return False, None
+            self._entries.move_to_end((provider, key))
+        return True, copy.deepcopy(value)
+
+    def put(self, provider: str, key: Hashable, value: Any):
+        if not self.enabled or self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[(provider, key)] = (time.monotonic() + self.ttl, copy.deepcopy(value))
+            self._entries.move_to_end((provider, key))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    async def get_or_load(self, provider: str, key: Hashable, loader: Callable[[], Awaitable[Any]],
+                          cacheable: Optional[Callable[[Any], bool]] = None) -> Any:
+        """命中缓存时返回缓存结果，否则执行 loader 请求（相同的查询只请求一次）
+
+        Args:
+            provider: 搜索服务或大模型调用的名称，不同 provider 的缓存互不影响
+            key: 缓存键，通常由 make_key 生成
+            loader: 无参数的协程函数，执行实际的请求
+            cacheable: 判断结果是否可以缓存，默认排除错误结果
+        """
+        hit, value = self.get(provider, key)
+        if hit:
+            with self._lock:
+                self.stats["hits"] += 1
+            return value
+
+        with self._lock:
+            future = self._in_flight.get((provider, key))
+            owner = future is None
+            if owner:
+                future = concurrent.futures.Future()
+                self._in_flight[(provider, key)] = future
+                self.stats["misses"] += 1
+            else:
+                self.stats["coalesced"] += 1
+
+        if not owner:
+            try:
+                # shield：等待方被取消时不影响正在执行的请求
+                return copy.deepcopy(await asyncio.shield(asyncio.wrap_future(future)))
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+            # 执行请求的调用被取消，由等待方重新请求
+            return await self.get_or_load(provider, key, loader, cacheable)
+
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            self._finish(provider, key, future)
+            future.cancel()
+            raise
+        except BaseException as e:
+            self._finish(provider, key, future)
+            future.set_exception(e)
+            raise
+        if (cacheable or (lambda result: not is_error_result(result)))(value):
+            self.put(provider, key, value)
+        self._finish(provider, key, future)
+        future.set_result(value)
+        return value
+
+    def _finish(self, provider: str, key: Hashable, future: concurrent.futures.Future):
+        with self._lock:
+            if self._in_flight.get((provider, key)) is future:
+                del self._in_flight[(provider, key)]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        logger.info("Search query cache cleared")
+
+
+# 进程内共享的查询缓存，供搜索工具和搜索关键词提取/问题改写使用
+search_cache = QueryCache()
@@ -13,26 +13,78 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import asyncio
+import atexit
 import os
+import weakref
 import xml.etree.ElementTree as ET
 from typing import Any, Dict, List, Literal, Optional, TypeAlias, Union
 
+import aiohttp
 import requests
 
 from app.common.logger_util import logger
+from app.cosight.tool.search_cache import QueryCache, search_cache
+
+# 搜索服务的请求超时（秒）
+SEARCH_HTTP_TIMEOUT = float(os.environ.get("SEARCH_HTTP_TIMEOUT", "30"))
+# 每个事件循环中搜索服务连接池的连接数上限
+SEARCH_HTTP_POOL_SIZE = int(os.environ.get("SEARCH_HTTP_POOL_SIZE", "32"))
+# 搜索服务的接口地址，可配置为代理或内网镜像
+GOOGLE_SEARCH_API_URL = os.environ.get("GOOGLE_SEARCH_API_URL", "https://www.googleapis.com/customsearch/v1")
+BRAVE_SEARCH_API_URL = os.environ.get("BRAVE_SEARCH_API_URL", "https://api.search.brave.com/res/v1/web/search")
+TAVILY_SEARCH_API_URL = os.environ.get("TAVILY_SEARCH_API_URL", "https://api.tavily.com/search")
+
+# 每个事件循环一个连接池（aiohttp的会话不能跨事件循环使用），智能体的工具调用都在共享的后台事件循环中执行
+_http_sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]" = \
+    weakref.WeakKeyDictionary()
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """获取当前事件循环的搜索服务连接池"""
+    loop = asyncio.get_running_loop()
+    session = _http_sessions.get(loop)
+    if session is None or session.closed:
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=SEARCH_HTTP_POOL_SIZE, ttl_dns_cache=300),
+            timeout=aiohttp.ClientTimeout(total=SEARCH_HTTP_TIMEOUT))
+        _http_sessions[loop] = session
+    return session
+
+
+def close_http_sessions(timeout: float = 5):
+    """关闭仍在运行的事件循环中的连接池"""
+    for loop, session in list(_http_sessions.items()):
+        if session.closed or loop.is_closed() or not loop.is_running():
+            continue
+        try:
+            asyncio.run_coroutine_threadsafe(session.close(), loop).result(timeout)
+        except Exception as e:
+            logger.warning(f"Error closing search http session: {e}")
+    _http_sessions.clear()
+
+
+atexit.register(close_http_sessions)
+
 
 class SearchToolkit:
     r"""A class representing a toolkit for web search.
 
     This class provides methods for searching information on the web using
     search engines like Google, DuckDuckGo, Wikipedia and Wolfram Alpha, Brave.
+
+    The search methods are coroutines. Results are cached for a short time
+    by normalized query, and concurrent identical queries to the same
+    provider share a single request.
     """
 
-    def __init__(self):
+    def __init__(self, cache: QueryCache = search_cache):
         proxy = os.environ.get("PROXY")
+        self.proxy = proxy
         self.proxies = {"http": proxy, "https": proxy} if proxy else None
+        self.cache = cache
 
-    def search_wiki(self, entity: str) -> str:
+    async def search_wiki(self, entity: str) -> str:
         r"""Search the entity in WikiPedia and return the summary of the
             required page, containing factual information about
             the given entity.
@@ -44,6 +96,11 @@ class SearchToolkit:
             str: The search result. If the page corresponding to the entity
                 exists, return the summary of this entity in a string.
         """
+        return await self.cache.get_or_load(
+            "wiki", QueryCache.make_key(entity), lambda: asyncio.to_thread(self._search_wiki, entity),
+            cacheable=lambda result: not result.startswith("An exception occurred"))
+
+    def _search_wiki(self, entity: str) -> str:
         import wikipedia
 
         result: str
@@ -65,7 +122,7 @@ class SearchToolkit:
         logger.info(f'search_wiki result = {result}')
         return result
 
-    def search_linkup(
+    async def search_linkup(
             self,
             query: str,
             depth: Literal["standard", "deep"] = "standard",
@@ -96,6 +153,13 @@ class SearchToolkit:
                 structure depends on the `output_type`. If an error occurs,
                 returns an error message.
         """
+        key = QueryCache.make_key(query, depth=depth, output_type=output_type,
+                                  structured_output_schema=structured_output_schema)
+        return await self.cache.get_or_load("linkup", key, lambda: asyncio.to_thread(
+            self._search_linkup, query, depth, output_type, structured_output_schema))
+
+    def _search_linkup(self, query: str, depth: str, output_type: str,
+                       structured_output_schema: Optional[str]) -> Dict[str, Any]:
         try:
             from linkup import LinkupClient
 
@@ -136,7 +200,7 @@ class SearchToolkit:
             logger.error(f'raise error: {str(e)}', exc_info=True)
             return {"error": f"An unexpected error occurred: {e!s}"}
 
-    def search_duckduckgo(
+    async def search_duckduckgo(
             self, query: str, source: str = "text", max_results: int = 5
     ) -> List[Dict[str, Any]]:
         r"""Use DuckDuckGo search engine to search information for
@@ -156,6 +220,11 @@ class SearchToolkit:
             List[Dict[str, Any]]: A list of dictionaries where each dictionary
                 represents a search result.
         """
+        key = QueryCache.make_key(query, source=source, max_results=max_results)
+        return await self.cache.get_or_load("duckduckgo", key, lambda: asyncio.to_thread(
+            self._search_duckduckgo, query, source, max_results))
+
+    def _search_duckduckgo(self, query: str, source: str, max_results: int) -> List[Dict[str, Any]]:
         from duckduckgo_search import DDGS
         from requests.exceptions import RequestException
 
@@ -225,7 +294,7 @@ class SearchToolkit:
         logger.info(f'search_duckduckgo result = {responses}')
         return responses
 
-    def search_brave(
+    async def search_brave(
             self,
             q: str,
             country: str = "US",
@@ -332,16 +401,15 @@ class SearchToolkit:
             Dict[str, Any]: A dictionary representing a search result.
         """
 
-        import requests
-
         BRAVE_API_KEY = os.getenv("BRAVE_API_KEY")
 
-        url = "https://api.search.brave.com/res/v1/web/search"
         headers = {
             "Content-Type": "application/json",
             "X-BCP-APIV": "1.0",
-            "X-Subscription-Token": BRAVE_API_KEY,
         }
+        # aiohttp不接受None作为请求头的值，未配置密钥时不携带该请求头
+        if BRAVE_API_KEY:
+            headers["X-Subscription-Token"] = BRAVE_API_KEY
 
         ParamsType: TypeAlias = Dict[
             str,
@@ -366,11 +434,18 @@ class SearchToolkit:
             "summary": summary,
         }
 
-        response = requests.get(url, headers=headers, params=params, proxies=self.proxies)
-        data = response.json()["web"]
-        return data
+        # aiohttp不接受None和布尔类型的参数值
+        params = {k: str(v).lower() if isinstance(v, bool) else v for k, v in params.items() if v is not None}
+
+        async def load():
+            async with get_http_session().get(BRAVE_SEARCH_API_URL, headers=headers, params=params,
+                                              proxy=self.proxy) as response:
+                return (await response.json(content_type=None))["web"]
+
+        key = QueryCache.make_key(q, **{k: v for k, v in params.items() if k != "q"})
+        return await self.cache.get_or_load("brave", key, load)
 
-    def search_google(
+    async def search_google(
             self, query: str
     ) -> List[Dict[str, Any]]:
         r"""Use Google search engine to search information for the given query.
@@ -403,8 +478,10 @@ class SearchToolkit:
                 }
             title, description, url of a website.
         """
-        import requests
+        return await self.cache.get_or_load("google", QueryCache.make_key(query),
+                                            lambda: self._search_google(query))
 
+    async def _search_google(self, query: str) -> List[Dict[str, Any]]:
         # https://developers.google.com/custom-search/v1/overview
         GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
         # https://cse.google.com/cse/all
@@ -416,20 +493,25 @@ class SearchToolkit:
         search_language = "en"
         # How many pages to return
         num_result_pages = 3
-        # Constructing the URL
+        # Constructing the query parameters
         # Doc: https://developers.google.com/custom-search/v1/using_rest
-        url = (
-            f"https://www.googleapis.com/customsearch/v1?"
-            f"key={GOOGLE_API_KEY}&cx={SEARCH_ENGINE_ID}&q={query}&start="
-            f"{start_page_idx}&lr={search_language}&num={num_result_pages}"
-        )
+        params = {
+            "key": GOOGLE_API_KEY,
+            "cx": SEARCH_ENGINE_ID,
+            "q": query,
+            "start": start_page_idx,
+            "lr": search_language,
+            "num": num_result_pages,
+        }
+        # aiohttp不接受None作为参数值，未配置的密钥不放入请求参数
+        params = {k: v for k, v in params.items() if v is not None}
 
         responses = []
         # Fetch the results given the URL
         try:
             # Make the get
-            result = requests.get(url, proxies=self.proxies)
-            data = result.json()
+            async with get_http_session().get(GOOGLE_SEARCH_API_URL, params=params, proxy=self.proxy) as result:
+                data = await result.json(content_type=None)
 
             # Get the result items
             if "items" in data:
@@ -469,14 +551,14 @@ class SearchToolkit:
             else:
                 responses.append({"error": "google search failed."})
 
-        except requests.RequestException:
+        except (aiohttp.ClientError, asyncio.TimeoutError):
             # Handle specific exceptions or general request exceptions
             responses.append({"error": "google search failed."})
         # If no answer found, return an empty list
         logger.info(f'search_google result = {responses}')
         return responses
 
-    def query_wolfram_alpha(
+    async def query_wolfram_alpha(
             self, query: str, is_detailed: bool = False
     ) -> Union[str, Dict[str, Any]]:
         r"""Queries Wolfram|Alpha and returns the result. Wolfram|Alpha is an
@@ -495,6 +577,12 @@ class SearchToolkit:
                 Returns a string if `is_detailed` is False, otherwise returns
                 a dictionary with detailed information.
         """
+        return await self.cache.get_or_load(
+            "wolfram_alpha", QueryCache.make_key(query, is_detailed=is_detailed),
+            lambda: asyncio.to_thread(self._query_wolfram_alpha, query, is_detailed),
+            cacheable=lambda result: not (isinstance(result, str) and result.startswith("Wolfram Alpha wasn't")))
+
+    def _query_wolfram_alpha(self, query: str, is_detailed: bool) -> Union[str, Dict[str, Any]]:
         import wolframalpha
 
         WOLFRAMALPHA_APP_ID = os.environ.get("WOLFRAMALPHA_APP_ID")
@@ -643,7 +731,7 @@ class SearchToolkit:
 
         return structured_steps
 
-    def tavily_search(
+    async def tavily_search(
             self, query: str, num_results: int = 5, **kwargs
     ) -> List[Dict[str, Any]]:
         r"""Use Tavily Search API to search information for the given query.
@@ -675,8 +763,6 @@ class SearchToolkit:
                 - 'published_date' (str): Publication date for news topics
                   (if available).
         """
-        from tavily import TavilyClient  # type: ignore[import-untyped]
-
         Tavily_API_KEY = os.getenv("TAVILY_API_KEY")
         if not Tavily_API_KEY:
             raise ValueError(
@@ -684,12 +770,39 @@ class SearchToolkit:
                 "Get `TAVILY_API_KEY` here: `https://www.tavily.com/api/`."
             )
 
-        client = TavilyClient(Tavily_API_KEY)
+        # 与 TavilyClient.search 的请求参数一致
+        data = {
+            "query": query,
+            "search_depth": "basic",
+            "topic": "general",
+            "days": 7,
+            "include_answer": False,
+            "include_raw_content": False,
+            "max_results": num_results,
+            "include_images": False,
+        }
+        data.update(kwargs)
+        timeout = min(data.pop("timeout", 60), 120)
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {Tavily_API_KEY}"
+        }
 
-        try:
-            results = client.search(query, max_results=num_results, **kwargs)
-            logger.info(f'tavily_search result = {results}')
-            return results
-        except Exception as e:
-            logger.error(f'error": f"An unexpected error occurred: {str(e)}', exc_info=True)
-            return [{"error": f"An unexpected error occurred: {e!s}"}]
+        async def load():
+            try:
+                async with get_http_session().post(TAVILY_SEARCH_API_URL, json=data, headers=headers,
+                                                   proxy=self.proxy,
+                                                   timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                    if response.status != 200:
+                        raise Exception(f"Tavily API request failed with status {response.status}: "
+                                        f"{await response.text()}")
+                    results = await response.json(content_type=None)
+                    results["results"] = results.get("results", [])
+                logger.info(f'tavily_search result = {results}')
+                return results
+            except Exception as e:
+                logger.error(f'error": f"An unexpected error occurred: {str(e)}', exc_info=True)
+                return [{"error": f"An unexpected error occurred: {e!s}"}]
+
+        return await self.cache.get_or_load(
+            "tavily", QueryCache.make_key(query, **{k: v for k, v in data.items() if k != "query"}), load)
@@ -51,6 +51,10 @@ class VideoTool:
             return base64.b64encode(video_file.read()).decode("utf-8")
 
     async def video_analy(self, video_path: str, question: str):
+        # 同步客户端的流式请求放到线程中执行，不阻塞调用方的事件循环（如共享的后台事件循环）
+        return await asyncio.to_thread(self._analyze, video_path, question)
+
+    def _analyze(self, video_path: str, question: str):
         video_url = ''
         if video_path.startswith('http://') or video_path.startswith('https://'):
             video_url = video_path
@@ -103,4 +107,4 @@ class VideoTool:
 
     def ask_question_about_video(self, video_path: str, question: str, ):
         logger.info(f"Using Tool: {self.name}, video_path: {video_path}, question: {question}")
-        return asyncio.run(self.video_analy(video_path, question))
+        return self._analyze(video_path, question)
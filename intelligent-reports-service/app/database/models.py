@@ -49,6 +49,22 @@ class MessageModel(BaseModel):
     metadata: Dict[str, Any] = Field(default_factory=dict)
 
 
+class ConversationSummaryModel(BaseModel):
+    """会话摘要模型（列表展示用，不含metadata）"""
+    id: str
+    title: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+
+class MessageSummaryModel(BaseModel):
+    """消息摘要模型（列表展示用，不含内容和metadata）"""
+    id: str
+    role: MessageRole
+    message_type: MessageType = MessageType.CHAT
+    timestamp: datetime
+
+
 class PlanModel(BaseModel):
     """计划模型"""
     id: str
@@ -83,12 +99,14 @@ class ChatHistoryResponse(BaseModel):
     conversation_id: str
     messages: List[MessageModel]
     total_count: int
+    next_cursor: Optional[str] = None
 
 
 class ConversationListResponse(BaseModel):
     """会话列表响应模型"""
     conversations: List[ConversationModel]
     total_count: int
+    next_cursor: Optional[str] = None
 
 
 class SaveMessageRequest(BaseModel):
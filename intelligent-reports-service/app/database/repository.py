@@ -8,6 +8,7 @@ import json
 from app.database.sqlite_db import SQLiteDB, get_db
 from app.database.models import (
     ConversationModel, MessageModel, PlanModel, UserSessionModel,
+    ConversationSummaryModel, MessageSummaryModel,
     MessageRole, MessageType, PlanStatus
 )
 from app.common.logger_util import logger
@@ -61,9 +62,9 @@ class ConversationRepository:
                 )
             return None
     
-    async def get_by_user(self, user_id: str, limit: int = 10) -> List[ConversationModel]:
-        """获取用户的会话列表"""
-        conversations_data = await self.db.get_conversations(user_id, limit)
+    async def get_by_user(self, user_id: str, limit: int = 10, before: str = None) -> List[ConversationModel]:
+        """获取用户的会话列表，before 为分页游标"""
+        conversations_data = await self.db.get_conversations(user_id, limit, before)
         
         return [
             ConversationModel(
@@ -78,6 +79,20 @@ class ConversationRepository:
             for conv in conversations_data
         ]
     
+    async def get_summaries_by_user(self, user_id: str, limit: int = 10,
+                                    before: str = None) -> List[ConversationSummaryModel]:
+        """获取用户的会话摘要列表，before 为分页游标"""
+        summaries = await self.db.get_conversation_summaries(user_id, limit, before)
+        return [
+            ConversationSummaryModel(
+                id=conv['id'],
+                title=conv['title'],
+                created_at=datetime.fromisoformat(conv['created_at']),
+                updated_at=datetime.fromisoformat(conv['updated_at'])
+            )
+            for conv in summaries
+        ]
+    
     async def update(self, conversation_id: str, title: str = None, 
                     metadata: Dict = None, is_active: bool = None) -> bool:
         """更新会话"""
@@ -144,49 +159,58 @@ class MessageRepository:
                     metadata=json.loads(row['metadata']) if row['metadata'] else {}
                 )
     
+    async def save_many(self, conversation_id: str, messages: List[Dict[str, Any]]) -> List[str]:
+        """在一个事务中批量保存消息，返回按输入顺序排列的消息ID
+
+        messages 每项包含 content、role（MessageRole），可选 message_type（MessageType）、metadata
+        """
+        return await self.db.save_messages(conversation_id, [
+            {
+                "content": message["content"],
+                "role": message["role"].value,
+                "message_type": message.get("message_type", MessageType.CHAT).value,
+                "metadata": message.get("metadata")
+            }
+            for message in messages
+        ])
+    
     async def get_conversation_history(self, conversation_id: str, 
-                                     limit: int = 100) -> List[MessageModel]:
-        """获取会话历史"""
-        messages_data = await self.db.get_conversation_history(conversation_id, limit)
-        
+                                     limit: int = 100, after: str = None) -> List[MessageModel]:
+        """获取会话历史（按时间正序），after 为分页游标"""
+        messages_data = await self.db.get_conversation_history(conversation_id, limit, after)
+        return [self._to_model(msg) for msg in messages_data]
+    
+    async def get_latest_messages(self, conversation_id: str, 
+                                 count: int = 10, before: str = None) -> List[MessageModel]:
+        """获取最新的几条消息（按时间正序），before 为向前翻页的游标"""
+        messages_data = await self.db.get_latest_messages(conversation_id, count, before)
+        return [self._to_model(msg) for msg in messages_data]
+    
+    async def get_summaries(self, conversation_id: str, count: int = 50,
+                            before: str = None) -> List[MessageSummaryModel]:
+        """获取最新的几条消息摘要（按时间正序），before 为向前翻页的游标"""
+        summaries = await self.db.get_message_summaries(conversation_id, count, before)
         return [
-            MessageModel(
+            MessageSummaryModel(
                 id=msg['id'],
-                conversation_id=msg['conversation_id'],
-                content=msg['content'],
                 role=MessageRole(msg['role']),
                 message_type=MessageType(msg['message_type']),
-                timestamp=datetime.fromisoformat(msg['timestamp']),
-                metadata=msg['metadata']
+                timestamp=datetime.fromisoformat(msg['timestamp'])
             )
-            for msg in messages_data
+            for msg in summaries
         ]
     
-    async def get_latest_messages(self, conversation_id: str, 
-                                 count: int = 10) -> List[MessageModel]:
-        """获取最新的几条消息"""
-        async with self.db.get_connection() as conn:
-            cursor = await conn.execute(
-                """SELECT * FROM messages 
-                   WHERE conversation_id = ? 
-                   ORDER BY timestamp DESC LIMIT ?""",
-                (conversation_id, count)
-            )
-            rows = await cursor.fetchall()
-            
-            messages = []
-            for row in reversed(rows):  # 反转以获得正确的时间顺序
-                messages.append(MessageModel(
-                    id=row['id'],
-                    conversation_id=row['conversation_id'],
-                    content=row['content'],
-                    role=MessageRole(row['role']),
-                    message_type=MessageType(row['message_type']),
-                    timestamp=datetime.fromisoformat(row['timestamp']),
-                    metadata=json.loads(row['metadata']) if row['metadata'] else {}
-                ))
-            
-            return messages
+    @staticmethod
+    def _to_model(msg: Dict) -> MessageModel:
+        return MessageModel(
+            id=msg['id'],
+            conversation_id=msg['conversation_id'],
+            content=msg['content'],
+            role=MessageRole(msg['role']),
+            message_type=MessageType(msg['message_type']),
+            timestamp=datetime.fromisoformat(msg['timestamp']),
+            metadata=msg['metadata']
+        )
 
 
 class PlanRepository:
@@ -5,16 +5,54 @@ import sqlite3
 import asyncio
 import aiosqlite
 import os
+import time
+import uuid
 from contextlib import asynccontextmanager
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime
 import json
 
 from app.common.logger_util import logger
 
+# 连接池大小（WAL模式下读操作可并发，写操作由SQLite串行化）
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "4"))
+# 等待写锁的超时时间（毫秒）
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+# 单个事务最多合并写入的消息数
+MESSAGE_BATCH_MAX_SIZE = int(os.getenv("SQLITE_MESSAGE_BATCH_MAX_SIZE", "500"))
+
+_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+)
+
+
+def generate_id(prefix: str) -> str:
+    """生成带时间前缀的唯一ID，时间戳相同时由随机后缀区分"""
+    return f"{prefix}_{int(time.time() * 1000000)}_{uuid.uuid4().hex[:16]}"
+
+
+def encode_cursor(sort_value: Any, row_id: str) -> str:
+    """把排序键（时间字段和ID）编码为分页游标
+
+    datetime 按 str() 编码，与 CURRENT_TIMESTAMP 写入的 "YYYY-MM-DD HH:MM:SS" 格式一致。
+    """
+    return f"{sort_value}|{row_id}"
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """解析分页游标，返回 (时间字段, ID)"""
+    sort_value, separator, row_id = cursor.partition("|")
+    if not separator:
+        raise ValueError(f"无效的分页游标: {cursor}")
+    return sort_value, row_id
+
 
 class SQLiteDB:
-    def __init__(self, db_path: str = None):
+    def __init__(self, db_path: str = None, pool_size: int = SQLITE_POOL_SIZE):
         if db_path is None:
             # 默认数据库路径在项目根目录下的data文件夹
             base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -23,8 +61,44 @@ class SQLiteDB:
             db_path = os.path.join(data_dir, "cosight.db")
         
         self.db_path = db_path
+        self.pool_size = max(1, pool_size)
+        # 空闲连接；每个连接同一时间只由一个协程使用，事务不会交错
+        self._pool: Optional[asyncio.Queue] = None
+        self._connections: List[aiosqlite.Connection] = []
+        self._pool_lock = asyncio.Lock()
+        # 待写入的消息：(消息行, 写入完成后通知调用方的future)
+        self._pending_messages: List[Tuple[tuple, asyncio.Future]] = []
+        self._message_writer: Optional[asyncio.Task] = None
         logger.info(f"SQLite数据库路径: {self.db_path}")
     
+    async def _open_connection(self) -> aiosqlite.Connection:
+        conn = await aiosqlite.connect(self.db_path)
+        conn.row_factory = aiosqlite.Row
+        for pragma in _PRAGMAS:
+            await conn.execute(pragma)
+        return conn
+    
+    async def _ensure_pool(self) -> asyncio.Queue:
+        if self._pool is None:
+            async with self._pool_lock:
+                if self._pool is None:
+                    pool = asyncio.Queue()
+                    for _ in range(self.pool_size):
+                        conn = await self._open_connection()
+                        self._connections.append(conn)
+                        pool.put_nowait(conn)
+                    self._pool = pool
+        return self._pool
+    
+    async def close(self):
+        """写入待保存的消息并关闭所有连接"""
+        if self._message_writer is not None:
+            await asyncio.gather(self._message_writer, return_exceptions=True)
+        for conn in self._connections:
+            await conn.close()
+        self._connections = []
+        self._pool = None
+    
     async def init_database(self):
         """初始化数据库表结构"""
         await self.create_tables()
@@ -32,7 +106,7 @@ class SQLiteDB:
     
     async def create_tables(self):
         """创建所需的数据表"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self.get_connection() as db:
             # 会话表
             await db.execute("""
                 CREATE TABLE IF NOT EXISTS conversations (
@@ -88,8 +162,15 @@ class SQLiteDB:
             """)
             
             # 创建索引
-            await db.execute("CREATE INDEX IF NOT EXISTS idx_conversations_user_id ON conversations(user_id)")
-            await db.execute("CREATE INDEX IF NOT EXISTS idx_messages_conversation_id ON messages(conversation_id)")
+            # 会话列表和消息分页按 (时间, id) 排序和定位游标，摘要查询只用索引即可完成
+            await db.execute("""CREATE INDEX IF NOT EXISTS idx_conversations_user_updated
+                                ON conversations(user_id, is_active, updated_at, id, title, created_at)""")
+            await db.execute("""CREATE INDEX IF NOT EXISTS idx_messages_conversation_page
+                                ON messages(conversation_id, timestamp, id, role, message_type)""")
+            # 以上索引的前缀已覆盖的旧索引
+            for index_name in ("idx_conversations_user_id", "idx_messages_conversation_id",
+                               "idx_messages_conversation_timestamp"):
+                await db.execute(f"DROP INDEX IF EXISTS {index_name}")
             await db.execute("CREATE INDEX IF NOT EXISTS idx_plans_user_id ON plans(user_id)")
             await db.execute("CREATE INDEX IF NOT EXISTS idx_user_sessions_user_id ON user_sessions(user_id)")
             
@@ -97,14 +178,22 @@ class SQLiteDB:
     
     @asynccontextmanager
     async def get_connection(self):
-        """获取数据库连接的上下文管理器"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        """从连接池获取数据库连接的上下文管理器，退出时回滚未提交的事务并归还连接"""
+        pool = await self._ensure_pool()
+        db = await pool.get()
+        try:
             yield db
+        finally:
+            try:
+                if db.in_transaction:
+                    await db.rollback()
+            except Exception as e:
+                logger.error(f"回滚未提交的事务失败: {e}")
+            pool.put_nowait(db)
     
     async def create_conversation(self, user_id: str, title: str = None, metadata: Dict = None) -> str:
         """创建新会话"""
-        conversation_id = f"conv_{int(datetime.now().timestamp() * 1000000)}"
+        conversation_id = generate_id("conv")
         
         async with self.get_connection() as db:
             await db.execute(
@@ -117,66 +206,165 @@ class SQLiteDB:
         logger.info(f"创建新会话: {conversation_id} for user: {user_id}")
         return conversation_id
     
-    async def get_conversations(self, user_id: str, limit: int = 10) -> List[Dict]:
-        """获取用户的会话列表"""
+    async def get_conversations(self, user_id: str, limit: int = 10, before: str = None) -> List[Dict]:
+        """获取用户的会话列表（按更新时间倒序）
+
+        Args:
+            user_id: 用户ID
+            limit: 返回的最大会话数
+            before: 分页游标，只返回排在该游标之后（更早更新）的会话
+        """
+        rows = await self._fetch_conversations("*", user_id, limit, before)
+        
+        conversations = []
+        for row in rows:
+            conv = dict(row)
+            conv['metadata'] = json.loads(conv['metadata']) if conv['metadata'] else {}
+            conversations.append(conv)
+        
+        return conversations
+    
+    async def get_conversation_summaries(self, user_id: str, limit: int = 10, before: str = None) -> List[Dict]:
+        """获取用户的会话摘要列表（不含metadata，只读索引）"""
+        rows = await self._fetch_conversations("id, title, created_at, updated_at", user_id, limit, before)
+        return [dict(row) for row in rows]
+    
+    async def _fetch_conversations(self, columns: str, user_id: str, limit: int, before: Optional[str]):
+        where, params = "user_id = ? AND is_active = 1", [user_id]
+        if before:
+            where += " AND (updated_at, id) < (?, ?)"
+            params.extend(decode_cursor(before))
         async with self.get_connection() as db:
             cursor = await db.execute(
-                """SELECT * FROM conversations 
-                   WHERE user_id = ? AND is_active = 1 
-                   ORDER BY updated_at DESC LIMIT ?""",
-                (user_id, limit)
+                f"""SELECT {columns} FROM conversations 
+                    WHERE {where}
+                    ORDER BY updated_at DESC, id DESC LIMIT ?""",
+                (*params, limit)
             )
-            rows = await cursor.fetchall()
-            
-            conversations = []
-            for row in rows:
-                conv = dict(row)
-                conv['metadata'] = json.loads(conv['metadata']) if conv['metadata'] else {}
-                conversations.append(conv)
-            
-            return conversations
+            return await cursor.fetchall()
     
     async def save_message(self, conversation_id: str, content: str, role: str, 
                           message_type: str = 'chat', metadata: Dict = None) -> str:
-        """保存消息"""
-        message_id = f"msg_{int(datetime.now().timestamp() * 1000000)}"
+        """保存消息
+
+        并发保存的消息（例如多个会话同时流式输出报告）合并到同一个事务中写入，返回时消息已提交。
+        """
+        message_id = generate_id("msg")
+        row = (message_id, conversation_id, content, role, message_type,
+               json.dumps(metadata) if metadata else None)
         
+        future = asyncio.get_running_loop().create_future()
+        self._pending_messages.append((row, future))
+        if self._message_writer is None or self._message_writer.done():
+            self._message_writer = asyncio.create_task(self._write_pending_messages())
+        await future
+        return message_id
+    
+    async def save_messages(self, conversation_id: str, messages: List[Dict[str, Any]]) -> List[str]:
+        """在一个事务中批量保存同一会话的多条消息
+
+        Args:
+            conversation_id: 会话ID
+            messages: 消息列表，每项包含 content、role，可选 message_type、metadata
+
+        Returns:
+            List[str]: 按输入顺序排列的消息ID
+        """
+        rows = [
+            (generate_id("msg"), conversation_id, message["content"], message["role"],
+             message.get("message_type", "chat"),
+             json.dumps(message["metadata"]) if message.get("metadata") else None)
+            for message in messages
+        ]
+        if rows:
+            await self._insert_messages(rows)
+        return [row[0] for row in rows]
+    
+    async def _insert_messages(self, rows: List[tuple]):
         async with self.get_connection() as db:
-            await db.execute(
+            await db.executemany(
                 """INSERT INTO messages (id, conversation_id, content, role, message_type, metadata)
                    VALUES (?, ?, ?, ?, ?, ?)""",
-                (message_id, conversation_id, content, role, message_type, 
-                 json.dumps(metadata) if metadata else None)
+                rows
             )
             
-            # 更新会话的更新时间
-            await db.execute(
+            # 更新会话的更新时间（每个会话只更新一次）
+            await db.executemany(
                 "UPDATE conversations SET updated_at = CURRENT_TIMESTAMP WHERE id = ?",
-                (conversation_id,)
+                [(conversation_id,) for conversation_id in dict.fromkeys(row[1] for row in rows)]
             )
             
             await db.commit()
-        
-        return message_id
     
-    async def get_conversation_history(self, conversation_id: str, limit: int = 100) -> List[Dict]:
-        """获取会话历史"""
+    async def _write_pending_messages(self):
+        """把等待中的消息按批写入，一个批次一个事务"""
+        while self._pending_messages:
+            batch = self._pending_messages[:MESSAGE_BATCH_MAX_SIZE]
+            del self._pending_messages[:MESSAGE_BATCH_MAX_SIZE]
+            try:
+                await self._insert_messages([row for row, _ in batch])
+            except Exception as e:
+                logger.error(f"批量保存 {len(batch)} 条消息失败: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_result(None)
+    
+    async def get_conversation_history(self, conversation_id: str, limit: int = 100,
+                                       after: str = None) -> List[Dict]:
+        """获取会话历史（按时间正序）
+
+        Args:
+            conversation_id: 会话ID
+            limit: 返回的最大消息数
+            after: 分页游标，只返回该游标之后的消息
+        """
+        rows = await self._fetch_messages("*", conversation_id, limit, after, newest_first=False)
+        return [self._decode_message(row) for row in rows]
+    
+    async def get_latest_messages(self, conversation_id: str, limit: int = 50,
+                                  before: str = None) -> List[Dict]:
+        """获取最新的一页消息，按时间正序返回
+
+        Args:
+            conversation_id: 会话ID
+            limit: 返回的最大消息数
+            before: 分页游标，只返回该游标之前（更早）的消息，用于向前翻页
+        """
+        rows = await self._fetch_messages("*", conversation_id, limit, before, newest_first=True)
+        return [self._decode_message(row) for row in reversed(rows)]
+    
+    async def get_message_summaries(self, conversation_id: str, limit: int = 50,
+                                    before: str = None) -> List[Dict]:
+        """获取最新一页消息的摘要（不含内容和metadata，只读索引），按时间正序返回"""
+        rows = await self._fetch_messages("id, role, message_type, timestamp", conversation_id, limit, before,
+                                          newest_first=True)
+        return [dict(row) for row in reversed(rows)]
+    
+    async def _fetch_messages(self, columns: str, conversation_id: str, limit: int,
+                              cursor: Optional[str], newest_first: bool):
+        where, params = "conversation_id = ?", [conversation_id]
+        if cursor:
+            where += f" AND (timestamp, id) {'<' if newest_first else '>'} (?, ?)"
+            params.extend(decode_cursor(cursor))
+        order = "DESC" if newest_first else "ASC"
         async with self.get_connection() as db:
-            cursor = await db.execute(
-                """SELECT * FROM messages 
-                   WHERE conversation_id = ? 
-                   ORDER BY timestamp ASC LIMIT ?""",
-                (conversation_id, limit)
+            result = await db.execute(
+                f"""SELECT {columns} FROM messages 
+                    WHERE {where}
+                    ORDER BY timestamp {order}, id {order} LIMIT ?""",
+                (*params, limit)
             )
-            rows = await cursor.fetchall()
-            
-            messages = []
-            for row in rows:
-                msg = dict(row)
-                msg['metadata'] = json.loads(msg['metadata']) if msg['metadata'] else {}
-                messages.append(msg)
-            
-            return messages
+            return await result.fetchall()
+    
+    @staticmethod
+    def _decode_message(row) -> Dict:
+        msg = dict(row)
+        msg['metadata'] = json.loads(msg['metadata']) if msg['metadata'] else {}
+        return msg
     
     async def save_plan(self, plan_id: str, conversation_id: str, user_id: str, 
                        question: str, plan_data: Dict) -> None:
@@ -251,4 +439,9 @@ async def get_db() -> SQLiteDB:
 
 async def init_db():
     """初始化数据库"""
-    await db_instance.init_database()
\ No newline at end of file
+    await db_instance.init_database()
+
+
+async def close_db():
+    """关闭数据库连接"""
+    await db_instance.close()
\ No newline at end of file
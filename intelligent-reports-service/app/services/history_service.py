@@ -5,11 +5,13 @@ from typing import Optional, List, Dict, Any
 from datetime import datetime
 import uuid
 
+from app.database.sqlite_db import generate_id, encode_cursor
 from app.database.repository import (
     get_conversation_repo, get_message_repo, get_plan_repo, get_user_session_repo
 )
 from app.database.models import (
     ConversationModel, MessageModel, PlanModel,
+    ConversationSummaryModel, MessageSummaryModel,
     MessageRole, MessageType, PlanStatus,
     ChatHistoryRequest, ChatHistoryResponse, ConversationListResponse,
     SaveMessageRequest, CreateConversationRequest
@@ -33,16 +35,24 @@ class HistoryService:
         
         return conversation
     
-    async def get_conversations(self, user_id: str, limit: int = 10) -> ConversationListResponse:
-        """获取用户的会话列表"""
+    async def get_conversations(self, user_id: str, limit: int = 10,
+                                before: str = None) -> ConversationListResponse:
+        """获取用户的会话列表（按更新时间倒序），before 为上一页返回的 next_cursor"""
         repo = await get_conversation_repo()
-        conversations = await repo.get_by_user(user_id, limit)
+        conversations = await repo.get_by_user(user_id, limit, before)
         
         return ConversationListResponse(
             conversations=conversations,
-            total_count=len(conversations)
+            total_count=len(conversations),
+            next_cursor=self._next_cursor(conversations, limit, "updated_at")
         )
     
+    async def get_conversation_summaries(self, user_id: str, limit: int = 10,
+                                         before: str = None) -> List[ConversationSummaryModel]:
+        """获取用户的会话摘要列表（不含metadata，用于列表展示）"""
+        repo = await get_conversation_repo()
+        return await repo.get_summaries_by_user(user_id, limit, before)
+    
     async def get_conversation_by_id(self, conversation_id: str) -> Optional[ConversationModel]:
         """根据ID获取会话"""
         repo = await get_conversation_repo()
@@ -72,39 +82,89 @@ class HistoryService:
         logger.info(f"保存消息: {message.id} to conversation: {conversation_id}")
         return message
     
+    async def save_messages(self, user_id: str, messages: List[Dict[str, Any]],
+                            conversation_id: str = None, title: str = None) -> str:
+        """在一个事务中保存同一会话的多条消息，没有指定会话ID时先创建会话
+
+        Args:
+            user_id: 用户ID
+            messages: 消息列表，每项包含 content、role（MessageRole），可选 message_type（MessageType）、metadata
+            conversation_id: 会话ID
+            title: 新建会话的标题
+
+        Returns:
+            str: 会话ID
+        """
+        if not conversation_id:
+            conversation = await self.create_conversation(user_id, title)
+            conversation_id = conversation.id
+        
+        repo = await get_message_repo()
+        message_ids = await repo.save_many(conversation_id, messages)
+        
+        logger.info(f"保存 {len(message_ids)} 条消息到会话: {conversation_id}")
+        return conversation_id
+    
     async def get_conversation_history(self, conversation_id: str, 
-                                     limit: int = 100) -> ChatHistoryResponse:
-        """获取会话历史记录"""
+                                     limit: int = 100, after: str = None) -> ChatHistoryResponse:
+        """获取会话历史记录（从最早的消息开始），after 为上一页返回的 next_cursor"""
+        repo = await get_message_repo()
+        messages = await repo.get_conversation_history(conversation_id, limit, after)
+        
+        return ChatHistoryResponse(
+            conversation_id=conversation_id,
+            messages=messages,
+            total_count=len(messages),
+            next_cursor=self._next_cursor(messages, limit, "timestamp")
+        )
+    
+    async def get_history_page(self, conversation_id: str, limit: int = 50,
+                               before: str = None) -> ChatHistoryResponse:
+        """获取会话最新的一页消息（按时间正序），next_cursor 用于继续加载更早的消息"""
         repo = await get_message_repo()
-        messages = await repo.get_conversation_history(conversation_id, limit)
+        messages = await repo.get_latest_messages(conversation_id, limit, before)
         
         return ChatHistoryResponse(
             conversation_id=conversation_id,
             messages=messages,
-            total_count=len(messages)
+            total_count=len(messages),
+            next_cursor=self._next_cursor(messages[::-1], limit, "timestamp")
         )
     
     async def get_user_conversation_history(self, user_id: str, 
                                           conversation_id: str = None,
-                                          limit: int = 50) -> ChatHistoryResponse:
-        """获取用户的会话历史（如果没有指定会话ID，返回最新会话的历史）"""
+                                          limit: int = 50, before: str = None) -> ChatHistoryResponse:
+        """获取用户的会话历史（如果没有指定会话ID，返回最新会话的历史），每次返回一页，before 为上一页的 next_cursor"""
         if not conversation_id:
             # 获取用户最新的会话
-            conversations = await self.get_conversations(user_id, 1)
-            if conversations.conversations:
-                conversation_id = conversations.conversations[0].id
+            conversations = await self.get_conversation_summaries(user_id, 1)
+            if conversations:
+                conversation_id = conversations[0].id
             else:
                 # 如果没有会话，创建一个新的
                 conversation = await self.create_conversation(user_id)
                 conversation_id = conversation.id
         
-        return await self.get_conversation_history(conversation_id, limit)
+        return await self.get_history_page(conversation_id, limit, before)
     
     async def get_latest_messages(self, conversation_id: str, 
-                                count: int = 10) -> List[MessageModel]:
+                                count: int = 10, before: str = None) -> List[MessageModel]:
         """获取会话中最新的几条消息"""
         repo = await get_message_repo()
-        return await repo.get_latest_messages(conversation_id, count)
+        return await repo.get_latest_messages(conversation_id, count, before)
+    
+    async def get_message_summaries(self, conversation_id: str, count: int = 50,
+                                    before: str = None) -> List[MessageSummaryModel]:
+        """获取会话中最新的几条消息摘要（不含内容和metadata，用于列表展示）"""
+        repo = await get_message_repo()
+        return await repo.get_summaries(conversation_id, count, before)
+    
+    @staticmethod
+    def _next_cursor(items: List[Any], limit: int, sort_field: str) -> Optional[str]:
+        """本页已满时，返回以最后一项为起点的下一页游标"""
+        if not items or len(items) < limit:
+            return None
+        return encode_cursor(getattr(items[-1], sort_field), items[-1].id)
     
     async def save_plan(self, plan_id: str, conversation_id: str, user_id: str,
                        question: str, plan_data: Dict) -> PlanModel:
@@ -175,9 +235,13 @@ class HistoryService:
     async def convert_chat_history_to_cosight_format(self, conversation_id: str) -> List[Dict]:
         """将聊天历史转换为CoSight格式"""
         history_response = await self.get_conversation_history(conversation_id)
-        
+        return self.convert_messages_to_cosight_format(history_response.messages)
+    
+    @staticmethod
+    def convert_messages_to_cosight_format(messages: List[MessageModel]) -> List[Dict]:
+        """将已加载的消息转换为CoSight格式"""
         cosight_history = []
-        for message in history_response.messages:
+        for message in messages:
             cosight_message = {
                 "role": message.role.value,
                 "content": message.content
@@ -197,7 +261,7 @@ class HistoryService:
     async def save_cosight_conversation(self, user_id: str, question: str, 
                                       plan_result: str, plan_data: Dict,
                                       conversation_id: str = None) -> str:
-        """保存CoSight对话的完整流程"""
+        """保存CoSight对话的完整流程（用户问题和AI回复在一个事务中写入）"""
         # 创建或使用现有会话
         if not conversation_id:
             conversation = await self.create_conversation(
@@ -206,28 +270,16 @@ class HistoryService:
             )
             conversation_id = conversation.id
         
-        # 保存用户问题
-        await self.save_message(SaveMessageRequest(
-            conversation_id=conversation_id,
-            user_id=user_id,
-            content=question,
-            role=MessageRole.USER,
-            message_type=MessageType.CHAT
-        ))
-        
         # 保存计划数据
-        plan_id = f"plan_{int(datetime.now().timestamp() * 1000000)}"
+        plan_id = generate_id("plan")
         await self.save_plan(plan_id, conversation_id, user_id, question, plan_data)
         
-        # 保存AI回复
-        await self.save_message(SaveMessageRequest(
-            conversation_id=conversation_id,
-            user_id=user_id,
-            content=plan_result,
-            role=MessageRole.ASSISTANT,
-            message_type=MessageType.RESULT,
-            metadata={"plan_id": plan_id}
-        ))
+        # 保存用户问题和AI回复
+        await self.save_messages(user_id, [
+            {"content": question, "role": MessageRole.USER, "message_type": MessageType.CHAT},
+            {"content": plan_result, "role": MessageRole.ASSISTANT, "message_type": MessageType.RESULT,
+             "metadata": {"plan_id": plan_id}}
+        ], conversation_id)
         
         logger.info(f"保存CoSight完整对话: {conversation_id}")
         return conversation_id
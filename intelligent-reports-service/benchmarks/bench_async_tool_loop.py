@@ -0,0 +1,150 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+异步工具调用基准测试：对比每次调用新建事件循环（BaseAgent 原实现）与提交到共享后台事件循环。
+
+- noop：空协程，只衡量事件循环的创建开销
+- tcp client：工具缓存一个到本地echo服务的连接，连接只能在创建它的事件循环中复用，
+  每次新建事件循环时必须重新连接
+
+运行：
+    python benchmarks/bench_async_tool_loop.py [调用次数]
+"""
+
+import asyncio
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.common.domain.util.background_loop import background_loop  # noqa: E402
+
+
+def start_echo_server() -> int:
+    """在独立线程中启动本地TCP echo服务，返回端口"""
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen()
+
+    def handle(conn):
+        with conn:
+            while data := conn.recv(4096):
+                conn.sendall(data)
+
+    def serve():
+        while True:
+            conn, _ = listener.accept()
+            threading.Thread(target=handle, args=(conn,), daemon=True).start()
+
+    threading.Thread(target=serve, daemon=True).start()
+    return listener.getsockname()[1]
+
+
+class EchoClientTool:
+    """缓存连接的异步客户端，模拟 httpx.AsyncClient 等只能在所属事件循环中复用的客户端"""
+
+    def __init__(self, port: int):
+        self.port = port
+        self.connections = 0
+        self._streams = None
+        self._loop = None
+
+    async def call(self, text: str) -> str:
+        if self._loop is not asyncio.get_running_loop() or self._loop.is_closed():
+            self._streams = await asyncio.open_connection("127.0.0.1", self.port)
+            self._loop = asyncio.get_running_loop()
+            self.connections += 1
+        reader, writer = self._streams
+        writer.write(text.encode() + b"\n")
+        await writer.drain()
+        return (await reader.readline()).decode().rstrip("\n")
+
+
+async def noop(text: str) -> str:
+    await asyncio.sleep(0)
+    return text
+
+
+def run_with_new_loop(coro):
+    """原实现：每次调用新建并关闭事件循环"""
+    loop = asyncio.new_event_loop()
+    try:
+        asyncio.set_event_loop(loop)
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def run_with_shared_loop(coro):
+    return background_loop.run(coro, timeout=10)
+
+
+def measure(runner, tool, calls: int) -> list:
+    """与 BaseAgent._execute_tool_calls 一样在线程池的工作线程中执行"""
+    latencies = []
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        for i in range(calls):
+            start = time.perf_counter()
+            assert executor.submit(runner, tool(f"call {i}")).result() == f"call {i}"
+            latencies.append((time.perf_counter() - start) * 1e6)
+    return latencies
+
+
+def check_timeout():
+    """超时后协程应被取消"""
+    cancelled = threading.Event()
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    start = time.perf_counter()
+    try:
+        background_loop.run(slow(), timeout=0.2)
+        raise AssertionError("expected TimeoutError")
+    except TimeoutError:
+        pass
+    assert cancelled.wait(1) and time.perf_counter() - start < 1
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    port = start_echo_server()
+
+    print(f"{'tool':<12}{'loop':<9}{'calls':>7}{'mean (us)':>12}{'p50 (us)':>11}{'p95 (us)':>11}{'connects':>10}")
+    for tool_name in ("noop", "tcp client"):
+        for loop_name, runner in (("new", run_with_new_loop), ("shared", run_with_shared_loop)):
+            client = EchoClientTool(port)
+            tool = noop if tool_name == "noop" else client.call
+            latencies = sorted(measure(runner, tool, calls))
+            connects = client.connections if tool_name == "tcp client" else "-"
+            print(f"{tool_name:<12}{loop_name:<9}{calls:>7}{statistics.mean(latencies):>12.1f}"
+                  f"{statistics.median(latencies):>11.1f}{latencies[int(len(latencies) * 0.95) - 1]:>11.1f}{connects:>10}")
+
+    check_timeout()
+    print("timeout cancels the coroutine: ok")
+
+
+if __name__ == "__main__":
+    main()
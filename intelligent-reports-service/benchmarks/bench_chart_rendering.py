@@ -0,0 +1,125 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+图表渲染基准测试：渲染一份包含40张图表（其中部分图表规格相同）的报告
+
+- serial：原实现在调用线程中逐张渲染（write_html + kaleido to_image）
+- threads：原实现在报告的线程池中并发渲染，共用进程内的kaleido
+- pooled：提交到预热的渲染进程池，相同规格的图表只渲染一次
+
+运行：
+    python benchmarks/bench_chart_rendering.py [图表数] [渲染进程数]
+"""
+import concurrent.futures
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import plotly.express as px  # noqa: E402
+
+from app.common.logger_util import logger  # noqa: E402
+from app.cosight.tool.chart_render_pool import (  # noqa: E402
+    CHART_RENDER_WORKERS, ChartRenderPool, chart_spec, render_chart)
+
+# 每4张图表中有1张与前面的图表相同（例如多个章节引用同一组数据）
+DUPLICATE_EVERY = 4
+
+
+def build_figures(count: int) -> list:
+    figures = []
+    for i in range(count):
+        n = i - 1 if i % DUPLICATE_EVERY == DUPLICATE_EVERY - 1 else i
+        categories = [f"Q{q}" for q in range(1, 9)]
+        values = [(n * 7 + q * 13) % 50 + 10 for q in range(8)]
+        kind = n % 4
+        if kind == 0:
+            fig = px.bar(x=categories, y=values, title=f"图表 {n}")
+        elif kind == 1:
+            fig = px.line(x=categories, y=values, title=f"图表 {n}")
+        elif kind == 2:
+            fig = px.pie(names=categories, values=values, title=f"图表 {n}")
+        else:
+            fig = px.scatter(x=values, y=values[::-1], size=values, title=f"图表 {n}")
+        figures.append(fig)
+    return figures
+
+
+def run_serial(specs: list) -> tuple:
+    results, errors = [], 0
+    for spec in specs:
+        try:
+            results.append(render_chart(spec))
+        except Exception:
+            errors += 1
+    return results, errors, len(specs)
+
+
+def run_threads(specs: list, workers: int = 8) -> tuple:
+    results, errors = [], 0
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        for future in [executor.submit(render_chart, spec) for spec in specs]:
+            try:
+                results.append(future.result())
+            except Exception:
+                errors += 1
+    return results, errors, len(specs)
+
+
+def run_pooled(pool: ChartRenderPool, specs: list) -> tuple:
+    results, errors = [], 0
+    # 与报告生成一样从多个线程提交，排队数受 max_pending 限制
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+        for future in [executor.submit(pool.render, spec) for spec in specs]:
+            try:
+                results.append(future.result())
+            except Exception:
+                errors += 1
+    return results, errors, len({pool.spec_key(spec) for spec in specs})
+
+
+def main():
+    logger.setLevel("WARNING")
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else CHART_RENDER_WORKERS
+
+    figures = build_figures(count)
+    start = time.perf_counter()
+    specs = [chart_spec(fig) for fig in figures]
+    print(f"{count} charts, building specs took {time.perf_counter() - start:.2f}s, "
+          f"{os.cpu_count()} CPUs, {workers} render workers")
+
+    # 启动进程内的kaleido，与预热的进程池公平比较
+    render_chart(chart_spec(px.bar(x=["a"], y=[1])))
+    pool = ChartRenderPool(max_workers=workers)
+    start = time.perf_counter()
+    pool.start()
+    print(f"pool start and warm-up took {time.perf_counter() - start:.2f}s\n")
+
+    print(f"{'mode':<10}{'seconds':>9}{'charts/s':>10}{'renders':>9}{'errors':>8}")
+    for mode, runner in (("serial", run_serial), ("threads", run_threads),
+                         ("pooled", lambda s: run_pooled(pool, s))):
+        start = time.perf_counter()
+        results, errors, renders = runner(specs)
+        elapsed = time.perf_counter() - start
+        print(f"{mode:<10}{elapsed:>9.2f}{count / elapsed:>10.1f}{renders:>9}{errors:>8}")
+        assert all(r["image_base64"] and r["chart_html"] for r in results)
+    pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+历史记录分页基准测试：在大库（默认100万条消息）上对比原查询与游标分页/覆盖索引/摘要查询
+
+先用原索引建库并测量原查询，再由 SQLiteDB.init_database() 迁移到新索引后测量新查询：
+- conversation list：用户的会话列表，原查询回表取全部字段并临时排序，新查询只读覆盖索引
+- latest page：最新一页消息（全部字段 / 摘要）
+- page back：从最新消息开始向前翻页，原实现只能用 OFFSET，游标分页每页开销固定
+
+运行：
+    python benchmarks/bench_history_pagination.py [消息总数] [向前翻页数]
+"""
+import asyncio
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.common.logger_util import logger  # noqa: E402
+from app.database.sqlite_db import SQLiteDB, encode_cursor  # noqa: E402
+
+USERS = 100
+CONVERSATIONS_PER_USER = 10
+# 一个长会话占全部消息的10%，用于测试深度翻页
+HEAVY_SHARE = 0.1
+PAGE = 50
+SAMPLES = 200
+
+OLD_SCHEMA = """
+CREATE TABLE conversations (
+    id TEXT PRIMARY KEY, user_id TEXT NOT NULL, title TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    is_active BOOLEAN DEFAULT 1, metadata TEXT);
+CREATE TABLE messages (
+    id TEXT PRIMARY KEY, conversation_id TEXT NOT NULL, content TEXT NOT NULL, role TEXT NOT NULL,
+    message_type TEXT DEFAULT 'chat', timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP, metadata TEXT,
+    FOREIGN KEY (conversation_id) REFERENCES conversations (id));
+CREATE INDEX idx_conversations_user_id ON conversations(user_id);
+CREATE INDEX idx_messages_conversation_id ON messages(conversation_id);
+CREATE INDEX idx_messages_conversation_timestamp ON messages(conversation_id, timestamp);
+"""
+
+OLD_CONVERSATION_LIST = """SELECT * FROM conversations WHERE user_id = ? AND is_active = 1
+                           ORDER BY updated_at DESC LIMIT ?"""
+OLD_LATEST_PAGE = """SELECT * FROM messages WHERE conversation_id = ?
+                     ORDER BY timestamp DESC, rowid DESC LIMIT ? OFFSET ?"""
+
+
+def build_database(db_path: str, total_messages: int) -> tuple:
+    """按原表结构和索引建库，返回 (普通会话ID列表, 长会话ID, 消息数)"""
+    base = datetime(2025, 1, 1)
+    conn = sqlite3.connect(db_path)
+    conn.executescript(OLD_SCHEMA)
+
+    conversations = []
+    for u in range(USERS):
+        for c in range(CONVERSATIONS_PER_USER):
+            conversations.append((f"conv_{u}_{c}", f"user_{u}", f"对话 {u}-{c}"))
+    heavy_id = conversations[0][0]
+    normal_ids = [conversation[0] for conversation in conversations[1:]]
+
+    heavy_count = int(total_messages * HEAVY_SHARE)
+    per_conversation = (total_messages - heavy_count) // len(normal_ids)
+    content = "报告内容" * 60
+    metadata = '{"source": "bench", "tokens": 512}'
+
+    def rows():
+        for conversation_id, count in [(heavy_id, heavy_count)] + [(cid, per_conversation) for cid in normal_ids]:
+            for i in range(count):
+                timestamp = (base + timedelta(seconds=i)).strftime("%Y-%m-%d %H:%M:%S")
+                yield (f"msg_{conversation_id}_{i:07d}", conversation_id, content,
+                       "user" if i % 2 == 0 else "assistant", "chat", timestamp, metadata)
+
+    conn.executemany(
+        "INSERT INTO messages (id, conversation_id, content, role, message_type, timestamp, metadata) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)", rows())
+    conn.executemany(
+        "INSERT INTO conversations (id, user_id, title, updated_at, metadata) VALUES (?, ?, ?, ?, ?)",
+        [(cid, uid, title, (base + timedelta(minutes=i)).strftime("%Y-%m-%d %H:%M:%S"), metadata)
+         for i, (cid, uid, title) in enumerate(conversations)])
+    conn.commit()
+    stored = conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+    conn.close()
+    return normal_ids, heavy_id, stored
+
+
+async def timed(calls) -> float:
+    """依次执行协程工厂，返回每次调用的平均耗时（毫秒）"""
+    latencies = []
+    for call in calls:
+        start = time.perf_counter()
+        await call()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return statistics.mean(latencies)
+
+
+async def raw_query(db: SQLiteDB, sql: str, params: tuple) -> list:
+    async with db.get_connection() as conn:
+        return await (await conn.execute(sql, params)).fetchall()
+
+
+async def old_query(db: SQLiteDB, sql: str, params: tuple) -> list:
+    """原实现同样会解析metadata"""
+    return [SQLiteDB._decode_message(row) for row in await raw_query(db, sql, params)]
+
+
+async def measure_old(db: SQLiteDB, users: list, conversation_ids: list, heavy_id: str, pages: int) -> dict:
+    results = {
+        "conversation list": await timed(
+            [lambda u=u: old_query(db, OLD_CONVERSATION_LIST, (u, 10)) for u in users]),
+        "latest page (full)": await timed(
+            [lambda c=c: old_query(db, OLD_LATEST_PAGE, (c, PAGE, 0)) for c in conversation_ids]),
+    }
+
+    async def page_back():
+        for page in range(pages):
+            rows = await old_query(db, OLD_LATEST_PAGE, (heavy_id, PAGE, page * PAGE))
+            assert len(rows) == PAGE
+    results[f"page back x{pages}"] = await timed([page_back])
+    return results
+
+
+async def measure_new(db: SQLiteDB, users: list, conversation_ids: list, heavy_id: str, pages: int) -> dict:
+    results = {
+        "conversation list": await timed(
+            [lambda u=u: db.get_conversation_summaries(u, 10) for u in users]),
+        "latest page (full)": await timed(
+            [lambda c=c: db.get_latest_messages(c, PAGE) for c in conversation_ids]),
+        "latest page (summary)": await timed(
+            [lambda c=c: db.get_message_summaries(c, PAGE) for c in conversation_ids]),
+    }
+
+    async def page_back():
+        before = None
+        for _ in range(pages):
+            rows = await db.get_latest_messages(heavy_id, PAGE, before)
+            assert len(rows) == PAGE
+            before = encode_cursor(rows[0]["timestamp"], rows[0]["id"])
+    results[f"page back x{pages}"] = await timed([page_back])
+    return results
+
+
+async def check_pages(db: SQLiteDB, heavy_id: str, pages: int):
+    """游标分页与 OFFSET 分页返回的消息一致"""
+    before = None
+    for page in range(pages):
+        keyset = await db.get_latest_messages(heavy_id, PAGE, before)
+        offset = await raw_query(db, OLD_LATEST_PAGE, (heavy_id, PAGE, page * PAGE))
+        assert [row["id"] for row in keyset] == [row["id"] for row in reversed(offset)]
+        before = encode_cursor(keyset[0]["timestamp"], keyset[0]["id"])
+
+
+async def explain(db: SQLiteDB, sql: str, params: tuple) -> str:
+    rows = await raw_query(db, f"EXPLAIN QUERY PLAN {sql}", params)
+    return "; ".join(row["detail"] for row in rows)
+
+
+async def main():
+    logger.setLevel("WARNING")
+    total_messages = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    pages = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    random.seed(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        start = time.perf_counter()
+        normal_ids, heavy_id, stored = build_database(db_path, total_messages)
+        print(f"built {stored} messages in {time.perf_counter() - start:.1f}s\n")
+
+        users = [f"user_{random.randrange(USERS)}" for _ in range(SAMPLES)]
+        conversation_ids = [random.choice(normal_ids) for _ in range(SAMPLES)]
+
+        db = SQLiteDB(db_path)
+        old = await measure_old(db, users, conversation_ids, heavy_id, pages)
+
+        start = time.perf_counter()
+        await db.init_database()
+        print(f"migrated indexes in {time.perf_counter() - start:.1f}s\n")
+        new = await measure_new(db, users, conversation_ids, heavy_id, pages)
+        await check_pages(db, heavy_id, 20)
+
+        print(f"{'query':<24}{'old (ms)':>10}{'new (ms)':>10}{'speedup':>9}")
+        for name, new_ms in new.items():
+            old_ms = old.get(name, old.get(name.replace("summary", "full")))
+            print(f"{name:<24}{old_ms:>10.3f}{new_ms:>10.3f}{old_ms / new_ms:>8.1f}x")
+
+        print("\nquery plans:")
+        plans = {
+            "conversation list": ("SELECT id, title, created_at, updated_at FROM conversations "
+                                  "WHERE user_id = ? AND is_active = 1 AND (updated_at, id) < (?, ?) "
+                                  "ORDER BY updated_at DESC, id DESC LIMIT 10", ("user_1", "9999", "z")),
+            "message page": ("SELECT * FROM messages WHERE conversation_id = ? AND (timestamp, id) < (?, ?) "
+                             "ORDER BY timestamp DESC, id DESC LIMIT 50", (heavy_id, "9999", "z")),
+            "message summary": ("SELECT id, role, message_type, timestamp FROM messages "
+                                "WHERE conversation_id = ? AND (timestamp, id) < (?, ?) "
+                                "ORDER BY timestamp DESC, id DESC LIMIT 50", (heavy_id, "9999", "z")),
+        }
+        for name, (sql, params) in plans.items():
+            plan = await explain(db, sql, params)
+            assert "TEMP B-TREE" not in plan, plan
+            print(f"  {name:<18}{plan}")
+        await db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
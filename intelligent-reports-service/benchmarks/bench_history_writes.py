@@ -0,0 +1,113 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+历史记录写入吞吐基准测试：多个会话并发流式保存消息
+
+- per-connection：原实现，每条消息新建连接，INSERT + UPDATE 后单独提交（默认rollback journal）
+- pooled：连接池 + WAL，并发的 save_message 合并到同一个事务
+- batched：每个会话每 BATCH 条消息调用一次 save_messages
+
+运行：
+    python benchmarks/bench_history_writes.py [会话数] [每个会话的消息数]
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import aiosqlite
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.common.logger_util import logger  # noqa: E402
+from app.database.sqlite_db import SQLiteDB  # noqa: E402
+
+BATCH = 20
+
+
+async def legacy_save_message(db_path: str, conversation_id: str, content: str, role: str) -> str:
+    """原 save_message 实现"""
+    message_id = f"msg_{int(datetime.now().timestamp() * 1000000)}"
+    async with aiosqlite.connect(db_path) as db:
+        await db.execute(
+            """INSERT OR IGNORE INTO messages (id, conversation_id, content, role, message_type, metadata)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            (message_id, conversation_id, content, role, "chat", json.dumps({"chunk": True}))
+        )
+        await db.execute("UPDATE conversations SET updated_at = CURRENT_TIMESTAMP WHERE id = ?", (conversation_id,))
+        await db.commit()
+    return message_id
+
+
+async def run(mode: str, conversations: int, messages: int) -> tuple:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        db = SQLiteDB(db_path)
+        await db.init_database()
+        conversation_ids = [await db.create_conversation(f"user_{i}", "bench") for i in range(conversations)]
+        if mode == "per-connection":
+            # 原实现没有WAL
+            await db.close()
+            async with aiosqlite.connect(db_path) as conn:
+                await conn.execute("PRAGMA journal_mode=DELETE")
+
+        async def stream(conversation_id: str):
+            if mode == "per-connection":
+                for i in range(messages):
+                    await legacy_save_message(db_path, conversation_id, f"chunk {i}", "assistant")
+            elif mode == "pooled":
+                for i in range(messages):
+                    await db.save_message(conversation_id, f"chunk {i}", "assistant", metadata={"chunk": True})
+            else:
+                for start in range(0, messages, BATCH):
+                    await db.save_messages(conversation_id, [
+                        {"content": f"chunk {i}", "role": "assistant", "metadata": {"chunk": True}}
+                        for i in range(start, min(start + BATCH, messages))
+                    ])
+
+        start = time.perf_counter()
+        await asyncio.gather(*(stream(conversation_id) for conversation_id in conversation_ids))
+        elapsed = time.perf_counter() - start
+
+        if mode != "per-connection":
+            await db.close()
+        async with aiosqlite.connect(db_path) as conn:
+            stored = (await (await conn.execute("SELECT COUNT(*) FROM messages")).fetchone())[0]
+            distinct = (await (await conn.execute("SELECT COUNT(DISTINCT id) FROM messages")).fetchone())[0]
+        return elapsed, stored, distinct
+
+
+async def main():
+    logger.setLevel("WARNING")
+    conversations = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    messages = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    expected = conversations * messages
+
+    print(f"{'mode':<16}{'messages':>10}{'stored':>9}{'seconds':>10}{'msg/s':>10}")
+    for mode in ("per-connection", "pooled", "batched"):
+        elapsed, stored, distinct = await run(mode, conversations, messages)
+        assert stored == distinct
+        if mode != "per-connection":
+            # 原实现的时间戳ID在并发写入时会冲突（INSERT OR IGNORE 丢弃了重复ID的消息）
+            assert stored == expected
+        print(f"{mode:<16}{expected:>10}{stored:>9}{elapsed:>10.2f}{expected / elapsed:>10.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
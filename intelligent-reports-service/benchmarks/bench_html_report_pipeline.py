@@ -0,0 +1,205 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+HTML报告生成流水线基准测试：用固定延迟的桩LLM统计 create_html_report 的LLM调用次数和耗时
+
+- staged：原实现的分阶段执行，全部子章节重组完成后才开始分析可视化，全部图表完成后才提取关键指标
+- pipeline：按依赖关系并行，首次生成（无缓存）
+- rerun：不修改工作区重新生成，全部命中缓存
+- edit one file：修改一个文件后重新生成，只重新处理引用该文件的子章节
+
+运行：
+    python benchmarks/bench_html_report_pipeline.py [LLM延迟(秒)] [LLM并发上限]
+"""
+import concurrent.futures
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+LATENCY = float(sys.argv[1]) if len(sys.argv) > 1 else 0.2
+os.environ["HTML_REPORT_LLM_CONCURRENCY"] = sys.argv[2] if len(sys.argv) > 2 else "4"
+# 桩LLM不需要真实的模型配置
+for name, value in (("API_KEY", "stub"), ("API_BASE_URL", "http://127.0.0.1:9"), ("MODEL_NAME", "stub")):
+    os.environ.setdefault(name, value)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.common.logger_util import logger  # noqa: E402
+from app.cosight.tool import html_visualization_toolkit  # noqa: E402
+from app.cosight.tool.html_visualization_toolkit import HtmlVisualizationToolkit  # noqa: E402
+
+FILES = 6
+SECTIONS = 4
+SUBSECTIONS = 3
+
+
+class StubLLM:
+    """按提示词类型返回固定格式的结果，记录调用次数和最大并发数"""
+
+    base_url = "http://127.0.0.1:9"
+    api_key = "stub"
+    model = "stub"
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def chat_to_llm(self, messages):
+        prompt = messages[0]["content"]
+        kind = self._kind(prompt)
+        with self._lock:
+            self.calls[kind] += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.latency)
+            return getattr(self, f"_{kind}")(prompt)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    @staticmethod
+    def _kind(prompt: str) -> str:
+        if "报告大纲" in prompt:
+            return "outline"
+        if "子章节内容" in prompt:
+            return "reorganize"
+        if "可视化的数据" in prompt:
+            return "analyze"
+        if "关键指标" in prompt:
+            return "metrics"
+        raise ValueError(f"unexpected prompt: {prompt[:80]}")
+
+    @staticmethod
+    def _outline(prompt: str) -> str:
+        sections = [{
+            "title": f"{i + 1} 章节{i + 1}",
+            "subsections": [{"title": f"{i + 1}.{j + 1} 子章节",
+                             "content_from": [f"file_{(i * SUBSECTIONS + j) % FILES}.md"]}
+                            for j in range(SUBSECTIONS)]
+        } for i in range(SECTIONS)]
+        return json.dumps({"title": "基准报告", "subtitle": "桩LLM", "sections": sections}, ensure_ascii=False)
+
+    @staticmethod
+    def _reorganize(prompt: str) -> str:
+        digest = hashlib.md5(prompt.encode("utf-8")).hexdigest()
+        return f"#### 摘要\n\n内容 {digest}，营收 **{int(digest[:4], 16)}** 万元。"
+
+    @staticmethod
+    def _analyze(prompt: str) -> str:
+        # 约三分之一的子章节适合生成图表
+        if int(hashlib.md5(prompt.encode("utf-8")).hexdigest(), 16) % 3:
+            return json.dumps({"suitable_for_visualization": False, "reason": "数据点过少"}, ensure_ascii=False)
+        return json.dumps({
+            "suitable_for_visualization": True, "theme": "营收", "chart_type": "柱状图",
+            "variables": {"x_axis": "季度", "y_axis": "营收"},
+            "data_points": [{"category": f"Q{q}", "value": q * 100} for q in range(1, 5)],
+            "data_unit": "万元"
+        }, ensure_ascii=False)
+
+    @staticmethod
+    def _metrics(prompt: str) -> str:
+        return json.dumps({"metrics": [{"name": "营收", "value": "100万元", "trend": "上升",
+                                        "description": "季度营收"}]}, ensure_ascii=False)
+
+
+def write_workspace(path: str):
+    for i in range(FILES):
+        with open(os.path.join(path, f"file_{i}.md"), "w", encoding="utf-8") as f:
+            f.write(f"# 资料{i}\n\n" + "市场数据。" * 400)
+
+
+def staged_sections(toolkit: HtmlVisualizationToolkit, text_files: list, outline: dict, chart_types: list) -> dict:
+    """原实现的执行顺序：重组内容 -> 分析可视化 -> 提取关键指标，每个阶段结束后才开始下一个阶段"""
+    sections = toolkit.reorganize_content(text_files, outline)
+    subsections = [subsection for section in sections for subsection in section["subsections"]]
+    max_workers = min(10, max(1, min(os.cpu_count() or 4, len(subsections))))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        visualizations = [v for v in executor.map(
+            lambda subsection: toolkit.visualize_subsection(subsection, chart_types), subsections) if v]
+    toolkit.extract_key_metrics(toolkit._join_section_content(sections))
+    return {"sections": sections, "visualizations": visualizations}
+
+
+def run(stub: StubLLM, action) -> tuple:
+    stub.calls.clear()
+    stub.max_in_flight = 0
+    start = time.perf_counter()
+    result = action()
+    return time.perf_counter() - start, dict(stub.calls), stub.max_in_flight, result
+
+
+def main():
+    logger.setLevel("WARNING")
+    stub = StubLLM(LATENCY)
+    html_visualization_toolkit.llm_for_tool = stub
+    chart_types = ["bar"]
+    limit = html_visualization_toolkit.HTML_REPORT_LLM_CONCURRENCY
+
+    print(f"LLM latency {LATENCY}s, concurrency limit {limit}, "
+          f"{SECTIONS * SUBSECTIONS} subsections from {FILES} files\n")
+    print(f"{'mode':<16}{'seconds':>9}{'llm calls':>11}{'in flight':>11}  calls by kind")
+    with tempfile.TemporaryDirectory() as staged_dir, tempfile.TemporaryDirectory() as workspace:
+        write_workspace(staged_dir)
+        write_workspace(workspace)
+
+        def staged():
+            html_visualization_toolkit.HTML_REPORT_CACHE_ENABLED = False
+            try:
+                toolkit = HtmlVisualizationToolkit(staged_dir)
+                text_files = toolkit.read_text_files_from_workspace()
+                outline = toolkit.generate_outline(text_files)
+                return staged_sections(toolkit, text_files, outline, chart_types)
+            finally:
+                html_visualization_toolkit.HTML_REPORT_CACHE_ENABLED = True
+
+        def pipeline():
+            result = HtmlVisualizationToolkit(workspace).create_html_report(chart_types=chart_types)
+            assert result["status"] == "success", result
+            return result
+
+        reports = {}
+        for mode, action in (("staged", staged), ("pipeline", pipeline), ("rerun", pipeline),
+                             ("edit one file", pipeline)):
+            if mode == "edit one file":
+                with open(os.path.join(workspace, "file_0.md"), "a", encoding="utf-8") as f:
+                    f.write("\n\n新增的市场数据。")
+            elapsed, calls, in_flight, result = run(stub, action)
+            reports[mode] = result
+            assert in_flight <= limit, in_flight
+            print(f"{mode:<16}{elapsed:>9.2f}{sum(calls.values()):>11}{in_flight:>11}  "
+                  f"{', '.join(f'{k}={v}' for k, v in sorted(calls.items()))}")
+
+        # 不修改工作区时重新生成的报告与首次生成的内容一致（除生成时间和图表元素ID外）
+        def report_body(result):
+            with open(result["report_path"], encoding="utf-8") as f:
+                return re.sub(r"\d{4}-\d{2}-\d{2}[ \d:]*|\d{4}年\d{1,2}月\d{1,2}日|[0-9a-f]{8}(-[0-9a-f]{4}){3}-[0-9a-f]{12}",
+                              "", f.read())
+        assert report_body(reports["pipeline"]) == report_body(reports["rerun"])
+        print("\nrerun produces the same report: ok")
+
+
+if __name__ == "__main__":
+    main()
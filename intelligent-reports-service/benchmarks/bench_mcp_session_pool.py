@@ -0,0 +1,92 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+MCP会话复用基准测试：对本地stdio stub server（benchmarks/stub_mcp_server.py）重复调用工具，
+对比每次调用都重新连接与复用连接池中会话的单次调用延迟，并验证server进程退出后能自动重连。
+
+调用方式与 BaseAgent 一致：每次调用新建一个事件循环。
+
+运行：
+    python benchmarks/bench_mcp_session_pool.py [调用次数]
+"""
+
+import asyncio
+import logging
+import os
+import signal
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.agent_dispatcher.domain.plan.action.skill.mcp import engine  # noqa: E402
+from app.agent_dispatcher.domain.plan.action.skill.mcp.engine import MCPEngine  # noqa: E402
+from app.common.logger_util import logger  # noqa: E402
+
+STUB_CONFIG = {
+    "command": sys.executable,
+    "args": [os.path.join(os.path.dirname(os.path.abspath(__file__)), "stub_mcp_server.py")],
+}
+
+
+def invoke(tool_name: str, arguments: dict) -> str:
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(MCPEngine.invoke_mcp_tool("stub", STUB_CONFIG, tool_name, arguments))
+    finally:
+        loop.close()
+
+
+def measure(calls: int, pooled: bool) -> list:
+    engine.MCP_SESSION_POOL_ENABLED = pooled
+    latencies = []
+    for i in range(calls):
+        start = time.perf_counter()
+        assert invoke("echo", {"text": f"hello {i}"}) == f"hello {i}"
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def check_reconnect():
+    """server进程被杀掉后，下一次调用应透明地重新连接"""
+    engine.MCP_SESSION_POOL_ENABLED = True
+    old_pid = int(invoke("pid", {}))
+    os.kill(old_pid, signal.SIGKILL)
+    time.sleep(0.2)
+    new_pid = int(invoke("pid", {}))
+    assert new_pid != old_pid
+    assert invoke("echo", {"text": "again"}) == "again"
+
+
+def main():
+    logger.setLevel(logging.WARNING)
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+
+    print(f"{'mode':<10}{'calls':>8}{'first (ms)':>12}{'mean (ms)':>12}{'p50 (ms)':>11}{'p95 (ms)':>11}")
+    for name, pooled in (("per-call", False), ("pooled", True)):
+        latencies = measure(calls, pooled)
+        warm = sorted(latencies[1:])
+        print(f"{name:<10}{calls:>8}{latencies[0]:>12.1f}{statistics.mean(warm):>12.1f}"
+              f"{statistics.median(warm):>11.1f}{warm[int(len(warm) * 0.95) - 1]:>11.1f}")
+
+    check_reconnect()
+    print("reconnect after server exit: ok")
+    engine.mcp_session_pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+搜索查询缓存基准测试：多个并行的计划步骤向本地模拟的 Google/Brave/Tavily 接口发起相近的查询
+
+- requests：原实现，每次调用用 requests 新建连接同步请求
+- single-flight：异步连接池 + 相同查询合并请求，关闭缓存
+- cache：异步连接池 + 相同查询合并请求 + 短时间缓存
+
+同时检查：错误结果不缓存、缓存过期后重新请求、关键词提取对相同问题只调用一次大模型
+
+运行：
+    python benchmarks/bench_search_cache.py [模拟接口延迟(秒)] [并行步骤数]
+"""
+import asyncio
+import concurrent.futures
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+import requests
+from aiohttp import web
+
+LATENCY = float(sys.argv[1]) if len(sys.argv) > 1 else 0.2
+STEPS = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+PORT = 18765
+BASE_URL = f"http://127.0.0.1:{PORT}"
+os.environ.update({
+    "GOOGLE_SEARCH_API_URL": f"{BASE_URL}/google", "BRAVE_SEARCH_API_URL": f"{BASE_URL}/brave",
+    "TAVILY_SEARCH_API_URL": f"{BASE_URL}/tavily", "GOOGLE_API_KEY": "stub", "SEARCH_ENGINE_ID": "stub",
+    "BRAVE_API_KEY": "stub", "TAVILY_API_KEY": "stub",
+})
+os.environ.pop("PROXY", None)
+for name, value in (("API_KEY", "stub"), ("API_BASE_URL", "http://127.0.0.1:9"), ("MODEL_NAME", "stub")):
+    os.environ.setdefault(name, value)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.common.domain.util.background_loop import background_loop  # noqa: E402
+from app.common.logger_util import logger  # noqa: E402
+from app.cosight.tool.deep_search.services.flash_search_service import extract_search_keywords  # noqa: E402
+from app.cosight.tool.search_cache import QueryCache, normalize_query, search_cache  # noqa: E402
+from app.cosight.tool.search_toolkit import SearchToolkit  # noqa: E402
+
+# 并行的计划步骤常常提出几乎相同的问题
+QUESTIONS = ["2024年新能源汽车销量", "Tesla revenue 2024", "光伏组件价格走势", "储能电池 市场规模"]
+VARIANTS = ["{}", "{}？", " {} ", "{}?"]
+
+
+class MockSearchServer:
+    """本地模拟的搜索接口，记录请求数和TCP连接数"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.requests = Counter()
+        self.connections = set()
+        self.fail_next = set()
+        self._runner = None
+        self._loop = asyncio.new_event_loop()
+
+    def reset(self):
+        self.requests.clear()
+        self.connections.clear()
+
+    async def _respond(self, request: web.Request, provider: str, query: str) -> str:
+        self.requests[provider] += 1
+        self.connections.add(request.transport.get_extra_info("peername"))
+        await asyncio.sleep(self.latency)
+        if query in self.fail_next:
+            self.fail_next.discard(query)
+            raise web.HTTPInternalServerError(text="mock failure")
+        return f"{normalize_query(query)}-{abs(hash(normalize_query(query))) % 1000}"
+
+    async def google(self, request: web.Request) -> web.Response:
+        tag = await self._respond(request, "google", request.query["q"])
+        items = [{"title": f"{tag} {i}", "snippet": "snippet", "link": f"https://example.com/{tag}/{i}",
+                  "pagemap": {"metatags": [{"og:description": "description"}]}} for i in range(3)]
+        return web.json_response({"items": items})
+
+    async def brave(self, request: web.Request) -> web.Response:
+        tag = await self._respond(request, "brave", request.query["q"])
+        return web.json_response({"web": {"results": [{"title": tag, "url": f"https://example.com/{tag}"}]}})
+
+    async def tavily(self, request: web.Request) -> web.Response:
+        data = await request.json()
+        tag = await self._respond(request, "tavily", data["query"])
+        return web.json_response({"query": data["query"], "results": [
+            {"title": f"{tag} {i}", "url": f"https://example.com/{tag}/{i}", "content": "content"}
+            for i in range(data["max_results"])]})
+
+    def start(self):
+        app = web.Application()
+        app.router.add_get("/google", self.google)
+        app.router.add_get("/brave", self.brave)
+        app.router.add_post("/tavily", self.tavily)
+        self._runner = web.AppRunner(app, access_log=None)
+        started = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self._runner.setup())
+            self._loop.run_until_complete(web.TCPSite(self._runner, "127.0.0.1", PORT).start())
+            started.set()
+            self._loop.run_forever()
+
+        threading.Thread(target=run, daemon=True).start()
+        started.wait()
+
+
+def requests_search(provider: str, query: str):
+    """原实现：每次调用用 requests 同步请求"""
+    if provider == "google":
+        return requests.get(f"{BASE_URL}/google", params={"q": query}).json()
+    if provider == "brave":
+        return requests.get(f"{BASE_URL}/brave", params={"q": query}).json()["web"]
+    return requests.post(f"{BASE_URL}/tavily", json={"query": query, "max_results": 5}).json()
+
+
+def toolkit_search(toolkit: SearchToolkit, provider: str, query: str):
+    """与 BaseAgent 执行异步工具的方式一致：提交到共享的后台事件循环并等待结果"""
+    if provider == "google":
+        return background_loop.run(toolkit.search_google(query))
+    if provider == "brave":
+        return background_loop.run(toolkit.search_brave(query))
+    return background_loop.run(toolkit.tavily_search(query))
+
+
+def plan_steps(search) -> tuple:
+    """STEPS 个步骤并行执行（先后开始），每个步骤依次用三个搜索服务查询全部问题（写法各不相同）"""
+
+    def step(index: int):
+        time.sleep(index * LATENCY)
+        results = {}
+        for q, question in enumerate(QUESTIONS):
+            query = VARIANTS[(index + q) % len(VARIANTS)].format(question)
+            for provider in ("google", "brave", "tavily"):
+                results[(provider, question)] = search(provider, query)
+        return results
+
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=STEPS) as executor:
+        results = list(executor.map(step, range(STEPS)))
+    return time.perf_counter() - start, results
+
+
+class StubLLM:
+    model_name = "stub"
+
+    def __init__(self):
+        self.calls = 0
+
+    async def chat(self, messages):
+        self.calls += 1
+        await asyncio.sleep(LATENCY)
+        return "关键词一, 关键词二, keyword one, keyword two"
+
+
+def check_error_not_cached(server: MockSearchServer, toolkit: SearchToolkit):
+    server.fail_next.add("故障查询")
+    # 预期的失败请求不输出错误日志
+    logger.setLevel("CRITICAL")
+    first = background_loop.run(toolkit.tavily_search("故障查询"))
+    logger.setLevel("WARNING")
+    second = background_loop.run(toolkit.tavily_search("故障查询"))
+    assert "error" in first[0] and "results" in second, (first, second)
+
+
+def check_ttl(server: MockSearchServer):
+    toolkit = SearchToolkit(cache=QueryCache(ttl=0.3))
+    server.reset()
+    background_loop.run(toolkit.search_brave("过期查询"))
+    background_loop.run(toolkit.search_brave("过期查询"))
+    time.sleep(0.4)
+    background_loop.run(toolkit.search_brave("过期查询"))
+    assert server.requests["brave"] == 2, server.requests
+
+
+def check_keywords():
+    llm = StubLLM()
+
+    async def concurrent_steps():
+        return await asyncio.gather(*[extract_search_keywords(VARIANTS[i % len(VARIANTS)].format(QUESTIONS[0]), llm)
+                                      for i in range(STEPS)])
+
+    results = background_loop.run(concurrent_steps())
+    assert llm.calls == 1, llm.calls
+    assert all(result[1:] == results[0][1:] for result in results)
+    assert results[1][0] == VARIANTS[1].format(QUESTIONS[0])
+
+
+def main():
+    logger.setLevel("WARNING")
+    server = MockSearchServer(LATENCY)
+    server.start()
+    calls = STEPS * len(QUESTIONS) * 3
+    print(f"{STEPS} parallel steps, {calls} search calls, {len(QUESTIONS)} distinct questions, "
+          f"mock latency {LATENCY}s\n")
+
+    print(f"{'mode':<15}{'seconds':>9}{'upstream':>10}{'connections':>13}")
+    outcomes = {}
+    modes = (("requests", requests_search, None),
+             ("single-flight", None, QueryCache(enabled=False)),
+             ("cache", None, search_cache))
+    for mode, search, cache in modes:
+        if search is None:
+            toolkit = SearchToolkit(cache=cache)
+            search = lambda provider, query, toolkit=toolkit: toolkit_search(toolkit, provider, query)
+        server.reset()
+        elapsed, results = plan_steps(search)
+        outcomes[mode] = results
+        print(f"{mode:<15}{elapsed:>9.2f}{sum(server.requests.values()):>10}{len(server.connections):>13}")
+
+    # 每个步骤得到的结果与原实现一致
+    def urls(provider: str, result, raw: bool) -> list:
+        if provider == "google":
+            return [item["link"] for item in result["items"]] if raw else [item["url"] for item in result]
+        return [item["url"] for item in result["results"]]
+
+    for mode in ("single-flight", "cache"):
+        for old, new in zip(outcomes["requests"], outcomes[mode]):
+            for (provider, question), result in old.items():
+                assert urls(provider, result, True) == urls(provider, new[(provider, question)], False)
+
+    check_error_not_cached(server, SearchToolkit())
+    check_ttl(server)
+    check_keywords()
+    print("\nresults match, errors not cached, ttl expiry and keyword coalescing: ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+多搜索源检索基准测试：用延迟可配置的桩搜索源对比 SearchContext.search 的首个结果时间和合并结果
+
+- gather：原实现用 asyncio.gather 等待所有搜索源完成后才处理结果，最慢的搜索源决定首个结果的时间
+- streaming：按完成顺序处理搜索源，超过截止时间的搜索源被跳过，合并时按URL/正文去重并限制token数
+
+同时检查：不同的完成顺序下引文编号和合并内容一致，合并内容不超过token预算
+
+运行：
+    python benchmarks/bench_search_streaming.py [最慢搜索源延迟(秒)] [搜索源截止时间(秒)]
+"""
+import asyncio
+import itertools
+import os
+import sys
+import time
+
+SLOWEST = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+os.environ["SEARCH_SOURCE_TIMEOUT"] = sys.argv[2] if len(sys.argv) > 2 else "2"
+os.environ.setdefault("SEARCH_CONTEXT_MAX_TOKENS", "16000")
+# 桩搜索源不需要真实的模型配置
+for name, value in (("API_KEY", "stub"), ("API_BASE_URL", "http://127.0.0.1:9"), ("MODEL_NAME", "stub")):
+    os.environ.setdefault(name, value)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.common.logger_util import logger  # noqa: E402
+from app.cosight.tool.deep_search.common.entity import SearchSourceType  # noqa: E402
+from app.cosight.tool.deep_search.common.i18n_service import i18n  # noqa: E402
+from app.cosight.tool.deep_search.services import flash_search_service  # noqa: E402
+from app.cosight.tool.deep_search.services.flash_search_service import (  # noqa: E402
+    SEARCH_CONTEXT_MAX_TOKENS, SEARCH_SOURCE_TIMEOUT, SearchContext, estimate_tokens)
+
+RESULTS_PER_SOURCE = 5
+# 每个网页正文约1500 token
+PAGE_BODY = "检索到的资料正文。" * 160 + "More English body text for the mixed content. " * 20
+# 其他搜索源都搜到了搜索源0的第0篇（URL写法不同），以及第1篇的转载（URL不同、正文相同）
+
+
+def build_sources(latencies: list) -> list:
+    sources = []
+    for i, latency in enumerate(latencies):
+        source_type = SearchSourceType.RAG if i == 0 else SearchSourceType.WEB
+        sources.append({"id": i, "name": f"source{i}", "sub_name": "stub", "type": source_type, "latency": latency})
+    return sources
+
+
+def source_pages(index: int) -> dict:
+    pages = {}
+    for r in range(RESULTS_PER_SOURCE):
+        url = f"https://example.com/source{index}/page{r}"
+        body = f"{PAGE_BODY}（搜索源{index}的第{r}篇）"
+        if r == 0 and index > 0:
+            url = "HTTPS://Example.com/source0/page0/#top"
+            body = f"{PAGE_BODY}（搜索源0的第0篇）"
+        elif r == 1 and index > 0:
+            body = f"{PAGE_BODY}（搜索源0的第1篇）"
+        pages[str(r)] = {"url": url, "title": f"搜索源{index} 网页{r}", "content": body}
+    return pages
+
+
+class StubSearchContext(SearchContext):
+    """搜索源按配置的延迟返回固定的网页"""
+
+    async def perform_search_with_source_task(self, query, selected_search_source, keywords):
+        await asyncio.sleep(selected_search_source["latency"])
+        index = selected_search_source["id"]
+        return source_pages(index), {query: [f"https://example.com/image{index}.png"]}
+
+
+class GatherSearchContext(StubSearchContext):
+    """原实现：等待所有搜索源完成后依次处理，不去重、不限制长度"""
+
+    async def search(self, query: str):
+        keywords = await flash_search_service.extract_search_keywords(query, None)
+        results = await asyncio.gather(*[self.perform_search_with_source_task(query, source, keywords)
+                                         for source in self.search_sources])
+        all_formatted_results = []
+        for source, (search_result, _) in zip(self.search_sources, results):
+            yield i18n.t('results_found', f"{source['name']}:{source['sub_name']}", len(search_result))
+            for item in search_result.values():
+                idx = len(all_formatted_results)
+                all_formatted_results.append(
+                    f"[webpage {idx + 1} begin]\n**标题：{item['title']}**\n链接：{item['url']}\n"
+                    f"正文：{item['content']}\n[webpage {idx + 1} end]")
+        yield {"type": "final_result", "content": "\n".join(all_formatted_results)}
+
+
+async def stub_keywords(query, llm):
+    return [query]
+
+
+async def run(context_class, latencies: list) -> dict:
+    ctx = context_class(search_engine="TavilySearch", search_sources=build_sources(latencies),
+                        models_used={}, web_search_info={})
+    start = time.perf_counter()
+    first_result, messages = None, []
+    async for result in ctx.search("桩查询"):
+        if isinstance(result, dict):
+            if result["type"] == "final_result":
+                ctx.add_context(result["content"])
+            break
+        messages.append(result)
+        if first_result is None and ("找到" in result or "Found" in result):
+            first_result = time.perf_counter() - start
+    return {"first": first_result, "total": time.perf_counter() - start, "context": ctx.context,
+            "results": ctx.search_results, "messages": messages}
+
+
+async def main():
+    logger.setLevel("WARNING")
+    flash_search_service.extract_search_keywords = stub_keywords
+    # 一个慢的RAG源排在最前，网页搜索源的延迟各不相同
+    latencies = [SLOWEST / 3, 0.2, 0.5, SLOWEST / 2]
+    print(f"{len(latencies)} sources, latencies {latencies}s, per-source deadline {SEARCH_SOURCE_TIMEOUT}s, "
+          f"context budget {SEARCH_CONTEXT_MAX_TOKENS} tokens\n")
+
+    print(f"{'mode':<20}{'first result':>13}{'total':>8}{'pages':>7}{'tokens':>8}")
+    rows = [("gather", GatherSearchContext, latencies),
+            ("streaming", StubSearchContext, latencies),
+            ("streaming + slow", StubSearchContext, latencies + [SLOWEST])]
+    outcomes = {}
+    for mode, context_class, mode_latencies in rows:
+        outcome = await run(context_class, mode_latencies)
+        outcomes[mode] = outcome
+        pages = outcome["context"].count("begin]")
+        print(f"{mode:<20}{outcome['first']:>12.2f}s{outcome['total']:>7.2f}s{pages:>7}"
+              f"{estimate_tokens(outcome['context']):>8}")
+
+    streaming = outcomes["streaming"]
+    assert estimate_tokens(streaming["context"]) <= SEARCH_CONTEXT_MAX_TOKENS + 1
+    urls = [item["url"] for item in streaming["results"]]
+    assert len(urls) == len(set(urls))
+    assert not any("page0/#top" in url or "page1" in url for url in urls[5:]), urls
+    assert outcomes["streaming + slow"]["total"] < SLOWEST
+    assert any("source4" in message for message in outcomes["streaming + slow"]["messages"])
+    print("\nbudget, dedup and deadline: ok")
+
+    # 完成顺序不同，引文编号和合并内容保持一致
+    for permutation in itertools.permutations([0.05, 0.1, 0.15, 0.2]):
+        outcome = await run(StubSearchContext, list(permutation))
+        assert outcome["context"] == streaming["context"], permutation
+        assert outcome["results"] == streaming["results"], permutation
+    print("citations stable across 24 completion orders: ok")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
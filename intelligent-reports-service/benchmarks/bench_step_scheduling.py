@@ -0,0 +1,122 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+步骤调度基准测试：对比按批等待（旧的 CoSight.execute 循环）与事件驱动的 StepScheduler。
+
+步骤用 sleep 模拟，执行方式与 TaskActorAgent.act 一致：先标记 in_progress，结束时标记 completed。
+
+运行：
+    python benchmarks/bench_step_scheduling.py
+"""
+
+import os
+import random
+import sys
+import time
+from threading import Semaphore, Thread
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.cosight.task.step_scheduler import StepScheduler  # noqa: E402
+from app.cosight.task.todolist import Plan  # noqa: E402
+
+MAX_CONCURRENT_STEPS = 5
+FAST = 0.02
+SLOW = 0.3
+
+
+def make_step_runner(plan: Plan, durations: List[float]) -> Callable[[int], str]:
+    def run_step(step_index: int) -> str:
+        plan.mark_step(step_index, step_status="in_progress")
+        time.sleep(durations[step_index])
+        plan.mark_step(step_index, step_status="completed")
+        return f"step {step_index} done"
+    return run_step
+
+
+def run_waves(plan: Plan, run_step: Callable[[int], str]) -> None:
+    """旧实现：每批就绪步骤全部结束后才查找新的就绪步骤"""
+    while True:
+        ready_steps = plan.get_ready_steps()
+        if not ready_steps:
+            break
+        semaphore = Semaphore(min(MAX_CONCURRENT_STEPS, len(ready_steps)))
+
+        def execute_step(step_index):
+            with semaphore:
+                run_step(step_index)
+
+        threads = [Thread(target=execute_step, args=(step_index,)) for step_index in ready_steps]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+
+def run_event_driven(plan: Plan, run_step: Callable[[int], str]) -> None:
+    StepScheduler(plan, run_step, max_concurrent_steps=MAX_CONCURRENT_STEPS).run()
+
+
+def uneven_chains(chains: int, length: int) -> tuple:
+    """多条互相独立的链，每一层都有一条链的步骤很慢（慢步骤在各层轮换）"""
+    durations, dependencies = [], {}
+    for chain in range(chains):
+        for level in range(length):
+            index = chain * length + level
+            durations.append(SLOW if chain == level % chains else FAST)
+            if level:
+                dependencies[index] = [index - 1]
+    return durations, dependencies
+
+
+def random_dag(steps: int, seed: int) -> tuple:
+    """随机的宽DAG：每个步骤依赖之前的0~2个步骤，约20%的步骤很慢"""
+    rng = random.Random(seed)
+    durations = [SLOW if rng.random() < 0.2 else FAST for _ in range(steps)]
+    dependencies = {}
+    for index in range(1, steps):
+        predecessors = rng.sample(range(max(0, index - 8), index), k=min(index, rng.randint(0, 2)))
+        if predecessors:
+            dependencies[index] = sorted(predecessors)
+    return durations, dependencies
+
+
+def measure(runner, durations: List[float], dependencies: Dict[int, List[int]]) -> tuple:
+    steps = [f"step {i}" for i in range(len(durations))]
+    plan = Plan(title="benchmark", steps=steps, dependencies={k: list(v) for k, v in dependencies.items()})
+    start = time.perf_counter()
+    runner(plan, make_step_runner(plan, durations))
+    return time.perf_counter() - start, dict(plan.step_statuses)
+
+
+def main():
+    scenarios = [
+        ("4 uneven chains x 4", uneven_chains(4, 4)),
+        ("8 uneven chains x 3", uneven_chains(8, 3)),
+        ("random DAG, 30 steps", random_dag(30, seed=1)),
+        ("random DAG, 60 steps", random_dag(60, seed=2)),
+    ]
+    print(f"{'scenario':<24}{'waves (s)':>12}{'event (s)':>12}{'speedup':>10}")
+    for name, (durations, dependencies) in scenarios:
+        wave_time, wave_state = measure(run_waves, durations, dependencies)
+        event_time, event_state = measure(run_event_driven, durations, dependencies)
+        assert wave_state == event_state, f"final plan state differs for {name}"
+        print(f"{name:<24}{wave_time:>12.2f}{event_time:>12.2f}{wave_time / event_time:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+# Copyright 2025 ZTE Corporation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""基准测试用的本地stdio MCP server"""
+
+import os
+
+from mcp.server.fastmcp import FastMCP
+
+server = FastMCP("stub", log_level="WARNING")
+
+
+@server.tool()
+def echo(text: str) -> str:
+    """Return the input text."""
+    return text
+
+
+@server.tool()
+def pid() -> str:
+    """Return the server process id."""
+    return str(os.getpid())
+
+
+if __name__ == "__main__":
+    server.run()
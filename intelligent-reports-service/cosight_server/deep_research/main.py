@@ -211,7 +211,19 @@ if web_dir:
     logger.info(f"前端静态文件已挂载到: /")
 
 
-@app.middleware("http") 
+@app.on_event("startup")
+async def start_chart_render_pool():
+    """单独运行时预热图表渲染进程池（挂载到其他应用时由外层应用的启动事件预热）"""
+    import asyncio
+    from app.cosight.tool.chart_render_pool import chart_render_pool
+
+    try:
+        await asyncio.to_thread(chart_render_pool.start)
+    except Exception as e:
+        logger.error(f"Chart render pool warm-up failed: {e}")
+
+
+@app.middleware("http")
 async def iframe_middleware(request: Request, call_next):
     """添加iframe支持的HTTP头"""
     response = await call_next(request)
@@ -28,6 +28,11 @@ from cosight_server.sdk.common.utils import get_timestamp
 
 wsRouter = APIRouter()
 
+# 建立连接时恢复的历史消息条数（也是 load_history 每页的条数）
+WELCOME_HISTORY_PAGE_SIZE = 50
+# 建立连接时发送的会话数（也是 load_conversations 每页的会话数）
+WELCOME_CONVERSATIONS_PAGE_SIZE = 5
+
 
 class WebsocketManager:
     def __init__(self):
@@ -79,11 +84,13 @@ async def websocket_handler(
         session_manager = AISSessionManager()
         user_id = session_manager.get_user_id(websocket_client_key) or "admin"
         
-        # 获取用户的会话历史
-        conversation_history = await session_manager.get_conversation_history(user_id)
+        # 获取用户最新会话的最新一页历史，更早的消息由前端发送 load_history 消息（带 history_cursor）按需加载
+        conversation_history, history_cursor, history_conversation_id = \
+            await session_manager.get_conversation_history_page(user_id, limit=WELCOME_HISTORY_PAGE_SIZE)
         
-        # 获取用户的会话列表
-        conversations = await session_manager.get_user_conversations(user_id, 5)
+        # 获取用户的会话列表，更多会话由前端发送 load_conversations 消息（带 conversations_cursor）加载
+        conversations, conversations_cursor = await session_manager.get_user_conversations_page(
+            user_id, WELCOME_CONVERSATIONS_PAGE_SIZE)
         
         welcome_message = {
             "data": {
@@ -106,6 +113,9 @@ async def websocket_handler(
                     "initData": {
                         "history": conversation_history,
                         "conversations": conversations,
+                        "conversation_id": history_conversation_id,
+                        "history_cursor": history_cursor,
+                        "conversations_cursor": conversations_cursor,
                         "user_id": user_id
                     }
                 }
@@ -116,7 +126,9 @@ async def websocket_handler(
         while True:
             data = await websocket.receive_json()
             logger.info(f"receive >>>>>>>>>>>>>> {data}")
-            if data.get("action") == "message":
+            if data.get("action") in ("load_history", "load_conversations"):
+                await _send_page(websocket, user_id, data)
+            elif data.get("action") == "message":
                 message = json.loads(data.get("data"))
                 logger.info(f"message >>>>>>>>>>>>>> {message}")
 
@@ -156,6 +168,34 @@ async def websocket_handler(
         logger.error(f"disconnect >>>>>>>>>>>>>> ")
 
 
+async def _send_page(websocket, user_id, data):
+    """按游标加载更早的历史消息（load_history）或更多会话（load_conversations）
+
+    请求的data为JSON：load_history 包含 conversation_id、before（上一页的 history_cursor）；
+    load_conversations 包含 before（上一页的 conversations_cursor）。
+    """
+    payload = data.get("data") or {}
+    if isinstance(payload, str):
+        payload = json.loads(payload or "{}")
+    session_manager = AISSessionManager()
+    
+    if data.get("action") == "load_history":
+        history, history_cursor, conversation_id = await session_manager.get_conversation_history_page(
+            user_id, payload.get("conversation_id"), WELCOME_HISTORY_PAGE_SIZE, payload.get("before"))
+        init_data = {"history": history, "conversation_id": conversation_id, "history_cursor": history_cursor}
+        page_type = "history_page"
+    else:
+        conversations, conversations_cursor = await session_manager.get_user_conversations_page(
+            user_id, WELCOME_CONVERSATIONS_PAGE_SIZE, payload.get("before"))
+        init_data = {"conversations": conversations, "conversations_cursor": conversations_cursor}
+        page_type = "conversations_page"
+    
+    await manager.send_json({
+        "topic": data.get("topic"),
+        "data": {"type": page_type, "initData": init_data}
+    }, websocket)
+
+
 # Started by AICoder, pid:wb967gf743u19051414d0be1f088122a49b62acf
 async def _send_resp(websocket, cookie, topic, message, lang):
     cookie_str = "; ".join([f"{key}={value}" for key, value in cookie.items()])
@@ -168,14 +208,9 @@ async def _send_resp(websocket, cookie, topic, message, lang):
     # 获取会话历史记录
     conversation_history = await session_manager.get_conversation_history(user_id, topic)
     
-    # 保存用户输入的消息
-    conversation_id = await session_manager.save_user_message(
-        user_id=user_id,
-        content=message.get("initData"),
-        role="user",
-        conversation_id=topic if topic != user_id else None,
-        message_type="chat"
-    )
+    # 立即保存用户输入的消息，报告流中断时问题也不会丢失
+    conversation_id = await session_manager.save_question(
+        user_id, message.get("initData"), topic if topic != user_id else None)
     
     params = {
         "content": message.get("initData"),
@@ -195,20 +230,26 @@ async def _send_resp(websocket, cookie, topic, message, lang):
         "content-type": "application/json;charset=utf-8",
         "Cookie": cookie_str,
     }
+    report = None
     try:
         if params.get("stream", False):
-            await _stream_handler(params, url, headers, topic, websocket)
+            report = await _stream_handler(params, url, headers, topic, websocket)
         else:
             await _no_stream_handler(params, url, headers, topic, websocket)
     except Exception as e:
         logger.error(f"response websocket error: {e}", exc_info=True)
+    finally:
+        # 流式报告的最终结果在报告结束后一次写入历史
+        await session_manager.save_report_result(user_id, report, conversation_id)
 
 
 # Ended by AICoder, pid:wb967gf743u19051414d0be1f088122a49b62acf
 
 
 async def _stream_handler(params, url, headers, topic, websocket):
+    """把报告流转发给前端，返回最终的报告结果（没有结果时返回None）"""
     msg_uuid = str(uuid.uuid4())
+    report = None
     timeout = aiohttp.ClientTimeout(sock_read=300)
     sessionInfo =params.get('sessionInfo', {})
     sessionInfo['messageSerialNumber'] = msg_uuid
@@ -227,6 +268,8 @@ async def _stream_handler(params, url, headers, topic, websocket):
                 init_data = line_json.get("content") if line_json.get("content") is not None else [
                     {"type": "text", "value": i18n.t('unknown_message')}]
                 change_type = line_json.get("changeType") if line_json.get("changeType") is not None else "append"
+                if isinstance(init_data, dict) and init_data.get("result"):
+                    report = init_data["result"]
                 await manager.send_json({
                     "topic": topic,
                     "data": {
@@ -243,6 +286,7 @@ async def _stream_handler(params, url, headers, topic, websocket):
                         "styles": {"width": "100%"}
                     }
                 }, websocket)
+    return report
 
 
 async def _no_stream_handler(params, url, headers, topic, websocket):
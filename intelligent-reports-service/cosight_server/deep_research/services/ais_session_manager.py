@@ -13,8 +13,10 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import json
+
 from fastapi import Request, Response
-from typing import Optional, Dict, List
+from typing import Any, Optional, Dict, List, Tuple
 
 from cosight_server.sdk.common.config import custom_config
 from cosight_server.sdk.common.api_result import json_result
@@ -127,26 +129,38 @@ class AISSessionManager(SessionManagerBase, metaclass=SingletonMetaCls):
     def get_property_from_cookie(self, cookie, property_name, default_value=None):
         return self._get_property_from_cookie(cookie, property_name, default_value)
     
-    async def get_conversation_history(self, user_id: str, conversation_id: str = None) -> List[Dict]:
-        """获取用户的会话历史记录"""
+    async def get_conversation_history(self, user_id: str, conversation_id: str = None,
+                                       limit: int = 50) -> List[Dict]:
+        """获取用户的会话历史记录（最新的 limit 条消息）"""
+        history, _, _ = await self.get_conversation_history_page(user_id, conversation_id, limit)
+        return history
+    
+    async def get_conversation_history_page(self, user_id: str, conversation_id: str = None,
+                                            limit: int = 50, before: str = None
+                                            ) -> Tuple[List[Dict], Optional[str], Optional[str]]:
+        """获取用户会话的一页历史记录（默认最新一页，before 为上一页返回的游标）
+
+        Returns:
+            (CoSight格式的消息, 加载更早消息的游标, 会话ID)
+        """
         try:
             history_service = await get_history_service()
             history_response = await history_service.get_user_conversation_history(
                 user_id=user_id, 
-                conversation_id=conversation_id
+                conversation_id=conversation_id,
+                limit=limit,
+                before=before
             )
             
             # 转换为CoSight格式
-            cosight_history = await history_service.convert_chat_history_to_cosight_format(
-                history_response.conversation_id
-            )
+            cosight_history = history_service.convert_messages_to_cosight_format(history_response.messages)
             
             logger.info(f"获取用户历史记录: {user_id}, 会话: {history_response.conversation_id}, 消息数: {len(cosight_history)}")
-            return cosight_history
+            return cosight_history, history_response.next_cursor, history_response.conversation_id
             
         except Exception as e:
             logger.error(f"获取会话历史失败: {e}")
-            return []
+            return [], None, conversation_id
     
     async def save_user_message(self, user_id: str, content: str, role: str, 
                                conversation_id: str = None, message_type: str = "chat") -> str:
@@ -181,6 +195,38 @@ class AISSessionManager(SessionManagerBase, metaclass=SingletonMetaCls):
             logger.error(f"保存用户消息失败: {e}")
             return conversation_id
     
+    async def save_question(self, user_id: str, question: Any, conversation_id: str = None) -> Optional[str]:
+        """立即保存用户问题（没有指定会话ID时创建新会话），返回会话ID"""
+        try:
+            history_service = await get_history_service()
+            
+            if not isinstance(question, str):
+                question = json.dumps(question, ensure_ascii=False)
+            messages = [{"content": question, "role": MessageRole.USER, "message_type": MessageType.CHAT}]
+            
+            return await history_service.save_messages(user_id, messages, conversation_id)
+            
+        except Exception as e:
+            logger.error(f"保存用户问题失败: {e}")
+            return conversation_id
+    
+    async def save_report_result(self, user_id: str, report: Any, conversation_id: str = None) -> Optional[str]:
+        """报告流结束后通过 save_messages 一次写入流式报告的最终结果"""
+        if not report:
+            return conversation_id
+        try:
+            history_service = await get_history_service()
+            
+            if not isinstance(report, str):
+                report = json.dumps(report, ensure_ascii=False)
+            messages = [{"content": report, "role": MessageRole.ASSISTANT, "message_type": MessageType.RESULT}]
+            
+            return await history_service.save_messages(user_id, messages, conversation_id)
+            
+        except Exception as e:
+            logger.error(f"保存报告结果失败: {e}")
+            return conversation_id
+    
     async def save_cosight_session(self, user_id: str, question: str, plan_result: str, 
                                   plan_data: Dict, conversation_id: str = None) -> str:
         """保存完整的CoSight会话"""
@@ -202,20 +248,19 @@ class AISSessionManager(SessionManagerBase, metaclass=SingletonMetaCls):
             return conversation_id
     
     async def get_user_conversations(self, user_id: str, limit: int = 10) -> List[Dict]:
-        """获取用户的会话列表"""
+        """获取用户的会话列表（只包含列表展示需要的字段）"""
         try:
             history_service = await get_history_service()
-            conversations_response = await history_service.get_conversations(user_id, limit)
+            summaries = await history_service.get_conversation_summaries(user_id, limit)
             
             conversations = []
-            for conv in conversations_response.conversations:
+            for conv in summaries:
                 conversations.append({
                     "id": conv.id,
                     "title": conv.title,
                     "created_at": conv.created_at.isoformat(),
                     "updated_at": conv.updated_at.isoformat(),
-                    "is_active": conv.is_active,
-                    "metadata": conv.metadata
+                    "is_active": True
                 })
             
             return conversations
@@ -223,3 +268,24 @@ class AISSessionManager(SessionManagerBase, metaclass=SingletonMetaCls):
         except Exception as e:
             logger.error(f"获取用户会话列表失败: {e}")
             return []
+    
+    async def get_user_conversations_page(self, user_id: str, limit: int = 10,
+                                          before: str = None) -> Tuple[List[Dict], Optional[str]]:
+        """按更新时间倒序获取用户的一页会话，同时返回加载下一页的游标"""
+        try:
+            history_service = await get_history_service()
+            response = await history_service.get_conversations(user_id, limit, before)
+            
+            conversations = [{
+                "id": conv.id,
+                "title": conv.title,
+                "created_at": conv.created_at.isoformat(),
+                "updated_at": conv.updated_at.isoformat(),
+                "is_active": True
+            } for conv in response.conversations]
+            
+            return conversations, response.next_cursor
+            
+        except Exception as e:
+            logger.error(f"获取用户会话列表失败: {e}")
+            return [], None
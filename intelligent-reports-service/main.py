@@ -4,6 +4,7 @@
 提供智能报告生成功能，支持通过iframe嵌入到前端系统中
 """
 
+import asyncio
 import os
 import sys
 import logging
@@ -136,6 +137,14 @@ async def startup_event():
     except Exception as e:
         logger.error(f"数据库初始化失败: {e}")
     
+    # 预热图表渲染进程池，避免第一份报告承担渲染进程和kaleido的启动开销
+    try:
+        from app.cosight.tool.chart_render_pool import chart_render_pool
+        await asyncio.to_thread(chart_render_pool.start)
+        logger.info("图表渲染进程池预热完成")
+    except Exception as e:
+        logger.error(f"图表渲染进程池预热失败: {e}")
+    
     # 向网关注册
     register_with_gateway()
 
@@ -143,6 +152,18 @@ async def startup_event():
 async def shutdown_event():
     """服务关闭事件"""
     logger.info(f"智能报告服务关闭: {SERVICE_NAME}")
+    
+    try:
+        from app.database.sqlite_db import close_db
+        await close_db()
+    except Exception as e:
+        logger.error(f"关闭数据库连接失败: {e}")
+    
+    try:
+        from app.cosight.tool.chart_render_pool import chart_render_pool
+        await asyncio.to_thread(chart_render_pool.close)
+    except Exception as e:
+        logger.error(f"关闭图表渲染进程池失败: {e}")
 
 if __name__ == "__main__":
     logger.info("启动智能报告服务...")
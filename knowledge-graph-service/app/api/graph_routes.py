@@ -3,9 +3,10 @@
 提供知识图谱的REST API接口
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Response
-from fastapi.responses import HTMLResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import HTMLResponse, StreamingResponse
 from typing import List, Optional
+import gzip
 import logging
 
 from ..models.graph import (
@@ -25,6 +26,7 @@ from ..models.graph import (
 from ..services.graph_service import GraphService, get_graph_service
 from ..utils.auth import get_current_user
 from ..adapters.legacy_adapter import LegacyKnowledgeGraphAdapter, LegacyAPIResponseAdapter
+from ..utils.graph_export import STREAM_EXPORT_FORMATS
 
 logger = logging.getLogger(__name__)
 
@@ -175,6 +177,72 @@ async def get_graph_visualization(
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.get("/{graph_id}/visualization/data")
+async def get_graph_visualization_page(
+    graph_id: str,
+    offset: int = Query(0, ge=0, description="偏移量"),
+    limit: int = Query(500, ge=1, le=5000, description="每页实体数"),
+    min_degree: int = Query(0, ge=0, description="最小度数"),
+    x_min: Optional[float] = Query(None, description="视口左边界"),
+    y_min: Optional[float] = Query(None, description="视口上边界"),
+    x_max: Optional[float] = Query(None, description="视口右边界"),
+    y_max: Optional[float] = Query(None, description="视口下边界"),
+    project_id: Optional[str] = Query(None, description="项目ID"),
+    current_user: dict = Depends(get_current_user),
+    graph_service: GraphService = Depends(get_graph_service)
+):
+    """分页获取可视化数据（按度数降序，可按视口和最小度数过滤）"""
+    viewport_bounds = (x_min, y_min, x_max, y_max)
+    if any(bound is not None for bound in viewport_bounds) and any(bound is None for bound in viewport_bounds):
+        raise HTTPException(status_code=400, detail="视口需要同时提供 x_min/y_min/x_max/y_max")
+    viewport = viewport_bounds if x_min is not None else None
+    
+    try:
+        user_id = current_user["user_id"]
+        page = await graph_service.get_visualization_page(
+            graph_id, offset, limit, min_degree, viewport, user_id, project_id
+        )
+    except Exception as e:
+        logger.error(f"Failed to get graph visualization page: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if page is None:
+        raise HTTPException(status_code=404, detail="图谱未找到")
+    return page
+
+
+@router.get("/{graph_id}/visualization/payload")
+async def get_graph_visualization_payload(
+    graph_id: str,
+    request: Request,
+    level: str = Query("overview", pattern="^(overview|full|communities)$", description="数据层级：overview/full/communities"),
+    community: Optional[List[int]] = Query(None, description="level=communities 时要展开的社区编号"),
+    project_id: Optional[str] = Query(None, description="项目ID"),
+    current_user: dict = Depends(get_current_user),
+    graph_service: GraphService = Depends(get_graph_service)
+):
+    """获取预计算布局的列式可视化数据（gzip压缩），先加载社区概览，再按社区展开"""
+    if level == "communities" and not community:
+        raise HTTPException(status_code=400, detail="level=communities 需要提供 community 参数")
+    
+    try:
+        user_id = current_user["user_id"]
+        content = await graph_service.get_visualization_payload(graph_id, level, community, user_id, project_id)
+    except Exception as e:
+        logger.error(f"Failed to get graph visualization payload: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if content is None:
+        raise HTTPException(status_code=404, detail="图谱未找到")
+    
+    headers = {"Vary": "Accept-Encoding"}
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+    else:
+        content = gzip.decompress(content)
+    return Response(content=content, media_type="application/json", headers=headers)
+
+
 @router.post("/generate")
 async def generate_graph_async(
     request: GraphGenerateRequest,
@@ -273,13 +341,27 @@ async def export_graph(
     current_user: dict = Depends(get_current_user),
     graph_service: GraphService = Depends(get_graph_service)
 ):
-    """导出图谱"""
+    """导出图谱（ndjson/graphml/csv 以流式响应返回）"""
     try:
         user_id = current_user["user_id"]
+        export_format = request.export_format.lower()
+        if export_format in STREAM_EXPORT_FORMATS:
+            media_type, extension = STREAM_EXPORT_FORMATS[export_format]
+            chunks = await graph_service.stream_export_graph(graph_id, export_format, user_id, project_id)
+            if chunks is None:
+                raise HTTPException(status_code=404, detail="图谱未找到")
+            return StreamingResponse(
+                chunks,
+                media_type=media_type,
+                headers={"Content-Disposition": f'attachment; filename="{graph_id}.{extension}"'}
+            )
+        
         export_data = await graph_service.export_graph(
             graph_id, request.export_format, user_id, project_id
         )
         return export_data
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to export graph: {e}")
         raise HTTPException(status_code=400, detail=str(e))
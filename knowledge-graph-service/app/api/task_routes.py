@@ -8,7 +8,7 @@ from typing import List, Optional
 import logging
 
 from ..models.graph import ProcessingProgress
-from ..core.task_manager import TaskManager, TaskInfo, get_task_manager
+from ..core.task_manager import TaskManager, TaskInfo, TaskStatus, get_task_manager
 from ..utils.auth import get_current_user
 
 logger = logging.getLogger(__name__)
@@ -112,13 +112,14 @@ async def cancel_task(
 @router.get("/")
 async def get_user_tasks(
     limit: int = Query(100, ge=1, le=1000, description="返回任务数量限制"),
+    status: Optional[TaskStatus] = Query(None, description="按任务状态过滤"),
     current_user: dict = Depends(get_current_user),
     task_manager: TaskManager = Depends(get_task_manager)
 ):
     """获取用户任务列表"""
     try:
         user_id = current_user["user_id"]
-        tasks = await task_manager.get_user_tasks(user_id, limit)
+        tasks = await task_manager.get_user_tasks(user_id, limit, status)
         
         # 转换为响应格式
         task_list = []
@@ -203,9 +204,7 @@ async def delete_task(
             raise HTTPException(status_code=400, detail="无法删除正在执行的任务")
         
         # 从任务管理器中删除
-        if task_id in task_manager.tasks:
-            del task_manager.tasks[task_id]
-            await task_manager._delete_task_file(task_id)
+        await task_manager.delete_task(task_id)
         
         return {"message": "任务删除成功"}
     except HTTPException:
@@ -245,22 +244,8 @@ async def get_task_stats(
     """获取任务统计信息"""
     try:
         user_id = current_user["user_id"]
-        user_tasks = await task_manager.get_user_tasks(user_id, 1000)
-        
         # 统计各状态任务数量
-        stats = {
-            "total": len(user_tasks),
-            "pending": 0,
-            "running": 0,
-            "completed": 0,
-            "failed": 0,
-            "cancelled": 0
-        }
-        
-        for task in user_tasks:
-            stats[task.status] += 1
-        
-        return stats
+        return await task_manager.get_user_task_stats(user_id)
     except Exception as e:
         logger.error(f"Failed to get task stats: {e}")
         raise HTTPException(status_code=400, detail=str(e))
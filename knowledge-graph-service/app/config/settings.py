@@ -45,6 +45,11 @@ class KnowledgeGraphServiceSettings(BaseSettings):
     GRAPH_DATABASE_TYPE: GraphDatabaseType = Field(default=GraphDatabaseType.ARANGODB, description="图数据库类型")
     GRAPH_DATABASE_TENANT_MODE: bool = Field(default=True, description="租户模式")
     GRAPH_DATABASE_MAX_CONNECTIONS: int = Field(default=10, description="最大连接数")
+    GRAPH_DATABASE_WRITE_BATCH_SIZE: int = Field(default=5000, description="图数据批量写入的每批文档数")
+    GRAPH_DATABASE_READ_BATCH_SIZE: int = Field(default=2000, description="图数据游标读取的每批文档数")
+    GRAPH_CACHE_MAX_ELEMENTS: int = Field(default=2_000_000, description="紧凑图缓存容量（节点数+边数）")
+    GRAPH_CACHE_MAX_NETWORKX_ELEMENTS: int = Field(default=200_000, description="NetworkX图对象缓存容量（节点数+边数）")
+    GRAPH_ANALYTICS_WORKERS: int = Field(default=2, description="图算法计算进程数")
     
     # 租户配置
     GRAPH_TENANT_USERS_PER_SHARD: int = Field(default=1000, description="每个分片的用户数")
@@ -76,6 +81,9 @@ class KnowledgeGraphServiceSettings(BaseSettings):
     VISUALIZATION_HEIGHT: int = Field(default=800, description="可视化高度")
     VISUALIZATION_PHYSICS: bool = Field(default=True, description="启用物理模拟")
     VISUALIZATION_THEME: str = Field(default="light", description="可视化主题")
+    VISUALIZATION_INLINE_MAX_NODES: int = Field(default=2000, description="HTML中直接内嵌全部节点的最大实体数，超过时只内嵌社区概览")
+    VISUALIZATION_LAYOUT_WORKERS: int = Field(default=1, description="可视化布局计算进程数")
+    VISUALIZATION_CACHE_MAX_GRAPHS: int = Field(default=8, description="内存中缓存可视化数据的最大图谱数")
     
     # 文件存储配置
     UPLOAD_DIR: str = Field(default="uploads", description="上传目录")
@@ -86,6 +94,7 @@ class KnowledgeGraphServiceSettings(BaseSettings):
     TASK_TIMEOUT: int = Field(default=3600, description="任务超时时间")
     TASK_RETRY_TIMES: int = Field(default=3, description="任务重试次数")
     TASK_RETRY_DELAY: int = Field(default=60, description="任务重试延迟")
+    TASK_STORE_FLUSH_INTERVAL: float = Field(default=0.5, description="任务进度批量写入间隔（秒）")
     
     # 安全配置
     JWT_SECRET_KEY: str = Field(default="knowledge-graph-secret", description="JWT密钥")
@@ -182,7 +182,7 @@ class GraphGenerator:
                     
                     # 更新进度
                     if callback_func:
-                        callback_func(f"正在处理知识库 {i+1}/{len(knowledge_base_ids)}", (i / len(knowledge_base_ids)) * 100)
+                        callback_func(kb_id, f"正在处理知识库 {i+1}/{len(knowledge_base_ids)}", i / len(knowledge_base_ids))
                     
                     # 处理知识库内容
                     result = await asyncio.get_event_loop().run_in_executor(
@@ -255,7 +255,7 @@ class GraphGenerator:
                     
                     # 更新进度
                     if callback_func:
-                        callback_func(f"正在处理文档 {i+1}/{len(document_ids)}", (i / len(document_ids)) * 100)
+                        callback_func(doc_id, f"正在处理文档 {i+1}/{len(document_ids)}", i / len(document_ids))
                     
                     # 处理文档内容
                     result = await asyncio.get_event_loop().run_in_executor(
@@ -311,10 +311,18 @@ class GraphGenerator:
             raise
     
     def _create_progress_callback(self, progress_callback: Callable) -> Callable:
-        """创建进度回调函数"""
-        def callback(message: str, progress: float):
+        """创建进度回调函数
+        
+        返回的回调使用框架处理器的签名 (task_id, status, progress, info)，progress 为0-1。
+        处理器在线程池中运行，因此通过 run_coroutine_threadsafe 把进度投递回事件循环。
+        """
+        loop = asyncio.get_running_loop()
+        
+        def callback(task_id: str, status: str, progress: float, info: Optional[Dict[str, Any]] = None):
             try:
-                asyncio.create_task(progress_callback(message, progress))
+                # 提取阶段映射到任务进度的0-80%，之后由任务管理器继续推进
+                coro = progress_callback(status, progress * 80.0, info)
+                asyncio.run_coroutine_threadsafe(coro, loop)
             except Exception as e:
                 logger.error(f"Progress callback error: {e}")
         
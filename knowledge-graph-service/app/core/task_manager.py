@@ -15,6 +15,7 @@ import uuid
 
 from ..config.settings import settings
 from ..models.graph import ProcessingConfig, ProcessingStage, ProcessingProgress
+from .task_store import SQLiteTaskStore
 
 logger = logging.getLogger(__name__)
 
@@ -89,9 +90,13 @@ class TaskManager:
         self.retry_times = settings.TASK_RETRY_TIMES
         self.retry_delay = settings.TASK_RETRY_DELAY
         
-        # 任务持久化
+        # 任务持久化：内存中只保留未结束的任务，历史任务按需从存储中查询
         self.task_storage_path = Path(settings.UPLOAD_DIR) / "tasks"
         self.task_storage_path.mkdir(parents=True, exist_ok=True)
+        self.store = SQLiteTaskStore(
+            self.task_storage_path / "tasks.db",
+            flush_interval=settings.TASK_STORE_FLUSH_INTERVAL
+        )
         
         # 启动工作线程
         self._start_workers()
@@ -211,9 +216,23 @@ class TaskManager:
             project_id = task_info.project_id
             
             # 创建进度回调
-            async def progress_callback(message: str, progress: float):
+            async def progress_callback(message: str, progress: float, details: Optional[Dict[str, Any]] = None):
                 task_info.progress = progress
                 task_info.message = message
+                if details and "total_chunks" in details:
+                    # 三元组提取按块上报：累计已提取的三元组，并保留最近完成块的结果供前端预览
+                    chunk_triples = details.get("triples") or []
+                    task_info.stage_details.update({
+                        "completed_chunks": details["completed_chunks"],
+                        "total_chunks": details["total_chunks"],
+                        "cached_chunks": task_info.stage_details.get("cached_chunks", 0) + int(bool(details.get("cached"))),
+                        "extracted_triples": task_info.stage_details.get("extracted_triples", 0) + len(chunk_triples),
+                        "latest_chunk": details.get("chunk"),
+                        "latest_triples": chunk_triples
+                    })
+                elif details and "total_changes" in details:
+                    # 增量保存图谱数据的进度
+                    task_info.stage_details.update({"persistence": details})
                 await self._save_task(task_info)
             
             # 获取图谱元数据
@@ -270,7 +289,15 @@ class TaskManager:
             # 使用图谱服务保存数据
             from ..repositories.arangodb_repository import get_arangodb_repository
             arangodb_repo = await get_arangodb_repository()
-            await arangodb_repo.save_graph_data(graph_id, entities, relations, user_id, project_id)
+            
+            async def persistence_callback(message: str, fraction: float, details: Optional[Dict[str, Any]] = None):
+                # 保存阶段占总进度的80%~90%
+                await progress_callback(message, 80.0 + fraction * 10.0, details)
+            
+            await arangodb_repo.save_graph_data(
+                graph_id, entities, relations, user_id, project_id,
+                progress_callback=persistence_callback
+            )
             
             # 更新图谱统计
             statistics = await arangodb_repo.get_graph_statistics(graph_id, user_id, project_id)
@@ -293,7 +320,10 @@ class TaskManager:
                 entities=entities,
                 relations=relations,
                 config=graph.visualization_config,
-                graph_title=graph.name
+                graph_title=graph.name,
+                graph_id=graph_id,
+                revision=await arangodb_repo.get_graph_revision(graph_id, user_id, project_id),
+                tenant_key=arangodb_repo.tenant_key(user_id, project_id)
             )
             
             # 保存可视化文件
@@ -453,7 +483,12 @@ class TaskManager:
     async def get_task_status(self, task_id: str) -> Optional[TaskInfo]:
         """获取任务状态"""
         try:
-            return self.tasks.get(task_id)
+            task_info = self.tasks.get(task_id)
+            if task_info is None:
+                task_dict = await self.store.get(task_id)
+                if task_dict:
+                    task_info = self._task_from_dict(task_dict)
+            return task_info
             
         except Exception as e:
             logger.error(f"Failed to get task status: {e}")
@@ -462,7 +497,7 @@ class TaskManager:
     async def get_task_progress(self, task_id: str) -> Optional[ProcessingProgress]:
         """获取任务进度"""
         try:
-            task_info = self.tasks.get(task_id)
+            task_info = await self.get_task_status(task_id)
             if not task_info:
                 return None
             
@@ -502,106 +537,121 @@ class TaskManager:
             logger.error(f"Failed to cancel task: {e}")
             return False
     
-    async def get_user_tasks(self, user_id: str, limit: int = 100) -> List[TaskInfo]:
-        """获取用户任务列表"""
+    async def get_user_tasks(self, user_id: str, limit: int = 100,
+                             status: Optional[TaskStatus] = None) -> List[TaskInfo]:
+        """获取用户任务列表（按创建时间倒序，可按状态过滤）"""
         try:
-            user_tasks = []
-            for task_info in self.tasks.values():
-                if task_info.user_id == user_id:
-                    user_tasks.append(task_info)
-            
-            # 按创建时间排序
-            user_tasks.sort(key=lambda x: x.created_at, reverse=True)
-            
-            return user_tasks[:limit]
+            task_dicts = await self.store.list_user_tasks(
+                user_id, limit, status.value if status else None
+            )
+            # 未结束的任务以内存中的对象为准
+            return [
+                self.tasks.get(task_dict['task_id']) or self._task_from_dict(task_dict)
+                for task_dict in task_dicts
+            ]
             
         except Exception as e:
             logger.error(f"Failed to get user tasks: {e}")
             return []
     
+    async def get_user_task_stats(self, user_id: str) -> Dict[str, int]:
+        """按状态统计用户任务数量"""
+        counts = await self.store.count_by_status(user_id)
+        stats = {"total": sum(counts.values())}
+        for status in TaskStatus:
+            stats[status.value] = counts.get(status.value, 0)
+        return stats
+    
+    async def delete_task(self, task_id: str) -> bool:
+        """删除任务记录"""
+        try:
+            self.tasks.pop(task_id, None)
+            return await self.store.delete([task_id]) > 0
+            
+        except Exception as e:
+            logger.error(f"Failed to delete task {task_id}: {e}")
+            return False
+    
     async def cleanup_old_tasks(self, days: int = 7):
-        """清理旧任务"""
+        """清理旧任务：删除已结束的历史任务并压缩存储"""
         try:
             cutoff_time = datetime.now() - timedelta(days=days)
-            
-            tasks_to_remove = []
-            for task_id, task_info in self.tasks.items():
-                if task_info.created_at < cutoff_time and task_info.status in [
-                    TaskStatus.COMPLETED, TaskStatus.FAILED, TaskStatus.CANCELLED
-                ]:
-                    tasks_to_remove.append(task_id)
-            
-            for task_id in tasks_to_remove:
-                # 删除任务文件
-                await self._delete_task_file(task_id)
-                # 从内存中删除
-                del self.tasks[task_id]
-            
-            logger.info(f"Cleaned up {len(tasks_to_remove)} old tasks")
+            removed = await self.store.compact(cutoff_time)
+            logger.info(f"Cleaned up {removed} old tasks")
             
         except Exception as e:
             logger.error(f"Failed to cleanup old tasks: {e}")
     
     async def _save_task(self, task_info: TaskInfo):
-        """保存任务到文件"""
+        """保存任务
+
+        状态变化立即写入存储，运行中的进度更新由存储批量写入；
+        已结束的任务从内存中移除，之后通过存储查询。
+        """
         try:
-            task_file = self.task_storage_path / f"{task_info.task_id}.json"
-            
-            # 转换为字典
-            task_dict = asdict(task_info)
-            
-            # 处理datetime对象
-            for key, value in task_dict.items():
-                if isinstance(value, datetime):
-                    task_dict[key] = value.isoformat()
-            
-            # 保存到文件
-            with open(task_file, 'w', encoding='utf-8') as f:
-                json.dump(task_dict, f, ensure_ascii=False, indent=2)
+            await self.store.save(asdict(task_info))
+            if task_info.status in (TaskStatus.COMPLETED, TaskStatus.FAILED, TaskStatus.CANCELLED):
+                self.tasks.pop(task_info.task_id, None)
             
         except Exception as e:
             logger.error(f"Failed to save task {task_info.task_id}: {e}")
     
-    async def _delete_task_file(self, task_id: str):
-        """删除任务文件"""
-        try:
-            task_file = self.task_storage_path / f"{task_id}.json"
-            if task_file.exists():
-                task_file.unlink()
-                
-        except Exception as e:
-            logger.error(f"Failed to delete task file {task_id}: {e}")
+    @staticmethod
+    def _task_from_dict(task_dict: Dict[str, Any]) -> TaskInfo:
+        """从存储的字典恢复任务信息"""
+        task_dict = dict(task_dict)
+        
+        # 转换datetime字段
+        for key in ['created_at', 'started_at', 'completed_at']:
+            if task_dict.get(key):
+                task_dict[key] = datetime.fromisoformat(task_dict[key])
+        
+        # 转换枚举类型
+        task_dict['task_type'] = TaskType(task_dict['task_type'])
+        task_dict['status'] = TaskStatus(task_dict['status'])
+        if task_dict.get('stage'):
+            task_dict['stage'] = ProcessingStage(task_dict['stage'])
+        
+        return TaskInfo(**task_dict)
+    
+    def _import_legacy_task_files(self):
+        """把旧版本逐个保存的JSON任务文件导入存储，导入后移到 legacy 目录"""
+        task_files = list(self.task_storage_path.glob("*.json"))
+        if not task_files:
+            return
+        
+        task_dicts = []
+        for task_file in task_files:
+            try:
+                with open(task_file, 'r', encoding='utf-8') as f:
+                    task_dicts.append(json.load(f))
+            except Exception as e:
+                logger.error(f"Failed to load task from {task_file}: {e}")
+        
+        self.store.import_tasks(task_dicts)
+        
+        legacy_path = self.task_storage_path / "legacy"
+        legacy_path.mkdir(exist_ok=True)
+        for task_file in task_files:
+            task_file.replace(legacy_path / task_file.name)
+        
+        logger.info(f"Imported {len(task_dicts)} legacy task files into task store")
     
     def _load_existing_tasks(self):
-        """加载已存在的任务"""
+        """加载未结束的任务（只扫描状态索引，启动耗时与历史任务数量无关）"""
         try:
-            if not self.task_storage_path.exists():
-                return
+            self._import_legacy_task_files()
             
-            for task_file in self.task_storage_path.glob("*.json"):
+            for task_dict in self.store.load_active():
                 try:
-                    with open(task_file, 'r', encoding='utf-8') as f:
-                        task_dict = json.load(f)
-                    
-                    # 转换datetime字段
-                    for key in ['created_at', 'started_at', 'completed_at']:
-                        if task_dict.get(key):
-                            task_dict[key] = datetime.fromisoformat(task_dict[key])
-                    
-                    # 转换枚举类型
-                    task_dict['task_type'] = TaskType(task_dict['task_type'])
-                    task_dict['status'] = TaskStatus(task_dict['status'])
-                    if task_dict.get('stage'):
-                        task_dict['stage'] = ProcessingStage(task_dict['stage'])
-                    
-                    task_info = TaskInfo(**task_dict)
+                    task_info = self._task_from_dict(task_dict)
                     self.tasks[task_info.task_id] = task_info
                     
                 except Exception as e:
-                    logger.error(f"Failed to load task from {task_file}: {e}")
+                    logger.error(f"Failed to load task {task_dict.get('task_id')}: {e}")
                     continue
             
-            logger.info(f"Loaded {len(self.tasks)} existing tasks")
+            logger.info(f"Loaded {len(self.tasks)} active tasks")
             
         except Exception as e:
             logger.error(f"Failed to load existing tasks: {e}")
@@ -609,11 +659,12 @@ class TaskManager:
     async def health_check(self) -> Dict[str, Any]:
         """健康检查"""
         try:
-            total_tasks = len(self.tasks)
-            pending_tasks = sum(1 for task in self.tasks.values() if task.status == TaskStatus.PENDING)
-            running_tasks = sum(1 for task in self.tasks.values() if task.status == TaskStatus.RUNNING)
-            completed_tasks = sum(1 for task in self.tasks.values() if task.status == TaskStatus.COMPLETED)
-            failed_tasks = sum(1 for task in self.tasks.values() if task.status == TaskStatus.FAILED)
+            counts = await self.store.count_by_status()
+            total_tasks = sum(counts.values())
+            pending_tasks = counts.get(TaskStatus.PENDING.value, 0)
+            running_tasks = counts.get(TaskStatus.RUNNING.value, 0)
+            completed_tasks = counts.get(TaskStatus.COMPLETED.value, 0)
+            failed_tasks = counts.get(TaskStatus.FAILED.value, 0)
             
             queue_size = self.task_queue.qsize()
             active_workers = sum(1 for worker in self.workers if not worker.done())
@@ -650,6 +701,9 @@ class TaskManager:
             # 等待所有工作线程完成
             await asyncio.gather(*self.workers, return_exceptions=True)
             
+            # 写入尚未刷新的进度并关闭存储
+            await self.store.close()
+            
             logger.info("Task manager shut down successfully")
             
         except Exception as e:
@@ -0,0 +1,262 @@
+"""
+任务存储
+基于SQLite（WAL模式）持久化任务状态，按用户和状态建立索引，进度更新批量写入
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 任务结束后不再需要的进度预览字段，写入终态时裁剪掉
+_TRANSIENT_STAGE_DETAILS = ("latest_chunk", "latest_triples")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id TEXT PRIMARY KEY,
+    user_id TEXT,
+    status TEXT NOT NULL,
+    task_type TEXT NOT NULL,
+    graph_id TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_user_created ON tasks (user_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_tasks_user_status ON tasks (user_id, status, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_tasks_status_created ON tasks (status, created_at);
+"""
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    if hasattr(value, "dict"):
+        return value.dict()
+    return str(value)
+
+
+class SQLiteTaskStore:
+    """任务存储
+
+    所有SQLite操作都在一个专用线程中执行（连接只在该线程中使用）。
+    状态变化立即写入；运行中的进度更新先记为脏数据，由后台按 flush_interval 合并成一个事务写入。
+    """
+
+    def __init__(self, db_path: Path, flush_interval: float = 0.5):
+        """初始化存储
+
+        Args:
+            db_path: 数据库文件路径
+            flush_interval: 进度更新的批量写入间隔（秒）
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.flush_interval = flush_interval
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="task-store")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._executor.submit(self._open).result()
+
+        self._dirty: Dict[str, Dict[str, Any]] = {}
+        self._persisted_status: Dict[str, str] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def _open(self):
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    # ===== 序列化 =====
+
+    @staticmethod
+    def serialize(task_dict: Dict[str, Any]) -> Tuple:
+        """把任务字典转换为表中的一行"""
+        status = _json_default(task_dict["status"])
+        if status in ("completed", "failed", "cancelled") and task_dict.get("stage_details"):
+            task_dict = dict(task_dict)
+            task_dict["stage_details"] = {
+                key: value for key, value in task_dict["stage_details"].items()
+                if key not in _TRANSIENT_STAGE_DETAILS
+            }
+        created_at = task_dict.get("created_at")
+        return (
+            task_dict["task_id"],
+            task_dict.get("user_id"),
+            status,
+            _json_default(task_dict["task_type"]),
+            task_dict.get("graph_id"),
+            created_at.isoformat() if isinstance(created_at, datetime) else str(created_at),
+            datetime.now().isoformat(),
+            json.dumps(task_dict, ensure_ascii=False, default=_json_default),
+        )
+
+    # ===== 写入 =====
+
+    def _write_rows(self, rows: List[Tuple]):
+        # 已结束的任务不会再被非终态的行覆盖（例如写入失败后重试的旧进度快照）
+        with self._conn:
+            self._conn.executemany(
+                """
+                INSERT INTO tasks (task_id, user_id, status, task_type, graph_id, created_at, updated_at, data)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(task_id) DO UPDATE SET
+                    user_id = excluded.user_id,
+                    status = excluded.status,
+                    graph_id = excluded.graph_id,
+                    updated_at = excluded.updated_at,
+                    data = excluded.data
+                WHERE tasks.status NOT IN ('completed', 'failed', 'cancelled')
+                    OR excluded.status IN ('completed', 'failed', 'cancelled')
+                """,
+                rows,
+            )
+
+    async def save(self, task_dict: Dict[str, Any]):
+        """保存任务
+
+        状态发生变化（创建、开始、结束）时立即写入，否则只标记为待写入，由后台批量刷新。
+        """
+        task_id = task_dict["task_id"]
+        status = _json_default(task_dict["status"])
+        if self._persisted_status.get(task_id) == status:
+            self._dirty[task_id] = task_dict
+            self._ensure_flusher()
+            return
+
+        self._dirty.pop(task_id, None)
+        await self._run(self._write_rows, [self.serialize(task_dict)])
+        self._persisted_status[task_id] = status
+        if status in ("completed", "failed", "cancelled"):
+            self._persisted_status.pop(task_id, None)
+
+    def import_tasks(self, task_dicts: List[Dict[str, Any]]):
+        """同步批量写入任务（启动时导入旧数据用）"""
+        rows = [self.serialize(task_dict) for task_dict in task_dicts]
+        self._executor.submit(self._write_rows, rows).result()
+
+    def _ensure_flusher(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while self._dirty:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self):
+        """把待写入的进度更新合并为一个事务写入"""
+        if not self._dirty:
+            return
+        pending, self._dirty = self._dirty, {}
+        try:
+            await self._run(self._write_rows, [self.serialize(task_dict) for task_dict in pending.values()])
+        except Exception as e:
+            logger.error(f"Failed to flush {len(pending)} task updates: {e}")
+            # 写入失败时保留未写入的更新，新的更新优先；
+            # 期间状态已变化（已结束或已删除）的任务丢弃旧快照，不能用它覆盖新状态
+            pending = {
+                task_id: task_dict for task_id, task_dict in pending.items()
+                if self._persisted_status.get(task_id) == _json_default(task_dict["status"])
+            }
+            pending.update(self._dirty)
+            self._dirty = pending
+
+    async def delete(self, task_ids: Iterable[str]) -> int:
+        """删除任务记录"""
+        task_ids = list(task_ids)
+        for task_id in task_ids:
+            self._dirty.pop(task_id, None)
+            self._persisted_status.pop(task_id, None)
+
+        def _delete():
+            with self._conn:
+                return self._conn.executemany("DELETE FROM tasks WHERE task_id = ?", [(task_id,) for task_id in task_ids]).rowcount
+
+        return await self._run(_delete)
+
+    async def compact(self, cutoff: datetime) -> int:
+        """删除 cutoff 之前创建的已结束任务，并截断WAL文件"""
+        def _compact():
+            with self._conn:
+                removed = self._conn.execute(
+                    "DELETE FROM tasks WHERE status IN ('completed', 'failed', 'cancelled') AND created_at < ?",
+                    (cutoff.isoformat(),),
+                ).rowcount
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            return removed
+
+        return await self._run(_compact)
+
+    # ===== 查询 =====
+
+    def _query(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        return self._conn.execute(sql, params).fetchall()
+
+    def load_active(self) -> List[Dict[str, Any]]:
+        """同步读取未结束的任务（启动时调用，只扫描状态索引）"""
+        rows = self._executor.submit(
+            self._query,
+            "SELECT data FROM tasks WHERE status IN ('pending', 'running') ORDER BY created_at",
+        ).result()
+        tasks = [json.loads(data) for (data,) in rows]
+        for task_dict in tasks:
+            self._persisted_status[task_dict["task_id"]] = task_dict["status"]
+        return tasks
+
+    async def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """按ID读取任务（包含尚未刷新的更新）"""
+        if task_id in self._dirty:
+            return json.loads(self.serialize(self._dirty[task_id])[-1])
+        rows = await self._run(self._query, "SELECT data FROM tasks WHERE task_id = ?", (task_id,))
+        return json.loads(rows[0][0]) if rows else None
+
+    async def list_user_tasks(self, user_id: str, limit: int = 100, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        """按创建时间倒序读取用户任务（走 user_id/status 索引）"""
+        await self.flush()
+        if status:
+            rows = await self._run(
+                self._query,
+                "SELECT data FROM tasks WHERE user_id = ? AND status = ? ORDER BY created_at DESC LIMIT ?",
+                (user_id, status, limit),
+            )
+        else:
+            rows = await self._run(
+                self._query,
+                "SELECT data FROM tasks WHERE user_id = ? ORDER BY created_at DESC LIMIT ?",
+                (user_id, limit),
+            )
+        return [json.loads(data) for (data,) in rows]
+
+    async def count_by_status(self, user_id: Optional[str] = None) -> Dict[str, int]:
+        """按状态统计任务数"""
+        if user_id is None:
+            rows = await self._run(self._query, "SELECT status, COUNT(*) FROM tasks GROUP BY status")
+        else:
+            rows = await self._run(
+                self._query, "SELECT status, COUNT(*) FROM tasks WHERE user_id = ? GROUP BY status", (user_id,)
+            )
+        return dict(rows)
+
+    async def close(self):
+        """刷新未写入的更新并关闭连接"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+        await self.flush()
+        await self._run(self._conn.close)
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,403 @@
+"""
+可视化数据服务
+按图版本预计算布局坐标和社区聚合，以gzip压缩的列式JSON保存和返回，支持按社区展开的分级加载
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import sys
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Hashable, List, Optional, Sequence
+
+import numpy as np
+
+from ..config.settings import settings
+from ..models.graph import Entity, Relation, VisualizationConfig
+
+# 添加框架路径
+sys.path.append(str(Path(__file__).parent.parent.parent / "frameworks"))
+
+from ai_knowledge_graph.utils.graph_layout import community_layout
+
+logger = logging.getLogger(__name__)
+
+# 列式数据格式版本，格式变化时递增使磁盘上的旧数据失效
+PAYLOAD_FORMAT_VERSION = 1
+
+# 节点颜色方案
+COLOR_SCHEMES = {
+    'category10': [
+        '#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd',
+        '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf'
+    ],
+    'category20': [
+        '#1f77b4', '#aec7e8', '#ff7f0e', '#ffbb78', '#2ca02c',
+        '#98df8a', '#d62728', '#ff9896', '#9467bd', '#c5b0d5',
+        '#8c564b', '#c49c94', '#e377c2', '#f7b6d3', '#7f7f7f',
+        '#c7c7c7', '#bcbd22', '#dbdb8d', '#17becf', '#9edae5'
+    ],
+    'pastel': [
+        '#fbb4ae', '#b3cde3', '#ccebc5', '#decbe4', '#fed9a6',
+        '#ffffcc', '#e5d8bd', '#fddaec', '#f2f2f2', '#b3e2cd'
+    ]
+}
+
+
+def _encode_categories(values: Sequence[str]) -> tuple:
+    """按首次出现顺序编码字符串列，返回 (类别表, 编码数组)"""
+    categories: Dict[str, int] = {}
+    codes = np.fromiter((categories.setdefault(value, len(categories)) for value in values),
+                        dtype=np.int32, count=len(values))
+    return list(categories), codes
+
+
+def _scale(values: np.ndarray, value_range: Sequence[float]) -> np.ndarray:
+    """把数值线性映射到 value_range，所有值相同时取下限"""
+    low, high = value_range
+    if values.size == 0:
+        return values.astype(np.float64)
+    span = values.max() - values.min()
+    if span <= 0:
+        return np.full(values.shape, float(low))
+    return low + (high - low) * (values - values.min()) / span
+
+
+def build_visualization_payload(node_ids: List[str], node_names: List[str], entity_types: List[str],
+                                frequency: List[int], confidence: List[float],
+                                edge_source: List[int], edge_target: List[int], predicates: List[str],
+                                edge_confidence: List[float], inferred: List[bool],
+                                node_size_range: Sequence[float], colors: Sequence[str]) -> Dict[str, Any]:
+    """计算布局并生成列式可视化数据（在进程池中执行）
+
+    节点和边的每个字段是一个数组，字符串列按类别编码；clusters/cluster_edges 是按社区聚合的概览层级。
+    """
+    n = len(node_ids)
+    src = np.asarray(edge_source, dtype=np.int64)
+    dst = np.asarray(edge_target, dtype=np.int64)
+    positions, communities = community_layout(n, src, dst)
+    positions = positions.astype(np.float64)
+
+    types, type_codes = _encode_categories(entity_types)
+    predicate_table, predicate_codes = _encode_categories(predicates)
+    frequency = np.asarray(frequency, dtype=np.float64)
+    degree = np.bincount(src, minlength=n) + np.bincount(dst, minlength=n)
+
+    # 社区概览：位置取成员的重心，标签取度数最高的成员，类型取成员中最多的类型
+    community_count = int(communities.max()) + 1 if n else 0
+    member_count = np.bincount(communities, minlength=community_count)
+    centroid = np.column_stack([
+        np.bincount(communities, weights=positions[:, axis], minlength=community_count) for axis in range(2)
+    ]) / np.maximum(member_count, 1)[:, None]
+    hub_order = np.lexsort((-degree, communities))
+    hubs = hub_order[np.searchsorted(communities[hub_order], np.arange(community_count))]
+    type_counts = np.bincount(communities * len(types) + type_codes,
+                              minlength=community_count * len(types)).reshape(community_count, max(len(types), 1))
+    cluster_types = type_counts.argmax(axis=1) if types else np.zeros(community_count, dtype=np.int64)
+
+    inter = communities[src] != communities[dst]
+    pairs = np.column_stack([
+        np.minimum(communities[src][inter], communities[dst][inter]),
+        np.maximum(communities[src][inter], communities[dst][inter]),
+    ])
+    if pairs.size:
+        pairs, weights = np.unique(pairs, axis=0, return_counts=True)
+    else:
+        pairs, weights = pairs.reshape(0, 2), np.zeros(0, dtype=np.int64)
+
+    return {
+        "format": PAYLOAD_FORMAT_VERSION,
+        "graph": {"node_count": n, "edge_count": int(src.size), "community_count": community_count},
+        "types": types,
+        "type_colors": [colors[i % len(colors)] for i in range(len(types))],
+        "predicates": predicate_table,
+        "nodes": {
+            "id": node_ids,
+            "label": node_names,
+            "type": type_codes.tolist(),
+            "community": communities.tolist(),
+            "x": np.round(positions[:, 0], 1).tolist(),
+            "y": np.round(positions[:, 1], 1).tolist(),
+            "size": np.round(_scale(frequency, node_size_range), 1).tolist(),
+            "confidence": np.round(np.asarray(confidence, dtype=np.float64), 3).tolist(),
+            "frequency": frequency.astype(np.int64).tolist(),
+        },
+        "edges": {
+            "source": src.tolist(),
+            "target": dst.tolist(),
+            "predicate": predicate_codes.tolist(),
+            "confidence": np.round(np.asarray(edge_confidence, dtype=np.float64), 3).tolist(),
+            "inferred": np.asarray(inferred, dtype=np.int8).tolist(),
+        },
+        "clusters": {
+            "id": list(range(community_count)),
+            "label": [node_names[hub] for hub in hubs.tolist()],
+            "type": cluster_types.tolist(),
+            "x": np.round(centroid[:, 0], 1).tolist(),
+            "y": np.round(centroid[:, 1], 1).tolist(),
+            "size": np.round(_scale(np.sqrt(member_count), node_size_range), 1).tolist(),
+            "node_count": member_count.tolist(),
+        },
+        "cluster_edges": {
+            "source": pairs[:, 0].tolist(),
+            "target": pairs[:, 1].tolist(),
+            "weight": weights.tolist(),
+        },
+    }
+
+
+def _compress(data: Dict[str, Any]) -> bytes:
+    return gzip.compress(json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8'),
+                         compresslevel=6, mtime=0)
+
+
+class VisualizationPayload:
+    """一个图版本的可视化数据
+
+    概览层级的压缩结果常驻内存，按社区展开时从列数据中切片后再压缩。
+    """
+
+    def __init__(self, data: Dict[str, Any], fingerprint: str):
+        self.data = data
+        self.fingerprint = fingerprint
+        self.node_community = np.asarray(data["nodes"]["community"], dtype=np.int32)
+        self.edge_source = np.asarray(data["edges"]["source"], dtype=np.int64)
+        self.edge_target = np.asarray(data["edges"]["target"], dtype=np.int64)
+        self.node_x = np.asarray(data["nodes"]["x"], dtype=np.float64)
+        self.node_y = np.asarray(data["nodes"]["y"], dtype=np.float64)
+        self.overview_gzip = _compress(self._overview())
+        self._full_gzip: Optional[bytes] = None
+
+    @property
+    def node_count(self) -> int:
+        return int(self.node_community.size)
+
+    def _header(self, level: str) -> Dict[str, Any]:
+        return {
+            "format": self.data["format"],
+            "level": level,
+            "graph": self.data["graph"],
+            "types": self.data["types"],
+            "type_colors": self.data["type_colors"],
+        }
+
+    def _overview(self) -> Dict[str, Any]:
+        return {
+            **self._header("overview"),
+            "clusters": self.data["clusters"],
+            "cluster_edges": self.data["cluster_edges"],
+        }
+
+    def full_gzip(self) -> bytes:
+        """完整数据（按需压缩一次）"""
+        if self._full_gzip is None:
+            self._full_gzip = _compress({
+                **self._header("full"),
+                "predicates": self.data["predicates"],
+                "nodes": self.data["nodes"],
+                "edges": self.data["edges"],
+            })
+        return self._full_gzip
+
+    def communities_gzip(self, communities: List[int]) -> bytes:
+        """展开指定社区：返回社区成员节点及成员之间的边，边的端点下标指向返回的节点数组"""
+        node_mask = np.isin(self.node_community, communities)
+        selected = np.flatnonzero(node_mask)
+        remap = np.full(self.node_count, -1, dtype=np.int64)
+        remap[selected] = np.arange(selected.size)
+        edge_mask = node_mask[self.edge_source] & node_mask[self.edge_target]
+        edges = np.flatnonzero(edge_mask)
+
+        nodes = {key: [values[i] for i in selected.tolist()] for key, values in self.data["nodes"].items()}
+        edge_columns = {
+            key: [values[i] for i in edges.tolist()]
+            for key, values in self.data["edges"].items() if key not in ("source", "target")
+        }
+        edge_columns["source"] = remap[self.edge_source[edges]].tolist()
+        edge_columns["target"] = remap[self.edge_target[edges]].tolist()
+        return _compress({
+            **self._header("communities"),
+            "communities": sorted(set(communities)),
+            "predicates": self.data["predicates"],
+            "nodes": nodes,
+            "edges": edge_columns,
+        })
+
+    def node_ids_in_viewport(self, viewport: Sequence[float]) -> List[str]:
+        """返回布局坐标落在视口 (x_min, y_min, x_max, y_max) 内的节点ID"""
+        x_min, y_min, x_max, y_max = viewport
+        inside = (self.node_x >= x_min) & (self.node_x <= x_max) & (self.node_y >= y_min) & (self.node_y <= y_max)
+        node_ids = self.data["nodes"]["id"]
+        return [node_ids[i] for i in np.flatnonzero(inside).tolist()]
+
+    def save(self, path: Path):
+        path.write_bytes(gzip.compress(
+            json.dumps({"fingerprint": self.fingerprint, "data": self.data},
+                       ensure_ascii=False, separators=(',', ':')).encode('utf-8'),
+            compresslevel=6, mtime=0
+        ))
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["VisualizationPayload"]:
+        stored = json.loads(gzip.decompress(path.read_bytes()))
+        if stored["data"].get("format") != PAYLOAD_FORMAT_VERSION:
+            return None
+        return cls(stored["data"], stored["fingerprint"])
+
+
+class VisualizationDataService:
+    """可视化数据服务
+
+    布局在进程池中计算，每个图只缓存最新版本；结果同时写入可视化目录，
+    重启后内容未变化的图直接从磁盘加载，不再重新计算布局。
+    """
+
+    def __init__(self):
+        self.storage_dir = Path(settings.VISUALIZATION_DIR)
+        self._process_executor: Optional[ProcessPoolExecutor] = None
+        # 内存缓存按 (租户键, 图谱ID) 区分，值为 (版本, 数据)
+        self._cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._locks: Dict[tuple, asyncio.Lock] = {}
+        self.max_cached_graphs = settings.VISUALIZATION_CACHE_MAX_GRAPHS
+
+    def _get_process_executor(self) -> ProcessPoolExecutor:
+        """按需创建布局计算进程池"""
+        if self._process_executor is None:
+            self._process_executor = ProcessPoolExecutor(max_workers=settings.VISUALIZATION_LAYOUT_WORKERS)
+        return self._process_executor
+
+    def _payload_path(self, graph_id: str) -> Path:
+        return self.storage_dir / f"{graph_id}.layout.json.gz"
+
+    @staticmethod
+    def _fingerprint(entities: List[Entity], relations: List[Relation], config: VisualizationConfig) -> str:
+        """根据参与可视化的字段和配置计算内容指纹"""
+        digest = hashlib.md5()
+        digest.update(repr((PAYLOAD_FORMAT_VERSION, config.node_size_range, config.node_color_scheme)).encode())
+        for entity in entities:
+            digest.update(repr((entity.id, entity.name, entity.entity_type, entity.frequency, entity.confidence)).encode())
+        digest.update(b"|")
+        for relation in relations:
+            digest.update(repr((relation.subject, relation.predicate, relation.object,
+                                relation.confidence, relation.inferred)).encode())
+        return digest.hexdigest()
+
+    def get_cached(self, graph_id: str, revision: Hashable, tenant_key: Optional[str] = None) -> Optional[VisualizationPayload]:
+        """返回指定租户、指定版本的缓存数据，没有时返回None"""
+        cache_key = (tenant_key, graph_id)
+        cached = self._cache.get(cache_key)
+        if cached is None or revision is None or cached[0] != revision:
+            return None
+        self._cache.move_to_end(cache_key)
+        return cached[1]
+
+    async def get_payload(self, graph_id: str, entities: List[Entity], relations: List[Relation],
+                          config: Optional[VisualizationConfig] = None,
+                          revision: Hashable = None, tenant_key: Optional[str] = None) -> VisualizationPayload:
+        """获取图的可视化数据，同一个图并发请求时只计算一次
+
+        Args:
+            graph_id: 图谱ID
+            entities: 实体列表
+            relations: 关系列表
+            config: 可视化配置（节点大小范围和颜色方案）
+            revision: 图数据版本号，提供时用于命中内存缓存
+            tenant_key: 租户键，内存缓存按 (租户键, 图谱ID) 区分
+        """
+        config = config or VisualizationConfig()
+        cache_key = (tenant_key, graph_id)
+        lock = self._locks.setdefault(cache_key, asyncio.Lock())
+        async with lock:
+            cached = self.get_cached(graph_id, revision, tenant_key)
+            if cached is not None:
+                return cached
+
+            # 磁盘上的预计算数据按内容指纹校验，只有数据完全相同时才会复用
+            fingerprint = self._fingerprint(entities, relations, config)
+            payload = self._cache[cache_key][1] if cache_key in self._cache else None
+            if payload is None or payload.fingerprint != fingerprint:
+                payload = await self._load_or_build(graph_id, entities, relations, config, fingerprint)
+
+            self._cache[cache_key] = (revision if revision is not None else fingerprint, payload)
+            self._cache.move_to_end(cache_key)
+            while len(self._cache) > self.max_cached_graphs:
+                self._cache.popitem(last=False)
+            return payload
+
+    async def _load_or_build(self, graph_id: str, entities: List[Entity], relations: List[Relation],
+                             config: VisualizationConfig, fingerprint: str) -> VisualizationPayload:
+        loop = asyncio.get_running_loop()
+        path = self._payload_path(graph_id)
+        if path.exists():
+            try:
+                payload = await loop.run_in_executor(None, VisualizationPayload.load, path)
+                if payload is not None and payload.fingerprint == fingerprint:
+                    logger.info(f"Loaded precomputed visualization payload for graph {graph_id}")
+                    return payload
+            except Exception as e:
+                logger.warning(f"Failed to load visualization payload for graph {graph_id}: {e}")
+
+        # 与 nx.DiGraph 的语义一致：重复实体以最后一次为准，缺失端点的关系跳过
+        latest_entities = {entity.id: entity for entity in entities}
+        nodes = list(latest_entities.values())
+        node_index = {node.id: i for i, node in enumerate(nodes)}
+        edges = [relation for relation in relations
+                 if relation.subject in node_index and relation.object in node_index]
+
+        colors = COLOR_SCHEMES.get(config.node_color_scheme, COLOR_SCHEMES['category10'])
+        data = await loop.run_in_executor(
+            self._get_process_executor(),
+            build_visualization_payload,
+            [node.id for node in nodes],
+            [node.name for node in nodes],
+            [node.entity_type for node in nodes],
+            [node.frequency for node in nodes],
+            [node.confidence for node in nodes],
+            [node_index[relation.subject] for relation in edges],
+            [node_index[relation.object] for relation in edges],
+            [relation.predicate for relation in edges],
+            [relation.confidence for relation in edges],
+            [relation.inferred for relation in edges],
+            list(config.node_size_range),
+            colors
+        )
+        payload = VisualizationPayload(data, fingerprint)
+
+        try:
+            self.storage_dir.mkdir(parents=True, exist_ok=True)
+            await loop.run_in_executor(None, payload.save, path)
+        except Exception as e:
+            logger.warning(f"Failed to save visualization payload for graph {graph_id}: {e}")
+
+        logger.info(f"Computed visualization payload for graph {graph_id}: "
+                    f"{len(nodes)} nodes, {data['graph']['community_count']} communities")
+        return payload
+
+    def invalidate(self, graph_id: str):
+        """删除图的缓存和磁盘数据（缓存键为(tenant_key, graph_id)，需清理该图在所有租户下的条目）"""
+        for cache_key in [key for key in self._cache if key[1] == graph_id]:
+            del self._cache[cache_key]
+        for lock_key in [key for key in self._locks if key[1] == graph_id]:
+            del self._locks[lock_key]
+        path = self._payload_path(graph_id)
+        if path.exists():
+            path.unlink()
+
+    def shutdown(self):
+        """关闭进程池"""
+        if self._process_executor is not None:
+            self._process_executor.shutdown(wait=False, cancel_futures=True)
+            self._process_executor = None
+
+
+# 全局可视化数据服务实例
+visualization_data_service = VisualizationDataService()
+
+
+async def get_visualization_data_service() -> VisualizationDataService:
+    """获取可视化数据服务实例"""
+    return visualization_data_service
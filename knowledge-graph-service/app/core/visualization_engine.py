@@ -4,16 +4,23 @@
 """
 
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Hashable, Tuple
 from datetime import datetime
+import heapq
 import json
+import math
+import re
 from pathlib import Path
 
 from ..models.graph import Entity, Relation, VisualizationConfig
 from ..config.settings import settings
+from .visualization_data import COLOR_SCHEMES, VisualizationPayload, visualization_data_service
 
 logger = logging.getLogger(__name__)
 
+# 模板占位符：{{ name }}
+_TEMPLATE_PLACEHOLDER = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
 
 class VisualizationEngine:
     """可视化引擎
@@ -633,14 +640,22 @@ class VisualizationEngine:
         logger.info(f"Created default HTML template: {template_path}")
     
     async def generate_html_visualization(self, entities: List[Entity], relations: List[Relation], 
-                                        config: VisualizationConfig = None, graph_title: str = "知识图谱") -> str:
+                                        config: VisualizationConfig = None, graph_title: str = "知识图谱",
+                                        graph_id: Optional[str] = None, revision: Hashable = None,
+                                        tenant_key: Optional[str] = None) -> str:
         """生成HTML可视化
         
+        实体数超过 VISUALIZATION_INLINE_MAX_NODES 且提供了 graph_id 时，只内嵌按社区聚合的概览
+        （使用预计算的布局坐标并关闭物理模拟），完整数据通过可视化数据接口按社区加载。
+        
         Args:
             entities: 实体列表
             relations: 关系列表
             config: 可视化配置
             graph_title: 图谱标题
+            graph_id: 图谱ID
+            revision: 图数据版本号
+            tenant_key: 租户键
             
         Returns:
             HTML内容
@@ -652,12 +667,27 @@ class VisualizationEngine:
             
             # 使用配置
             viz_config = config or self.default_config
+            physics_enabled = viz_config.physics_enabled
             
-            # 生成节点数据
-            nodes_data = self._generate_nodes_data(entities, viz_config)
-            
-            # 生成边数据
-            edges_data = self._generate_edges_data(relations, viz_config)
+            if graph_id and len(entities) > settings.VISUALIZATION_INLINE_MAX_NODES:
+                # 大图：内嵌社区概览
+                payload = await visualization_data_service.get_payload(
+                    graph_id, entities, relations, viz_config, revision, tenant_key
+                )
+                nodes_data, edges_data = self._generate_cluster_view(payload, viz_config)
+                physics_enabled = False
+                entity_list = self._generate_entity_list(
+                    heapq.nlargest(settings.VISUALIZATION_INLINE_MAX_NODES, entities, key=lambda x: x.confidence)
+                )
+            else:
+                # 生成节点数据
+                nodes_data = self._generate_nodes_data(entities, viz_config)
+                
+                # 生成边数据
+                edges_data = self._generate_edges_data(relations, viz_config)
+                
+                # 生成实体列表
+                entity_list = self._generate_entity_list(entities)
             
             # 生成统计信息
             stats = self._calculate_visualization_stats(entities, relations)
@@ -665,25 +695,22 @@ class VisualizationEngine:
             # 生成图例
             legend_content = self._generate_legend(entities)
             
-            # 生成实体列表
-            entity_list = self._generate_entity_list(entities)
-            
             # 替换模板变量
-            html_content = self.html_template.format(
-                graph_title=graph_title,
-                background_color=viz_config.background_color,
-                font_color="#000000",
-                entity_count=len(entities),
-                relation_count=len(relations),
-                graph_density=f"{stats['density']:.3f}",
-                avg_confidence=f"{stats['avg_confidence']:.3f}",
-                legend_content=legend_content,
-                entity_list=entity_list,
-                nodes_data=json.dumps(nodes_data, ensure_ascii=False),
-                edges_data=json.dumps(edges_data, ensure_ascii=False),
-                smooth_edges=str(viz_config.physics_enabled).lower(),
-                physics_enabled=str(viz_config.physics_enabled).lower()
-            )
+            html_content = self._render_template({
+                'graph_title': graph_title,
+                'background_color': viz_config.background_color,
+                'font_color': "#000000",
+                'entity_count': len(entities),
+                'relation_count': len(relations),
+                'graph_density': f"{stats['density']:.3f}",
+                'avg_confidence': f"{stats['avg_confidence']:.3f}",
+                'legend_content': legend_content,
+                'entity_list': entity_list,
+                'nodes_data': json.dumps(nodes_data, ensure_ascii=False),
+                'edges_data': json.dumps(edges_data, ensure_ascii=False),
+                'smooth_edges': str(physics_enabled).lower(),
+                'physics_enabled': str(physics_enabled).lower()
+            })
             
             logger.info(f"Generated HTML visualization with {len(entities)} entities and {len(relations)} relations")
             return html_content
@@ -692,18 +719,27 @@ class VisualizationEngine:
             logger.error(f"Failed to generate HTML visualization: {e}")
             raise
     
+    def _render_template(self, values: Dict[str, Any]) -> str:
+        """替换模板中的 {{ name }} 占位符（模板中的CSS/JS花括号保持原样），未知占位符保留"""
+        return _TEMPLATE_PLACEHOLDER.sub(
+            lambda match: str(values[match.group(1)]) if match.group(1) in values else match.group(0),
+            self.html_template
+        )
+    
     def _generate_nodes_data(self, entities: List[Entity], config: VisualizationConfig) -> List[Dict[str, Any]]:
         """生成节点数据"""
         try:
             nodes = []
             
-            # 实体类型颜色映射
+            # 实体类型样式：每种类型只计算一次颜色
             entity_colors = self._get_entity_colors(entities, config)
+            type_styles: Dict[str, Tuple[str, str]] = {}
             
             # 计算节点大小范围
             max_freq = max(entity.frequency for entity in entities) if entities else 1
             min_freq = min(entity.frequency for entity in entities) if entities else 1
             size_range = config.node_size_range
+            font_size = 12 if config.show_labels else 0
             
             for entity in entities:
                 # 计算节点大小
@@ -714,7 +750,11 @@ class VisualizationEngine:
                     node_size = size_range[0]
                 
                 # 获取颜色
-                color = entity_colors.get(entity.entity_type, '#2B7CE9')
+                style = type_styles.get(entity.entity_type)
+                if style is None:
+                    color = entity_colors.get(entity.entity_type, '#2B7CE9')
+                    style = type_styles[entity.entity_type] = (color, self._lighten_color(color, 0.3))
+                color, background = style
                 
                 node = {
                     'id': entity.id,
@@ -726,15 +766,15 @@ class VisualizationEngine:
                     'centrality': entity.centrality,
                     'color': {
                         'border': color,
-                        'background': self._lighten_color(color, 0.3)
+                        'background': background
                     },
                     'originalColor': {
                         'border': color,
-                        'background': self._lighten_color(color, 0.3)
+                        'background': background
                     },
                     'title': f"{entity.name}\\n类型: {entity.entity_type}\\n置信度: {entity.confidence:.3f}\\n频次: {entity.frequency}",
                     'font': {
-                        'size': 12 if config.show_labels else 0
+                        'size': font_size
                     }
                 }
                 
@@ -747,6 +787,53 @@ class VisualizationEngine:
             logger.error(f"Failed to generate nodes data: {e}")
             raise
     
+    def _generate_cluster_view(self, payload: VisualizationPayload,
+                               config: VisualizationConfig) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """把可视化数据的社区概览层级转换为vis.js节点和边（坐标固定）"""
+        clusters = payload.data["clusters"]
+        cluster_edges = payload.data["cluster_edges"]
+        types = payload.data["types"]
+        type_colors = payload.data["type_colors"]
+        lightened = [self._lighten_color(color, 0.3) for color in type_colors]
+        font_size = 12 if config.show_labels else 0
+        
+        nodes = []
+        for cluster_id, label, type_code, x, y, size, node_count in zip(
+            clusters["id"], clusters["label"], clusters["type"], clusters["x"],
+            clusters["y"], clusters["size"], clusters["node_count"]
+        ):
+            color = {'border': type_colors[type_code], 'background': lightened[type_code]} if types else None
+            nodes.append({
+                'id': f"cluster-{cluster_id}",
+                'label': label if node_count == 1 else f"{label} (+{node_count - 1})",
+                'group': types[type_code] if types else 'cluster',
+                'size': size,
+                'x': x,
+                'y': y,
+                'community': cluster_id,
+                'nodeCount': node_count,
+                'color': color,
+                'originalColor': color,
+                'title': f"社区 {cluster_id}\\n节点数: {node_count}\\n主要类型: {types[type_code] if types else ''}",
+                'font': {'size': font_size}
+            })
+        
+        edges = []
+        for source, target, weight in zip(cluster_edges["source"], cluster_edges["target"], cluster_edges["weight"]):
+            edges.append({
+                'id': f"cluster-edge-{source}-{target}",
+                'from': f"cluster-{source}",
+                'to': f"cluster-{target}",
+                'width': 1.0 + math.log(weight),
+                'color': {'color': config.edge_color},
+                'originalColor': {'color': config.edge_color},
+                'title': f"{weight} 条关系",
+                'arrows': {'to': {'enabled': False}}
+            })
+        
+        logger.info(f"Generated cluster view with {len(nodes)} clusters and {len(edges)} cluster edges")
+        return nodes, edges
+    
     def _generate_edges_data(self, relations: List[Relation], config: VisualizationConfig) -> List[Dict[str, Any]]:
         """生成边数据"""
         try:
@@ -807,28 +894,11 @@ class VisualizationEngine:
     def _get_entity_colors(self, entities: List[Entity], config: VisualizationConfig) -> Dict[str, str]:
         """获取实体类型颜色映射"""
         try:
-            entity_types = list(set(entity.entity_type for entity in entities))
-            
-            # 预定义颜色方案
-            color_schemes = {
-                'category10': [
-                    '#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd',
-                    '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf'
-                ],
-                'category20': [
-                    '#1f77b4', '#aec7e8', '#ff7f0e', '#ffbb78', '#2ca02c',
-                    '#98df8a', '#d62728', '#ff9896', '#9467bd', '#c5b0d5',
-                    '#8c564b', '#c49c94', '#e377c2', '#f7b6d3', '#7f7f7f',
-                    '#c7c7c7', '#bcbd22', '#dbdb8d', '#17becf', '#9edae5'
-                ],
-                'pastel': [
-                    '#fbb4ae', '#b3cde3', '#ccebc5', '#decbe4', '#fed9a6',
-                    '#ffffcc', '#e5d8bd', '#fddaec', '#f2f2f2', '#b3e2cd'
-                ]
-            }
+            # 按首次出现的顺序分配颜色，使同一个图每次生成的颜色一致
+            entity_types = list(dict.fromkeys(entity.entity_type for entity in entities))
             
             # 选择颜色方案
-            colors = color_schemes.get(config.node_color_scheme, color_schemes['category10'])
+            colors = COLOR_SCHEMES.get(config.node_color_scheme, COLOR_SCHEMES['category10'])
             
             # 分配颜色
             entity_colors = {}
@@ -291,7 +291,7 @@ class GraphDataResponse(BaseModel):
 class GraphExportRequest(BaseModel):
     """图谱导出请求"""
     graph_id: str = Field(..., description="图谱ID")
-    export_format: str = Field(default="json", description="导出格式：json/csv/rdf/cypher/networkx")
+    export_format: str = Field(default="json", description="导出格式：json/ndjson/graphml/csv/rdf/cypher/networkx")
     include_metadata: bool = Field(default=True, description="包含元数据")
     include_visualization: bool = Field(default=False, description="包含可视化")
     filter_confidence: Optional[float] = Field(None, description="置信度过滤")
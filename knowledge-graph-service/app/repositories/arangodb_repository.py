@@ -5,7 +5,12 @@ ArangoDB 数据访问层
 
 import logging
 import asyncio
-from typing import List, Dict, Any, Optional, Tuple
+import hashlib
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+from typing import List, Dict, Any, Optional, Tuple, Callable, Awaitable, Iterable, AsyncIterator, Set
 from datetime import datetime
 import json
 from contextlib import asynccontextmanager
@@ -38,11 +43,20 @@ class ArangoDBRepository:
         
         # 连接池配置
         self.max_connections = settings.GRAPH_DATABASE_MAX_CONNECTIONS
+        self.write_batch_size = settings.GRAPH_DATABASE_WRITE_BATCH_SIZE
+        self.read_batch_size = settings.GRAPH_DATABASE_READ_BATCH_SIZE
+        # python-arango是同步驱动，驱动调用放到专用线程池中执行，避免阻塞事件循环
+        self._driver_executor = ThreadPoolExecutor(max_workers=self.max_connections, thread_name_prefix="arangodb")
         
         # 初始化组件
         self.tenant_manager = TenantIsolationManager(self.client, self.username, self.password)
         self.networkx_adapter = NetworkXAdapter()
         
+        # 已确认存在实体搜索视图的 (数据库名, 图ID)
+        self._search_views: set = set()
+        # 已确认建立了度数索引、实体度数已计算的 (数据库名, 图ID)
+        self._degree_indexes: set = set()
+        
         # 延迟初始化系统数据库（避免模块导入时连接数据库）
         self._db_initialized = False
     
@@ -144,6 +158,103 @@ class ArangoDBRepository:
             logger.error(f"Failed to get graph database: {e}")
             raise
     
+    @staticmethod
+    def tenant_key(user_id: str = None, project_id: str = None) -> str:
+        """租户键，进程内缓存的图数据按 (租户键, 图ID) 区分，不同租户之间不会共享缓存"""
+        return f"kg_tenant_{user_id}_{project_id}"
+    
+    def _read_graph_owner_revision(self, graph_id: str) -> Optional[Dict[str, Any]]:
+        """只读取图谱元数据中的所有者和数据版本字段（元数据文档可能包含完整的实体列表）"""
+        cursor = self.get_database().aql.execute(
+            """
+            LET doc = DOCUMENT('graph_metadata', @key)
+            RETURN doc == null ? null : {created_by: doc.created_by, project_id: doc.project_id, revision: doc.data_revision}
+            """,
+            bind_vars={'key': graph_id}
+        )
+        return next(cursor, None)
+    
+    async def get_graph_access(self, graph_id: str, user_id: str = None, project_id: str = None) -> Tuple[bool, Optional[str]]:
+        """返回 (图谱是否属于该用户（和项目）, 图数据的当前版本)
+        
+        版本随图谱元数据持久化在数据库中，所有工作进程看到同一版本；尚未写入过图数据时为None。
+        """
+        owner = await self._run_driver(self._read_graph_owner_revision, graph_id)
+        if owner is None or owner.get('created_by') != user_id:
+            return False, None
+        if project_id is not None and owner.get('project_id') != project_id:
+            return False, None
+        return True, owner.get('revision')
+    
+    async def get_graph_revision(self, graph_id: str, user_id: str = None, project_id: str = None) -> Optional[str]:
+        """获取图数据的当前版本
+        
+        图谱元数据不存在、不属于该用户（或项目）、或尚未写入过图数据时返回None，调用方不应使用缓存。
+        """
+        owned, revision = await self.get_graph_access(graph_id, user_id, project_id)
+        return revision if owned else None
+    
+    def _bump_graph_revision(self, graph_id: str) -> Optional[str]:
+        """图数据写入后在图谱元数据中写入新的版本，使各进程缓存的图失效
+        
+        版本使用随机标识而不是计数器，图谱删除后以相同ID重建时也不会与旧缓存的版本相同。
+        """
+        try:
+            cursor = self.get_database().aql.execute(
+                """
+                FOR doc IN graph_metadata
+                    FILTER doc._key == @key
+                    UPDATE doc WITH {data_revision: @revision} IN graph_metadata
+                    RETURN NEW.data_revision
+                """,
+                bind_vars={'key': graph_id, 'revision': uuid.uuid4().hex}
+            )
+            return next(cursor, None)
+        except ArangoError as e:
+            logger.error(f"Failed to bump graph revision for {graph_id}: {e}")
+            raise
+    
+    async def _run_driver(self, func: Callable, *args, **kwargs) -> Any:
+        """在驱动线程池中执行同步的python-arango调用"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._driver_executor, partial(func, *args, **kwargs))
+    
+    @staticmethod
+    def _document_hash(doc: Dict[str, Any]) -> str:
+        """文档内容哈希，存入 _hash 字段，用于增量保存时判断文档是否变化"""
+        payload = json.dumps(doc, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def _fetch_document_hashes(db: Database, collection_name: str) -> Dict[str, Optional[str]]:
+        """读取集合中所有文档的 _key 和 _hash（旧版本写入的文档没有 _hash）"""
+        cursor = db.aql.execute(
+            "FOR doc IN @@collection RETURN [doc._key, doc._hash]",
+            bind_vars={'@collection': collection_name},
+            batch_size=10000,
+            stream=True
+        )
+        return {key: doc_hash for key, doc_hash in cursor}
+    
+    @staticmethod
+    def _diff_documents(docs: List[Dict[str, Any]], stored_hashes: Dict[str, Optional[str]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[str]]:
+        """比较新文档与已存储的哈希，返回 (新增文档, 变化文档, 删除的key)"""
+        added, changed = [], []
+        for doc in docs:
+            stored_hash = stored_hashes.get(doc['_key'], ...)
+            if stored_hash is ...:
+                added.append(doc)
+            elif stored_hash != doc['_hash']:
+                changed.append(doc)
+        new_keys = {doc['_key'] for doc in docs}
+        removed = [key for key in stored_hashes if key not in new_keys]
+        return added, changed, removed
+    
+    @staticmethod
+    def _chunked(items: List[Any], size: int) -> Iterable[List[Any]]:
+        for start in range(0, len(items), size):
+            yield items[start:start + size]
+    
     async def save_project(self, project: KnowledgeGraphProject) -> KnowledgeGraphProject:
         """保存项目"""
         try:
@@ -223,67 +334,156 @@ class ArangoDBRepository:
             raise
     
     async def save_graph_data(self, graph_id: str, entities: List[Entity], relations: List[Relation], 
-                             user_id: str = None, project_id: str = None) -> bool:
-        """保存图谱数据"""
+                             user_id: str = None, project_id: str = None,
+                             progress_callback: Optional[Callable[[str, float, Optional[Dict[str, Any]]], Awaitable[None]]] = None) -> bool:
+        """保存图谱数据
+        
+        增量保存：用每个文档的内容哈希与库中已存储的哈希比较，只写入新增和变化的文档、删除已不存在的文档，
+        写入按批进行。progress_callback(message, progress, details) 的progress为0~1。
+        """
+        written = False
         try:
-            db, graph = self.get_graph_database(graph_id, user_id, project_id)
+            db, graph = await self._run_driver(self.get_graph_database, graph_id, user_id, project_id)
             
             # 获取实体和关系集合
-            entities_collection = graph.vertex_collection(f"entities_{graph_id}")
-            relations_collection = graph.edge_collection(f"relations_{graph_id}")
-            
-            # 清空现有数据
-            entities_collection.truncate()
-            relations_collection.truncate()
-            
-            # 批量插入实体
+            entities_name = f"entities_{graph_id}"
+            relations_name = f"relations_{graph_id}"
+            entities_collection = graph.vertex_collection(entities_name)
+            relations_collection = graph.edge_collection(relations_name)
+            
+            # 写入前建立搜索视图，新文档写入时即被索引
+            try:
+                await self._run_driver(self._ensure_search_view, db, graph_id)
+            except ArangoError as e:
+                logger.warning(f"Failed to create search view for graph {graph_id}: {e}")
+            
+            # 构建文档并计算内容哈希
             entity_docs = []
             for entity in entities:
                 entity_doc = entity.dict()
                 entity_doc['_key'] = entity.id
+                entity_doc['_hash'] = self._document_hash(entity_doc)
                 entity_docs.append(entity_doc)
             
-            if entity_docs:
-                entities_collection.insert_many(entity_docs)
-                logger.info(f"Inserted {len(entity_docs)} entities for graph {graph_id}")
-            
-            # 批量插入关系
             relation_docs = []
             for relation in relations:
                 relation_doc = relation.dict()
                 relation_doc['_key'] = relation.id
-                relation_doc['_from'] = f"entities_{graph_id}/{relation.subject}"
-                relation_doc['_to'] = f"entities_{graph_id}/{relation.object}"
+                relation_doc['_from'] = f"{entities_name}/{relation.subject}"
+                relation_doc['_to'] = f"{entities_name}/{relation.object}"
+                relation_doc['_hash'] = self._document_hash(relation_doc)
                 relation_docs.append(relation_doc)
             
-            if relation_docs:
-                relations_collection.insert_many(relation_docs)
-                logger.info(f"Inserted {len(relation_docs)} relations for graph {graph_id}")
-            
+            # 与已存储的哈希比较
+            stored_entity_hashes, stored_relation_hashes = await asyncio.gather(
+                self._run_driver(self._fetch_document_hashes, db, entities_name),
+                self._run_driver(self._fetch_document_hashes, db, relations_name)
+            )
+            added_entities, changed_entities, removed_entities = self._diff_documents(entity_docs, stored_entity_hashes)
+            added_relations, changed_relations, removed_relations = self._diff_documents(relation_docs, stored_relation_hashes)
+            
+            summary = {
+                'added_entities': len(added_entities),
+                'changed_entities': len(changed_entities),
+                'removed_entities': len(removed_entities),
+                'added_relations': len(added_relations),
+                'changed_relations': len(changed_relations),
+                'removed_relations': len(removed_relations)
+            }
+            total_changes = sum(summary.values())
+            logger.info(f"Graph {graph_id} diff: {summary}")
+            
+            # 度数可能变化的实体：新增和变化的实体（整体替换会丢掉 degree 字段），以及新增、变化、删除的关系的端点；
+            # 变化和删除的关系的旧端点在写入前读取
+            degree_keys = {doc['_key'] for doc in added_entities + changed_entities}
+            for doc in added_relations + changed_relations:
+                degree_keys.update((doc['_from'].split('/', 1)[1], doc['_to'].split('/', 1)[1]))
+            for batch in self._chunked(removed_relations + [doc['_key'] for doc in changed_relations], self.write_batch_size):
+                degree_keys.update(await self._run_driver(self._fetch_relation_endpoints, db, relations_name, batch))
+            
+            # 先删除关系、写入实体，再写入关系、删除实体，保证任意时刻边的端点都存在
+            operations = [
+                ("删除关系", relations_collection.delete_many, [{'_key': key} for key in removed_relations]),
+                ("写入实体", partial(entities_collection.import_bulk, on_duplicate='replace', halt_on_error=True), added_entities + changed_entities),
+                ("写入关系", partial(relations_collection.import_bulk, on_duplicate='replace', halt_on_error=True), added_relations + changed_relations),
+                ("删除实体", entities_collection.delete_many, [{'_key': key} for key in removed_entities])
+            ]
+            
+            applied = 0
+            for label, operation, docs in operations:
+                for batch in self._chunked(docs, self.write_batch_size):
+                    written = True
+                    await self._run_driver(operation, batch)
+                    applied += len(batch)
+                    if progress_callback:
+                        await progress_callback(
+                            f"保存图谱数据: {label} {applied}/{total_changes}",
+                            applied / total_changes,
+                            {'persisted_changes': applied, 'total_changes': total_changes, **summary}
+                        )
+            
+            # 度数随图数据写入一起计算并保存，分页查询按索引过滤和排序，不必每页重新遍历所有边；
+            # 只重新计算受本次写入影响的实体
+            if written:
+                for batch in self._chunked(sorted(degree_keys), self.write_batch_size):
+                    await self._run_driver(self._update_degrees, db, graph_id, batch)
+            
+            if progress_callback and total_changes == 0:
+                await progress_callback("图谱数据无变化", 1.0, {'persisted_changes': 0, 'total_changes': 0, **summary})
+            
+            logger.info(f"Saved graph {graph_id}: {applied} document changes applied")
             return True
             
         except ArangoError as e:
             logger.error(f"Failed to save graph data: {e}")
             raise
+        finally:
+            # 写入失败时数据也可能已部分变化，同样需要使缓存失效
+            if written:
+                await self._run_driver(self._bump_graph_revision, graph_id)
+    
+    async def _stream_collection(self, db: Database, collection_name: str, batch_size: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """用流式AQL游标逐批读取集合文档，每批的网络读取在驱动线程池中完成"""
+        batch_size = batch_size or self.read_batch_size
+        cursor = await self._run_driver(
+            db.aql.execute,
+            "FOR doc IN @@collection RETURN doc",
+            bind_vars={'@collection': collection_name},
+            batch_size=batch_size,
+            stream=True
+        )
+        try:
+            while True:
+                batch = await self._run_driver(lambda: list(islice(cursor, batch_size)))
+                if not batch:
+                    break
+                for doc in batch:
+                    yield doc
+        finally:
+            await self._run_driver(cursor.close, ignore_missing=True)
+    
+    async def iter_entities(self, graph_id: str, user_id: str = None, project_id: str = None,
+                            batch_size: Optional[int] = None) -> AsyncIterator[Entity]:
+        """流式读取图谱实体"""
+        db, _ = await self._run_driver(self.get_graph_database, graph_id, user_id, project_id)
+        async for doc in self._stream_collection(db, f"entities_{graph_id}", batch_size):
+            yield Entity(**doc)
+    
+    async def iter_relations(self, graph_id: str, user_id: str = None, project_id: str = None,
+                             batch_size: Optional[int] = None) -> AsyncIterator[Relation]:
+        """流式读取图谱关系"""
+        db, _ = await self._run_driver(self.get_graph_database, graph_id, user_id, project_id)
+        async for doc in self._stream_collection(db, f"relations_{graph_id}", batch_size):
+            yield Relation(**doc)
     
     async def get_graph_data(self, graph_id: str, user_id: str = None, project_id: str = None) -> Tuple[List[Entity], List[Relation]]:
-        """获取图谱数据"""
+        """获取图谱数据（完整列表；大图请使用 iter_entities/iter_relations）"""
         try:
-            db, graph = self.get_graph_database(graph_id, user_id, project_id)
-            
-            # 获取实体和关系集合
-            entities_collection = graph.vertex_collection(f"entities_{graph_id}")
-            relations_collection = graph.edge_collection(f"relations_{graph_id}")
-            
             # 查询实体
-            entities = []
-            for entity_doc in entities_collection.all():
-                entities.append(Entity(**entity_doc))
+            entities = [entity async for entity in self.iter_entities(graph_id, user_id, project_id)]
             
             # 查询关系
-            relations = []
-            for relation_doc in relations_collection.all():
-                relations.append(Relation(**relation_doc))
+            relations = [relation async for relation in self.iter_relations(graph_id, user_id, project_id)]
             
             logger.info(f"Retrieved {len(entities)} entities and {len(relations)} relations for graph {graph_id}")
             return entities, relations
@@ -292,28 +492,239 @@ class ArangoDBRepository:
             logger.error(f"Failed to get graph data: {e}")
             raise
     
+    @staticmethod
+    def _fetch_relation_endpoints(db: Database, relations_name: str, keys: List[str]) -> Set[str]:
+        """读取指定关系的两端实体key"""
+        cursor = db.aql.execute(
+            """
+            FOR rel IN @@relations
+                FILTER rel._key IN @keys
+                RETURN [rel._from, rel._to]
+            """,
+            bind_vars={'@relations': relations_name, 'keys': keys}
+        )
+        return {endpoint.split('/', 1)[1] for endpoints in cursor for endpoint in endpoints}
+    
+    @staticmethod
+    def _update_degrees(db: Database, graph_id: str, entity_keys: Optional[List[str]] = None) -> None:
+        """重新计算实体度数并写入 degree 字段，只更新度数有变化（或尚未计算）的实体
+        
+        Args:
+            entity_keys: 只重新计算这些实体，为None时计算所有实体
+        """
+        key_filter = "FILTER doc._key IN @keys" if entity_keys is not None else ""
+        bind_vars = {'@entities': f"entities_{graph_id}", '@relations': f"relations_{graph_id}"}
+        if entity_keys is not None:
+            bind_vars['keys'] = entity_keys
+        db.aql.execute(
+            f"""
+            FOR doc IN @@entities
+                {key_filter}
+                LET degree = COUNT(FOR v IN 1..1 ANY doc @@relations RETURN 1)
+                FILTER doc.degree != degree
+                UPDATE doc WITH {{degree: degree}} IN @@entities
+            """,
+            bind_vars=bind_vars
+        )
+    
+    def _ensure_degree_index(self, db: Database, graph_id: str) -> None:
+        """确保实体 degree 字段上有持久化索引；旧版本写入的图没有度数时先补算一次"""
+        if (db.name, graph_id) in self._degree_indexes:
+            return
+        
+        entities_name = f"entities_{graph_id}"
+        # 同字段的持久化索引重复创建是幂等的
+        db.collection(entities_name).add_persistent_index(fields=['degree'])
+        missing = db.aql.execute(
+            "FOR doc IN @@entities FILTER doc.degree == null LIMIT 1 RETURN 1",
+            bind_vars={'@entities': entities_name}
+        )
+        if next(missing, None) is not None:
+            self._update_degrees(db, graph_id)
+            logger.info(f"Computed entity degrees for graph {graph_id}")
+        
+        self._degree_indexes.add((db.name, graph_id))
+    
+    async def get_visualization_page(self, graph_id: str, offset: int = 0, limit: int = 500,
+                                     min_degree: int = 0, entity_keys: Optional[List[str]] = None,
+                                     user_id: str = None, project_id: str = None) -> Dict[str, Any]:
+        """分页获取可视化数据
+        
+        按度数降序返回一页实体及这些实体之间的关系，可按最小度数和实体key集合（例如视口内的实体）过滤，
+        前端只需按视口和缩放级别加载需要的部分。度数在图数据写入时保存到实体的 degree 字段并建立索引。
+        
+        Args:
+            entity_keys: 只返回这些实体，为None时不限制
+        """
+        try:
+            db, _ = await self._run_driver(self.get_graph_database, graph_id, user_id, project_id)
+            await self._run_driver(self._ensure_degree_index, db, graph_id)
+            entities_name = f"entities_{graph_id}"
+            relations_name = f"relations_{graph_id}"
+            
+            filters = []
+            bind_vars: Dict[str, Any] = {
+                '@entities': entities_name,
+                'min_degree': min_degree,
+                'offset': offset,
+                'limit': limit
+            }
+            if entity_keys is not None:
+                filters.append("FILTER doc._key IN @entity_keys")
+                bind_vars['entity_keys'] = entity_keys
+            
+            query = f"""
+                FOR doc IN @@entities
+                    FILTER doc.degree >= @min_degree
+                    {' '.join(filters)}
+                    SORT doc.degree DESC, doc._key
+                    LIMIT @offset, @limit
+                    RETURN doc
+            """
+            cursor = await self._run_driver(db.aql.execute, query, bind_vars=bind_vars, full_count=True)
+            entity_docs = await self._run_driver(list, cursor)
+            total = (cursor.statistics() or {}).get('fullCount', len(entity_docs))
+            
+            # 只返回两端都在本页中的关系
+            entity_ids = [doc['_id'] for doc in entity_docs]
+            relation_cursor = await self._run_driver(
+                db.aql.execute,
+                """
+                FOR id IN @ids
+                    FOR rel IN @@relations
+                        FILTER rel._from == id AND rel._to IN @ids
+                        RETURN rel
+                """,
+                bind_vars={'ids': entity_ids, '@relations': relations_name},
+                batch_size=self.read_batch_size
+            )
+            relation_docs = await self._run_driver(list, relation_cursor)
+            
+            return {
+                'graph_id': graph_id,
+                'entities': [dict(Entity(**doc).dict(), degree=doc['degree']) for doc in entity_docs],
+                'relations': [Relation(**doc).dict() for doc in relation_docs],
+                'offset': offset,
+                'limit': limit,
+                'total': total,
+                'has_more': offset + len(entity_docs) < total
+            }
+            
+        except ArangoError as e:
+            logger.error(f"Failed to get visualization page: {e}")
+            raise
+    
+    # 实体搜索分析器：kg_norm 小写归一化（用于前缀/模糊/精确匹配），
+    # kg_ngram 在归一化后切2~3字符的n-gram，同时适用于中文（无分词）和英文名称
+    SEARCH_ANALYZERS = {
+        'kg_norm': {
+            'analyzer_type': 'norm',
+            'properties': {'locale': 'en', 'case': 'lower', 'accent': False},
+            'features': ['frequency', 'norm', 'position']
+        },
+        'kg_ngram': {
+            'analyzer_type': 'pipeline',
+            'properties': {'pipeline': [
+                {'type': 'norm', 'properties': {'locale': 'en', 'case': 'lower', 'accent': False}},
+                {'type': 'ngram', 'properties': {'min': 2, 'max': 3, 'preserveOriginal': True, 'streamType': 'utf8'}}
+            ]},
+            'features': ['frequency', 'norm', 'position']
+        }
+    }
+    
+    @staticmethod
+    def _search_view_name(graph_id: str) -> str:
+        return f"entities_{graph_id}_search"
+    
+    def _ensure_search_view(self, db: Database, graph_id: str) -> str:
+        """确保图的实体搜索视图（ArangoSearch）存在，返回视图名"""
+        view_name = self._search_view_name(graph_id)
+        if (db.name, graph_id) in self._search_views:
+            return view_name
+        
+        for name, definition in self.SEARCH_ANALYZERS.items():
+            try:
+                # 同名同定义的分析器重复创建是幂等的
+                db.create_analyzer(name, **definition)
+            except ArangoError as e:
+                logger.debug(f"Analyzer {name} not created: {e}")
+        
+        if not any(view['name'] == view_name for view in db.views()):
+            db.create_arangosearch_view(view_name, properties={
+                'links': {
+                    f"entities_{graph_id}": {
+                        'includeAllFields': False,
+                        'fields': {
+                            'name': {'analyzers': ['kg_ngram', 'kg_norm']},
+                            'entity_type': {'analyzers': ['kg_norm']}
+                        }
+                    }
+                }
+            })
+            logger.info(f"Created search view: {view_name}")
+        
+        self._search_views.add((db.name, graph_id))
+        return view_name
+    
+    @staticmethod
+    def _fuzzy_distance(query: str) -> int:
+        """模糊匹配允许的编辑距离，短查询只做精确/前缀匹配"""
+        if len(query) < 3:
+            return 0
+        return 1 if len(query) <= 6 else 2
+    
     async def search_entities(self, graph_id: str, query: str, limit: int = 100, 
                             user_id: str = None, project_id: str = None) -> List[Entity]:
-        """搜索实体"""
+        """搜索实体
+        
+        使用实体搜索视图：名称的n-gram相似、前缀和编辑距离模糊匹配，以及实体类型精确匹配，按BM25排序。
+        视图不可用时回退到集合扫描。
+        """
         try:
-            db, graph = self.get_graph_database(graph_id, user_id, project_id)
-            
-            # 构建搜索查询
-            aql_query = f"""
-            FOR entity IN entities_{graph_id}
-            FILTER CONTAINS(LOWER(entity.name), LOWER(@query)) OR 
-                   CONTAINS(LOWER(entity.entity_type), LOWER(@query))
-            LIMIT @limit
-            RETURN entity
-            """
+            db, graph = await self._run_driver(self.get_graph_database, graph_id, user_id, project_id)
+            
+            try:
+                view_name = await self._run_driver(self._ensure_search_view, db, graph_id)
+            except ArangoError as e:
+                logger.warning(f"Search view unavailable for graph {graph_id}, falling back to scan: {e}")
+                view_name = None
+            
+            if view_name:
+                aql_query = """
+                LET term = FIRST(TOKENS(@query, "kg_norm"))
+                FOR entity IN @@view
+                SEARCH ANALYZER(
+                           NGRAM_MATCH(entity.name, @query, 0.5, "kg_ngram")
+                           OR STARTS_WITH(entity.name, term)
+                           OR (@distance > 0 AND LEVENSHTEIN_MATCH(entity.name, term, @distance, false)),
+                           "kg_norm")
+                       OR ANALYZER(entity.entity_type == term, "kg_norm")
+                SORT BM25(entity) DESC
+                LIMIT @limit
+                RETURN entity
+                """
+                bind_vars = {
+                    '@view': view_name,
+                    'query': query,
+                    'distance': self._fuzzy_distance(query),
+                    'limit': limit
+                }
+            else:
+                aql_query = """
+                FOR entity IN @@collection
+                FILTER CONTAINS(LOWER(entity.name), LOWER(@query)) OR 
+                       CONTAINS(LOWER(entity.entity_type), LOWER(@query))
+                LIMIT @limit
+                RETURN entity
+                """
+                bind_vars = {'@collection': f"entities_{graph_id}", 'query': query, 'limit': limit}
             
             # 执行查询
-            cursor = db.aql.execute(aql_query, bind_vars={'query': query, 'limit': limit})
+            cursor = await self._run_driver(db.aql.execute, aql_query, bind_vars=bind_vars)
+            entity_docs = await self._run_driver(list, cursor)
             
             # 转换结果
-            entities = []
-            for entity_doc in cursor:
-                entities.append(Entity(**entity_doc))
+            entities = [Entity(**entity_doc) for entity_doc in entity_docs]
             
             logger.info(f"Found {len(entities)} entities for query '{query}' in graph {graph_id}")
             return entities
@@ -476,9 +887,14 @@ class ArangoDBRepository:
     
     async def delete_graph(self, graph_id: str, user_id: str = None, project_id: str = None) -> bool:
         """删除图谱"""
-        try:
+        def _delete() -> bool:
             db, graph = self.get_graph_database(graph_id, user_id, project_id)
             
+            # 删除实体搜索视图
+            db.delete_view(self._search_view_name(graph_id), ignore_missing=True)
+            self._search_views.discard((db.name, graph_id))
+            self._degree_indexes.discard((db.name, graph_id))
+            
             # 删除图
             graph_name = f"knowledge_graph_{graph_id}"
             if db.has_graph(graph_name):
@@ -492,10 +908,20 @@ class ArangoDBRepository:
                 logger.info(f"Deleted graph metadata: {graph_id}")
             
             return True
+        
+        try:
+            return await self._run_driver(_delete)
             
         except ArangoError as e:
             logger.error(f"Failed to delete graph: {e}")
             raise
+        finally:
+            # 租户模式下元数据保存在主数据库中不会随图删除，写入新版本使各进程缓存的图失效；
+            # 失败时只记录日志，不覆盖删除本身的异常
+            try:
+                await self._run_driver(self._bump_graph_revision, graph_id)
+            except Exception as e:
+                logger.error(f"Failed to invalidate cached graph {graph_id} after delete: {e}")
     
     async def export_graph(self, graph_id: str, format: str = 'json', 
                          user_id: str = None, project_id: str = None) -> Dict[str, Any]:
@@ -641,11 +1067,25 @@ class ArangoDBRepository:
             logger.error(f"Failed to get relations from tenant db: {e}")
             return []
     
+    async def _load_graph_for_adapter(self, graph_id: str, user_id: str, project_id: str = None) -> Tuple[Tuple[str, str], Optional[str], Optional[List[Entity]], Optional[List[Relation]]]:
+        """返回 (适配器缓存键, 版本, 实体, 关系)
+        
+        缓存键为 (租户键, 图ID)。每次调用都先校验图谱属于该用户（和项目）并读取持久化的版本，
+        适配器已缓存当前版本时不再读取图数据，实体和关系返回None；
+        校验不通过或没有版本时不使用缓存，从租户数据库读取数据。
+        """
+        cache_key = (self.tenant_key(user_id, project_id), graph_id)
+        revision = await self.get_graph_revision(graph_id, user_id, project_id)
+        if revision is not None and self.networkx_adapter.has_graph(cache_key, revision):
+            return cache_key, revision, None, None
+        entities, relations = await self.get_graph_with_tenant_context(graph_id, user_id, project_id)
+        return cache_key, revision, entities, relations
+    
     async def export_to_networkx(self, graph_id: str, user_id: str, project_id: str = None) -> Any:
         """导出图数据为NetworkX对象"""
         try:
-            entities, relations = await self.get_graph_with_tenant_context(graph_id, user_id, project_id)
-            return await self.networkx_adapter.export_to_networkx(graph_id, entities, relations)
+            cache_key, revision, entities, relations = await self._load_graph_for_adapter(graph_id, user_id, project_id)
+            return await self.networkx_adapter.export_to_networkx(cache_key, entities, relations, revision=revision)
             
         except Exception as e:
             logger.error(f"Failed to export graph to NetworkX: {e}")
@@ -654,8 +1094,8 @@ class ArangoDBRepository:
     async def compute_advanced_metrics(self, graph_id: str, user_id: str, project_id: str = None, algorithms: List[str] = None) -> Dict[str, Any]:
         """计算高级图指标"""
         try:
-            entities, relations = await self.get_graph_with_tenant_context(graph_id, user_id, project_id)
-            return await self.networkx_adapter.compute_advanced_metrics(graph_id, entities, relations, algorithms)
+            cache_key, revision, entities, relations = await self._load_graph_for_adapter(graph_id, user_id, project_id)
+            return await self.networkx_adapter.compute_advanced_metrics(cache_key, entities, relations, algorithms, revision=revision)
             
         except Exception as e:
             logger.error(f"Failed to compute advanced metrics: {e}")
@@ -665,8 +1105,8 @@ class ArangoDBRepository:
                           user_id: str = None, project_id: str = None) -> Dict[str, Any]:
         """获取子图"""
         try:
-            entities, relations = await self.get_graph_with_tenant_context(graph_id, user_id, project_id)
-            return await self.networkx_adapter.get_subgraph(graph_id, entities, relations, center_entity, depth, limit)
+            cache_key, revision, entities, relations = await self._load_graph_for_adapter(graph_id, user_id, project_id)
+            return await self.networkx_adapter.get_subgraph(cache_key, entities, relations, center_entity, depth, limit, revision=revision)
             
         except Exception as e:
             logger.error(f"Failed to get subgraph: {e}")
@@ -676,8 +1116,8 @@ class ArangoDBRepository:
                                 user_id: str = None, project_id: str = None) -> Dict[str, Any]:
         """查找最短路径"""
         try:
-            entities, relations = await self.get_graph_with_tenant_context(graph_id, user_id, project_id)
-            return await self.networkx_adapter.find_shortest_path(graph_id, entities, relations, start_entity, end_entity)
+            cache_key, revision, entities, relations = await self._load_graph_for_adapter(graph_id, user_id, project_id)
+            return await self.networkx_adapter.find_shortest_path(cache_key, entities, relations, start_entity, end_entity, revision=revision)
             
         except Exception as e:
             logger.error(f"Failed to find shortest path: {e}")
@@ -687,8 +1127,8 @@ class ArangoDBRepository:
                                user_id: str = None, project_id: str = None) -> Dict[str, Any]:
         """导出图数据为不同格式"""
         try:
-            entities, relations = await self.get_graph_with_tenant_context(graph_id, user_id, project_id)
-            return await self.networkx_adapter.export_to_formats(graph_id, entities, relations, export_format)
+            cache_key, revision, entities, relations = await self._load_graph_for_adapter(graph_id, user_id, project_id)
+            return await self.networkx_adapter.export_to_formats(cache_key, entities, relations, export_format, revision=revision)
             
         except Exception as e:
             logger.error(f"Failed to export graph data: {e}")
@@ -719,6 +1159,7 @@ class ArangoDBRepository:
         try:
             await self.tenant_manager.cleanup_tenant_cache()
             await self.networkx_adapter.close()
+            self._driver_executor.shutdown(wait=True)
             logger.info("ArangoDB repository resources cleaned up")
             
         except Exception as e:
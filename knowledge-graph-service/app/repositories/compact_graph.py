@@ -0,0 +1,206 @@
+"""
+紧凑图存储
+以CSR（numpy数组）形式缓存图结构，只在需要NetworkX算法时才构建NetworkX图对象
+"""
+
+import logging
+from collections import deque
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import networkx as nx
+import numpy as np
+
+from ..models.graph import Entity, Relation
+
+logger = logging.getLogger(__name__)
+
+
+def _encode_categories(values: List[Any]) -> Tuple[List[Any], np.ndarray]:
+    """把重复度高的字符串列（实体类型、谓词、来源）编码为 (类别表, int32编码)"""
+    categories: Dict[Any, int] = {}
+    codes = np.fromiter(
+        (categories.setdefault(value, len(categories)) for value in values),
+        dtype=np.int32,
+        count=len(values)
+    )
+    return list(categories), codes
+
+
+class CompactGraph:
+    """CSR形式的有向图
+
+    节点和边的数值属性存为numpy数组，字符串属性按类别编码，属性字典只为非空的条目保存。
+    边按源节点分组（出边CSR），入边CSR按需从出边推导。
+    """
+
+    def __init__(self, entities: List[Entity], relations: List[Relation], revision: Hashable = None):
+        """构建紧凑图，语义与逐个向 nx.DiGraph 添加节点和边一致（重复节点/边以最后一次为准，缺失端点的关系跳过）
+
+        Args:
+            entities: 实体列表
+            relations: 关系列表
+            revision: 图版本
+        """
+        self.revision = revision
+
+        latest_entities: Dict[str, Entity] = {}
+        for entity in entities:
+            latest_entities[entity.id] = entity
+        self.node_ids: List[str] = list(latest_entities)
+        self.node_index: Dict[str, int] = {node_id: i for i, node_id in enumerate(self.node_ids)}
+        nodes = list(latest_entities.values())
+
+        self.node_names: List[str] = [entity.name for entity in nodes]
+        self.entity_types, self.entity_type_codes = _encode_categories([entity.entity_type for entity in nodes])
+        self.node_confidence = np.array([entity.confidence for entity in nodes], dtype=np.float32)
+        self.node_frequency = np.array([entity.frequency for entity in nodes], dtype=np.int32)
+        self.node_centrality = np.array([entity.centrality for entity in nodes], dtype=np.float32)
+        self.node_properties: Dict[int, Dict[str, Any]] = {
+            i: entity.properties for i, entity in enumerate(nodes) if entity.properties
+        }
+
+        # 同一对端点只保留一条边（位置取第一次出现，属性取最后一次），与 nx.DiGraph 的行为一致
+        latest_relations: Dict[Tuple[int, int], Relation] = {}
+        for relation in relations:
+            source = self.node_index.get(relation.subject)
+            target = self.node_index.get(relation.object)
+            if source is None or target is None:
+                logger.warning(f"Skipping relation {relation.id}: missing nodes {relation.subject} or {relation.object}")
+                continue
+            latest_relations[(source, target)] = relation
+
+        n = len(self.node_ids)
+        sources = np.fromiter((pair[0] for pair in latest_relations), dtype=np.int32, count=len(latest_relations))
+        targets = np.fromiter((pair[1] for pair in latest_relations), dtype=np.int32, count=len(latest_relations))
+        order = np.argsort(sources, kind="stable")
+        edges = list(latest_relations.values())
+        edges = [edges[i] for i in order.tolist()]
+
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=n), out=self.indptr[1:])
+        self.indices = targets[order]
+        # 出边数组中每条边原始的插入顺序，用于让入边邻居的顺序与NetworkX一致
+        self._edge_rank = order.astype(np.int32)
+
+        self.predicates, self.predicate_codes = _encode_categories([relation.predicate for relation in edges])
+        self.sources, self.source_codes = _encode_categories([relation.source for relation in edges])
+        self.edge_confidence = np.array([relation.confidence for relation in edges], dtype=np.float32)
+        self.edge_inferred = np.array([relation.inferred for relation in edges], dtype=bool)
+        self.edge_properties: Dict[int, Dict[str, Any]] = {
+            i: relation.properties for i, relation in enumerate(edges) if relation.properties
+        }
+
+        self._in_indptr: Optional[np.ndarray] = None
+        self._in_indices: Optional[np.ndarray] = None
+
+    @property
+    def number_of_nodes(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def number_of_edges(self) -> int:
+        return int(self.indices.size)
+
+    @property
+    def size(self) -> int:
+        """缓存占用权重（节点数 + 边数）"""
+        return self.number_of_nodes + self.number_of_edges
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self.node_index
+
+    def _ensure_in_edges(self):
+        """按需构建入边CSR，记录的是出边数组中的位置"""
+        if self._in_indptr is None:
+            n = self.number_of_nodes
+            order = np.lexsort((self._edge_rank, self.indices))
+            self._in_indptr = np.zeros(n + 1, dtype=np.int64)
+            np.cumsum(np.bincount(self.indices, minlength=n), out=self._in_indptr[1:])
+            self._in_indices = order
+
+    def successors(self, node: int) -> np.ndarray:
+        """出边邻居（节点下标）"""
+        return self.indices[self.indptr[node]:self.indptr[node + 1]]
+
+    def predecessors(self, node: int) -> np.ndarray:
+        """入边邻居（节点下标）"""
+        self._ensure_in_edges()
+        positions = self._in_indices[self._in_indptr[node]:self._in_indptr[node + 1]]
+        return np.searchsorted(self.indptr, positions, side="right") - 1
+
+    def edge_position(self, source: int, target: int) -> int:
+        """边在出边数组中的位置，不存在时返回-1"""
+        start, end = self.indptr[source], self.indptr[source + 1]
+        hits = np.flatnonzero(self.indices[start:end] == target)
+        return int(start + hits[0]) if hits.size else -1
+
+    def node_data(self, node: int) -> Dict[str, Any]:
+        """节点属性（与NetworkX图中的节点属性字段一致）"""
+        return {
+            "name": self.node_names[node],
+            "entity_type": self.entity_types[self.entity_type_codes[node]],
+            "confidence": float(self.node_confidence[node]),
+            "properties": self.node_properties.get(node, {}),
+            "frequency": int(self.node_frequency[node]),
+            "centrality": float(self.node_centrality[node]),
+        }
+
+    def edge_data(self, position: int) -> Dict[str, Any]:
+        """边属性（与NetworkX图中的边属性字段一致）"""
+        return {
+            "predicate": self.predicates[self.predicate_codes[position]],
+            "confidence": float(self.edge_confidence[position]),
+            "properties": self.edge_properties.get(position, {}),
+            "inferred": bool(self.edge_inferred[position]),
+            "source": self.sources[self.source_codes[position]],
+        }
+
+    def to_networkx(self) -> nx.DiGraph:
+        """构建NetworkX图对象，节点和边的属性字段与原始实体/关系一致，属性字典同时展开为顶层属性"""
+        G = nx.DiGraph()
+        for node, node_id in enumerate(self.node_ids):
+            data = self.node_data(node)
+            G.add_node(node_id, **data, **data["properties"])
+
+        node_ids = self.node_ids
+        for source in range(self.number_of_nodes):
+            for position in range(self.indptr[source], self.indptr[source + 1]):
+                data = self.edge_data(position)
+                G.add_edge(node_ids[source], node_ids[self.indices[position]], **data, **data["properties"])
+        return G
+
+    def bfs_neighborhood(self, center: int, depth: int, limit: int) -> List[int]:
+        """按BFS收集center周围depth跳内（入边和出边）的节点，最多limit个"""
+        visited = {center}
+        order = [center]
+        queue = deque([(center, 0)])
+        while queue and len(visited) < limit:
+            node, node_depth = queue.popleft()
+            if node_depth >= depth:
+                continue
+            for neighbor in np.concatenate([self.predecessors(node), self.successors(node)]).tolist():
+                if neighbor not in visited and len(visited) < limit:
+                    visited.add(neighbor)
+                    order.append(neighbor)
+                    queue.append((neighbor, node_depth + 1))
+        return order
+
+    def shortest_path(self, source: int, target: int) -> Optional[List[int]]:
+        """沿出边的无权最短路径（BFS），不可达时返回None"""
+        if source == target:
+            return [source]
+        parents = {source: -1}
+        queue = deque([source])
+        while queue:
+            node = queue.popleft()
+            for neighbor in self.successors(node).tolist():
+                if neighbor in parents:
+                    continue
+                parents[neighbor] = node
+                if neighbor == target:
+                    path = [target]
+                    while parents[path[-1]] != -1:
+                        path.append(parents[path[-1]])
+                    return path[::-1]
+                queue.append(neighbor)
+        return None
@@ -9,96 +9,152 @@ import json
 from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import hashlib
+import random
+import sys
+from pathlib import Path
 
+from ..config.settings import settings
 from ..models.graph import Entity, Relation, GraphStatistics
+from .compact_graph import CompactGraph
+
+sys.path.append(str(Path(__file__).parent.parent.parent / "frameworks"))
+
+from ai_knowledge_graph.utils.graph_analytics import (
+    EXACT_MAX_NODES,
+    PIVOT_COUNT,
+    PIVOT_SEED,
+    compute_centrality_metrics,
+)
 
 logger = logging.getLogger(__name__)
 
+# 算法名到 graph_analytics 指标名的映射
+_CENTRALITY_ALGORITHMS = {
+    'degree_centrality': 'degree',
+    'betweenness_centrality': 'betweenness',
+    'closeness_centrality': 'closeness',
+    'pagerank': 'pagerank',
+}
+
 
 class NetworkXAdapter:
     """NetworkX集成适配器"""
     
     def __init__(self):
         self.executor = ThreadPoolExecutor(max_workers=4)
-        self._graph_cache: Dict[str, nx.DiGraph] = {}
-        self.max_cache_size = 10
+        self._process_executor: Optional[ProcessPoolExecutor] = None
+        # 每个图只缓存最新版本：紧凑图常驻，NetworkX图对象只为需要它的算法按需构建；
+        # 两者都按 节点数+边数 做LRU淘汰。以下缓存中的graph_id可以是仓库传入的 (租户键, 图ID) 元组
+        self._graph_cache: "OrderedDict[str, CompactGraph]" = OrderedDict()
+        self._networkx_cache: "OrderedDict[str, Tuple[Any, nx.DiGraph]]" = OrderedDict()
+        self.max_cache_elements = settings.GRAPH_CACHE_MAX_ELEMENTS
+        self.max_networkx_cache_elements = settings.GRAPH_CACHE_MAX_NETWORKX_ELEMENTS
+        # 图指标按 (graph_id, 图版本, 算法集合) 缓存；增量计算state按graph_id保存
+        self._metrics_cache: "OrderedDict[Tuple[str, Any, Tuple[str, ...]], Dict[str, Any]]" = OrderedDict()
+        self._analytics_states: Dict[str, Dict[str, Any]] = {}
+        self.max_metrics_cache_size = 32
+    
+    def has_graph(self, graph_id: str, revision: Any) -> bool:
+        """指定版本的图是否已缓存（已缓存时调用方可以不再加载实体和关系）"""
+        cached = self._graph_cache.get(graph_id)
+        return cached is not None and cached.revision == revision
+    
+    async def get_compact_graph(self, graph_id: str, entities: Optional[List[Entity]] = None,
+                                relations: Optional[List[Relation]] = None, revision: Any = None) -> CompactGraph:
+        """获取图的紧凑表示
+        
+        revision 由仓库在每次写入时更新；未提供时使用实体和关系的内容哈希。
+        缓存命中时不需要传入实体和关系。
+        """
+        if revision is None:
+            if entities is None or relations is None:
+                raise ValueError("entities and relations are required when revision is not given")
+            revision = self._content_revision(entities, relations)
+        
+        cached = self._graph_cache.get(graph_id)
+        if cached is not None and cached.revision == revision:
+            self._graph_cache.move_to_end(graph_id)
+            return cached
+        if entities is None or relations is None:
+            raise LookupError(f"Graph {graph_id} revision {revision} is not cached")
         
-    async def export_to_networkx(self, graph_id: str, entities: List[Entity], relations: List[Relation]) -> nx.DiGraph:
+        # 在线程池中构建紧凑图
+        compact = await asyncio.get_event_loop().run_in_executor(
+            self.executor,
+            CompactGraph,
+            entities,
+            relations,
+            revision
+        )
+        
+        self._graph_cache[graph_id] = compact
+        self._graph_cache.move_to_end(graph_id)
+        self._networkx_cache.pop(graph_id, None)
+        self._evict(self._graph_cache, self.max_cache_elements, lambda item: item.size)
+        
+        logger.info(f"Cached graph {graph_id} (revision {revision}): {compact.number_of_nodes} nodes, {compact.number_of_edges} edges")
+        return compact
+    
+    async def export_to_networkx(self, graph_id: str, entities: Optional[List[Entity]] = None,
+                                 relations: Optional[List[Relation]] = None, revision: Any = None) -> nx.DiGraph:
         """将图数据导出为NetworkX图对象"""
         try:
-            # 检查缓存
-            cache_key = self._generate_cache_key(graph_id, entities, relations)
-            if cache_key in self._graph_cache:
-                logger.info(f"Using cached NetworkX graph for {graph_id}")
-                return self._graph_cache[cache_key]
-            
-            # 在线程池中创建NetworkX图
-            graph = await asyncio.get_event_loop().run_in_executor(
-                self.executor,
-                self._build_networkx_graph,
-                entities,
-                relations
-            )
-            
-            # 缓存管理
-            if len(self._graph_cache) >= self.max_cache_size:
-                # 移除最旧的缓存
-                oldest_key = next(iter(self._graph_cache))
-                del self._graph_cache[oldest_key]
-            
-            self._graph_cache[cache_key] = graph
-            
-            logger.info(f"Successfully exported graph {graph_id} to NetworkX: {graph.number_of_nodes()} nodes, {graph.number_of_edges()} edges")
-            return graph
+            compact = await self.get_compact_graph(graph_id, entities, relations, revision)
+            return await self._materialize(graph_id, compact)
             
         except Exception as e:
             logger.error(f"Failed to export graph {graph_id} to NetworkX: {e}")
             raise
     
-    def _build_networkx_graph(self, entities: List[Entity], relations: List[Relation]) -> nx.DiGraph:
-        """构建NetworkX图对象"""
-        G = nx.DiGraph()
+    async def _materialize(self, graph_id: str, compact: CompactGraph) -> nx.DiGraph:
+        """把紧凑图转换为NetworkX图对象（按版本缓存）"""
+        # 检查缓存
+        cached = self._networkx_cache.get(graph_id)
+        if cached is not None and cached[0] == compact.revision:
+            self._networkx_cache.move_to_end(graph_id)
+            logger.info(f"Using cached NetworkX graph for {graph_id}")
+            return cached[1]
         
-        # 添加节点
-        for entity in entities:
-            G.add_node(
-                entity.id,
-                name=entity.name,
-                entity_type=entity.entity_type,
-                confidence=entity.confidence,
-                properties=entity.properties,
-                frequency=entity.frequency,
-                centrality=entity.centrality,
-                **entity.properties  # 将属性展开为节点属性
-            )
+        # 在线程池中创建NetworkX图
+        graph = await asyncio.get_event_loop().run_in_executor(
+            self.executor,
+            compact.to_networkx
+        )
         
-        # 添加边
-        for relation in relations:
-            if G.has_node(relation.subject) and G.has_node(relation.object):
-                G.add_edge(
-                    relation.subject,
-                    relation.object,
-                    predicate=relation.predicate,
-                    confidence=relation.confidence,
-                    properties=relation.properties,
-                    inferred=relation.inferred,
-                    source=relation.source,
-                    **relation.properties  # 将属性展开为边属性
-                )
-            else:
-                logger.warning(f"Skipping relation {relation.id}: missing nodes {relation.subject} or {relation.object}")
+        # 构建期间缓存中的紧凑图可能已被更新的版本替换，这时不再缓存旧版本的NetworkX图
+        current = self._graph_cache.get(graph_id)
+        if current is None or current.revision == compact.revision:
+            self._networkx_cache[graph_id] = (compact.revision, graph)
+            self._networkx_cache.move_to_end(graph_id)
+            self._evict(
+                self._networkx_cache,
+                self.max_networkx_cache_elements,
+                lambda item: item[1].number_of_nodes() + item[1].number_of_edges()
+            )
         
-        return G
+        logger.info(f"Successfully exported graph {graph_id} to NetworkX: {graph.number_of_nodes()} nodes, {graph.number_of_edges()} edges")
+        return graph
+    
+    @staticmethod
+    def _evict(cache: "OrderedDict[str, Any]", max_elements: int, weight) -> None:
+        """按LRU淘汰，直到总权重不超过上限（最近使用的一项总是保留）"""
+        total = sum(weight(item) for item in cache.values())
+        while total > max_elements and len(cache) > 1:
+            graph_id, item = cache.popitem(last=False)
+            total -= weight(item)
+            logger.info(f"Evicted graph {graph_id} from cache")
     
-    async def compute_advanced_metrics(self, graph_id: str, entities: List[Entity], relations: List[Relation], algorithms: List[str] = None) -> Dict[str, Any]:
+    async def compute_advanced_metrics(self, graph_id: str, entities: Optional[List[Entity]] = None,
+                                       relations: Optional[List[Relation]] = None, algorithms: List[str] = None,
+                                       revision: Any = None) -> Dict[str, Any]:
         """计算高级图指标"""
         try:
-            # 获取NetworkX图
-            G = await self.export_to_networkx(graph_id, entities, relations)
+            compact = await self.get_compact_graph(graph_id, entities, relations, revision)
             
-            if G.number_of_nodes() == 0:
+            if compact.number_of_nodes == 0:
                 return {"error": "Empty graph"}
             
             # 默认算法列表
@@ -112,14 +168,31 @@ class NetworkXAdapter:
                     'communities'
                 ]
             
-            # 在线程池中计算指标
-            metrics = await asyncio.get_event_loop().run_in_executor(
-                self.executor,
-                self._compute_graph_algorithms,
+            loop = asyncio.get_event_loop()
+            cache_key = (graph_id, compact.revision, tuple(sorted(algorithms)))
+            if cache_key in self._metrics_cache:
+                self._metrics_cache.move_to_end(cache_key)
+                logger.info(f"Using cached advanced metrics for graph {graph_id}")
+                return self._metrics_cache[cache_key]
+            
+            # 只有需要计算时才构建NetworkX图
+            G = await self._materialize(graph_id, compact)
+            
+            # 在进程池中计算指标，沿用该图上一版本的state做增量计算
+            metrics, state = await loop.run_in_executor(
+                self._get_process_executor(),
+                NetworkXAdapter._compute_graph_algorithms,
                 G,
-                algorithms
+                algorithms,
+                self._analytics_states.get(graph_id)
             )
             
+            if 'error' not in metrics:
+                self._analytics_states[graph_id] = state
+                self._metrics_cache[cache_key] = metrics
+                while len(self._metrics_cache) > self.max_metrics_cache_size:
+                    self._metrics_cache.popitem(last=False)
+            
             logger.info(f"Computed advanced metrics for graph {graph_id}: {list(metrics.keys())}")
             return metrics
             
@@ -127,26 +200,31 @@ class NetworkXAdapter:
             logger.error(f"Failed to compute advanced metrics for graph {graph_id}: {e}")
             return {"error": str(e)}
     
-    def _compute_graph_algorithms(self, G: nx.DiGraph, algorithms: List[str]) -> Dict[str, Any]:
-        """计算图算法（在线程池中执行）"""
+    def _get_process_executor(self) -> ProcessPoolExecutor:
+        """按需创建图算法进程池"""
+        if self._process_executor is None:
+            # 计算在独立进程中进行，不占用API事件循环所在进程的GIL
+            self._process_executor = ProcessPoolExecutor(max_workers=settings.GRAPH_ANALYTICS_WORKERS)
+        return self._process_executor
+    
+    @staticmethod
+    def _compute_graph_algorithms(G: nx.DiGraph, algorithms: List[str], state: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """计算图算法（在进程池中执行）
+        
+        大图的介数/接近中心性使用k-pivot采样，PageRank使用稀疏幂迭代并以上一版本结果热启动，
+        未变化的连通分量直接复用state中的结果。返回 (指标, 新state)。
+        """
         metrics = {}
+        new_state = state or {}
         
         try:
-            # 度中心性
-            if 'degree_centrality' in algorithms:
-                metrics['degree_centrality'] = nx.degree_centrality(G)
-            
-            # 介数中心性
-            if 'betweenness_centrality' in algorithms:
-                metrics['betweenness_centrality'] = nx.betweenness_centrality(G)
-            
-            # 接近中心性
-            if 'closeness_centrality' in algorithms:
-                metrics['closeness_centrality'] = nx.closeness_centrality(G)
-            
-            # PageRank
-            if 'pagerank' in algorithms:
-                metrics['pagerank'] = nx.pagerank(G)
+            # 中心性指标
+            centrality = [_CENTRALITY_ALGORITHMS[name] for name in algorithms if name in _CENTRALITY_ALGORITHMS]
+            if centrality:
+                results, new_state = compute_centrality_metrics(G, centrality, state)
+                for name, metric in _CENTRALITY_ALGORITHMS.items():
+                    if metric in results:
+                        metrics[name] = results[metric]
             
             # 聚类系数
             if 'clustering' in algorithms:
@@ -179,8 +257,11 @@ class NetworkXAdapter:
             # 路径相关指标
             if nx.is_weakly_connected(G):
                 try:
-                    metrics['basic_metrics']['average_shortest_path_length'] = nx.average_shortest_path_length(G)
-                    metrics['basic_metrics']['diameter'] = nx.diameter(G)
+                    if G.number_of_nodes() <= EXACT_MAX_NODES:
+                        metrics['basic_metrics']['average_shortest_path_length'] = nx.average_shortest_path_length(G)
+                        metrics['basic_metrics']['diameter'] = nx.diameter(G)
+                    else:
+                        metrics['basic_metrics'].update(NetworkXAdapter._estimate_path_metrics(G))
                 except Exception as e:
                     logger.warning(f"Path metrics computation failed: {e}")
             
@@ -188,14 +269,36 @@ class NetworkXAdapter:
             logger.error(f"Error computing graph algorithms: {e}")
             metrics['error'] = str(e)
         
-        return metrics
+        return metrics, new_state
     
-    async def get_subgraph(self, graph_id: str, entities: List[Entity], relations: List[Relation], 
-                          center_entity: str, depth: int = 2, limit: int = 100) -> Dict[str, Any]:
+    @staticmethod
+    def _estimate_path_metrics(G: nx.DiGraph) -> Dict[str, Any]:
+        """用pivot采样估计大图的平均最短路径长度和直径（直径为下界）"""
+        nodes = sorted(G.nodes, key=repr)
+        pivots = random.Random(PIVOT_SEED).sample(nodes, min(PIVOT_COUNT, len(nodes)))
+        
+        total_distance = 0
+        pairs = 0
+        diameter = 0
+        for pivot in pivots:
+            lengths = nx.single_source_shortest_path_length(G, pivot)
+            total_distance += sum(lengths.values())
+            pairs += len(lengths) - 1
+            diameter = max(diameter, max(lengths.values()))
+        
+        return {
+            'average_shortest_path_length': total_distance / pairs if pairs else 0.0,
+            'diameter': diameter,
+            'path_metrics_approximate': True,
+            'path_metrics_pivots': len(pivots)
+        }
+    
+    async def get_subgraph(self, graph_id: str, entities: Optional[List[Entity]] = None, relations: Optional[List[Relation]] = None,
+                          center_entity: str = None, depth: int = 2, limit: int = 100, revision: Any = None) -> Dict[str, Any]:
         """获取以指定实体为中心的子图"""
         try:
-            # 获取完整的NetworkX图
-            G = await self.export_to_networkx(graph_id, entities, relations)
+            # 子图遍历直接在紧凑图上进行，不需要构建NetworkX图
+            G = await self.get_compact_graph(graph_id, entities, relations, revision)
             
             if center_entity not in G:
                 return {
@@ -221,52 +324,41 @@ class NetworkXAdapter:
             logger.error(f"Failed to get subgraph for {center_entity}: {e}")
             return {"error": str(e), "nodes": [], "edges": []}
     
-    def _extract_subgraph(self, G: nx.DiGraph, center_entity: str, depth: int, limit: int) -> Dict[str, Any]:
+    def _extract_subgraph(self, G: CompactGraph, center_entity: str, depth: int, limit: int) -> Dict[str, Any]:
         """提取子图（在线程池中执行）"""
-        # 使用BFS获取指定深度内的所有节点
-        visited_nodes = set()
-        queue = [(center_entity, 0)]
-        visited_nodes.add(center_entity)
-        
-        while queue and len(visited_nodes) < limit:
-            current_node, current_depth = queue.pop(0)
-            
-            if current_depth < depth:
-                # 获取邻居节点（包括入边和出边）
-                neighbors = list(G.predecessors(current_node)) + list(G.successors(current_node))
-                
-                for neighbor in neighbors:
-                    if neighbor not in visited_nodes and len(visited_nodes) < limit:
-                        visited_nodes.add(neighbor)
-                        queue.append((neighbor, current_depth + 1))
-        
-        # 创建子图
-        subgraph = G.subgraph(visited_nodes)
+        # 使用BFS获取指定深度内的所有节点（包括入边和出边邻居）
+        center = G.node_index[center_entity]
+        visited_nodes = G.bfs_neighborhood(center, depth, limit)
+        visited_set = set(visited_nodes)
         
         # 转换为标准格式
         nodes = []
-        for node_id in subgraph.nodes():
-            node_data = subgraph.nodes[node_id]
+        for node in visited_nodes:
+            node_data = G.node_data(node)
             nodes.append({
-                "id": node_id,
-                "name": node_data.get("name", node_id),
-                "entity_type": node_data.get("entity_type", "unknown"),
-                "confidence": node_data.get("confidence", 1.0),
-                "properties": node_data.get("properties", {}),
-                "is_center": node_id == center_entity
+                "id": G.node_ids[node],
+                "name": node_data["name"],
+                "entity_type": node_data["entity_type"],
+                "confidence": node_data["confidence"],
+                "properties": node_data["properties"],
+                "is_center": node == center
             })
         
         edges = []
-        for source, target in subgraph.edges():
-            edge_data = subgraph.edges[source, target]
-            edges.append({
-                "source": source,
-                "target": target,
-                "predicate": edge_data.get("predicate", "related_to"),
-                "confidence": edge_data.get("confidence", 1.0),
-                "properties": edge_data.get("properties", {}),
-                "inferred": edge_data.get("inferred", False)
-            })
+        for node in visited_nodes:
+            for position in range(G.indptr[node], G.indptr[node + 1]):
+                target = int(G.indices[position])
+                if target not in visited_set:
+                    continue
+                edge_data = G.edge_data(position)
+                edges.append({
+                    "source": G.node_ids[node],
+                    "target": G.node_ids[target],
+                    "predicate": edge_data["predicate"],
+                    "confidence": edge_data["confidence"],
+                    "properties": edge_data["properties"],
+                    "inferred": edge_data["inferred"]
+                })
         
         return {
             "nodes": nodes,
@@ -277,12 +369,12 @@ class NetworkXAdapter:
             "total_edges": len(edges)
         }
     
-    async def find_shortest_path(self, graph_id: str, entities: List[Entity], relations: List[Relation],
-                                start_entity: str, end_entity: str) -> Dict[str, Any]:
+    async def find_shortest_path(self, graph_id: str, entities: Optional[List[Entity]] = None, relations: Optional[List[Relation]] = None,
+                                start_entity: str = None, end_entity: str = None, revision: Any = None) -> Dict[str, Any]:
         """查找两个实体之间的最短路径"""
         try:
-            # 获取NetworkX图
-            G = await self.export_to_networkx(graph_id, entities, relations)
+            # 最短路径直接在紧凑图上做BFS
+            G = await self.get_compact_graph(graph_id, entities, relations, revision)
             
             if start_entity not in G or end_entity not in G:
                 return {
@@ -305,24 +397,32 @@ class NetworkXAdapter:
             logger.error(f"Failed to find shortest path from {start_entity} to {end_entity}: {e}")
             return {"error": str(e), "path": []}
     
-    def _find_path(self, G: nx.DiGraph, start_entity: str, end_entity: str) -> Dict[str, Any]:
+    def _find_path(self, G: CompactGraph, start_entity: str, end_entity: str) -> Dict[str, Any]:
         """查找路径（在线程池中执行）"""
         try:
             # 尝试找到最短路径
-            path = nx.shortest_path(G, start_entity, end_entity)
+            node_path = G.shortest_path(G.node_index[start_entity], G.node_index[end_entity])
+            if node_path is None:
+                return {
+                    "path": [],
+                    "edges": [],
+                    "length": -1,
+                    "found": False,
+                    "error": "No path found between entities"
+                }
             
             # 获取路径上的边信息
             path_edges = []
-            for i in range(len(path) - 1):
-                source, target = path[i], path[i + 1]
-                edge_data = G.edges[source, target]
+            for source, target in zip(node_path, node_path[1:]):
+                edge_data = G.edge_data(G.edge_position(source, target))
                 path_edges.append({
-                    "source": source,
-                    "target": target,
-                    "predicate": edge_data.get("predicate", "related_to"),
-                    "confidence": edge_data.get("confidence", 1.0)
+                    "source": G.node_ids[source],
+                    "target": G.node_ids[target],
+                    "predicate": edge_data["predicate"],
+                    "confidence": edge_data["confidence"]
                 })
             
+            path = [G.node_ids[node] for node in node_path]
             return {
                 "path": path,
                 "edges": path_edges,
@@ -330,14 +430,6 @@ class NetworkXAdapter:
                 "found": True
             }
             
-        except nx.NetworkXNoPath:
-            return {
-                "path": [],
-                "edges": [],
-                "length": -1,
-                "found": False,
-                "error": "No path found between entities"
-            }
         except Exception as e:
             return {
                 "path": [],
@@ -347,18 +439,24 @@ class NetworkXAdapter:
                 "error": str(e)
             }
     
-    def _generate_cache_key(self, graph_id: str, entities: List[Entity], relations: List[Relation]) -> str:
-        """生成图缓存键"""
-        # 基于图ID和数据hash生成缓存键
-        entities_hash = hashlib.md5(str(len(entities)).encode()).hexdigest()[:8]
-        relations_hash = hashlib.md5(str(len(relations)).encode()).hexdigest()[:8]
-        return f"{graph_id}_{entities_hash}_{relations_hash}"
+    @staticmethod
+    def _content_revision(entities: List[Entity], relations: List[Relation]) -> str:
+        """根据实体和关系内容生成版本号（调用方没有提供仓库版本号时使用）"""
+        digest = hashlib.md5()
+        for entity in entities:
+            digest.update(repr((entity.id, entity.name, entity.entity_type, entity.confidence,
+                                entity.frequency, entity.centrality, entity.properties)).encode())
+        digest.update(b"|")
+        for relation in relations:
+            digest.update(repr((relation.id, relation.subject, relation.predicate, relation.object,
+                                relation.confidence, relation.inferred, relation.source, relation.properties)).encode())
+        return digest.hexdigest()
     
-    async def export_to_formats(self, graph_id: str, entities: List[Entity], relations: List[Relation],
-                               export_format: str = "json") -> Dict[str, Any]:
+    async def export_to_formats(self, graph_id: str, entities: Optional[List[Entity]] = None, relations: Optional[List[Relation]] = None,
+                               export_format: str = "json", revision: Any = None) -> Dict[str, Any]:
         """导出图数据为不同格式"""
         try:
-            G = await self.export_to_networkx(graph_id, entities, relations)
+            G = await self.export_to_networkx(graph_id, entities, relations, revision)
             
             if export_format.lower() == "json":
                 return nx.node_link_data(G)
@@ -384,9 +482,15 @@ class NetworkXAdapter:
     def clear_cache(self):
         """清理缓存"""
         self._graph_cache.clear()
+        self._networkx_cache.clear()
+        self._metrics_cache.clear()
+        self._analytics_states.clear()
         logger.info("NetworkX graph cache cleared")
     
     async def close(self):
         """关闭适配器"""
         self.executor.shutdown(wait=True)
+        if self._process_executor is not None:
+            self._process_executor.shutdown(wait=True)
+            self._process_executor = None
         self.clear_cache()
\ No newline at end of file
@@ -4,7 +4,7 @@
 """
 
 import logging
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator
 from datetime import datetime
 import json
 import asyncio
@@ -27,8 +27,10 @@ from ..models.project import KnowledgeGraphProject
 from ..repositories.arangodb_repository import ArangoDBRepository, get_arangodb_repository
 from ..core.graph_generator import GraphGenerator
 from ..core.visualization_engine import VisualizationEngine
+from ..core.visualization_data import VisualizationPayload, visualization_data_service
 from ..core.task_manager import TaskManager
 from ..config.settings import settings
+from ..utils.graph_export import stream_graph_export
 
 logger = logging.getLogger(__name__)
 
@@ -294,6 +296,97 @@ class GraphService:
             logger.error(f"Failed to export graph {graph_id}: {e}")
             raise
     
+    async def stream_export_graph(self, graph_id: str, export_format: str, user_id: str = None,
+                                  project_id: str = None, batch_size: Optional[int] = None) -> Optional[AsyncIterator[str]]:
+        """流式导出图谱（ndjson/graphml/csv），实体和关系按批从数据库游标读取
+        
+        响应头发出后无法再返回错误状态码，因此先校验图谱存在且属于该用户（项目），否则返回None。
+        """
+        await self.initialize()
+        
+        owned, _ = await self.arangodb_repo.get_graph_access(graph_id, user_id, project_id)
+        if not owned:
+            return None
+        
+        entities = self.arangodb_repo.iter_entities(graph_id, user_id, project_id, batch_size)
+        relations = self.arangodb_repo.iter_relations(graph_id, user_id, project_id, batch_size)
+        logger.info(f"Streaming export of graph {graph_id} in format {export_format}")
+        return stream_graph_export(export_format, graph_id, entities, relations)
+    
+    async def get_visualization_page(self, graph_id: str, offset: int = 0, limit: int = 500, min_degree: int = 0,
+                                     viewport: Optional[Tuple[float, float, float, float]] = None,
+                                     user_id: str = None, project_id: str = None) -> Optional[Dict[str, Any]]:
+        """分页获取可视化数据
+        
+        视口按可视化数据中预计算的布局坐标过滤（与前端渲染使用的坐标一致），
+        视口内的实体再按度数在数据库中分页。按视口查询且图谱不存在或不属于该用户（项目）时返回None。
+        """
+        await self.initialize()
+        
+        try:
+            entity_keys = None
+            if viewport is not None:
+                payload = await self._load_visualization_payload(graph_id, user_id, project_id)
+                if payload is None:
+                    return None
+                entity_keys = payload.node_ids_in_viewport(viewport)
+            return await self.arangodb_repo.get_visualization_page(
+                graph_id, offset, limit, min_degree, entity_keys, user_id, project_id
+            )
+            
+        except Exception as e:
+            logger.error(f"Failed to get visualization page for graph {graph_id}: {e}")
+            raise
+    
+    async def _load_visualization_payload(self, graph_id: str, user_id: str = None,
+                                          project_id: str = None) -> Optional[VisualizationPayload]:
+        """读取图的可视化数据（含布局），图谱不存在或不属于该用户（项目）时返回None"""
+        # 先按租户校验图谱归属并读取持久化的版本，缓存按 (租户键, 图谱ID, 版本) 命中
+        owned, revision = await self.arangodb_repo.get_graph_access(graph_id, user_id, project_id)
+        if not owned:
+            return None
+        tenant_key = self.arangodb_repo.tenant_key(user_id, project_id)
+        payload = visualization_data_service.get_cached(graph_id, revision, tenant_key)
+        if payload is None:
+            graph = await self.arangodb_repo.get_graph_metadata(graph_id)
+            if not graph:
+                return None
+            entities, relations = await self.arangodb_repo.get_graph_data(graph_id, user_id, project_id)
+            payload = await visualization_data_service.get_payload(
+                graph_id, entities, relations, graph.visualization_config, revision, tenant_key
+            )
+        return payload
+    
+    async def get_visualization_payload(self, graph_id: str, level: str = "overview",
+                                        communities: Optional[List[int]] = None,
+                                        user_id: str = None, project_id: str = None) -> Optional[bytes]:
+        """获取gzip压缩的列式可视化数据
+        
+        Args:
+            graph_id: 图谱ID
+            level: overview（社区概览）、full（全部节点和边）或 communities（展开指定社区）
+            communities: level 为 communities 时要展开的社区编号
+            
+        Returns:
+            gzip压缩的JSON，图谱不存在或不属于该用户（项目）时返回None
+        """
+        await self.initialize()
+        
+        try:
+            payload = await self._load_visualization_payload(graph_id, user_id, project_id)
+            if payload is None:
+                return None
+            
+            if level == "full":
+                return payload.full_gzip()
+            if level == "communities":
+                return payload.communities_gzip(communities or [])
+            return payload.overview_gzip
+            
+        except Exception as e:
+            logger.error(f"Failed to get visualization payload for graph {graph_id}: {e}")
+            raise
+    
     async def generate_graph_async(self, request: GraphGenerateRequest, user_id: str) -> str:
         """异步生成图谱"""
         await self.initialize()
@@ -512,7 +605,10 @@ class GraphService:
                 entities=entities,
                 relations=relations,
                 config=graph.visualization_config,
-                graph_title=graph.name
+                graph_title=graph.name,
+                graph_id=graph.graph_id,
+                revision=await self.arangodb_repo.get_graph_revision(graph.graph_id, user_id, graph.project_id),
+                tenant_key=self.arangodb_repo.tenant_key(user_id, graph.project_id)
             )
             
             # 保存可视化文件
@@ -543,6 +639,9 @@ class GraphService:
             if visualization_file.exists():
                 visualization_file.unlink()
                 logger.info(f"Deleted visualization file for graph {graph_id}")
+            
+            # 预计算的布局数据
+            visualization_data_service.invalidate(graph_id)
                 
         except Exception as e:
             logger.error(f"Failed to delete visualization files: {e}")
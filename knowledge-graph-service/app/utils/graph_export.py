@@ -0,0 +1,172 @@
+"""
+图谱流式导出
+把实体和关系的异步迭代器逐条编码为NDJSON/GraphML/CSV文本块，导出时不需要把整个图放进内存。
+响应头发出后读取失败时，导出以一条显式的错误记录结束，客户端据此判断导出不完整
+"""
+
+import csv
+import io
+import json
+import logging
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict
+from xml.sax.saxutils import escape, quoteattr
+
+from ..models.graph import Entity, Relation
+
+logger = logging.getLogger(__name__)
+
+# 导出格式 -> (媒体类型, 文件扩展名)
+STREAM_EXPORT_FORMATS: Dict[str, tuple] = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'graphml': ('application/graphml+xml', 'graphml'),
+    'csv': ('text/csv', 'csv'),
+}
+
+CSV_COLUMNS = [
+    'record_type', 'id', 'name', 'entity_type', 'subject', 'predicate', 'object',
+    'confidence', 'source', 'frequency', 'inferred', 'properties'
+]
+
+_GRAPHML_NODE_KEYS = [('name', 'string'), ('entity_type', 'string'), ('confidence', 'double'),
+                      ('source', 'string'), ('frequency', 'int'), ('properties', 'string')]
+_GRAPHML_EDGE_KEYS = [('predicate', 'string'), ('confidence', 'double'), ('source', 'string'),
+                      ('inferred', 'boolean'), ('properties', 'string')]
+
+
+def _json_dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+async def stream_ndjson(graph_id: str, entities: AsyncIterator[Entity], relations: AsyncIterator[Relation]) -> AsyncIterator[str]:
+    """每行一个JSON对象：首行为图信息，随后是实体和关系，末行为 type=end 的计数（失败时为 type=error）"""
+    yield _json_dumps({'type': 'graph', 'graph_id': graph_id, 'exported_at': datetime.now().isoformat()}) + '\n'
+    entity_count = relation_count = 0
+    async for entity in entities:
+        entity_count += 1
+        yield _json_dumps({'type': 'entity', **entity.dict()}) + '\n'
+    async for relation in relations:
+        relation_count += 1
+        yield _json_dumps({'type': 'relation', **relation.dict()}) + '\n'
+    yield _json_dumps({'type': 'end', 'entities': entity_count, 'relations': relation_count}) + '\n'
+
+
+def _graphml_data(key: str, value: Any) -> str:
+    if isinstance(value, bool):
+        value = 'true' if value else 'false'
+    elif isinstance(value, dict):
+        value = _json_dumps(value)
+    return f'<data key="{key}">{escape(str(value))}</data>'
+
+
+async def stream_graphml(graph_id: str, entities: AsyncIterator[Entity], relations: AsyncIterator[Relation]) -> AsyncIterator[str]:
+    """GraphML文档，节点和边逐个输出"""
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+    for name, attr_type in _GRAPHML_NODE_KEYS:
+        yield f'  <key id="n_{name}" for="node" attr.name="{name}" attr.type="{attr_type}"/>\n'
+    for name, attr_type in _GRAPHML_EDGE_KEYS:
+        yield f'  <key id="e_{name}" for="edge" attr.name="{name}" attr.type="{attr_type}"/>\n'
+    yield f'  <graph id={quoteattr(graph_id)} edgedefault="directed">\n'
+
+    async for entity in entities:
+        data = ''.join(_graphml_data(f'n_{name}', getattr(entity, name)) for name, _ in _GRAPHML_NODE_KEYS)
+        yield f'    <node id={quoteattr(entity.id)}>{data}</node>\n'
+
+    async for relation in relations:
+        data = ''.join(_graphml_data(f'e_{name}', getattr(relation, name)) for name, _ in _GRAPHML_EDGE_KEYS)
+        yield (f'    <edge id={quoteattr(relation.id)} source={quoteattr(relation.subject)} '
+               f'target={quoteattr(relation.object)}>{data}</edge>\n')
+
+    yield '  </graph>\n</graphml>\n'
+
+
+def _csv_row(row: Dict[str, Any]) -> str:
+    buffer = io.StringIO()
+    csv.DictWriter(buffer, fieldnames=CSV_COLUMNS).writerow(row)
+    return buffer.getvalue()
+
+
+async def stream_csv(graph_id: str, entities: AsyncIterator[Entity], relations: AsyncIterator[Relation]) -> AsyncIterator[str]:
+    """单个CSV表：record_type 区分实体行和关系行，属性列为JSON"""
+    yield ','.join(CSV_COLUMNS) + '\r\n'
+    async for entity in entities:
+        yield _csv_row({
+            'record_type': 'entity',
+            'id': entity.id,
+            'name': entity.name,
+            'entity_type': entity.entity_type,
+            'confidence': entity.confidence,
+            'source': entity.source,
+            'frequency': entity.frequency,
+            'properties': _json_dumps(entity.properties),
+        })
+    async for relation in relations:
+        yield _csv_row({
+            'record_type': 'relation',
+            'id': relation.id,
+            'subject': relation.subject,
+            'predicate': relation.predicate,
+            'object': relation.object,
+            'confidence': relation.confidence,
+            'source': relation.source,
+            'inferred': relation.inferred,
+            'properties': _json_dumps(relation.properties),
+        })
+
+
+def _error_record(export_format: str, message: str) -> str:
+    """导出中断时追加的错误记录：NDJSON为 type=error 的一行，CSV为 record_type=error 的一行，
+    GraphML为XML注释且不输出闭合标签，解析器会把文档当作不完整"""
+    if export_format == 'ndjson':
+        return _json_dumps({'type': 'error', 'error': message}) + '\n'
+    if export_format == 'csv':
+        return _csv_row({'record_type': 'error', 'name': message})
+    return f"  <!-- export failed: {escape(message).replace('--', '- -')} -->\n"
+
+
+async def _with_error_record(export_format: str, graph_id: str, chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    """读取失败时输出错误记录后结束，不让已发出的部分看起来像完整的导出"""
+    try:
+        async for chunk in chunks:
+            yield chunk
+    except Exception as e:
+        logger.error(f"Streaming export of graph {graph_id} failed: {e}")
+        yield _error_record(export_format, str(e) or type(e).__name__)
+
+
+async def _buffered(chunks: AsyncIterator[str], buffer_size: int) -> AsyncIterator[str]:
+    """把细碎的文本块合并到约 buffer_size 字符再输出，减少响应写入次数"""
+    parts = []
+    size = 0
+    async for chunk in chunks:
+        parts.append(chunk)
+        size += len(chunk)
+        if size >= buffer_size:
+            yield ''.join(parts)
+            parts = []
+            size = 0
+    if parts:
+        yield ''.join(parts)
+
+
+_WRITERS = {
+    'ndjson': stream_ndjson,
+    'graphml': stream_graphml,
+    'csv': stream_csv,
+}
+
+
+def stream_graph_export(export_format: str, graph_id: str, entities: AsyncIterator[Entity],
+                        relations: AsyncIterator[Relation], buffer_size: int = 64 * 1024) -> AsyncIterator[str]:
+    """按格式返回导出文本块的异步迭代器
+
+    Raises:
+        ValueError: 不支持流式导出的格式
+    """
+    export_format = export_format.lower()
+    writer = _WRITERS.get(export_format)
+    if writer is None:
+        raise ValueError(f"Unsupported streaming export format: {export_format}")
+    chunks = _with_error_record(export_format, graph_id, writer(graph_id, entities, relations))
+    return _buffered(chunks, buffer_size)
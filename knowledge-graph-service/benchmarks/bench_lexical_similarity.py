@@ -0,0 +1,134 @@
+"""词汇相似性推理基准测试
+对比候选对逐对用SequenceMatcher打分（上一版实现）和numpy内核批量打分的耗时，
+用暴力计算校验候选生成，并校验批量内核与SequenceMatcher的结果完全一致
+
+- sequence-matcher：分块索引生成候选，逐对计算SequenceMatcher相似度（只在实体数不超过20000时运行）
+- batched：分块索引生成候选，numpy内核批量计算SequenceMatcher相似度
+
+运行:
+    python benchmarks/bench_lexical_similarity.py [实体数,...]
+"""
+
+import os
+import random
+import sys
+import time
+from difflib import SequenceMatcher
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frameworks.ai_knowledge_graph.core.inference import RelationshipInference  # noqa: E402
+from frameworks.ai_knowledge_graph.utils.similarity_index import (  # noqa: E402
+    BlockingIndex, char_ngrams, sequence_ratios)
+
+SIZES = [int(n) for n in sys.argv[1].split(",")] if len(sys.argv) > 1 else [20000, 100000]
+SEQUENCE_MATCHER_LIMIT = 20000
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+
+def generate_entities(count: int, seed: int = 7) -> list:
+    """实体名由Zipf分布的词组成，约四分之一是已有实体的变体（复数、拼写错误、增删词）"""
+    rng = random.Random(seed)
+    vocabulary = ["".join(rng.choice(LETTERS) for _ in range(rng.randint(3, 10))) for _ in range(count // 2)]
+    weights = [1 / (rank + 1) ** 0.8 for rank in range(len(vocabulary))]
+    entities, names = set(), []
+    while len(entities) < count:
+        if names and rng.random() < 0.25:
+            words = rng.choice(names).split()
+            variant = rng.randint(0, 3)
+            if variant == 0:
+                words[-1] += "s"
+            elif variant == 1:
+                word = words[rng.randrange(len(words))]
+                position = rng.randrange(len(word))
+                words[words.index(word)] = word[:position] + rng.choice(LETTERS) + word[position + 1:]
+            elif variant == 2:
+                words.append(rng.choices(vocabulary, weights)[0])
+            elif len(words) > 1:
+                words.pop(rng.randrange(len(words)))
+            name = " ".join(words)
+        else:
+            name = " ".join(rng.choices(vocabulary, weights, k=rng.randint(1, 4)))
+        if name not in entities:
+            entities.add(name)
+            names.append(name)
+    return names
+
+
+def to_triples(entities: list) -> list:
+    return [{"subject": entities[i], "predicate": "mentions", "object": entities[i + 1]}
+            for i in range(0, len(entities) - 1, 2)]
+
+
+def sequence_matcher_inference(entities: list) -> int:
+    """上一版实现：分块候选 + 逐对SequenceMatcher打分"""
+    lowered = sorted(entity.lower() for entity in entities)
+    index = BlockingIndex(lowered, char_ngrams)
+    left, right, _ = index.similar_pairs(RelationshipInference.LEXICAL_CANDIDATE_MIN_DICE)
+    matcher, current, found = SequenceMatcher(), None, 0
+    for j, i in zip(left.tolist(), right.tolist()):
+        if i != current:
+            matcher.set_seq2(lowered[i])
+            current = i
+        matcher.set_seq1(lowered[j])
+        if matcher.real_quick_ratio() <= 0.5 or matcher.quick_ratio() <= 0.5:
+            continue
+        if matcher.ratio() > 0.5:
+            found += 1
+    return found
+
+
+def check_against_brute_force(entities: list):
+    """在小规模数据上与暴力计算比较Dice候选，并与SequenceMatcher逐对比较批量相似度"""
+    index = BlockingIndex(entities, char_ngrams)
+    left, right, dice = index.similar_pairs(0.3)
+    sets = [char_ngrams(entity) for entity in entities]
+    expected = {}
+    for i in range(len(sets)):
+        for j in range(i + 1, len(sets)):
+            score = 2 * len(sets[i] & sets[j]) / (len(sets[i]) + len(sets[j]))
+            if score >= 0.3:
+                expected[(i, j)] = score
+    assert dict(zip(zip(left.tolist(), right.tolist()), dice.tolist())) == expected
+
+    # 分成很多小批时结果不变
+    index.PAIR_BATCH_SIZE = 64
+    batched = index.similar_pairs(0.3)
+    assert all(np.array_equal(a, b) for a, b in zip(batched, (left, right, dice)))
+
+    # 包含空串、重复字符、非ASCII字符和触发autojunk的长字符串
+    rng = random.Random(3)
+    items = list(entities) + ["", "a", "aaaa", "abab", "知识图谱", "知识 图谱 推理",
+                              "x" * 250, "xy" * 120, "abc" * 70 + "d"]
+    pairs = [(rng.randrange(len(items)), rng.randrange(len(items))) for _ in range(20000)]
+    pairs += [(i, j) for i in range(len(entities), len(items)) for j in range(len(entities), len(items))]
+    pairs += list(zip(left.tolist(), right.tolist()))
+    pair_left, pair_right = np.array([p[0] for p in pairs]), np.array([p[1] for p in pairs])
+    ratios = sequence_ratios(items, pair_left, pair_right)
+    for (i, j), ratio in zip(pairs, ratios.tolist()):
+        assert ratio == SequenceMatcher(None, items[i], items[j]).ratio(), (items[i], items[j], ratio)
+
+
+def main():
+    check_against_brute_force(generate_entities(1500, seed=1))
+    print("dice pairs match brute force, batched ratios match SequenceMatcher: ok\n")
+
+    inference = RelationshipInference(None)
+    print(f"{'entities':>9}{'mode':>18}{'seconds':>9}{'inferred':>10}")
+    for size in SIZES:
+        entities = generate_entities(size)
+        found = None
+        if size <= SEQUENCE_MATCHER_LIMIT:
+            start = time.perf_counter()
+            found = sequence_matcher_inference(entities)
+            print(f"{size:>9}{'sequence-matcher':>18}{time.perf_counter() - start:>9.2f}{found:>10}")
+        start = time.perf_counter()
+        inferred = inference._infer_relationships_by_lexical_similarity(to_triples(entities))
+        print(f"{size:>9}{'batched':>18}{time.perf_counter() - start:>9.2f}{len(inferred):>10}")
+        assert found is None or found == len(inferred)
+
+
+if __name__ == "__main__":
+    main()
@@ -99,6 +99,41 @@ class LLMAdapter:
             logger.error(f"LLM调用失败: {str(e)}")
             raise RuntimeError(f"LLM调用失败: {str(e)}")
     
+    async def acall_llm(
+        self,
+        user_prompt: str,
+        system_prompt: Optional[str] = None,
+        max_tokens: int = 4096,
+        temperature: float = 0.8,
+        **kwargs
+    ) -> str:
+        """异步调用LLM生成响应，可在同一事件循环中并发调用
+        
+        Args:
+            user_prompt: 用户提示
+            system_prompt: 系统提示
+            max_tokens: 最大token数
+            temperature: 温度参数
+            **kwargs: 其他参数
+            
+        Returns:
+            LLM响应文本
+        """
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": user_prompt})
+        
+        try:
+            return await self.client.chat_completion(
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+        except Exception as e:
+            logger.error(f"LLM调用失败: {str(e)}")
+            raise RuntimeError(f"LLM调用失败: {str(e)}")
+    
     def is_available(self) -> bool:
         """检查LLM是否可用
         
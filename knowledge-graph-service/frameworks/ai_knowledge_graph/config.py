@@ -25,6 +25,12 @@ class AIKnowledgeGraphConfig:
         self.max_tokens = int(os.getenv('AI_KG_MAX_TOKENS', '8192'))
         self.temperature = float(os.getenv('AI_KG_TEMPERATURE', '0.8'))
         
+        # 三元组提取并发配置
+        self.extraction_concurrency = int(os.getenv('AI_KG_EXTRACTION_CONCURRENCY', '4'))
+        self.extraction_tokens_per_minute = int(os.getenv('AI_KG_EXTRACTION_TPM', '0'))  # 0表示不限
+        self.extraction_cache_enabled = os.getenv('AI_KG_EXTRACTION_CACHE_ENABLED', 'true').lower() == 'true'
+        self.extraction_cache_dir = os.getenv('AI_KG_EXTRACTION_CACHE_DIR', os.path.join(self.base_dir, 'extraction_cache'))
+        
         # 实体标准化配置
         self.standardization_enabled = os.getenv('AI_KG_STANDARDIZATION_ENABLED', 'true').lower() == 'true'
         self.use_llm_for_entities = os.getenv('AI_KG_USE_LLM_FOR_ENTITIES', 'true').lower() == 'true'
@@ -73,6 +79,11 @@ class AIKnowledgeGraphConfig:
                 "max_tokens": self.max_tokens,
                 "temperature": self.temperature
             },
+            "extraction": {
+                "concurrency": self.extraction_concurrency,
+                "tokens_per_minute": self.extraction_tokens_per_minute,
+                "cache_enabled": self.extraction_cache_enabled
+            },
             "standardization": {
                 "enabled": self.standardization_enabled,
                 "use_llm_for_entities": self.use_llm_for_entities
@@ -111,6 +122,9 @@ class AIKnowledgeGraphConfig:
             "chunk_overlap": self.chunk_overlap,
             "max_tokens": self.max_tokens,
             "temperature": self.temperature,
+            "extraction_concurrency": self.extraction_concurrency,
+            "extraction_tokens_per_minute": self.extraction_tokens_per_minute,
+            "extraction_cache_enabled": self.extraction_cache_enabled,
             "standardization_enabled": self.standardization_enabled,
             "use_llm_for_entities": self.use_llm_for_entities,
             "inference_enabled": self.inference_enabled,
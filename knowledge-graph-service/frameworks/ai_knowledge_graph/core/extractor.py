@@ -3,8 +3,14 @@
 """
 
 from typing import List, Dict, Any, Optional, Callable
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import asyncio
+import hashlib
 import logging
 import json
+import time
 import re
 
 from ..adapters.llm_adapter import get_llm_adapter
@@ -66,9 +72,47 @@ MAIN_USER_PROMPT = """
 """
 
 
+class TokenRateLimiter:
+    """按每分钟token预算限流的令牌桶"""
+    
+    def __init__(self, tokens_per_minute: int):
+        """初始化限流器
+        
+        Args:
+            tokens_per_minute: 每分钟允许的token数
+        """
+        self.capacity = float(tokens_per_minute)
+        self.tokens = float(tokens_per_minute)
+        self.refill_rate = tokens_per_minute / 60.0
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self, tokens: int) -> None:
+        """等待直到预算中有足够的token
+        
+        Args:
+            tokens: 本次请求预计消耗的token数
+        """
+        # 单个请求超过整个预算时，按整个预算计算，避免永远等待
+        needed = min(float(tokens), self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate)
+                self.updated_at = now
+                if self.tokens >= needed:
+                    self.tokens -= needed
+                    return
+                await asyncio.sleep((needed - self.tokens) / self.refill_rate)
+
+
 class TripleExtractor:
     """三元组提取器类"""
     
+    # 提示词或解析规则变化时递增，使旧的缓存失效
+    CACHE_VERSION = 1
+    MEMORY_CACHE_SIZE = 4096
+    
     def __init__(self, config):
         """初始化提取器
         
@@ -77,6 +121,7 @@ class TripleExtractor:
         """
         self.config = config
         self.llm_adapter = get_llm_adapter()
+        self._chunk_cache: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
         
         logger.info("三元组提取器初始化完成")
     
@@ -86,7 +131,7 @@ class TripleExtractor:
         callback: Optional[Callable] = None,
         task_id: Optional[str] = None
     ) -> List[Dict[str, Any]]:
-        """从文本中提取三元组
+        """从文本中提取三元组（同步入口）
         
         Args:
             text: 输入文本
@@ -96,6 +141,35 @@ class TripleExtractor:
         Returns:
             三元组列表
         """
+        coro = self.aextract_triples(text, callback, task_id)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coro)
+        
+        # 在事件循环线程中被同步调用时，在独立线程中运行，避免嵌套事件循环
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, coro).result()
+    
+    async def aextract_triples(
+        self,
+        text: str,
+        callback: Optional[Callable] = None,
+        task_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """从文本中并发提取三元组
+        
+        各块在并发数和每分钟token预算的限制下并发调用LLM，每完成一块就通过回调
+        上报该块的三元组。块结果按内容哈希缓存，文档修改后重新生成只需处理变化的块。
+        
+        Args:
+            text: 输入文本
+            callback: 进度回调函数
+            task_id: 任务ID
+            
+        Returns:
+            按块顺序排列的三元组列表
+        """
         if not text or not text.strip():
             logger.warning("输入文本为空")
             return []
@@ -106,33 +180,67 @@ class TripleExtractor:
         
         # 分块处理
         text_chunks = chunk_text(text, chunk_size, overlap)
+        total = len(text_chunks)
         
-        logger.info(f"将文本分为 {len(text_chunks)} 块进行处理 (大小: {chunk_size} 词, 重叠: {overlap} 词)")
+        concurrency = max(1, int(getattr(self.config, "extraction_concurrency", 4)))
+        tokens_per_minute = int(getattr(self.config, "extraction_tokens_per_minute", 0))
+        semaphore = asyncio.Semaphore(concurrency)
+        rate_limiter = TokenRateLimiter(tokens_per_minute) if tokens_per_minute > 0 else None
         
-        all_results = []
-        for i, chunk in enumerate(text_chunks):
-            if callback:
-                progress = 0.1 + (i / len(text_chunks)) * 0.3  # 在0.1-0.4之间
-                callback(task_id or "", f"处理第 {i+1}/{len(text_chunks)} 块", progress, None)
-            
-            logger.info(f"处理第 {i+1}/{len(text_chunks)} 块 ({len(chunk.split())} 词)")
+        logger.info(f"将文本分为 {total} 块进行处理 (大小: {chunk_size} 词, 重叠: {overlap} 词, 并发: {concurrency}, TPM: {tokens_per_minute or '不限'})")
+        
+        chunk_results: List[Optional[List[Dict[str, Any]]]] = [None] * total
+        completed = 0
+        cache_hits = 0
+        
+        async def run_chunk(index: int, chunk: str):
+            cache_key = self._chunk_cache_key(chunk)
+            triples = self._get_cached_chunk(cache_key)
+            cached = triples is not None
             
-            # 处理单个块
-            chunk_results = self._process_chunk(chunk, i+1)
+            if not cached:
+                async with semaphore:
+                    if rate_limiter:
+                        await rate_limiter.acquire(self._estimate_request_tokens(chunk))
+                    logger.info(f"处理第 {index+1}/{total} 块 ({len(chunk.split())} 词)")
+                    triples = await self._aprocess_chunk(chunk, index + 1)
+                # 失败的块不缓存，下次重新提取
+                if triples is not None:
+                    self._set_cached_chunk(cache_key, triples)
             
-            if chunk_results:
-                # 添加块信息
-                for item in chunk_results:
-                    item["chunk"] = i + 1
+            # 返回副本，避免后续标准化等步骤修改缓存中的数据
+            return index, cached, [dict(item, chunk=index + 1) for item in (triples or [])]
+        
+        tasks = [asyncio.create_task(run_chunk(i, chunk)) for i, chunk in enumerate(text_chunks)]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                index, cached, triples = await finished
+                chunk_results[index] = triples
+                completed += 1
+                cache_hits += int(cached)
                 
-                all_results.extend(chunk_results)
-            else:
-                logger.warning(f"第 {i+1} 块未提取到三元组")
+                if not triples:
+                    logger.warning(f"第 {index+1} 块未提取到三元组")
+                
+                if callback:
+                    progress = 0.1 + (completed / total) * 0.3  # 在0.1-0.4之间
+                    callback(task_id or "", f"已处理 {completed}/{total} 块", progress, {
+                        "chunk": index + 1,
+                        "completed_chunks": completed,
+                        "total_chunks": total,
+                        "cached": cached,
+                        "triples": triples
+                    })
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
         
-        logger.info(f"从所有块中提取到总共 {len(all_results)} 个三元组")
+        all_results = [item for triples in chunk_results for item in (triples or [])]
+        logger.info(f"从所有块中提取到总共 {len(all_results)} 个三元组 (缓存命中 {cache_hits}/{total} 块)")
         return all_results
     
-    def _process_chunk(self, chunk_text: str, chunk_num: int) -> List[Dict[str, Any]]:
+    async def _aprocess_chunk(self, chunk_text: str, chunk_num: int) -> Optional[List[Dict[str, Any]]]:
         """处理单个文本块
         
         Args:
@@ -140,7 +248,7 @@ class TripleExtractor:
             chunk_num: 块编号
             
         Returns:
-            三元组列表
+            三元组列表；LLM调用或解析失败时返回None
         """
         # 构造提示词
         system_prompt = MAIN_SYSTEM_PROMPT
@@ -148,44 +256,104 @@ class TripleExtractor:
         
         try:
             # 调用LLM
-            response = self.llm_adapter.call_llm(
+            response = await self.llm_adapter.acall_llm(
                 user_prompt=user_prompt,
                 system_prompt=system_prompt,
                 max_tokens=self.config.max_tokens,
                 temperature=self.config.temperature
             )
-            
-            # 提取JSON
-            result = self._extract_json_from_response(response)
-            
-            if result:
-                # 验证和过滤三元组
-                valid_triples = []
-                invalid_count = 0
-                
-                for item in result:
-                    if isinstance(item, dict) and "subject" in item and "predicate" in item and "object" in item:
-                        # 限制谓词长度
-                        item["predicate"] = self._limit_predicate_length(item["predicate"])
-                        valid_triples.append(item)
-                    else:
-                        invalid_count += 1
-                
-                if invalid_count > 0:
-                    logger.warning(f"第 {chunk_num} 块：过滤掉 {invalid_count} 个无效三元组")
-                
-                if not valid_triples:
-                    logger.warning(f"第 {chunk_num} 块：未找到有效三元组")
-                    return []
-                
-                return valid_triples
-            else:
-                logger.error(f"第 {chunk_num} 块：无法从响应中提取有效JSON")
-                return []
-                
         except Exception as e:
             logger.error(f"处理第 {chunk_num} 块时出错: {str(e)}")
-            return []
+            return None
+        
+        # 提取JSON
+        result = self._extract_json_from_response(response)
+        
+        if not result:
+            logger.error(f"第 {chunk_num} 块：无法从响应中提取有效JSON")
+            return None
+        
+        # 验证和过滤三元组
+        valid_triples = []
+        invalid_count = 0
+        
+        for item in result:
+            if isinstance(item, dict) and "subject" in item and "predicate" in item and "object" in item:
+                # 限制谓词长度
+                item["predicate"] = self._limit_predicate_length(item["predicate"])
+                valid_triples.append(item)
+            else:
+                invalid_count += 1
+        
+        if invalid_count > 0:
+            logger.warning(f"第 {chunk_num} 块：过滤掉 {invalid_count} 个无效三元组")
+        
+        if not valid_triples:
+            logger.warning(f"第 {chunk_num} 块：未找到有效三元组")
+        
+        return valid_triples
+    
+    def _estimate_request_tokens(self, chunk_text: str) -> int:
+        """粗略估计一次块提取请求消耗的token数（输入加上同等规模的输出）"""
+        prompt_tokens = (len(MAIN_SYSTEM_PROMPT) + len(MAIN_USER_PROMPT) + len(chunk_text)) // 2
+        return prompt_tokens + min(self.config.max_tokens, prompt_tokens)
+    
+    def _chunk_cache_key(self, chunk_text: str) -> str:
+        """根据块内容和影响提取结果的参数计算缓存键"""
+        payload = json.dumps([
+            self.CACHE_VERSION,
+            self.config.max_tokens,
+            self.config.temperature,
+            chunk_text
+        ], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def _cache_file(self, cache_key: str) -> Optional[Path]:
+        cache_dir = getattr(self.config, "extraction_cache_dir", None)
+        if not cache_dir:
+            return None
+        return Path(cache_dir) / cache_key[:2] / f"{cache_key}.json"
+    
+    def _get_cached_chunk(self, cache_key: str) -> Optional[List[Dict[str, Any]]]:
+        """从内存或磁盘缓存中读取块的提取结果"""
+        if not getattr(self.config, "extraction_cache_enabled", True):
+            return None
+        
+        if cache_key in self._chunk_cache:
+            self._chunk_cache.move_to_end(cache_key)
+            return self._chunk_cache[cache_key]
+        
+        cache_file = self._cache_file(cache_key)
+        if cache_file is None or not cache_file.exists():
+            return None
+        try:
+            triples = json.loads(cache_file.read_text(encoding="utf-8"))
+        except Exception as e:
+            logger.warning(f"读取块缓存失败 {cache_file}: {str(e)}")
+            return None
+        self._remember_chunk(cache_key, triples)
+        return triples
+    
+    def _set_cached_chunk(self, cache_key: str, triples: List[Dict[str, Any]]) -> None:
+        """写入块的提取结果到内存和磁盘缓存"""
+        if not getattr(self.config, "extraction_cache_enabled", True):
+            return
+        
+        self._remember_chunk(cache_key, triples)
+        cache_file = self._cache_file(cache_key)
+        if cache_file is None:
+            return
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            cache_file.write_text(json.dumps(triples, ensure_ascii=False), encoding="utf-8")
+        except Exception as e:
+            logger.warning(f"写入块缓存失败 {cache_file}: {str(e)}")
+    
+    def _remember_chunk(self, cache_key: str, triples: List[Dict[str, Any]]) -> None:
+        self._chunk_cache[cache_key] = triples
+        self._chunk_cache.move_to_end(cache_key)
+        while len(self._chunk_cache) > self.MEMORY_CACHE_SIZE:
+            self._chunk_cache.popitem(last=False)
     
     def _extract_json_from_response(self, response: str) -> Optional[List[Dict[str, Any]]]:
         """从LLM响应中提取JSON
@@ -5,11 +5,12 @@
 from typing import List, Dict, Any, Optional, Set
 import logging
 import networkx as nx
+import numpy as np
 from collections import defaultdict, Counter
 import itertools
-from difflib import SequenceMatcher
 
 from ..adapters.llm_adapter import get_llm_adapter
+from ..utils.similarity_index import BlockingIndex, char_ngrams, sequence_ratios
 
 logger = logging.getLogger(__name__)
 
@@ -65,6 +66,12 @@ def get_cross_community_prompt(community1_entities, community2_entities):
 class RelationshipInference:
     """关系推理器类"""
     
+    # SequenceMatcher相似度阈值：高于前者推断"相似"，高于后者推断"相关"
+    LEXICAL_SIMILAR_THRESHOLD = 0.7
+    LEXICAL_RELATED_THRESHOLD = 0.5
+    # 词汇相似性推理的候选阈值：字符三元组Dice系数低于该值的实体对不参与打分
+    LEXICAL_CANDIDATE_MIN_DICE = 0.3
+    
     def __init__(self, config):
         """初始化关系推理器
         
@@ -251,6 +258,8 @@ class RelationshipInference:
     ) -> List[Dict[str, Any]]:
         """基于词汇相似性推断关系
         
+        先用字符三元组分块索引批量生成候选实体对，再用与SequenceMatcher结果一致的numpy内核批量打分
+        
         Args:
             triples: 现有三元组列表
             
@@ -265,14 +274,25 @@ class RelationshipInference:
             entities.add(triple["subject"])
             entities.add(triple["object"])
         
-        entity_list = list(entities)
+        entity_list = sorted(entities)
+        lowered = [entity.lower() for entity in entity_list]
         
-        # 对实体进行两两比较
-        for i, entity1 in enumerate(entity_list):
-            for entity2 in entity_list[i+1:]:
-                similarity = self._calculate_string_similarity(entity1, entity2)
-                
-                if similarity > 0.7:  # 高相似度阈值
+        # real_quick_ratio 是 ratio 的上界：长度相差过大的候选不可能达到阈值
+        lengths = np.array([len(entity) for entity in lowered], dtype=np.int64)
+        
+        def possible(left, right):
+            total = lengths[left] + lengths[right]
+            return 2 * np.minimum(lengths[left], lengths[right]) > self.LEXICAL_RELATED_THRESHOLD * total
+        
+        # 只对共享足够多字符三元组的候选对计算相似度，避免两两比较；候选按批生成和打分，内存占用与实体数无关
+        index = BlockingIndex(lowered, char_ngrams)
+        for left, right, _ in index.iter_similar_pairs(self.LEXICAL_CANDIDATE_MIN_DICE, possible):
+            scores = sequence_ratios(lowered, left, right)
+            matched = scores > self.LEXICAL_RELATED_THRESHOLD
+            
+            for j, i, similarity in zip(left[matched].tolist(), right[matched].tolist(), scores[matched].tolist()):
+                entity1, entity2 = entity_list[j], entity_list[i]
+                if similarity > self.LEXICAL_SIMILAR_THRESHOLD:  # 高相似度阈值
                     # 推断"相似"关系
                     inferred_triples.append({
                         "subject": entity1,
@@ -282,7 +302,7 @@ class RelationshipInference:
                         "inference_type": "lexical_similarity",
                         "similarity_score": similarity
                     })
-                elif similarity > 0.5:  # 中等相似度阈值
+                else:  # 中等相似度阈值
                     # 推断"相关"关系
                     inferred_triples.append({
                         "subject": entity1,
@@ -295,19 +315,6 @@ class RelationshipInference:
         
         return inferred_triples
     
-    def _calculate_string_similarity(self, str1: str, str2: str) -> float:
-        """计算字符串相似度
-        
-        Args:
-            str1: 字符串1
-            str2: 字符串2
-            
-        Returns:
-            相似度分数 (0-1)
-        """
-        # 使用SequenceMatcher计算相似度
-        return SequenceMatcher(None, str1.lower(), str2.lower()).ratio()
-    
     def _infer_within_community_relationships(
         self, 
         communities: List[Set[str]], 
@@ -8,6 +8,7 @@ import re
 from collections import defaultdict
 
 from ..adapters.llm_adapter import get_llm_adapter
+from ..utils.similarity_index import BlockingIndex
 
 logger = logging.getLogger(__name__)
 
@@ -188,34 +189,38 @@ class EntityStandardizer:
         standard_forms = set(standardized_entities.values())
         sorted_standards = sorted(standard_forms, key=len)
         
-        for i, entity1 in enumerate(sorted_standards):
+        # 子集关系要求共享至少一个词，词干相似要求共享至少一个词干，
+        # 因此只需比较共享词或词干的实体对，结果与两两比较完全一致
+        def word_and_stem_keys(entity):
+            words = entity.split()
+            return [("word", word) for word in words] + [("stem", word[:4]) for word in words if len(word) > 4]
+        
+        index = BlockingIndex(sorted_standards, word_and_stem_keys)
+        
+        for i, j in index.candidate_pairs():
+            entity1, entity2 = sorted_standards[i], sorted_standards[j]
             e1_words = set(entity1.split())
+            e2_words = set(entity2.split())
             
-            for entity2 in sorted_standards[i+1:]:
-                if entity1 == entity2:
-                    continue
+            # 检查一个实体是否是另一个的子集
+            if e1_words.issubset(e2_words) and len(e1_words) > 0:
+                # 较短的可能是更通用的概念
+                additional_standardizations[entity2] = entity1
+            elif e2_words.issubset(e1_words) and len(e2_words) > 0:
+                additional_standardizations[entity1] = entity2
+            else:
+                # 检查词干相似性
+                stems1 = {word[:4] for word in e1_words if len(word) > 4}
+                stems2 = {word[:4] for word in e2_words if len(word) > 4}
                 
-                e2_words = set(entity2.split())
+                shared_stems = stems1.intersection(stems2)
                 
-                # 检查一个实体是否是另一个的子集
-                if e1_words.issubset(e2_words) and len(e1_words) > 0:
-                    # 较短的可能是更通用的概念
-                    additional_standardizations[entity2] = entity1
-                elif e2_words.issubset(e1_words) and len(e2_words) > 0:
-                    additional_standardizations[entity1] = entity2
-                else:
-                    # 检查词干相似性
-                    stems1 = {word[:4] for word in e1_words if len(word) > 4}
-                    stems2 = {word[:4] for word in e2_words if len(word) > 4}
-                    
-                    shared_stems = stems1.intersection(stems2)
-                    
-                    if shared_stems and (len(shared_stems) / max(len(stems1), len(stems2))) > 0.5:
-                        # 使用较短的实体作为标准
-                        if len(entity1) <= len(entity2):
-                            additional_standardizations[entity2] = entity1
-                        else:
-                            additional_standardizations[entity1] = entity2
+                if shared_stems and (len(shared_stems) / max(len(stems1), len(stems2))) > 0.5:
+                    # 使用较短的实体作为标准
+                    if len(entity1) <= len(entity2):
+                        additional_standardizations[entity2] = entity1
+                    else:
+                        additional_standardizations[entity1] = entity2
         
         return additional_standardizations
     
@@ -8,8 +8,15 @@ import networkx as nx
 from pyvis.network import Network
 import os
 import tempfile
+import json
+from collections import Counter
 from pathlib import Path
 
+import numpy as np
+
+from ..utils.graph_analytics import GraphAnalytics
+from ..utils.graph_layout import PRECOMPUTE_MIN_NODES, community_layout
+
 logger = logging.getLogger(__name__)
 
 
@@ -23,6 +30,8 @@ class KnowledgeGraphVisualizer:
             config: 配置对象
         """
         self.config = config
+        # 中心性指标按图版本缓存，小改动后增量计算
+        self.analytics = GraphAnalytics()
         
         logger.info("知识图谱可视化器初始化完成")
     
@@ -240,38 +249,13 @@ class KnowledgeGraphVisualizer:
             return metrics
         
         try:
-            # 度中心性
-            metrics["degree"] = nx.degree_centrality(graph)
-            
-            # 介数中心性
-            if len(graph.nodes) > 2:
-                metrics["betweenness"] = nx.betweenness_centrality(graph)
-            else:
-                metrics["betweenness"] = {node: 0.0 for node in graph.nodes}
-            
-            # 特征向量中心性
-            if len(graph.edges) > 0:
-                try:
-                    metrics["eigenvector"] = nx.eigenvector_centrality(graph, max_iter=1000)
-                except:
-                    # 如果计算失败，使用度中心性作为替代
-                    metrics["eigenvector"] = metrics["degree"]
-            else:
-                metrics["eigenvector"] = {node: 0.0 for node in graph.nodes}
-            
-            # 接近中心性
-            if nx.is_connected(graph):
-                metrics["closeness"] = nx.closeness_centrality(graph)
-            else:
-                # 对于非连通图，分别计算每个连通组件的接近中心性
-                metrics["closeness"] = {}
-                for component in nx.connected_components(graph):
-                    subgraph = graph.subgraph(component)
-                    if len(subgraph) > 1:
-                        closeness = nx.closeness_centrality(subgraph)
-                        metrics["closeness"].update(closeness)
-                    else:
-                        metrics["closeness"][list(component)[0]] = 0.0
+            # 大图的介数和接近中心性使用k-pivot采样，特征向量中心性使用稀疏幂迭代；
+            # 非连通图的接近中心性按连通组件分别计算
+            metrics = dict(self.analytics.compute(
+                graph,
+                ("degree", "betweenness", "eigenvector", "closeness"),
+                per_component_closeness=True
+            ))
             
         except Exception as e:
             logger.warning(f"计算中心性指标失败: {str(e)}")
@@ -1322,30 +1306,32 @@ class KnowledgeGraphVisualizer:
     def _prepare_visualization_data(self, triples: List[Dict[str, Any]]) -> str:
         """准备可视化数据
         
+        节点数达到 PRECOMPUTE_MIN_NODES 时预先计算布局坐标并固定节点，浏览器无需再做物理模拟
+        
         Args:
             triples: 三元组列表
             
         Returns:
             JSON格式的可视化数据
         """
-        import json
-        
-        # 收集所有节点
-        nodes = set()
+        # 收集所有节点并计算节点度数
+        node_degrees = Counter()
         for triple in triples:
-            nodes.add(triple["subject"])
-            nodes.add(triple["object"])
-        
-        # 计算节点度数
-        node_degrees = {}
-        for node in nodes:
-            degree = sum(1 for t in triples 
-                        if t["subject"] == node or t["object"] == node)
-            node_degrees[node] = degree
+            node_degrees[triple["subject"]] += 1
+            node_degrees[triple["object"]] += 1
+        nodes = list(node_degrees)
+        
+        positions = None
+        if len(nodes) >= PRECOMPUTE_MIN_NODES:
+            index = {node: i for i, node in enumerate(nodes)}
+            src = np.fromiter((index[t["subject"]] for t in triples), dtype=np.int64, count=len(triples))
+            dst = np.fromiter((index[t["object"]] for t in triples), dtype=np.int64, count=len(triples))
+            positions, _ = community_layout(len(nodes), src, dst)
+            positions = np.round(positions.astype(np.float64), 1).tolist()
         
         # 创建节点数据
         nodes_data = []
-        for node in nodes:
+        for i, node in enumerate(nodes):
             degree = node_degrees[node]
             # 根据度数设置颜色和大小
             if degree > 5:
@@ -1355,14 +1341,17 @@ class KnowledgeGraphVisualizer:
                 color = "#FBBC05"  # 黄色 - 普通节点
                 size = 20
                 
-            nodes_data.append({
+            node_data = {
                 "id": node,
                 "label": node,
                 "color": {"background": color, "border": "#333"},
                 "size": size,
                 "originalColor": {"background": color, "border": "#333"},
                 "group": "entity"
-            })
+            }
+            if positions is not None:
+                node_data.update(x=positions[i][0], y=positions[i][1], physics=False)
+            nodes_data.append(node_data)
         
         # 创建边数据
         edges_data = []
@@ -1383,7 +1372,7 @@ class KnowledgeGraphVisualizer:
         return json.dumps({
             "nodes": nodes_data,
             "edges": edges_data
-        }, ensure_ascii=False, indent=2)
+        }, ensure_ascii=False, separators=(",", ":"))
     
     def _calculate_triples_statistics(self, triples: List[Dict[str, Any]]) -> Dict[str, Any]:
         """计算三元组统计信息
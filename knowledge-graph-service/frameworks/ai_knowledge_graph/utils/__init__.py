@@ -4,10 +4,20 @@
 
 from .text_utils import chunk_text, clean_text
 from .graph_utils import build_graph, calculate_centrality
+from .similarity_index import BlockingIndex, char_ngrams, sequence_ratios
+from .graph_analytics import GraphAnalytics, compute_centrality_metrics
+from .graph_layout import community_layout, detect_communities
 
 __all__ = [
     'chunk_text',
     'clean_text',
     'build_graph',
-    'calculate_centrality'
+    'calculate_centrality',
+    'BlockingIndex',
+    'char_ngrams',
+    'sequence_ratios',
+    'GraphAnalytics',
+    'compute_centrality_metrics',
+    'community_layout',
+    'detect_communities'
 ] 
\ No newline at end of file
@@ -0,0 +1,235 @@
+"""图布局工具
+基于社区划分的两级力导向布局：先布局社区，再在各社区内部布局节点，
+只依赖numpy和networkx，可用于十万级节点的图
+"""
+
+from typing import Tuple
+import logging
+import math
+import os
+
+import networkx as nx
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 节点数不超过该值时使用Louvain社区检测，否则使用向量化的标签传播
+LOUVAIN_MAX_NODES = int(os.getenv('AI_KG_LAYOUT_LOUVAIN_MAX_NODES', '5000'))
+# 社区内节点数不超过该值时使用力导向布局，否则使用按度数排列的螺旋布局加邻居平滑
+FORCE_MAX_NODES = int(os.getenv('AI_KG_LAYOUT_FORCE_MAX_NODES', '300'))
+# 参与力导向布局的最大社区数，其余（较小的）社区排列在外圈
+COMMUNITY_FORCE_MAX = int(os.getenv('AI_KG_LAYOUT_COMMUNITY_FORCE_MAX', '1500'))
+# 节点数达到该值时由服务端预计算布局，浏览器不再做物理模拟
+PRECOMPUTE_MIN_NODES = int(os.getenv('AI_KG_LAYOUT_PRECOMPUTE_MIN_NODES', '500'))
+# 相邻节点的目标间距（布局坐标单位）
+NODE_SPACING = 10.0
+# 固定随机种子，使同一个图的布局可复现
+LAYOUT_SEED = 42
+
+_GOLDEN_ANGLE = math.pi * (3.0 - math.sqrt(5.0))
+
+
+def _label_propagation(n: int, src: np.ndarray, dst: np.ndarray, seed: int = LAYOUT_SEED,
+                       max_iterations: int = 30) -> np.ndarray:
+    """向量化的标签传播：每轮随机选一半需要变化的节点改为其邻居中最多的标签，避免同步更新时的振荡"""
+    rng = np.random.default_rng(seed)
+    labels = np.arange(n, dtype=np.int64)
+    endpoints = np.concatenate([src, dst])
+    neighbors = np.concatenate([dst, src])
+    # 票数相同时按标签的随机优先级选择
+    tiebreak = rng.random(n) * 0.5
+
+    for _ in range(max_iterations):
+        keys, counts = np.unique(endpoints * n + labels[neighbors], return_counts=True)
+        nodes, candidate_labels = keys // n, keys % n
+        order = np.lexsort((-(counts + tiebreak[candidate_labels]), nodes))
+        first = order[np.concatenate([[True], nodes[order][1:] != nodes[order][:-1]])]
+        best = labels.copy()
+        best[nodes[first]] = candidate_labels[first]
+
+        changed = best != labels
+        if not changed.any():
+            break
+        update = changed & (rng.random(n) < 0.5)
+        labels[update] = best[update]
+    return labels
+
+
+def detect_communities(n: int, src: np.ndarray, dst: np.ndarray, seed: int = LAYOUT_SEED) -> np.ndarray:
+    """社区检测（忽略边方向）
+
+    Args:
+        n: 节点数
+        src: 边的起点下标
+        dst: 边的终点下标
+        seed: 随机种子
+
+    Returns:
+        每个节点的社区编号，编号按社区大小降序分配
+    """
+    if n <= LOUVAIN_MAX_NODES:
+        graph = nx.Graph()
+        graph.add_nodes_from(range(n))
+        graph.add_edges_from(zip(src.tolist(), dst.tolist()))
+        try:
+            raw_labels = np.empty(n, dtype=np.int64)
+            for label, community in enumerate(nx.community.louvain_communities(graph, seed=seed)):
+                raw_labels[list(community)] = label
+        except Exception as e:
+            logger.warning(f"Louvain社区检测失败，降级为标签传播: {str(e)}")
+            raw_labels = _label_propagation(n, src, dst, seed)
+    else:
+        raw_labels = _label_propagation(n, src, dst, seed)
+
+    # 按社区大小降序重新编号
+    _, inverse, sizes = np.unique(raw_labels, return_inverse=True, return_counts=True)
+    rank = np.empty(sizes.size, dtype=np.int32)
+    rank[np.argsort(-sizes, kind="stable")] = np.arange(sizes.size, dtype=np.int32)
+    return rank[inverse]
+
+
+def force_layout(n: int, src: np.ndarray, dst: np.ndarray, iterations: int = 50,
+                 seed: int = LAYOUT_SEED) -> np.ndarray:
+    """Fruchterman-Reingold力导向布局（稠密斥力矩阵，适合数百到一两千个节点）
+
+    Returns:
+        (n, 2) 坐标数组，范围约为 [-1, 1]
+    """
+    if n == 1:
+        return np.zeros((1, 2))
+    rng = np.random.default_rng(seed)
+    x, y = rng.uniform(-1.0, 1.0, size=(2, n))
+    k_sq = 4.0 / n
+    k = math.sqrt(k_sq)
+    temperature = 0.2
+    cooling = temperature / (iterations + 1)
+
+    for _ in range(iterations):
+        dx = x[:, None] - x[None, :]
+        dy = y[:, None] - y[None, :]
+        # 斥力 k²/d，沿 (dx, dy)/d 方向
+        factor = k_sq / np.maximum(dx * dx + dy * dy, 1e-4)
+        disp_x = (factor * dx).sum(axis=1)
+        disp_y = (factor * dy).sum(axis=1)
+        if src.size:
+            # 引力 d²/k，沿边方向
+            edge_dx = x[src] - x[dst]
+            edge_dy = y[src] - y[dst]
+            edge_factor = np.sqrt(edge_dx * edge_dx + edge_dy * edge_dy) / k
+            fx, fy = edge_dx * edge_factor, edge_dy * edge_factor
+            disp_x += np.bincount(dst, weights=fx, minlength=n) - np.bincount(src, weights=fx, minlength=n)
+            disp_y += np.bincount(dst, weights=fy, minlength=n) - np.bincount(src, weights=fy, minlength=n)
+        length = np.maximum(np.sqrt(disp_x * disp_x + disp_y * disp_y), 1e-4)
+        step = np.minimum(length, temperature) / length
+        x += disp_x * step
+        y += disp_y * step
+        temperature -= cooling
+
+    pos = np.column_stack([x - x.mean(), y - y.mean()])
+    scale = np.abs(pos).max()
+    return pos / scale if scale > 0 else pos
+
+
+def spiral_layout(n: int) -> np.ndarray:
+    """向日葵螺旋：第i个点在半径 sqrt(i/n) 处，点均匀铺满单位圆"""
+    index = np.arange(n) + 0.5
+    radius = np.sqrt(index / n)
+    angle = index * _GOLDEN_ANGLE
+    return np.column_stack([radius * np.cos(angle), radius * np.sin(angle)])
+
+
+def _smoothed_spiral_layout(n: int, src: np.ndarray, dst: np.ndarray, degree: np.ndarray,
+                            iterations: int = 10) -> np.ndarray:
+    """大社区布局：度数高的节点在螺旋中心，再向邻居的平均位置平滑，使相连的节点靠近"""
+    anchor = np.empty((n, 2))
+    anchor[np.argsort(-degree, kind="stable")] = spiral_layout(n)
+    if not src.size:
+        return anchor
+
+    endpoints = np.concatenate([src, dst])
+    neighbors = np.concatenate([dst, src])
+    neighbor_count = np.bincount(endpoints, minlength=n)
+    has_neighbors = neighbor_count > 0
+    pos = anchor.copy()
+    for _ in range(iterations):
+        neighbor_mean = np.column_stack([
+            np.bincount(endpoints, weights=pos[neighbors, axis], minlength=n) for axis in range(2)
+        ])
+        neighbor_mean[has_neighbors] /= neighbor_count[has_neighbors, None]
+        pos[has_neighbors] = 0.5 * anchor[has_neighbors] + 0.5 * neighbor_mean[has_neighbors]
+    return pos
+
+
+def community_layout(n: int, src: np.ndarray, dst: np.ndarray,
+                     seed: int = LAYOUT_SEED) -> Tuple[np.ndarray, np.ndarray]:
+    """两级布局：社区中心由社区图的力导向布局决定，社区内部节点分布在半径与 sqrt(社区大小) 成正比的圆内
+
+    Args:
+        n: 节点数
+        src: 边的起点下标
+        dst: 边的终点下标
+        seed: 随机种子
+
+    Returns:
+        ((n, 2) 坐标数组, 每个节点的社区编号)
+    """
+    src = np.asarray(src, dtype=np.int64)
+    dst = np.asarray(dst, dtype=np.int64)
+    if n == 0:
+        return np.zeros((0, 2), dtype=np.float32), np.zeros(0, dtype=np.int32)
+
+    labels = detect_communities(n, src, dst, seed)
+    community_count = int(labels.max()) + 1
+    sizes = np.bincount(labels, minlength=community_count)
+    degree = np.bincount(src, minlength=n) + np.bincount(dst, minlength=n)
+    radii = np.sqrt(sizes) * NODE_SPACING
+
+    # 社区图：社区间的边去重后做力导向布局
+    source_labels, target_labels = labels[src], labels[dst]
+    inter = source_labels != target_labels
+    top = min(community_count, COMMUNITY_FORCE_MAX)
+    pairs = np.column_stack([
+        np.minimum(source_labels[inter], target_labels[inter]),
+        np.maximum(source_labels[inter], target_labels[inter]),
+    ])
+    pairs = pairs[(pairs < top).all(axis=1)]
+    pairs = np.unique(pairs, axis=0) if pairs.size else pairs.reshape(0, 2)
+    centers = np.zeros((community_count, 2))
+    centers[:top] = force_layout(top, pairs[:, 0], pairs[:, 1], seed=seed) * (np.sqrt(n) * NODE_SPACING)
+
+    if community_count > top:
+        # 剩余的小社区按大小排列在外圈螺旋上
+        inner_radius = np.sqrt((centers[:top] ** 2).sum(axis=1)).max() + radii[:top].max()
+        rest = community_count - top
+        ring = spiral_layout(rest + top)[top:]
+        ring /= np.sqrt((ring ** 2).sum(axis=1)).min()
+        centers[top:] = ring * inner_radius
+
+    # 社区内部布局
+    order = np.argsort(labels, kind="stable")
+    bounds = np.concatenate([[0], np.cumsum(sizes)])
+    local_index = np.empty(n, dtype=np.int64)
+    local_index[order] = np.arange(n) - bounds[labels[order]]
+
+    intra = ~inter
+    intra_src, intra_dst = src[intra], dst[intra]
+    intra_order = np.argsort(source_labels[intra], kind="stable")
+    intra_bounds = np.concatenate([[0], np.cumsum(np.bincount(source_labels[intra], minlength=community_count))])
+
+    pos = np.empty((n, 2))
+    for community in range(community_count):
+        members = order[bounds[community]:bounds[community + 1]]
+        size = members.size
+        if size == 1:
+            pos[members] = centers[community]
+            continue
+        edge_slice = intra_order[intra_bounds[community]:intra_bounds[community + 1]]
+        local_src = local_index[intra_src[edge_slice]]
+        local_dst = local_index[intra_dst[edge_slice]]
+        if size <= FORCE_MAX_NODES:
+            local = force_layout(size, local_src, local_dst, seed=seed)
+        else:
+            local = _smoothed_spiral_layout(size, local_src, local_dst, degree[members])
+        pos[members] = centers[community] + local * radii[community]
+
+    return pos.astype(np.float32), labels
@@ -0,0 +1,357 @@
+"""相似度候选生成与批量打分工具
+通过倒排索引（分块）只枚举可能相似的实体对，避免两两比较所有实体；
+候选对的相似度用numpy内核按批计算
+"""
+
+from typing import Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+from collections import defaultdict
+from difflib import SequenceMatcher
+import itertools
+
+import numpy as np
+
+
+def char_ngrams(text: str, n: int = 3) -> Set[str]:
+    """提取字符n-gram集合
+
+    首尾补空格，使短字符串和词首词尾也能产生n-gram。
+
+    Args:
+        text: 输入文本
+        n: n-gram长度
+
+    Returns:
+        n-gram集合
+    """
+    padded = f"{' ' * (n - 1)}{text}{' ' * (n - 1)}"
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+class BlockingIndex:
+    """实体分块索引
+
+    每个条目由 key_func 映射为一组分块键（例如字符n-gram、词、词干），
+    只有共享分块键的条目才会被当作候选对。
+    """
+
+    # 批量计算时每批展开的元素数上限，控制内存占用
+    PAIR_BATCH_SIZE = 1 << 22
+
+    def __init__(self, items: Sequence[str], key_func: Callable[[str], Iterable[Hashable]]):
+        """构建索引
+
+        Args:
+            items: 条目列表，候选对用条目在列表中的下标表示
+            key_func: 条目到分块键的映射函数
+        """
+        self.items = list(items)
+        self.keys: List[Set[Hashable]] = [set(key_func(item)) for item in self.items]
+
+        self.postings: Dict[Hashable, List[int]] = defaultdict(list)
+        for index, keys in enumerate(self.keys):
+            for key in keys:
+                self.postings[key].append(index)
+
+        # 稀疏矩阵在第一次批量计算相似度时构建
+        self._indptr: Optional[np.ndarray] = None
+
+    def candidate_pairs(self) -> Iterator[Tuple[int, int]]:
+        """枚举至少共享一个分块键的条目对
+
+        按 (i, j)（i < j）的字典序产出，与两两比较的遍历顺序一致。
+
+        Returns:
+            候选对 (i, j) 的迭代器
+        """
+        for i, keys in enumerate(self.keys):
+            partners = set()
+            for key in keys:
+                for j in self.postings[key]:
+                    if j > i:
+                        partners.add(j)
+            for j in sorted(partners):
+                yield i, j
+
+    def _build_matrix(self):
+        """构建稀疏的 条目×分块键 矩阵（CSR布局），分块键按全局频率升序编号"""
+        if self._indptr is not None:
+            return
+
+        key_order = sorted(self.postings, key=lambda key: len(self.postings[key]))
+        key_rank = {key: rank for rank, key in enumerate(key_order)}
+        rows = [sorted(key_rank[key] for key in keys) for keys in self.keys]
+
+        self._num_keys = max(1, len(key_order))
+        self._doc_freq = np.array([len(self.postings[key]) for key in key_order], dtype=np.int64)
+        self._sizes = np.array([len(row) for row in rows], dtype=np.int64)
+        self._indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(self._sizes, out=self._indptr[1:])
+        self._key_ids = np.fromiter(itertools.chain.from_iterable(rows), dtype=np.int64,
+                                    count=int(self._indptr[-1]))
+        # 条目编号 * 键数 + 键编号，整体升序，用于二分查找某个条目是否含有某个键
+        self._codes = np.repeat(np.arange(len(rows), dtype=np.int64), self._sizes) * self._num_keys + self._key_ids
+
+    def similar_pairs(self, min_dice: float,
+                      pair_filter: Optional[Callable[[np.ndarray, np.ndarray], np.ndarray]] = None
+                      ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """求分块键集合的Dice系数不低于阈值的全部条目对，见 iter_similar_pairs
+
+        Returns:
+            (left, right, dice) 三个等长数组，left < right，按 (left, right) 升序
+        """
+        batches = list(self.iter_similar_pairs(min_dice, pair_filter))
+        if not batches:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+        left, right, dice = zip(*batches)
+        return np.concatenate(left), np.concatenate(right), np.concatenate(dice)
+
+    def iter_similar_pairs(self, min_dice: float,
+                           pair_filter: Optional[Callable[[np.ndarray, np.ndarray], np.ndarray]] = None
+                           ) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """按批求分块键集合的Dice系数不低于阈值的条目对
+
+        使用前缀过滤：分块键按全局频率升序排列，Dice >= min_dice 的两个集合
+        必然在各自的前缀中共享一个键，因此只需在前缀倒排表内配对，高频键几乎不参与比较。
+        候选配对、长度过滤和精确重叠数都按批用numpy计算，不逐对进入Python循环；
+        每批只展开一段连续条目的候选，内存占用与条目数无关。
+
+        Args:
+            min_dice: Dice系数阈值 (0, 1]
+            pair_filter: 可选的候选过滤函数（例如调用方相似度的上界），在计算重叠数之前应用，返回布尔掩码
+
+        Returns:
+            (left, right, dice) 三个等长数组的迭代器，left < right，批内按 (left, right) 升序，批之间 left 递增
+        """
+        if not 0 < min_dice <= 1:
+            raise ValueError("min_dice must be in (0, 1]")
+        self._build_matrix()
+        sizes = self._sizes
+        length_ratio = min_dice / (2 - min_dice)
+
+        # 每个条目的前缀：去掉最后 (最小重叠数 - 1) 个高频键
+        min_overlap = np.maximum(1, np.ceil(length_ratio * sizes)).astype(np.int64)
+        prefix_len = np.where(sizes > 0, sizes - min_overlap + 1, 0)
+        positions = np.arange(self._key_ids.size) - np.repeat(self._indptr[:-1], sizes)
+        in_prefix = positions < np.repeat(prefix_len, sizes)
+
+        def candidate_filter(left, right):
+            # 集合大小相差过大时Dice不可能达到阈值
+            left_sizes, right_sizes = sizes[left], sizes[right]
+            keep = (left_sizes >= length_ratio * right_sizes) & (right_sizes >= length_ratio * left_sizes)
+            if pair_filter is not None:
+                keep &= pair_filter(left, right)
+            return keep
+
+        for left, right, prefix_overlap in self._prefix_pairs(in_prefix, candidate_filter):
+            overlap = prefix_overlap + self._suffix_overlap(left, right, prefix_len)
+            dice = 2 * overlap / np.maximum(1, sizes[left] + sizes[right])
+            matched = dice >= min_dice
+            yield left[matched], right[matched], dice[matched]
+
+    def _prefix_pairs(self, in_prefix: np.ndarray,
+                      pair_filter: Optional[Callable[[np.ndarray, np.ndarray], np.ndarray]] = None
+                      ) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """在前缀倒排表内批量配对，按批产出去重后的候选 (left, right, 共享的前缀键数)，left < right
+
+        每个条目与同一前缀键下编号更大的条目配对，同一对只会由 left 产生，
+        因此按 left 的连续区间分批时，批内去重即可。
+
+        Args:
+            in_prefix: CSR中每个元素是否属于所在条目的前缀
+            pair_filter: 可选的候选过滤函数，返回布尔掩码
+        """
+        num_items = len(self.items)
+        entry_ids = np.flatnonzero(in_prefix)
+        # CSR顺序，条目编号不减
+        entry_rows = np.repeat(np.arange(num_items, dtype=np.int64), self._sizes)[entry_ids]
+        entry_keys = self._key_ids[entry_ids]
+        if not entry_ids.size:
+            return
+
+        # 按 (键, 条目) 排序后，同一个键的前缀条目相邻；每个条目与同组中排在它后面的条目配对
+        order = np.lexsort((entry_rows, entry_keys))
+        sorted_rows, sorted_keys = entry_rows[order], entry_keys[order]
+        is_last = np.ones(sorted_keys.size, dtype=bool)
+        is_last[:-1] = sorted_keys[:-1] != sorted_keys[1:]
+        group_last = np.minimum.accumulate(
+            np.where(is_last, np.arange(sorted_keys.size), sorted_keys.size)[::-1])[::-1]
+        sorted_position = np.empty(order.size, dtype=np.int64)
+        sorted_position[order] = np.arange(order.size)
+        partners = (group_last - np.arange(sorted_keys.size))[sorted_position]
+
+        # 按条目的候选数分批，批的边界落在条目之间
+        row_cumulative = np.cumsum(np.bincount(entry_rows, weights=partners, minlength=num_items))
+        row_bounds = np.searchsorted(row_cumulative, np.arange(0, row_cumulative[-1], self.PAIR_BATCH_SIZE),
+                                     side='right')
+        row_bounds = np.unique(np.concatenate([[0], row_bounds, [num_items]]))
+        entry_bounds = np.searchsorted(entry_rows, row_bounds)
+        for start, end in zip(entry_bounds[:-1], entry_bounds[1:]):
+            counts = partners[start:end]
+            if not counts.any():
+                continue
+            left = np.repeat(entry_rows[start:end], counts)
+            right = sorted_rows[_segment_indices(sorted_position[start:end] + 1, counts)]
+            if pair_filter is not None:
+                keep = pair_filter(left, right)
+                left, right = left[keep], right[keep]
+            # 排序去重（同一对在每个共享的前缀键上各产生一次，出现次数即共享的前缀键数）
+            codes = np.sort(left * num_items + right)
+            if not codes.size:
+                continue
+            is_first = np.ones(codes.size, dtype=bool)
+            is_first[1:] = codes[1:] != codes[:-1]
+            starts = np.flatnonzero(is_first)
+            codes = codes[starts]
+            yield codes // num_items, codes % num_items, np.diff(np.append(starts, is_first.size))
+
+    def _suffix_overlap(self, left: np.ndarray, right: np.ndarray, prefix_len: np.ndarray) -> np.ndarray:
+        """批量计算条目对在前缀之外共享的分块键个数
+
+        共享的键分为三类：都在两者前缀中（配对时已计数）、在 left 的后缀中、在 left 的前缀和 right 的后缀中。
+        后缀只有 (最小重叠数 - 1) 个键，把后缀的键在全体 (条目, 键) 编码上二分查找，比展开整个条目少得多。
+        """
+        result = np.zeros(left.size, dtype=np.int64)
+        suffix_len = self._sizes - prefix_len
+        batch = max(1, self.PAIR_BATCH_SIZE // max(1, int(suffix_len.mean()) if suffix_len.size else 1))
+        for start in range(0, left.size, batch):
+            batch_left, batch_right = left[start:start + batch], right[start:start + batch]
+            for source, target, target_limit in ((batch_left, batch_right, None),
+                                                 (batch_right, batch_left, prefix_len)):
+                counts = suffix_len[source]
+                pair_ids = np.repeat(np.arange(source.size), counts)
+                entries = _segment_indices(self._indptr[:-1][source] + prefix_len[source], counts)
+                target_rows = target[pair_ids]
+                targets = target_rows * self._num_keys + self._key_ids[entries]
+                positions = np.searchsorted(self._codes, targets)
+                positions[positions == self._codes.size] = 0
+                found = self._codes[positions] == targets
+                if target_limit is not None:
+                    # 只计在 target 前缀中的键
+                    found &= positions - self._indptr[:-1][target_rows] < target_limit[target_rows]
+                result[start:start + batch] += np.bincount(pair_ids[found], minlength=source.size)
+        return result
+
+
+def _segment_indices(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """把若干段 [start, start + length) 展开成一个下标数组"""
+    total = int(lengths.sum())
+    offsets = np.arange(total, dtype=np.int64) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return np.repeat(np.asarray(starts, dtype=np.int64), lengths) + offsets
+
+
+# 批量计算 SequenceMatcher 相似度时每批展开的矩阵元素数上限
+RATIO_BATCH_CELLS = 1 << 22
+# difflib 对长度不小于该值的 b 启用 autojunk 启发式，这类条目对仍逐对交给 SequenceMatcher
+_AUTOJUNK_MIN_LENGTH = 200
+
+
+def sequence_ratios(items: Sequence[str], left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """批量计算条目对的 difflib.SequenceMatcher(None, items[left], items[right]).ratio()
+
+    结果与 SequenceMatcher 完全一致：先对整批条目对用numpy求公共子串长度矩阵，
+    再按 find_longest_match 的规则（最长、a 中最靠前、b 中最靠前）批量递归拆分区间，
+    累加匹配字符数 M，ratio = 2M / (len(a) + len(b))。
+
+    Args:
+        items: 条目列表
+        left: 条目下标数组（作为 a）
+        right: 条目下标数组（作为 b）
+
+    Returns:
+        相似度数组 [0, 1]
+    """
+    left = np.asarray(left, dtype=np.int64)
+    right = np.asarray(right, dtype=np.int64)
+    lengths = np.fromiter((len(item) for item in items), dtype=np.int64, count=len(items))
+    left_lengths, right_lengths = lengths[left], lengths[right]
+    total = left_lengths + right_lengths
+    ratios = np.ones(left.size, dtype=np.float64)
+
+    fallback = right_lengths >= _AUTOJUNK_MIN_LENGTH
+    for n in np.flatnonzero(fallback).tolist():
+        ratios[n] = SequenceMatcher(None, items[left[n]], items[right[n]]).ratio()
+
+    vectorized = np.flatnonzero(~fallback & (total > 0))
+    if vectorized.size:
+        # 只编码本次用到的条目，codes 的行号为条目在 used 中的位置
+        used = np.unique(np.concatenate([left[vectorized], right[vectorized]]))
+        codes = np.full((used.size, max(1, int(lengths[used].max()))), -1, dtype=np.int32)
+        for n, item_index in enumerate(used.tolist()):
+            item = items[item_index]
+            codes[n, :len(item)] = np.frombuffer(item.encode('utf-32-le'), dtype=np.int32)
+        left_rows = np.searchsorted(used, left)
+        right_rows = np.searchsorted(used, right)
+
+        # 按较长一方的长度升序分批，减少补齐的元素；批内最后一对最长，决定矩阵大小
+        widths = np.maximum(left_lengths, right_lengths)
+        order = vectorized[np.argsort(widths[vectorized], kind='stable')]
+        start = 0
+        while start < order.size:
+            end = min(order.size, start + max(1, RATIO_BATCH_CELLS // int(widths[order[start]]) ** 2))
+            while end - start > 1 and (end - start) * int(widths[order[end - 1]]) ** 2 > RATIO_BATCH_CELLS:
+                end = start + (end - start) // 2
+            batch = order[start:end]
+            width_a, width_b = int(left_lengths[batch].max()), int(right_lengths[batch].max())
+            matched = _matched_characters(codes[left_rows[batch], :max(1, width_a)],
+                                          codes[right_rows[batch], :max(1, width_b)],
+                                          left_lengths[batch], right_lengths[batch])
+            ratios[batch] = 2.0 * matched / total[batch]
+            start = end
+    return ratios
+
+
+def _matched_characters(a: np.ndarray, b: np.ndarray, a_lengths: np.ndarray, b_lengths: np.ndarray) -> np.ndarray:
+    """批量求 SequenceMatcher 匹配块的字符总数
+
+    a、b 为按码位编码、以负数补齐的二维数组（每行一个条目对）。
+    run[p, i, j] 是 a[p] 以 i 结尾、b[p] 以 j 结尾的最长公共子串长度；
+    限定在区间 [alo, ahi) x [blo, bhi) 内时，长度为 min(run, i - alo + 1, j - blo + 1)。
+    区间内按行优先第一个取到最大值的位置即 find_longest_match 的结果，再拆分出左右两个区间。
+    """
+    pairs, width_a = a.shape
+    width_b = b.shape[1]
+    dtype = np.int8 if max(width_a, width_b) < np.iinfo(np.int8).max else np.int16
+    limit = np.iinfo(dtype).max
+
+    # 两侧补齐的值不同，补齐位置不会匹配
+    equal = a[:, :, None] == np.where(b < 0, -2, b)[:, None, :]
+    run = np.zeros((pairs, width_a, width_b), dtype=dtype)
+    run[:, 0, :] = equal[:, 0, :]
+    for i in range(1, width_a):
+        run[:, i, 0] = equal[:, i, 0]
+        np.multiply(run[:, i - 1, :-1] + 1, equal[:, i, 1:], out=run[:, i, 1:], casting='unsafe')
+
+    # 第一轮的区间是整个条目对，补齐位置都是0，直接取最大值
+    flat = run.reshape(pairs, -1)
+    position = flat.argmax(axis=1)
+    size = flat[np.arange(pairs), position].astype(np.int64)
+    matched = size.copy()
+
+    pair = np.arange(pairs)
+    a_low, a_high = np.zeros(pairs, dtype=np.int64), np.asarray(a_lengths, dtype=np.int64)
+    b_low, b_high = np.zeros(pairs, dtype=np.int64), np.asarray(b_lengths, dtype=np.int64)
+    a_index, b_index = np.arange(width_a)[None, :], np.arange(width_b)[None, :]
+    while True:
+        found = size > 0
+        pair, position, size = pair[found], position[found], size[found]
+        a_low, a_high, b_low, b_high = a_low[found], a_high[found], b_low[found], b_high[found]
+        i = position // width_b - size + 1
+        j = position % width_b - size + 1
+
+        # 匹配块左侧和右侧的剩余区间
+        has_left = (a_low < i) & (b_low < j)
+        has_right = (i + size < a_high) & (j + size < b_high)
+        pair = np.concatenate([pair[has_left], pair[has_right]])
+        if not pair.size:
+            return matched
+        a_low, a_high = np.concatenate([a_low[has_left], (i + size)[has_right]]), np.concatenate([i[has_left], a_high[has_right]])
+        b_low, b_high = np.concatenate([b_low[has_left], (j + size)[has_right]]), np.concatenate([j[has_left], b_high[has_right]])
+
+        a_limit = np.where(a_index < a_high[:, None], a_index - a_low[:, None] + 1, 0).clip(0, limit).astype(dtype)
+        b_limit = np.where(b_index < b_high[:, None], b_index - b_low[:, None] + 1, 0).clip(0, limit).astype(dtype)
+        bounded = np.minimum(run[pair], a_limit[:, :, None])
+        np.minimum(bounded, b_limit[:, None, :], out=bounded)
+        flat = bounded.reshape(pair.size, -1)
+        position = flat.argmax(axis=1)
+        size = flat[np.arange(pair.size), position].astype(np.int64)
+        np.add.at(matched, pair, size)
@@ -529,24 +529,12 @@ async def cleanup_old_data(
         }
         
         if not dry_run:
-            # 实际清理数据
-            original_count = len(usage_monitor.usage_records)
-            
-            # 过滤保留最近的记录
-            usage_monitor.usage_records = [
-                record for record in usage_monitor.usage_records
-                if record.timestamp >= cutoff_date
-            ]
-            
+            # 实际清理数据，保留最近的记录
+            cleanup_stats["cleaned_records"] = usage_monitor.cleanup_records_before(cutoff_date)
             cleanup_stats["usage_records_after"] = len(usage_monitor.usage_records)
-            cleanup_stats["cleaned_records"] = original_count - len(usage_monitor.usage_records)
         else:
             # 试运行，只统计
-            records_to_clean = sum(
-                1 for record in usage_monitor.usage_records
-                if record.timestamp < cutoff_date
-            )
-            cleanup_stats["records_to_clean"] = records_to_clean
+            cleanup_stats["records_to_clean"] = usage_monitor.count_records_before(cutoff_date)
         
         return {
             "success": True,
@@ -566,7 +554,6 @@ async def clear_cache():
     try:
         # 清理使用监控器的缓存
         usage_monitor.metrics_cache.clear()
-        usage_monitor.windowed_stats.clear()
         
         # 重置实时统计
         usage_monitor.realtime_stats = {
@@ -5,9 +5,11 @@
 
 import asyncio
 import logging
-from typing import Dict, Any, List, Optional, Union
+import math
+from array import array
+from typing import Dict, Any, List, Optional, Union, Callable, Iterable
 from datetime import datetime, timedelta
-from collections import defaultdict, deque
+from collections import defaultdict
 import time
 import json
 from dataclasses import dataclass, asdict
@@ -65,12 +67,338 @@ class MetricSnapshot:
     window: TimeWindow
 
 
+# 预聚合的时间粒度（秒），从细到粗
+MINUTE_SECONDS = 60
+HOUR_SECONDS = 3600
+DAY_SECONDS = 86400
+ROLLUP_RESOLUTIONS = (MINUTE_SECONDS, HOUR_SECONDS, DAY_SECONDS)
+# 按格子分开聚合的粒度；分钟桶只保存总计，按格子的分钟桶条目数接近记录数，内存占用反而超过原始记录
+CELL_RESOLUTIONS = (HOUR_SECONDS, DAY_SECONDS)
+
+# 聚合值的下标：[调用数, token数, 费用, 延迟合计, 错误数]
+CALLS, TOKENS, COST, LATENCY_SUM, ERRORS = range(5)
+AGG_SIZE = 5
+# 缓存的筛选条件数
+MATCHING_CELLS_CACHE_SIZE = 256
+
+
+class CellAggregates:
+    """一个桶内按格子编号保存的聚合值
+
+    每个格子的5个聚合值连续存放在同一个 array('d') 中，格子编号到位置的映射保存在 slots 中，
+    比每个格子一个元组键加一个 list 节省一半以上的内存。调用数减为0的格子清零后保留位置，遍历时跳过
+    """
+
+    __slots__ = ("slots", "values")
+
+    def __init__(self):
+        self.slots: Dict[int, int] = {}
+        self.values = array('d')
+
+    def add(self, cell_id: int, values: tuple):
+        slot = self.slots.get(cell_id)
+        if slot is None:
+            self.slots[cell_id] = len(self.values)
+            self.values.extend(values)
+            return
+        aggs = self.values
+        for i in range(AGG_SIZE):
+            aggs[slot + i] += values[i]
+        if aggs[slot + CALLS] <= 0:
+            # 最后一条记录被移除，清零（同时消除浮点累加误差）
+            for i in range(AGG_SIZE):
+                aggs[slot + i] = 0.0
+
+    def items(self, cell_ids: Optional[Iterable[int]] = None):
+        """遍历 (格子编号, [调用数, token数, 费用, 延迟合计, 错误数])，跳过没有记录的格子；
+        指定 cell_ids 时只查找这些格子"""
+        aggs = self.values
+        if cell_ids is None:
+            pairs = self.slots.items()
+        else:
+            pairs = ((cell_id, self.slots.get(cell_id)) for cell_id in cell_ids)
+        for cell_id, slot in pairs:
+            if slot is not None and aggs[slot + CALLS] > 0:
+                yield cell_id, [int(aggs[slot + CALLS]), int(aggs[slot + TOKENS]), aggs[slot + COST],
+                                aggs[slot + LATENCY_SUM], int(aggs[slot + ERRORS])]
+
+
+class UsageStore:
+    """列式环形缓冲区 + 按分钟/小时/天预聚合的使用统计
+
+    - 记录按列保存在定长的 array 中，写满后覆盖最旧的记录；用户、提供商、模型、调用类型字典编码为整数
+    - 每条记录写入时累加到所在分钟、小时和天的桶中，每个桶保存总计，小时和天的桶还保存按
+      (用户, 提供商, 模型, 调用类型) 分格的聚合值（格子编码为整数编号，见 CellAggregates）；记录被覆盖或清理时从桶中减去，
+      预聚合结果始终与缓冲区中的记录一致
+    - 时间范围查询只读取范围内的桶（尽量用粗粒度的桶），总计不足一分钟、按格子不足一小时的首尾部分
+      二分查找后扫描原始记录，开销与时间范围成正比，与记录总数无关
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self._head = 0  # 最旧记录的位置
+        self._size = 0
+
+        self.timestamps = array('d', bytes(8 * self.capacity))
+        self.input_tokens = array('q', bytes(8 * self.capacity))
+        self.output_tokens = array('q', bytes(8 * self.capacity))
+        self.total_tokens = array('q', bytes(8 * self.capacity))
+        self.latency_ms = array('d', bytes(8 * self.capacity))
+        self.cost = array('d', bytes(8 * self.capacity))
+        self.success = array('b', bytes(self.capacity))
+        self.user_ids = array('i', bytes(4 * self.capacity))
+        self.provider_ids = array('i', bytes(4 * self.capacity))
+        self.model_ids = array('i', bytes(4 * self.capacity))
+        self.call_types = array('i', bytes(4 * self.capacity))
+        # 很少有值的字段不做列式存储
+        self.extras: List[Optional[tuple]] = [None] * self.capacity
+
+        self._strings: List[str] = []
+        self._string_codes: Dict[str, int] = {}
+        # 格子 (用户, 提供商, 模型, 调用类型) 的编号，不同格子的数量远小于记录数
+        self._cells: List[tuple] = []
+        self._cell_ids: Dict[tuple, int] = {}
+        # {筛选条件: (已检查的格子数, [符合条件的格子编号])}，格子只增不减，新增格子后增量补充
+        self._matching_cells: Dict[tuple, tuple] = {}
+
+        # {粒度: {桶开始时间: 各格子的聚合值}}（只有小时和天）和 {粒度: {桶开始时间: 总计}}
+        self.rollups: Dict[int, Dict[int, CellAggregates]] = {r: {} for r in CELL_RESOLUTIONS}
+        self.rollup_totals: Dict[int, Dict[int, list]] = {r: {} for r in ROLLUP_RESOLUTIONS}
+        self.model_totals: Dict[tuple, list] = {}
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self):
+        for i in range(self._size):
+            yield self.record((self._head + i) % self.capacity)
+
+    def encode(self, value: str) -> int:
+        code = self._string_codes.get(value)
+        if code is None:
+            code = len(self._strings)
+            self._strings.append(value)
+            self._string_codes[value] = code
+        return code
+
+    def code_of(self, value: str) -> Optional[int]:
+        """返回已有字符串的编码，没有出现过时返回None"""
+        return self._string_codes.get(value)
+
+    def decode(self, code: int) -> str:
+        return self._strings[code]
+
+    def append(self, record: UsageRecord):
+        """追加记录，缓冲区已满时先移除最旧的记录"""
+        if self._size == self.capacity:
+            self.drop_oldest(1)
+
+        pos = (self._head + self._size) % self.capacity
+        timestamp = record.timestamp.timestamp()
+        if self._size and timestamp < self.timestamps[(pos - 1) % self.capacity]:
+            # 保持时间戳单调不减（系统时钟回拨时），时间范围查询依赖二分查找
+            timestamp = self.timestamps[(pos - 1) % self.capacity]
+
+        self.timestamps[pos] = timestamp
+        self.input_tokens[pos] = record.input_tokens
+        self.output_tokens[pos] = record.output_tokens
+        self.total_tokens[pos] = record.total_tokens
+        self.latency_ms[pos] = record.latency_ms
+        self.cost[pos] = record.cost
+        self.success[pos] = 1 if record.success else 0
+        self.user_ids[pos] = self.encode(record.user_id)
+        self.provider_ids[pos] = self.encode(record.provider_id)
+        self.model_ids[pos] = self.encode(record.model_id)
+        self.call_types[pos] = self.encode(record.call_type)
+        extras = (record.error_type, record.error_message, record.request_id, record.session_id)
+        self.extras[pos] = extras if any(extras) else None
+        self._size += 1
+        self._apply(pos, 1)
+
+    def drop_oldest(self, count: int) -> int:
+        """移除最旧的 count 条记录，返回实际移除的条数"""
+        count = min(count, self._size)
+        for _ in range(count):
+            self._apply(self._head, -1)
+            self.extras[self._head] = None
+            self._head = (self._head + 1) % self.capacity
+            self._size -= 1
+        return count
+
+    def clear(self):
+        self.drop_oldest(self._size)
+
+    def _apply(self, pos: int, sign: int):
+        """把一条记录累加到（sign=-1 时从中减去）所在的分钟、小时、天的桶和模型汇总"""
+        timestamp = self.timestamps[pos]
+        cell = (self.user_ids[pos], self.provider_ids[pos], self.model_ids[pos], self.call_types[pos])
+        values = (sign, sign * self.total_tokens[pos], sign * self.cost[pos], sign * self.latency_ms[pos],
+                  0 if self.success[pos] else sign)
+
+        cell_id = self._cell_ids.get(cell)
+        if cell_id is None:
+            cell_id = self._cell_ids[cell] = len(self._cells)
+            self._cells.append(cell)
+
+        for resolution in ROLLUP_RESOLUTIONS:
+            bucket_start = int(timestamp // resolution) * resolution
+            totals = self.rollup_totals[resolution]
+            self._add(totals, bucket_start, values)
+            if resolution not in self.rollups:
+                continue
+            buckets = self.rollups[resolution]
+            if bucket_start not in totals:
+                # 桶内的记录已全部移除
+                buckets.pop(bucket_start, None)
+                continue
+            cells = buckets.get(bucket_start)
+            if cells is None:
+                cells = buckets[bucket_start] = CellAggregates()
+            cells.add(cell_id, values)
+        self._add(self.model_totals, (cell[1], cell[2]), values)
+
+    @staticmethod
+    def _add(aggs: Dict[Any, list], key: Any, values: tuple):
+        agg = aggs.get(key)
+        if agg is None:
+            aggs[key] = list(values)
+            return
+        agg[CALLS] += values[CALLS]
+        agg[TOKENS] += values[TOKENS]
+        agg[COST] += values[COST]
+        agg[LATENCY_SUM] += values[LATENCY_SUM]
+        agg[ERRORS] += values[ERRORS]
+        if agg[CALLS] <= 0:
+            # 最后一条记录被移除，删除空的聚合（同时消除浮点累加误差）
+            del aggs[key]
+
+    def _position(self, index: int) -> int:
+        return (self._head + index) % self.capacity
+
+    def bisect(self, timestamp: float) -> int:
+        """返回第一条时间戳 >= timestamp 的记录序号（0为最旧的记录）"""
+        lo, hi = 0, self._size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.timestamps[self._position(mid)] < timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def positions(self, start: float, end: float):
+        """时间范围 [start, end) 内记录的位置"""
+        for index in range(self.bisect(start), self.bisect(end)):
+            yield self._position(index)
+
+    def record(self, pos: int) -> UsageRecord:
+        error_type, error_message, request_id, session_id = self.extras[pos] or (None, None, None, None)
+        return UsageRecord(
+            timestamp=datetime.fromtimestamp(self.timestamps[pos]),
+            user_id=self._strings[self.user_ids[pos]],
+            provider_id=self._strings[self.provider_ids[pos]],
+            model_id=self._strings[self.model_ids[pos]],
+            call_type=self._strings[self.call_types[pos]],
+            input_tokens=self.input_tokens[pos],
+            output_tokens=self.output_tokens[pos],
+            total_tokens=self.total_tokens[pos],
+            latency_ms=self.latency_ms[pos],
+            cost=self.cost[pos],
+            success=bool(self.success[pos]),
+            error_type=error_type,
+            error_message=error_message,
+            request_id=request_id,
+            session_id=session_id
+        )
+
+    def _segments(self, start: float, end: float, resolutions: tuple = ROLLUP_RESOLUTIONS,
+                  level: Optional[int] = None) -> List[tuple]:
+        """把时间范围 [start, end) 拆分为 (粒度, 开始, 结束) 的片段，中间部分用 resolutions 中尽量粗的桶，
+        首尾不足最细粒度的部分粒度为None，需要扫描原始记录"""
+        if level is None:
+            level = len(resolutions) - 1
+        if start >= end:
+            return []
+        if level < 0:
+            return [(None, start, end)]
+        resolution = resolutions[level]
+        inner_start = -(-start // resolution) * resolution
+        inner_end = end // resolution * resolution
+        if inner_start >= inner_end:
+            return self._segments(start, end, resolutions, level - 1)
+        return (self._segments(start, inner_start, resolutions, level - 1)
+                + [(resolution, int(inner_start), int(inner_end))]
+                + self._segments(inner_end, end, resolutions, level - 1))
+
+    def collect(self, start: float, end: float, visit: Callable[[tuple, list], None],
+                expected: Optional[List[tuple]] = None):
+        """按格子访问时间范围 [start, end) 内的聚合值，不足一小时的首尾部分扫描原始记录
+
+        expected 为格子中的 (下标, 编码) 筛选条件，指定时桶内只查找符合条件的格子
+        （扫描原始记录的部分不做筛选，由 visit 判断）
+        """
+        cell_ids = self.matching_cells(expected) if expected else None
+        for resolution, segment_start, segment_end in self._segments(start, end, CELL_RESOLUTIONS):
+            if resolution is None:
+                for pos in self.positions(segment_start, segment_end):
+                    visit(*self._single(pos))
+                continue
+            buckets = self.rollups[resolution]
+            for bucket_start in range(segment_start, segment_end, resolution):
+                cells = buckets.get(bucket_start)
+                if cells is not None:
+                    for cell_id, agg in cells.items(cell_ids):
+                        visit(self._cells[cell_id], agg)
+
+    def matching_cells(self, expected: List[tuple]) -> List[int]:
+        """符合筛选条件 [(下标, 编码)] 的格子编号，结果按筛选条件缓存（时间序列的每个时间点都会用到）"""
+        key = tuple(expected)
+        checked, cell_ids = self._matching_cells.get(key, (0, None))
+        if cell_ids is None:
+            if len(self._matching_cells) >= MATCHING_CELLS_CACHE_SIZE:
+                self._matching_cells.clear()
+            cell_ids = []
+        if checked < len(self._cells):
+            for cell_id in range(checked, len(self._cells)):
+                cell = self._cells[cell_id]
+                if all(cell[index] == code for index, code in expected):
+                    cell_ids.append(cell_id)
+            self._matching_cells[key] = (len(self._cells), cell_ids)
+        return cell_ids
+
+    def total(self, start: float, end: float) -> list:
+        """时间范围 [start, end) 内的总计 [调用数, token数, 费用, 延迟合计, 错误数]"""
+        result = [0, 0, 0.0, 0.0, 0]
+
+        def add(values):
+            for i, value in enumerate(values):
+                result[i] += value
+
+        for resolution, segment_start, segment_end in self._segments(start, end):
+            if resolution is None:
+                for pos in self.positions(segment_start, segment_end):
+                    add(self._single(pos)[1])
+                continue
+            totals = self.rollup_totals[resolution]
+            for bucket_start in range(segment_start, segment_end, resolution):
+                agg = totals.get(bucket_start)
+                if agg:
+                    add(agg)
+        return result
+
+    def _single(self, pos: int) -> tuple:
+        """单条记录的格子和聚合值"""
+        cell = (self.user_ids[pos], self.provider_ids[pos], self.model_ids[pos], self.call_types[pos])
+        return cell, [1, self.total_tokens[pos], self.cost[pos], self.latency_ms[pos],
+                      0 if self.success[pos] else 1]
+
+
 class UsageMonitor:
     """使用监控器"""
     
     def __init__(self, max_records: int = 100000):
         self.max_records = max_records
-        self.usage_records: deque = deque(maxlen=max_records)
+        self.usage_records = UsageStore(max_records)
         self.metrics_cache: Dict[str, List[MetricSnapshot]] = defaultdict(list)
         
         # 实时统计缓存
@@ -83,22 +411,18 @@ class UsageMonitor:
             "last_updated": datetime.now()
         }
         
-        # 按时间窗口的统计缓存
-        self.windowed_stats: Dict[TimeWindow, Dict[str, Any]] = {
-            TimeWindow.MINUTE: defaultdict(lambda: defaultdict(float)),
-            TimeWindow.HOUR: defaultdict(lambda: defaultdict(float)),
-            TimeWindow.DAY: defaultdict(lambda: defaultdict(float))
-        }
-        
-        # 启动后台任务
+        # 启动后台任务（模块导入时没有运行中的事件循环，推迟到第一次记录时启动）
         self._background_tasks = []
         self._start_background_tasks()
     
     def _start_background_tasks(self):
         """启动后台任务"""
-        # 定期清理过期数据
-        cleanup_task = asyncio.create_task(self._cleanup_expired_data())
-        self._background_tasks.append(cleanup_task)
+        if self._background_tasks:
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return
         
         # 定期计算聚合指标
         aggregation_task = asyncio.create_task(self._calculate_aggregated_metrics())
@@ -134,15 +458,14 @@ class UsageMonitor:
                 session_id=usage_data.get("session_id")
             )
             
-            # 添加到记录队列
+            self._start_background_tasks()
+            
+            # 添加到列式存储，同时更新分钟/小时预聚合
             self.usage_records.append(record)
             
             # 更新实时统计
             await self._update_realtime_stats(record)
             
-            # 更新窗口统计
-            await self._update_windowed_stats(record)
-            
             logger.debug(f"使用记录已保存: {record.provider_id}:{record.model_id}")
             return True
             
@@ -172,46 +495,6 @@ class UsageMonitor:
         except Exception as e:
             logger.error(f"更新实时统计失败: {e}")
     
-    async def _update_windowed_stats(self, record: UsageRecord):
-        """更新窗口统计"""
-        try:
-            # 生成时间窗口键
-            now = record.timestamp
-            
-            windows = {
-                TimeWindow.MINUTE: now.replace(second=0, microsecond=0),
-                TimeWindow.HOUR: now.replace(minute=0, second=0, microsecond=0),
-                TimeWindow.DAY: now.replace(hour=0, minute=0, second=0, microsecond=0)
-            }
-            
-            # 生成统计键
-            keys = [
-                "global",  # 全局统计
-                f"provider:{record.provider_id}",  # 按提供商
-                f"model:{record.provider_id}:{record.model_id}",  # 按模型
-                f"user:{record.user_id}",  # 按用户
-                f"type:{record.call_type}"  # 按调用类型
-            ]
-            
-            # 更新各个时间窗口的统计
-            for window, window_time in windows.items():
-                window_key = window_time.isoformat()
-                
-                for key in keys:
-                    stats = self.windowed_stats[window][window_key][key]
-                    
-                    # 更新各项指标
-                    stats["calls"] = stats.get("calls", 0) + 1
-                    stats["tokens"] = stats.get("tokens", 0) + record.total_tokens
-                    stats["cost"] = stats.get("cost", 0.0) + record.cost
-                    stats["latency_sum"] = stats.get("latency_sum", 0.0) + record.latency_ms
-                    
-                    if not record.success:
-                        stats["errors"] = stats.get("errors", 0) + 1
-            
-        except Exception as e:
-            logger.error(f"更新窗口统计失败: {e}")
-    
     async def get_usage_stats(
         self,
         user_id: Optional[str] = None,
@@ -247,25 +530,15 @@ class UsageMonitor:
                 else:
                     start_time = end_time - timedelta(days=7)
             
-            # 筛选记录
-            filtered_records = []
-            for record in self.usage_records:
-                if record.timestamp < start_time or record.timestamp > end_time:
-                    continue
-                
-                if user_id and record.user_id != user_id:
-                    continue
-                
-                if provider_id and record.provider_id != provider_id:
-                    continue
-                
-                if model_id and record.model_id != model_id:
-                    continue
-                
-                filtered_records.append(record)
+            # 读取时间范围内的预聚合数据，按格子筛选
+            start_ts = start_time.timestamp()
+            # 结束时间包含在范围内
+            end_ts = math.nextafter(end_time.timestamp(), math.inf)
+            expected = self._filter_codes(user_id, provider_id, model_id)
+            cells = self._aggregate_cells(start_ts, end_ts, expected) if expected is not None else {}
             
             # 计算统计指标
-            if not filtered_records:
+            if not cells:
                 return {
                     "total_calls": 0,
                     "total_tokens": 0,
@@ -278,12 +551,12 @@ class UsageMonitor:
                 }
             
             # 基础统计
-            total_calls = len(filtered_records)
-            total_tokens = sum(r.total_tokens for r in filtered_records)
-            total_cost = sum(r.cost for r in filtered_records)
-            avg_latency = sum(r.latency_ms for r in filtered_records) / total_calls
-            error_count = sum(1 for r in filtered_records if not r.success)
-            error_rate = error_count / total_calls if total_calls > 0 else 0.0
+            totals = self._sum_cells(cells.values())
+            total_calls = totals[CALLS]
+            total_tokens = totals[TOKENS]
+            total_cost = totals[COST]
+            avg_latency = totals[LATENCY_SUM] / total_calls
+            error_rate = totals[ERRORS] / total_calls if total_calls > 0 else 0.0
             
             # 计算吞吐量（每分钟调用数）
             time_span_minutes = (end_time - start_time).total_seconds() / 60
@@ -291,11 +564,11 @@ class UsageMonitor:
             
             # 时间序列数据
             time_series = await self._generate_time_series(
-                filtered_records, time_window, start_time, end_time
+                expected, time_window, start_time, end_time
             )
             
             # 分类统计
-            breakdown = await self._generate_breakdown(filtered_records)
+            breakdown = await self._generate_breakdown(cells)
             
             return {
                 "total_calls": total_calls,
@@ -317,9 +590,58 @@ class UsageMonitor:
             logger.error(f"获取使用统计失败: {e}")
             raise
     
+    def _filter_codes(
+        self,
+        user_id: Optional[str] = None,
+        provider_id: Optional[str] = None,
+        model_id: Optional[str] = None
+    ) -> Optional[List[tuple]]:
+        """把筛选条件转换为格子 (用户, 提供商, 模型, 调用类型) 中的 (下标, 编码)，
+        筛选值没有出现过（不可能有记录）时返回None"""
+        expected = []
+        for index, value in ((0, user_id), (1, provider_id), (2, model_id)):
+            if value:
+                code = self.usage_records.code_of(value)
+                if code is None:
+                    return None
+                expected.append((index, code))
+        return expected
+    
+    def _aggregate_cells(self, start_ts: float, end_ts: float, expected: List[tuple]) -> Dict[tuple, list]:
+        """汇总时间范围 [start_ts, end_ts) 内符合筛选条件的各格子的聚合值"""
+        cells: Dict[tuple, list] = {}
+        
+        def visit(cell: tuple, agg: list):
+            for index, code in expected:
+                if cell[index] != code:
+                    return
+            total = cells.get(cell)
+            if total is None:
+                cells[cell] = list(agg)
+            else:
+                for i, value in enumerate(agg):
+                    total[i] += value
+        
+        self.usage_records.collect(start_ts, end_ts, visit, expected)
+        return cells
+    
+    def _aggregate_total(self, start_ts: float, end_ts: float, expected: List[tuple]) -> list:
+        """时间范围 [start_ts, end_ts) 内符合筛选条件的总计，没有筛选条件时直接读取桶的总计"""
+        if not expected:
+            return self.usage_records.total(start_ts, end_ts)
+        return self._sum_cells(self._aggregate_cells(start_ts, end_ts, expected).values())
+    
+    @staticmethod
+    def _sum_cells(aggs) -> list:
+        totals = [0, 0, 0.0, 0.0, 0]
+        for agg in aggs:
+            for i, value in enumerate(agg):
+                totals[i] += value
+        return totals
+    
     async def _generate_time_series(
         self,
-        records: List[UsageRecord],
+        expected: List[tuple],
         time_window: TimeWindow,
         start_time: datetime,
         end_time: datetime
@@ -341,25 +663,15 @@ class UsageMonitor:
                 time_points.append(current_time)
                 current_time += interval
             
-            # 按时间点聚合数据
+            # 按时间点读取预聚合数据，只包含结束时间之前的记录
+            end_ts = math.nextafter(end_time.timestamp(), math.inf)
             time_series = []
             for time_point in time_points:
                 next_time = time_point + interval
-                
-                # 筛选该时间段的记录
-                period_records = [
-                    r for r in records
-                    if time_point <= r.timestamp < next_time
-                ]
-                
-                if period_records:
-                    calls = len(period_records)
-                    tokens = sum(r.total_tokens for r in period_records)
-                    cost = sum(r.cost for r in period_records)
-                    avg_latency = sum(r.latency_ms for r in period_records) / calls
-                    errors = sum(1 for r in period_records if not r.success)
-                else:
-                    calls = tokens = cost = avg_latency = errors = 0
+                calls, tokens, cost, latency_sum, errors = self._aggregate_total(
+                    time_point.timestamp(), min(next_time.timestamp(), end_ts), expected
+                )
+                avg_latency = latency_sum / calls if calls else 0
                 
                 time_series.append({
                     "timestamp": time_point.isoformat(),
@@ -376,7 +688,7 @@ class UsageMonitor:
             logger.error(f"生成时间序列失败: {e}")
             return []
     
-    async def _generate_breakdown(self, records: List[UsageRecord]) -> Dict[str, Any]:
+    async def _generate_breakdown(self, cells: Dict[tuple, list]) -> Dict[str, Any]:
         """生成分类统计"""
         try:
             breakdown = {
@@ -386,31 +698,19 @@ class UsageMonitor:
                 "by_call_type": defaultdict(lambda: {"calls": 0, "tokens": 0, "cost": 0.0})
             }
             
-            for record in records:
-                # 按提供商
-                provider_stats = breakdown["by_provider"][record.provider_id]
-                provider_stats["calls"] += 1
-                provider_stats["tokens"] += record.total_tokens
-                provider_stats["cost"] += record.cost
-                
-                # 按模型
-                model_key = f"{record.provider_id}:{record.model_id}"
-                model_stats = breakdown["by_model"][model_key]
-                model_stats["calls"] += 1
-                model_stats["tokens"] += record.total_tokens
-                model_stats["cost"] += record.cost
-                
-                # 按用户
-                user_stats = breakdown["by_user"][record.user_id]
-                user_stats["calls"] += 1
-                user_stats["tokens"] += record.total_tokens
-                user_stats["cost"] += record.cost
-                
-                # 按调用类型
-                type_stats = breakdown["by_call_type"][record.call_type]
-                type_stats["calls"] += 1
-                type_stats["tokens"] += record.total_tokens
-                type_stats["cost"] += record.cost
+            decode = self.usage_records.decode
+            for (user_code, provider_code, model_code, type_code), agg in cells.items():
+                provider_id = decode(provider_code)
+                for category, key in (
+                    ("by_provider", provider_id),  # 按提供商
+                    ("by_model", f"{provider_id}:{decode(model_code)}"),  # 按模型
+                    ("by_user", decode(user_code)),  # 按用户
+                    ("by_call_type", decode(type_code))  # 按调用类型
+                ):
+                    stats = breakdown[category][key]
+                    stats["calls"] += agg[CALLS]
+                    stats["tokens"] += agg[TOKENS]
+                    stats["cost"] += agg[COST]
             
             # 转换为普通字典并排序
             result = {}
@@ -443,11 +743,7 @@ class UsageMonitor:
             
             # 计算每分钟调用数（基于最近的记录）
             now = datetime.now()
-            recent_records = [
-                r for r in self.usage_records
-                if (now - r.timestamp).total_seconds() <= 60
-            ]
-            calls_per_minute = len(recent_records)
+            calls_per_minute = len(self.usage_records) - self.usage_records.bisect(now.timestamp() - 60)
             
             return {
                 "total_calls": stats["total_calls"],
@@ -468,47 +764,24 @@ class UsageMonitor:
     async def get_top_models(self, limit: int = 10) -> List[Dict[str, Any]]:
         """获取使用最多的模型"""
         try:
-            model_stats = defaultdict(lambda: {
-                "calls": 0,
-                "tokens": 0,
-                "cost": 0.0,
-                "avg_latency": 0.0,
-                "error_count": 0
-            })
-            
-            # 统计各模型使用情况
-            for record in self.usage_records:
-                model_key = f"{record.provider_id}:{record.model_id}"
-                stats = model_stats[model_key]
-                
-                stats["calls"] += 1
-                stats["tokens"] += record.total_tokens
-                stats["cost"] += record.cost
-                stats["avg_latency"] = (
-                    (stats["avg_latency"] * (stats["calls"] - 1) + record.latency_ms) / stats["calls"]
-                )
-                
-                if not record.success:
-                    stats["error_count"] += 1
-            
-            # 排序并返回前N个
+            # 各模型的汇总随记录写入/移除增量维护
+            decode = self.usage_records.decode
             sorted_models = sorted(
-                model_stats.items(),
-                key=lambda x: x[1]["calls"],
+                self.usage_records.model_totals.items(),
+                key=lambda x: x[1][CALLS],
                 reverse=True
             )
             
             result = []
-            for model_key, stats in sorted_models[:limit]:
-                provider_id, model_id = model_key.split(":", 1)
+            for (provider_code, model_code), stats in sorted_models[:limit]:
                 result.append({
-                    "provider_id": provider_id,
-                    "model_id": model_id,
-                    "calls": stats["calls"],
-                    "tokens": stats["tokens"],
-                    "cost": round(stats["cost"], 4),
-                    "avg_latency": round(stats["avg_latency"], 2),
-                    "error_rate": round(stats["error_count"] / stats["calls"], 4) if stats["calls"] > 0 else 0.0
+                    "provider_id": decode(provider_code),
+                    "model_id": decode(model_code),
+                    "calls": stats[CALLS],
+                    "tokens": stats[TOKENS],
+                    "cost": round(stats[COST], 4),
+                    "avg_latency": round(stats[LATENCY_SUM] / stats[CALLS], 2),
+                    "error_rate": round(stats[ERRORS] / stats[CALLS], 4) if stats[CALLS] > 0 else 0.0
                 })
             
             return result
@@ -517,28 +790,15 @@ class UsageMonitor:
             logger.error(f"获取热门模型失败: {e}")
             return []
     
-    async def _cleanup_expired_data(self):
-        """清理过期数据"""
-        while True:
-            try:
-                await asyncio.sleep(3600)  # 每小时清理一次
-                
-                # 清理过期的窗口统计（保留7天）
-                cutoff_time = datetime.now() - timedelta(days=7)
-                
-                for window in self.windowed_stats:
-                    expired_keys = [
-                        key for key in self.windowed_stats[window]
-                        if datetime.fromisoformat(key) < cutoff_time
-                    ]
-                    
-                    for key in expired_keys:
-                        del self.windowed_stats[window][key]
-                
-                logger.info("过期数据清理完成")
-                
-            except Exception as e:
-                logger.error(f"清理过期数据失败: {e}")
+    def count_records_before(self, cutoff_time: datetime) -> int:
+        """统计早于 cutoff_time 的记录数"""
+        return self.usage_records.bisect(cutoff_time.timestamp())
+    
+    def cleanup_records_before(self, cutoff_time: datetime) -> int:
+        """清理早于 cutoff_time 的记录（同时从预聚合中减去），返回清理的记录数"""
+        cleaned = self.usage_records.drop_oldest(self.count_records_before(cutoff_time))
+        logger.info(f"已清理 {cleaned} 条过期使用记录")
+        return cleaned
     
     async def _calculate_aggregated_metrics(self):
         """计算聚合指标"""
@@ -579,8 +839,10 @@ class UsageMonitor:
                 end_time = datetime.now()
             
             filtered_records = [
-                record for record in self.usage_records
-                if start_time <= record.timestamp <= end_time
+                self.usage_records.record(pos)
+                for pos in self.usage_records.positions(
+                    start_time.timestamp(), math.nextafter(end_time.timestamp(), math.inf)
+                )
             ]
             
             if format_type.lower() == "json":
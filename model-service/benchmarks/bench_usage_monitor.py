@@ -0,0 +1,228 @@
+"""
+UsageMonitor 统计查询基准测试
+对比原实现（deque 保存记录，每次查询线性扫描全部记录）和列式存储 + 分钟/小时/天预聚合的查询耗时，
+并检查两者的查询结果一致
+
+运行:
+    python benchmarks/bench_usage_monitor.py [记录数] [查询重复次数]
+"""
+
+import asyncio
+import os
+import random
+import sys
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.usage_monitor import TimeWindow, UsageMonitor, UsageRecord  # noqa: E402
+
+RECORDS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+REPEAT = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+DAYS = 40
+
+PROVIDERS = {
+    "openai": ["gpt-4o", "gpt-4o-mini", "text-embedding-3-small"],
+    "zhipu": ["glm-4", "glm-4-flash", "embedding-2"],
+    "deepseek": ["deepseek-chat", "deepseek-reasoner"],
+    "qwen": ["qwen-max", "qwen-plus", "text-embedding-v3"],
+}
+USERS = [f"user_{i}" for i in range(200)]
+CALL_TYPES = ["chat", "embedding", "completion"]
+
+
+class LegacyUsageMonitor:
+    """原实现的查询方式：对保存在 deque 中的全部记录线性扫描"""
+
+    def __init__(self, max_records: int):
+        self.usage_records = deque(maxlen=max_records)
+
+    async def get_usage_stats(self, user_id=None, provider_id=None, model_id=None,
+                              time_window=TimeWindow.DAY, start_time=None, end_time=None):
+        filtered_records = [
+            r for r in self.usage_records
+            if start_time <= r.timestamp <= end_time
+            and not (user_id and r.user_id != user_id)
+            and not (provider_id and r.provider_id != provider_id)
+            and not (model_id and r.model_id != model_id)
+        ]
+        if not filtered_records:
+            return {"total_calls": 0}
+
+        total_calls = len(filtered_records)
+        interval = {TimeWindow.MINUTE: timedelta(minutes=1), TimeWindow.HOUR: timedelta(hours=1)}.get(
+            time_window, timedelta(days=1))
+        time_series = []
+        time_point = start_time
+        while time_point <= end_time:
+            next_time = time_point + interval
+            period = [r for r in filtered_records if time_point <= r.timestamp < next_time]
+            calls = len(period)
+            time_series.append({
+                "timestamp": time_point.isoformat(),
+                "calls": calls,
+                "tokens": sum(r.total_tokens for r in period),
+                "cost": round(sum(r.cost for r in period), 4),
+                "avg_latency": round(sum(r.latency_ms for r in period) / calls, 2) if calls else 0,
+                "errors": sum(1 for r in period if not r.success)
+            })
+            time_point = next_time
+
+        breakdown = {name: defaultdict(lambda: {"calls": 0, "tokens": 0, "cost": 0.0})
+                     for name in ("by_provider", "by_model", "by_user", "by_call_type")}
+        for r in filtered_records:
+            for category, key in (("by_provider", r.provider_id), ("by_model", f"{r.provider_id}:{r.model_id}"),
+                                  ("by_user", r.user_id), ("by_call_type", r.call_type)):
+                stats = breakdown[category][key]
+                stats["calls"] += 1
+                stats["tokens"] += r.total_tokens
+                stats["cost"] += r.cost
+
+        return {
+            "total_calls": total_calls,
+            "total_tokens": sum(r.total_tokens for r in filtered_records),
+            "total_cost": round(sum(r.cost for r in filtered_records), 4),
+            "avg_latency": round(sum(r.latency_ms for r in filtered_records) / total_calls, 2),
+            "error_rate": round(sum(1 for r in filtered_records if not r.success) / total_calls, 4),
+            "time_series": time_series,
+            "breakdown": {category: dict(data) for category, data in breakdown.items()},
+        }
+
+    async def get_top_models(self, limit: int = 10):
+        model_stats = defaultdict(lambda: {"calls": 0, "tokens": 0, "cost": 0.0, "latency": 0.0, "errors": 0})
+        for r in self.usage_records:
+            stats = model_stats[(r.provider_id, r.model_id)]
+            stats["calls"] += 1
+            stats["tokens"] += r.total_tokens
+            stats["cost"] += r.cost
+            stats["latency"] += r.latency_ms
+            stats["errors"] += 0 if r.success else 1
+        top = sorted(model_stats.items(), key=lambda x: x[1]["calls"], reverse=True)[:limit]
+        return [{"provider_id": p, "model_id": m, "calls": s["calls"], "tokens": s["tokens"],
+                 "cost": round(s["cost"], 4), "avg_latency": round(s["latency"] / s["calls"], 2),
+                 "error_rate": round(s["errors"] / s["calls"], 4)} for (p, m), s in top]
+
+
+def generate_records(count: int, end: datetime) -> list:
+    rng = random.Random(42)
+    span = DAYS * 86400
+    offsets = sorted(rng.random() * span for _ in range(count))
+    models = [(p, m) for p, names in PROVIDERS.items() for m in names]
+    records = []
+    for offset in offsets:
+        provider_id, model_id = models[min(int(rng.expovariate(0.35)), len(models) - 1)]
+        input_tokens = rng.randint(10, 4000)
+        output_tokens = rng.randint(0, 2000)
+        success = rng.random() > 0.03
+        records.append(UsageRecord(
+            timestamp=end - timedelta(seconds=span - offset),
+            user_id=USERS[min(int(rng.expovariate(0.05)), len(USERS) - 1)],
+            provider_id=provider_id,
+            model_id=model_id,
+            call_type=rng.choice(CALL_TYPES),
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            total_tokens=input_tokens + output_tokens,
+            latency_ms=round(rng.uniform(80, 6000), 1),
+            cost=round((input_tokens + output_tokens) * 0.000002, 6),
+            success=success,
+            error_type=None if success else "timeout",
+        ))
+    return records
+
+
+def close(a, b) -> bool:
+    """浮点累加顺序不同，四舍五入到两位小数后可能相差最后一位"""
+    if isinstance(a, float) or isinstance(b, float):
+        return abs(a - b) <= 0.0101 + 1e-9 * abs(a)
+    return a == b
+
+
+def check_stats(old: dict, new: dict, label: str):
+    for key in ("total_calls", "total_tokens", "total_cost", "avg_latency", "error_rate"):
+        assert close(old[key], new[key]), (label, key, old[key], new[key])
+    assert len(old["time_series"]) == len(new["time_series"]), label
+    for a, b in zip(old["time_series"], new["time_series"]):
+        assert a["timestamp"] == b["timestamp"], label
+        for key in ("calls", "tokens", "cost", "avg_latency", "errors"):
+            assert close(a[key], b[key]), (label, a["timestamp"], key, a[key], b[key])
+    # 新实现只返回每类前10个，调用数相同的项顺序可能不同
+    for category, items in new["breakdown"].items():
+        full = old["breakdown"][category]
+        expected = sorted((s["calls"] for s in full.values()), reverse=True)[:10]
+        assert [item["calls"] for item in items] == expected, (label, category)
+        for item in items:
+            stats = full[item["key"]]
+            assert stats["calls"] == item["calls"] and stats["tokens"] == item["tokens"], (label, item)
+            assert close(stats["cost"], item["cost"]), (label, item)
+
+
+def timed(coroutine_factory, repeat: int):
+    result, best = None, float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = asyncio.run(coroutine_factory())
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    now = datetime.now().replace(microsecond=0)
+    print(f"generating {RECORDS} records over {DAYS} days ...")
+    records = generate_records(RECORDS, now)
+
+    legacy = LegacyUsageMonitor(RECORDS)
+    start = time.perf_counter()
+    legacy.usage_records.extend(records)
+    legacy_load = time.perf_counter() - start
+
+    monitor = UsageMonitor(max_records=RECORDS)
+    start = time.perf_counter()
+    for record in records:
+        monitor.usage_records.append(record)
+    store_load = time.perf_counter() - start
+    print(f"load: deque {legacy_load:.2f}s, columnar store with rollups {store_load:.2f}s "
+          f"({store_load / RECORDS * 1e6:.1f}us per record)\n")
+
+    queries = [
+        ("dashboard 1h/24h", dict(time_window=TimeWindow.HOUR, start_time=now - timedelta(hours=24), end_time=now)),
+        ("1d/30d", dict(time_window=TimeWindow.DAY, start_time=now - timedelta(days=30), end_time=now)),
+        ("1m/last hour", dict(time_window=TimeWindow.MINUTE, start_time=now - timedelta(hours=1), end_time=now)),
+        ("1h/7d odd edges", dict(time_window=TimeWindow.HOUR, start_time=now - timedelta(days=7, seconds=1234.5),
+                                 end_time=now - timedelta(seconds=77.25))),
+        ("user 1d/30d", dict(user_id="user_3", time_window=TimeWindow.DAY,
+                             start_time=now - timedelta(days=30), end_time=now)),
+        ("provider+model 1h/24h", dict(provider_id="zhipu", model_id="glm-4", time_window=TimeWindow.HOUR,
+                                       start_time=now - timedelta(hours=24), end_time=now)),
+    ]
+
+    print(f"{'query':<24}{'scan (s)':>10}{'rollup (s)':>12}{'speedup':>10}")
+    for label, params in queries:
+        old_time, old = timed(lambda: legacy.get_usage_stats(**params), 1)
+        new_time, new = timed(lambda: monitor.get_usage_stats(**params), REPEAT)
+        check_stats(old, new, label)
+        print(f"{label:<24}{old_time:>10.3f}{new_time:>12.4f}{old_time / new_time:>9.0f}x")
+
+    old_time, old = timed(lambda: legacy.get_top_models(5), 1)
+    new_time, new = timed(lambda: monitor.get_top_models(5), REPEAT)
+    assert [(m["provider_id"], m["model_id"], m["calls"], m["tokens"]) for m in old] == \
+           [(m["provider_id"], m["model_id"], m["calls"], m["tokens"]) for m in new]
+    assert all(close(a[k], b[k]) for a, b in zip(old, new) for k in ("cost", "avg_latency", "error_rate"))
+    print(f"{'top models':<24}{old_time:>10.3f}{new_time:>12.4f}{old_time / new_time:>9.0f}x")
+
+    # 清理旧记录后预聚合与剩余记录一致
+    cutoff = now - timedelta(days=DAYS // 2)
+    cleaned = monitor.cleanup_records_before(cutoff)
+    kept = [r for r in records if r.timestamp >= cutoff]
+    assert cleaned == RECORDS - len(kept)
+    legacy.usage_records = deque(kept)
+    params = dict(time_window=TimeWindow.DAY, start_time=now - timedelta(days=DAYS), end_time=now)
+    check_stats(asyncio.run(legacy.get_usage_stats(**params)), asyncio.run(monitor.get_usage_stats(**params)),
+                "after cleanup")
+    print("\nresults match (including after cleanup): ok")
+
+
+if __name__ == "__main__":
+    main()